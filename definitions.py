@@ -2,3 +2,4 @@ import os
 
 ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
 CONFIG_DIR = os.path.join(ROOT_DIR, "config")
+CONFIG_SNAPSHOT_FILE = os.path.join(ROOT_DIR, "storage", "config.snapshot.json")
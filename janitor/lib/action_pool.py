@@ -0,0 +1,256 @@
+from pyxavi.terminal_color import TerminalColor
+from pyxavi.config import Config
+from collections import deque
+from typing import Callable
+import multiprocessing
+import logging
+import psutil
+import signal
+import glob
+import time
+import os
+
+OVERLAP_SKIP = "skip"
+OVERLAP_QUEUE = "queue"
+OVERLAP_KILL = "kill"
+DEFAULT_OVERLAP = OVERLAP_SKIP
+DEFAULT_MAX_CONCURRENCY = 1
+DEFAULT_PID_DIR = "storage/scheduler"
+DEFAULT_POLL_SECONDS = 1
+KILL_GRACE_SECONDS = 5
+# Start times are read from /proc with the precision of a clock tick
+START_TIME_TOLERANCE = 0.5
+
+
+class ActionPool:
+    '''
+    ActionPool
+
+    Runs the scheduled actions in worker processes, so a slow one does not delay the rest.
+
+    Processes (and not threads) so they can be stopped when they time out or
+    when a new run replaces them. Every running action has a PID file, so a
+    Scheduler called from cron also sees the ones left running by a previous call.
+    The PID file also keeps the start time of the process, so a PID reused by
+    an unrelated process after a crash or a reboot is never taken as ours.
+
+    Every schedule can define:
+    - `max_concurrency`: how many runs of its action can run at the same time.
+    - `timeout`: seconds after which the run is stopped.
+    - `overlap`: what to do when the action is already running at its maximum:
+        "skip" it (default), "queue" it until there is room, or "kill" the oldest run.
+    '''
+
+    def __init__(
+        self,
+        config: Config,
+        logger: logging,
+        target: Callable[[str], None],
+        base_path: str = None
+    ) -> None:
+        self._config = config
+        self._logger = logger
+        self._target = target
+        self._pid_dir = config.get("scheduler.workers.pid_dir", DEFAULT_PID_DIR)
+        if base_path is not None:
+            self._pid_dir = os.path.join(base_path, self._pid_dir)
+        self._poll_seconds = config.get("scheduler.workers.poll_seconds", DEFAULT_POLL_SECONDS)
+        # Forking lets the workers inherit the already loaded config, logger and modules
+        self._context = multiprocessing.get_context("fork")
+        self._processes = {}
+        self._pending = deque()
+        os.makedirs(self._pid_dir, exist_ok=True)
+
+    def dispatch(self, schedule: dict) -> bool:
+        '''
+        Starts the action of the schedule, attending its limits.
+
+        Returns False when the run is skipped.
+        '''
+        self.reap()
+
+        action = schedule["action"]
+        max_concurrency = schedule.get("max_concurrency", DEFAULT_MAX_CONCURRENCY)
+        running = self.get_running_pids(action)
+        if len(running) < max_concurrency:
+            self._start(schedule)
+            return True
+
+        overlap = schedule.get("overlap", DEFAULT_OVERLAP)
+        if overlap == OVERLAP_SKIP:
+            self._logger.info(
+                f"{TerminalColor.YELLOW}The action [{action}] is already running, " +
+                f"skipping the schedule [{schedule['name']}]{TerminalColor.END}"
+            )
+            return False
+        elif overlap == OVERLAP_QUEUE:
+            self._logger.info(
+                f"The action [{action}] is already running, " +
+                f"queueing the schedule [{schedule['name']}]"
+            )
+            self._pending.append(schedule)
+            return True
+        elif overlap == OVERLAP_KILL:
+            # Make room stopping the oldest runs
+            for pid in running[:len(running) - max_concurrency + 1]:
+                self._logger.info(
+                    f"{TerminalColor.YELLOW}Stopping the previous run of [{action}] " +
+                    f"under PID {pid}{TerminalColor.END}"
+                )
+                self._kill(pid)
+            self._start(schedule)
+            return True
+        else:
+            raise RuntimeError(
+                f"Unknown overlap [{overlap}] for the schedule [{schedule['name']}]"
+            )
+
+    def reap(self) -> None:
+        '''
+        Collects the finished runs, stops the timed out ones and starts the queued ones
+        '''
+        now = time.monotonic()
+        for pid, job in list(self._processes.items()):
+            if not job["process"].is_alive():
+                job["process"].join()
+                if job["process"].exitcode != 0:
+                    self._logger.error(
+                        f"{TerminalColor.RED_BRIGHT}The action [{job['action']}] ended with " +
+                        f"exit code {job['process'].exitcode}{TerminalColor.END}"
+                    )
+                self._forget(pid)
+            elif job["timeout"] is not None and now - job["started_at"] > job["timeout"]:
+                self._logger.error(
+                    f"{TerminalColor.RED_BRIGHT}The action [{job['action']}] timed out after " +
+                    f"{job['timeout']} seconds, stopping it{TerminalColor.END}"
+                )
+                self._kill(pid)
+
+        for schedule in list(self._pending):
+            max_concurrency = schedule.get("max_concurrency", DEFAULT_MAX_CONCURRENCY)
+            if len(self.get_running_pids(schedule["action"])) < max_concurrency:
+                self._pending.remove(schedule)
+                self._start(schedule)
+
+    def is_busy(self) -> bool:
+        return len(self._processes) > 0 or len(self._pending) > 0
+
+    def get_poll_seconds(self) -> float:
+        return self._poll_seconds
+
+    def wait(self, drop_pending: bool = False) -> None:
+        '''
+        Blocks until all the runs started (and queued) from here are finished
+        '''
+        if drop_pending:
+            self._pending.clear()
+        self.reap()
+        while self.is_busy():
+            time.sleep(self._poll_seconds)
+            self.reap()
+
+    def get_running_pids(self, action: str) -> list:
+        '''
+        PIDs running the given action from any process, oldest first
+        '''
+        pid_files = sorted(
+            glob.glob(os.path.join(self._pid_dir, f"{action}.*.pid")), key=os.path.getmtime
+        )
+        pids = []
+        for pid_file in pid_files:
+            try:
+                pid = int(os.path.basename(pid_file).split(".")[-2])
+            except ValueError:
+                continue
+            if self._is_ours(pid, pid_file):
+                pids.append(pid)
+            else:
+                # Left behind by a run that could not clean up
+                self._remove_pid_file(pid_file)
+        return pids
+
+    def _start(self, schedule: dict) -> None:
+        process = self._context.Process(
+            target=self._run_action, args=(schedule["action"], ), name=schedule["name"]
+        )
+        process.start()
+        self._processes[process.pid] = {
+            "action": schedule["action"],
+            "process": process,
+            "started_at": time.monotonic(),
+            "timeout": schedule.get("timeout", None),
+        }
+        with open(self._get_pid_file(schedule["action"], process.pid), "w") as file:
+            file.write(f"{process.pid} {self._get_start_time(process.pid)}")
+        self._logger.debug(f"Action [{schedule['action']}] started under PID {process.pid}")
+
+    def _run_action(self, action: str) -> None:
+        # Inherited from the parent, that may have its own handlers to stop gracefully
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        try:
+            self._target(action)
+        except Exception as e:
+            self._logger.exception(e)
+            raise SystemExit(1)
+
+    def _kill(self, pid: int) -> None:
+        if pid in self._processes:
+            process = self._processes[pid]["process"]
+            process.terminate()
+            process.join(KILL_GRACE_SECONDS)
+            if process.is_alive():
+                process.kill()
+                process.join()
+            self._forget(pid)
+            return
+
+        # Started by another process, we can only signal it.
+        #   psutil checks that the PID is still the same process before every signal.
+        try:
+            process = psutil.Process(pid)
+            process.terminate()
+            try:
+                process.wait(KILL_GRACE_SECONDS)
+            except psutil.TimeoutExpired:
+                process.kill()
+        except psutil.NoSuchProcess:
+            pass
+
+    def _forget(self, pid: int) -> None:
+        job = self._processes.pop(pid)
+        self._remove_pid_file(self._get_pid_file(job["action"], pid))
+
+    def _is_ours(self, pid: int, pid_file: str) -> bool:
+        '''
+        If the PID is alive and it is still the process that wrote the PID file
+        '''
+        if pid in self._processes:
+            return self._processes[pid]["process"].is_alive()
+        try:
+            with open(pid_file, "r") as file:
+                recorded_start_time = float(file.read().split()[1])
+        except (OSError, IndexError, ValueError):
+            # Without a start time to compare with, we can not trust it
+            return False
+        start_time = self._get_start_time(pid)
+        return start_time is not None\
+            and abs(start_time - recorded_start_time) <= START_TIME_TOLERANCE
+
+    def _get_start_time(self, pid: int) -> float:
+        try:
+            process = psutil.Process(pid)
+            if process.status() == psutil.STATUS_ZOMBIE:
+                return None
+            return process.create_time()
+        except psutil.NoSuchProcess:
+            return None
+
+    def _get_pid_file(self, action: str, pid: int) -> str:
+        return os.path.join(self._pid_dir, f"{action}.{pid}.pid")
+
+    def _remove_pid_file(self, pid_file: str) -> None:
+        try:
+            os.remove(pid_file)
+        except FileNotFoundError:
+            pass
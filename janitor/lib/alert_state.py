@@ -0,0 +1,416 @@
+from pyxavi.config import Config
+from janitor.objects.message import Message, MessageType
+from janitor.lib.system_info import SystemInfo
+from janitor.lib.system_info_templater import SystemInfoTemplater
+from typing import Callable
+import threading
+import sqlite3
+import time
+import os
+
+DEFAULT_STATE_FILE = "storage/alert_state.db"
+DEFAULT_RENOTIFY_SECONDS = 0
+TRANSITION_FIRING = "firing"
+TRANSITION_ESCALATED = "escalated"
+TRANSITION_RENOTIFY = "renotify"
+TRANSITION_RESOLVED = "resolved"
+
+
+def _get_priority(severity: str) -> int:
+    try:
+        return MessageType.priority().index(severity)
+    except ValueError:
+        return 0
+
+
+class AlertStateStore:
+    '''
+    AlertStateStore
+
+    Remembers which metrics of which hosts are crossing their thresholds,
+    in a SQLite database that the listener and the local runner can share.
+
+    Only the firing alerts have a row: a metric without one is ok. Besides
+    the current severity, every row keeps the last one that was notified,
+    so an alert whose message could not be published is notified again in
+    the next update. Same for a resolution, that keeps its row until it is
+    notified.
+    '''
+
+    def __init__(self, storage_file: str = DEFAULT_STATE_FILE) -> None:
+        if storage_file != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(storage_file)), exist_ok=True)
+        self._lock = threading.RLock()
+        # Transactions are opened explicitly, see update()
+        self._connection = sqlite3.connect(
+            storage_file, timeout=30, check_same_thread=False, isolation_level=None
+        )
+        self._create_schema()
+
+    def _create_schema(self) -> None:
+        with self._lock:
+            # Lets readers and a writer from other processes work at the same time
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS alert_state (
+                    hostname TEXT NOT NULL,
+                    metric TEXT NOT NULL,
+                    severity TEXT NOT NULL,
+                    fired_at REAL NOT NULL,
+                    notified_at REAL NOT NULL,
+                    notified_severity TEXT,
+                    resolved_at REAL,
+                    PRIMARY KEY (hostname, metric)
+                ) WITHOUT ROWID
+                """
+            )
+            # Databases created before the notifications were confirmed
+            columns = [
+                row[1] for row in self._connection.execute("PRAGMA table_info(alert_state)")
+            ]
+            if "notified_severity" not in columns:
+                self._connection.execute(
+                    "ALTER TABLE alert_state ADD COLUMN notified_severity TEXT"
+                )
+                self._connection.execute("UPDATE alert_state SET notified_severity = severity")
+            if "resolved_at" not in columns:
+                self._connection.execute("ALTER TABLE alert_state ADD COLUMN resolved_at REAL")
+
+    def update(
+        self,
+        hostname: str,
+        crossed: dict,
+        now: float = None,
+        renotify_seconds: float = 0
+    ) -> dict:
+        '''
+        Stores the metrics crossed now by the host, and returns the transitions
+            to notify, as {transition: [metric, ...]}
+
+        - firing: were ok and now are crossed, or were never notified
+        - escalated: are crossed with a higher severity than the notified one
+        - renotify: still crossed, and it's been renotify_seconds since the last notification
+        - resolved: were notified as crossed and now are ok
+
+        Nothing is considered notified until mark_notified() is called for it,
+            so the transitions come again in the next update if it never is.
+        '''
+        now = now if now is not None else time.time()
+        transitions = {
+            TRANSITION_FIRING: [],
+            TRANSITION_ESCALATED: [],
+            TRANSITION_RENOTIFY: [],
+            TRANSITION_RESOLVED: [],
+        }
+        with self._lock:
+            # Immediate, so another process can't read the same state meanwhile
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                stored = {
+                    row[0]: {
+                        "severity": row[1],
+                        "notified_at": row[2],
+                        "notified_severity": row[3],
+                        "resolved_at": row[4],
+                    }
+                    for row in self._connection.execute(
+                        "SELECT metric, severity, notified_at, notified_severity, " +
+                        "resolved_at FROM alert_state WHERE hostname = ?", (hostname, )
+                    )
+                }
+
+                for metric, severity in crossed.items():
+                    if metric not in stored:
+                        transitions[TRANSITION_FIRING].append(metric)
+                        self._connection.execute(
+                            "INSERT INTO alert_state " +
+                            "(hostname, metric, severity, fired_at, notified_at) " +
+                            "VALUES (?, ?, ?, ?, ?)", (hostname, metric, severity, now, now)
+                        )
+                        continue
+
+                    row = stored[metric]
+                    if row["notified_severity"] is None:
+                        transitions[TRANSITION_FIRING].append(metric)
+                    elif _get_priority(severity) > _get_priority(row["notified_severity"]):
+                        transitions[TRANSITION_ESCALATED].append(metric)
+                    elif renotify_seconds > 0\
+                            and now - row["notified_at"] >= renotify_seconds:
+                        transitions[TRANSITION_RENOTIFY].append(metric)
+                    # Lowering the severity is not worth a notification, just keep it
+                    if severity != row["severity"] or row["resolved_at"] is not None:
+                        self._connection.execute(
+                            "UPDATE alert_state SET severity = ?, resolved_at = NULL " +
+                            "WHERE hostname = ? AND metric = ?", (severity, hostname, metric)
+                        )
+
+                for metric, row in stored.items():
+                    if metric in crossed:
+                        continue
+                    if row["notified_severity"] is None:
+                        # Nobody heard about it, so there is nothing to resolve
+                        self._delete(hostname, metric)
+                        continue
+                    transitions[TRANSITION_RESOLVED].append(metric)
+                    if row["resolved_at"] is None:
+                        self._connection.execute(
+                            "UPDATE alert_state SET resolved_at = ? " +
+                            "WHERE hostname = ? AND metric = ?", (now, hostname, metric)
+                        )
+                self._connection.execute("COMMIT")
+            except Exception:
+                self._connection.execute("ROLLBACK")
+                raise
+
+        return transitions
+
+    def mark_notified(
+        self,
+        hostname: str,
+        transitions: dict,
+        now: float = None,
+        severities: dict = None
+    ) -> None:
+        '''
+        Confirms that the given transitions of the host were published
+
+        `severities` are the ones in the published message, as {metric: severity}.
+            Without them, the current severity of every metric is the notified one.
+        '''
+        now = now if now is not None else time.time()
+        severities = severities if severities is not None else {}
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                for transition in [TRANSITION_FIRING, TRANSITION_ESCALATED,
+                                   TRANSITION_RENOTIFY]:
+                    for metric in transitions.get(transition, []):
+                        # Unless it got resolved meanwhile. If it escalated meanwhile,
+                        #   the escalation is still to be notified.
+                        self._connection.execute(
+                            "UPDATE alert_state SET " +
+                            "notified_severity = COALESCE(?, severity), notified_at = ? " +
+                            "WHERE hostname = ? AND metric = ? AND resolved_at IS NULL",
+                            (severities.get(metric, None), now, hostname, metric)
+                        )
+                for metric in transitions.get(TRANSITION_RESOLVED, []):
+                    # Unless it fired again meanwhile
+                    self._connection.execute(
+                        "DELETE FROM alert_state WHERE hostname = ? AND metric = ? " +
+                        "AND resolved_at IS NOT NULL", (hostname, metric)
+                    )
+                self._connection.execute("COMMIT")
+            except Exception:
+                self._connection.execute("ROLLBACK")
+                raise
+
+    def get_firing(self, hostname: str = None) -> list:
+        '''
+        The firing alerts, of all hosts or only the given one
+        '''
+        query = "SELECT hostname, metric, severity, fired_at, notified_at, " +\
+            "notified_severity FROM alert_state WHERE resolved_at IS NULL"
+        params = ()
+        if hostname is not None:
+            query += " AND hostname = ?"
+            params = (hostname, )
+        with self._lock:
+            rows = self._connection.execute(query + " ORDER BY hostname, metric", params)
+            return [
+                {
+                    "hostname": row[0],
+                    "metric": row[1],
+                    "severity": row[2],
+                    "fired_at": row[3],
+                    "notified_at": row[4] if row[5] is not None else None,
+                } for row in rows
+            ]
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def _delete(self, hostname: str, metric: str):
+        self._connection.execute(
+            "DELETE FROM alert_state WHERE hostname = ? AND metric = ?", (hostname, metric)
+        )
+
+
+class AlertState:
+    '''
+    AlertState
+
+    Decides what to publish for a System Info report attending the stored
+    state of its host, so a host that keeps crossing a threshold does not
+    publish the same report every time:
+
+    - The full report when a metric starts firing, escalates in severity,
+        or has been firing for longer than the renotify interval (when set).
+    - A message listing the metrics that went back under their thresholds.
+
+    The changes are only stored as notified once their message is published,
+    so a failed publish is retried with the next report of the host. While
+    the message is on its way (for example, waiting in the ingest queue),
+    the changes it notifies are pending and the next reports do not notify
+    them again, unless they escalate.
+    '''
+
+    def __init__(self, config: Config, store: AlertStateStore = None) -> None:
+        self._config = config
+        self._sys_info = SystemInfo(config)
+        self._store = store if store is not None else AlertStateStore(
+            storage_file=config.get("system_info.alert_state.file", DEFAULT_STATE_FILE)
+        )
+        self._renotify_seconds = config.get(
+            "system_info.alert_state.renotify_seconds", DEFAULT_RENOTIFY_SECONDS
+        )
+        # Changes being published, as {(hostname, metric): (severity, )}, where
+        #   the severity is None for a resolution. Tuples, to tell them apart.
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+
+    def track(self, sys_data: dict, now: float = None, crossed: dict = None) -> dict:
+        '''
+        Updates the state of the host of the report and returns the transitions,
+            without the ones already pending to be published
+        '''
+        hostname = sys_data.get("hostname", "unknown host")
+        crossed = crossed if crossed is not None\
+            else self._sys_info.get_crossed_metrics(sys_data, ["hostname"])
+        transitions = self._store.update(
+            hostname=hostname,
+            crossed=crossed,
+            now=now,
+            renotify_seconds=self._renotify_seconds
+        )
+        with self._pending_lock:
+            for transition in [TRANSITION_FIRING, TRANSITION_ESCALATED, TRANSITION_RENOTIFY]:
+                transitions[transition] = [
+                    metric for metric in transitions[transition]
+                    if not self._is_pending(hostname, metric, crossed[metric])
+                ]
+            transitions[TRANSITION_RESOLVED] = [
+                metric for metric in transitions[TRANSITION_RESOLVED]
+                if not self._is_pending(hostname, metric, None)
+            ]
+        return transitions
+
+    def get_notifications(self, sys_data: dict, transitions: dict) -> list:
+        '''
+        The Messages to publish for the transitions of the report, if any,
+            as [(Message, the transitions that it notifies), ...]
+        '''
+        notifications = []
+        if self.needs_report(transitions):
+            notifications.append(
+                (
+                    SystemInfoTemplater(self._config).process_report(dict(sys_data)),
+                    {
+                        transition: transitions[transition]
+                        for transition in
+                        [TRANSITION_FIRING, TRANSITION_ESCALATED, TRANSITION_RENOTIFY]
+                    }
+                )
+            )
+        resolved_message = self.get_resolved_message(sys_data, transitions)
+        if resolved_message is not None:
+            notifications.append(
+                (resolved_message, {
+                    TRANSITION_RESOLVED: transitions[TRANSITION_RESOLVED]
+                })
+            )
+        return notifications
+
+    def mark_notified(
+        self,
+        sys_data: dict,
+        transitions: dict,
+        now: float = None,
+        severities: dict = None
+    ) -> None:
+        self._store.mark_notified(
+            hostname=sys_data.get("hostname", "unknown host"),
+            transitions=transitions,
+            now=now,
+            severities=severities
+        )
+
+    def publish_changes(self, sys_data: dict, publish: Callable, now: float = None) -> list:
+        '''
+        Tracks the report and publishes the changes in the alerts of its host
+
+        `publish(message, on_done)` returns whatever the caller needs back
+            and has to call `on_done(published)` once it knows if the message
+            got out, which can be later on when it is queued. The returned
+            values are collected in a list, empty when there is nothing to publish.
+        '''
+        hostname = sys_data.get("hostname", "unknown host")
+        crossed = self._sys_info.get_crossed_metrics(sys_data, ["hostname"])
+        transitions = self.track(sys_data, now, crossed=crossed)
+        results = []
+        for message, notified in self.get_notifications(sys_data, transitions):
+            severities = {
+                metric: crossed[metric]
+                for transition,
+                metrics in notified.items() if transition != TRANSITION_RESOLVED
+                for metric in metrics
+            }
+            pending = self._set_pending(hostname, notified, severities)
+
+            def on_done(
+                published: bool, notified=notified, severities=severities, pending=pending
+            ):
+                if published:
+                    self.mark_notified(sys_data, notified, now, severities=severities)
+                self._clear_pending(pending)
+
+            try:
+                results.append(publish(message, on_done))
+            except BaseException:
+                # MastodonPublisherException is not an Exception
+                self._clear_pending(pending)
+                raise
+        return results
+
+    def get_resolved_message(self, sys_data: dict, transitions: dict) -> Message:
+        if len(transitions[TRANSITION_RESOLVED]) == 0:
+            return None
+        return SystemInfoTemplater(self._config).process_resolved(
+            hostname=sys_data.get("hostname", "unknown host"),
+            metrics=transitions[TRANSITION_RESOLVED],
+            system_info_data=sys_data
+        )
+
+    def _is_pending(self, hostname: str, metric: str, severity: str) -> bool:
+        pending = self._pending.get((hostname, metric), None)
+        if pending is None or (pending[0] is None) != (severity is None):
+            return False
+        # A report is pending, but it does not cover an escalation
+        return severity is None or _get_priority(severity)\
+            <= _get_priority(pending[0])
+
+    def _set_pending(self, hostname: str, notified: dict, severities: dict) -> dict:
+        pending = {}
+        for metrics in notified.values():
+            for metric in metrics:
+                pending[(hostname, metric)] = (severities.get(metric, None), )
+        with self._pending_lock:
+            self._pending.update(pending)
+        return pending
+
+    def _clear_pending(self, pending: dict) -> None:
+        with self._pending_lock:
+            for key, value in pending.items():
+                # Unless a newer publish of the same metric took over
+                if self._pending.get(key, None) is value:
+                    del self._pending[key]
+
+    @staticmethod
+    def needs_report(transitions: dict) -> bool:
+        return any(
+            [
+                len(transitions[transition]) > 0 for transition in
+                [TRANSITION_FIRING, TRANSITION_ESCALATED, TRANSITION_RENOTIFY]
+            ]
+        )
@@ -0,0 +1,75 @@
+from pyxavi.storage import Storage
+import threading
+import tempfile
+import yaml
+import stat
+import os
+
+
+class BufferedStorage(Storage):
+    '''
+    BufferedStorage
+
+    A Storage meant to be shared by several consumers during a run.
+
+    - get() and set() are thread safe.
+    - write_file() only flags that there are changes, nothing touches the disk.
+    - flush() writes all buffered changes once, into a temporary file in the same
+        directory that then replaces the original, so the file is never left
+        half written.
+    '''
+
+    def __init__(self, filename, path_separator_char=None) -> None:
+        self._lock = threading.RLock()
+        self._dirty = False
+        super().__init__(filename=filename, path_separator_char=path_separator_char)
+
+    def get(self, param_name: str = "", default_value: any = None) -> any:
+        with self._lock:
+            return super().get(param_name=param_name, default_value=default_value)
+
+    def set(self, param_name: str, value: any = None) -> None:
+        with self._lock:
+            super().set(param_name=param_name, value=value)
+
+    def write_file(self) -> None:
+        with self._lock:
+            self._dirty = True
+
+    def is_dirty(self) -> bool:
+        return self._dirty
+
+    def flush(self) -> bool:
+        """
+        Writes the buffered changes, if any. Returns if something was written.
+        """
+        with self._lock:
+            if not self._dirty:
+                return False
+
+            directory = os.path.dirname(os.path.abspath(self._filename))
+            file_descriptor, temporary_filename = tempfile.mkstemp(
+                dir=directory, prefix=".", suffix=".tmp"
+            )
+            try:
+                with os.fdopen(file_descriptor, 'w') as stream:
+                    yaml.safe_dump(self._content, stream)
+                # mkstemp creates it as 0600, the replace must not change the mode
+                os.chmod(temporary_filename, self._get_file_mode())
+                os.replace(temporary_filename, self._filename)
+            except Exception:
+                if os.path.exists(temporary_filename):
+                    os.unlink(temporary_filename)
+                raise
+
+            self._dirty = False
+            return True
+
+    def _get_file_mode(self) -> int:
+        try:
+            return stat.S_IMODE(os.stat(self._filename).st_mode)
+        except FileNotFoundError:
+            # A new file gets the same mode that open() would give it
+            umask = os.umask(0)
+            os.umask(umask)
+            return 0o666 & ~umask
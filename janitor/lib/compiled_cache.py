@@ -0,0 +1,41 @@
+from pyxavi.config import Config
+from typing import Callable, Hashable
+import threading
+import weakref
+
+
+class CompiledCache:
+    '''
+    CompiledCache
+
+    Keeps the artefacts compiled from the config (templates, regular expressions,
+    lookup maps...) so the hot paths do not traverse the config nor compile anything.
+
+    - Artefacts are built once per config object and name, by the given builder,
+        and shared by all the instances using the same config object.
+    - They are dropped when the config object is gone, when its content is reloaded
+        (read_file() and the root merges replace it), or when invalidate() is called.
+    '''
+
+    _entries: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+    _lock = threading.RLock()
+
+    @classmethod
+    def get(cls, config: Config, name: Hashable, builder: Callable[[Config], any]) -> any:
+        content = getattr(config, "_content", None)
+        with cls._lock:
+            entry = cls._entries.get(config, None)
+            if entry is None or entry["content"] is not content:
+                entry = {"content": content, "artefacts": {}}
+                cls._entries[config] = entry
+            if name not in entry["artefacts"]:
+                entry["artefacts"][name] = builder(config)
+            return entry["artefacts"][name]
+
+    @classmethod
+    def invalidate(cls, config: Config = None) -> None:
+        with cls._lock:
+            if config is None:
+                cls._entries.clear()
+            else:
+                cls._entries.pop(config, None)
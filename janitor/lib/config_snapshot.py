@@ -0,0 +1,172 @@
+from pyxavi.config import Config
+import tempfile
+import hashlib
+import json
+import glob
+import stat
+import os
+
+MAIN_CONFIG_FILE = "main.yaml"
+
+
+class ConfigSnapshot:
+    '''
+    ConfigSnapshot
+
+    Keeps the config merged from all the YAML files of the config directory
+    in a single JSON file, that loads much faster than parsing and merging
+    all of them again in every call.
+
+    The snapshot is used while the YAML files are the same ones and, for every
+    file, the modification time and size did not change, or else its content
+    hash is the same. Otherwise it is rebuilt from the YAML files.
+    '''
+
+    VERSION = 1
+
+    def __init__(self, config_dir: str, snapshot_file: str) -> None:
+        self._config_dir = config_dir
+        self._snapshot_file = snapshot_file
+
+    def load(self) -> Config:
+        sources = self._get_sources()
+        snapshot = self._read_snapshot()
+        if snapshot is not None:
+            fresh, touched = self._check_sources(snapshot["sources"], sources)
+            if fresh:
+                if touched:
+                    # Same content with new stats, save them to avoid hashing next time
+                    snapshot["sources"] = self._describe_sources(sources)
+                    self._write_snapshot(snapshot)
+                return Config(params=snapshot["config"])
+
+        return self.build(sources=sources)
+
+    def build(self, sources: list = None) -> Config:
+        '''
+        Merges the YAML files and saves the result as the snapshot
+        '''
+        sources = sources if sources is not None else self._get_sources()
+        # Described before merging, so a file changed meanwhile invalidates the snapshot
+        described_sources = self._describe_sources(sources)
+        config = self.merge_files(sources)
+        self._write_snapshot(
+            {
+                "version": self.VERSION,
+                "sources": described_sources,
+                "config": config.get_all(),
+            }
+        )
+        return config
+
+    def merge_files(self, sources: list = None) -> Config:
+        """
+        Loads all configs existing in the config directory.
+
+        This is a merge-all-to-one approach, so may be the case that later objects
+            overwrite older ones
+        """
+        sources = sources if sources is not None else self._get_sources()
+
+        # Yes, technically we're loading main.yaml twice
+        config = Config(filename=os.path.join(self._config_dir, MAIN_CONFIG_FILE))
+        for file in sources:
+            config.merge_from_file(filename=os.path.join(self._config_dir, file))
+
+        return config
+
+    def _get_sources(self) -> list:
+        return glob.glob(os.path.join(self._config_dir, "*.yaml"))
+
+    def _describe_sources(self, sources: list) -> dict:
+        described = {}
+        for source in sources:
+            path = os.path.join(self._config_dir, source)
+            stat = os.stat(path)
+            described[os.path.basename(path)] = {
+                "mtime": stat.st_mtime_ns,
+                "size": stat.st_size,
+                "sha256": self._hash_file(path),
+            }
+        return described
+
+    def _check_sources(self, described: dict, sources: list) -> tuple:
+        '''
+        Returns if the described sources are still the current ones,
+            and if any of them needed the content hash to tell.
+        '''
+        paths = {
+            os.path.basename(source): os.path.join(self._config_dir, source)
+            for source in sources
+        }
+        if sorted(paths.keys()) != sorted(described.keys()):
+            return False, False
+
+        touched = False
+        for name, path in paths.items():
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                return False, False
+            if stat.st_mtime_ns == described[name]["mtime"]\
+                    and stat.st_size == described[name]["size"]:
+                continue
+            if stat.st_size != described[name]["size"]\
+                    or self._hash_file(path) != described[name]["sha256"]:
+                return False, False
+            touched = True
+
+        return True, touched
+
+    def _hash_file(self, path: str) -> str:
+        with open(path, "rb") as file:
+            return hashlib.sha256(file.read()).hexdigest()
+
+    def _read_snapshot(self) -> dict:
+        try:
+            with open(self._snapshot_file, "r") as file:
+                snapshot = json.load(file)
+        except (OSError, ValueError):
+            return None
+
+        if not isinstance(snapshot, dict) or snapshot.get("version") != self.VERSION:
+            return None
+        return snapshot
+
+    def _write_snapshot(self, snapshot: dict) -> bool:
+        directory = os.path.dirname(os.path.abspath(self._snapshot_file))
+        try:
+            os.makedirs(directory, exist_ok=True)
+            file_descriptor, temporary_filename = tempfile.mkstemp(
+                dir=directory, prefix=".", suffix=".tmp"
+            )
+        except OSError:
+            # Not being able to cache is not a reason to stop
+            return False
+
+        try:
+            with os.fdopen(file_descriptor, 'w') as stream:
+                content = json.dumps(snapshot)
+                # JSON turns non string keys into strings, it has to come back the same
+                if json.loads(content) != snapshot:
+                    raise ValueError("The config does not survive a JSON round trip")
+                stream.write(content)
+            # mkstemp creates it as 0600, the replace must not change the mode
+            os.chmod(temporary_filename, self._get_file_mode())
+            os.replace(temporary_filename, self._snapshot_file)
+        except (OSError, TypeError, ValueError):
+            # Values that JSON can't hold, like dates. We simply don't cache.
+            if os.path.exists(temporary_filename):
+                os.unlink(temporary_filename)
+            return False
+
+        return True
+
+    def _get_file_mode(self) -> int:
+        try:
+            return stat.S_IMODE(os.stat(self._snapshot_file).st_mode)
+        except FileNotFoundError:
+            # A new file gets the same mode that open() would give it
+            umask = os.umask(0)
+            os.umask(umask)
+            return 0o666 & ~umask
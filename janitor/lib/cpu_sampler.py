@@ -0,0 +1,171 @@
+import threading
+import atexit
+import psutil
+import json
+import time
+import os
+
+DEFAULT_STATE_FILE = "storage/cpu_sample.json"
+DEFAULT_MAX_SAMPLE_AGE = 900
+DEFAULT_FALLBACK_INTERVAL = 0.1
+DEFAULT_PERSIST_INTERVAL = 300
+
+
+class CpuSampler:
+    '''
+    CpuSampler
+
+    Gets the CPU utilisation from the difference of the CPU times between two
+    samples, instead of blocking for a whole second to measure it.
+
+    - The previous sample is kept in memory for the running process, and in a
+        state file for the next runs, so a run from cron gets the utilisation
+        since the previous run in microseconds. That is, the average since the
+        previous run and not the usage of the last second.
+    - The state file is written when the process exits and, for the long
+        running ones, every `persist_interval` seconds, not on every sample.
+    - Only when there is no usable previous sample (first run, too old, or the
+        machine rebooted meanwhile) it measures during a short interval.
+    '''
+
+    _last_sample: dict = None
+    # The timestamp of the last sample written into the state file
+    _persisted_at: float = None
+    _first_sample_at: float = None
+    _exit_hooks: set = set()
+    _lock = threading.Lock()
+
+    def __init__(
+        self,
+        state_file: str = DEFAULT_STATE_FILE,
+        max_sample_age: float = DEFAULT_MAX_SAMPLE_AGE,
+        fallback_interval: float = DEFAULT_FALLBACK_INTERVAL,
+        persist_interval: float = DEFAULT_PERSIST_INTERVAL
+    ) -> None:
+        self._state_file = state_file
+        self._max_sample_age = max_sample_age
+        self._fallback_interval = fallback_interval
+        self._persist_interval = persist_interval
+
+    def sample(self) -> dict:
+        '''
+        Returns the CPU utilisation percent, in total and per core
+        '''
+        current = self._take_sample()
+        with self._lock:
+            previous = self._get_previous_sample(current)
+            if previous is None:
+                time.sleep(self._fallback_interval)
+                previous, current = current, self._take_sample()
+            CpuSampler._last_sample = current
+            self._persist_if_due(current)
+
+        return {
+            "cpu_percent": self._get_percent(previous["cpu"], current["cpu"]),
+            "cpu_percent_per_core": [
+                self._get_percent(previous_core, current_core) for previous_core,
+                current_core in zip(previous["cores"], current["cores"])
+            ]
+        }
+
+    def persist(self) -> None:
+        '''
+        Writes the last sample into the state file, unless it is already there
+        '''
+        with self._lock:
+            sample = CpuSampler._last_sample
+            if sample is None or (CpuSampler._persisted_at is not None and
+                                  CpuSampler._persisted_at >= sample["timestamp"]):
+                return
+            self._write_state(sample)
+            CpuSampler._persisted_at = sample["timestamp"]
+
+    def get_load_average(self) -> tuple:
+        '''
+        Returns the load average of the last 1, 5 and 15 minutes
+        '''
+        return psutil.getloadavg()
+
+    def _take_sample(self) -> dict:
+        return {
+            "timestamp": time.time(),
+            "cpu": self._to_times(psutil.cpu_times()),
+            "cores": [self._to_times(core) for core in psutil.cpu_times(percpu=True)],
+        }
+
+    def _to_times(self, cpu_times) -> list:
+        '''
+        Reduces the CPU times to [total, busy], the way psutil.cpu_percent does
+        '''
+        total = sum(cpu_times)
+        # In Linux "guest" is already counted in "user" and "guest_nice" in "nice"
+        total -= getattr(cpu_times, "guest", 0)
+        total -= getattr(cpu_times, "guest_nice", 0)
+        busy = total - cpu_times.idle - getattr(cpu_times, "iowait", 0)
+        return [total, busy]
+
+    def _get_previous_sample(self, current: dict) -> dict:
+        candidates = [
+            sample for sample in [CpuSampler._last_sample, self._read_state()]
+            if sample is not None and self._is_usable(sample, current)
+        ]
+        if len(candidates) == 0:
+            return None
+        # Another process could have sampled after us
+        return max(candidates, key=lambda x: x["timestamp"])
+
+    def _is_usable(self, previous: dict, current: dict) -> bool:
+        age = current["timestamp"] - previous["timestamp"]
+        return 0 < age <= self._max_sample_age\
+            and len(previous["cores"]) == len(current["cores"])\
+            and current["cpu"][0] > previous["cpu"][0]
+
+    def _get_percent(self, previous: list, current: list) -> float:
+        total_delta = current[0] - previous[0]
+        if total_delta <= 0:
+            return 0.0
+        percent = (current[1] - previous[1]) / total_delta * 100
+        return round(min(max(percent, 0.0), 100.0), 1)
+
+    def _persist_if_due(self, sample: dict) -> None:
+        if self._state_file is None:
+            return
+
+        if self._state_file not in CpuSampler._exit_hooks:
+            CpuSampler._exit_hooks.add(self._state_file)
+            atexit.register(self.persist)
+
+        # Counting from the last write, or from the first sample of the process
+        since = CpuSampler._persisted_at if CpuSampler._persisted_at is not None\
+            else CpuSampler._first_sample_at
+        if since is None:
+            CpuSampler._first_sample_at = sample["timestamp"]
+        elif sample["timestamp"] - since >= self._persist_interval:
+            self._write_state(sample)
+            CpuSampler._persisted_at = sample["timestamp"]
+
+    def _read_state(self) -> dict:
+        if self._state_file is None:
+            return None
+        try:
+            with open(self._state_file, "r") as file:
+                sample = json.load(file)
+        except (OSError, ValueError):
+            return None
+
+        if not isinstance(sample, dict) or any(key not in sample
+                                               for key in ["timestamp", "cpu", "cores"]):
+            return None
+        return sample
+
+    def _write_state(self, sample: dict) -> None:
+        if self._state_file is None:
+            return
+        try:
+            directory = os.path.dirname(os.path.abspath(self._state_file))
+            os.makedirs(directory, exist_ok=True)
+            # Not worth a temporary file: a broken state is just ignored next time
+            with open(self._state_file, "w") as file:
+                json.dump(sample, file)
+        except OSError:
+            pass
@@ -3,6 +3,7 @@ from pyxavi.config import Config
 from ..objects.message import Message
 from janitor.objects.message import MessageType
 from pyxavi.mastodon_helper import StatusPost, StatusPostVisibility, MastodonStatusParams
+from janitor.lib.compiled_cache import CompiledCache
 from string import Template
 import logging
 
@@ -18,46 +19,43 @@ class Formatter:
         self._logger = logging.getLogger(config.get("logger.name"))
         self._status_params = status_params
         self._merge_summary_into_text = config.get("formatter.merge_summary_into_text", False)
-        self._templates = {
+        self._templates = CompiledCache.get(config, self.__class__.__name__, self._compile)
+
+    @staticmethod
+    def _compile(config: Config) -> dict:
+        """
+        Compiles once the templates defined in the config
+        """
+        return {
             "merge_strategies": {
-                "text_with_mention": config.get(
-                    "formatter.templates.merge_strategies.mention_into_text",
-                    "$text\n\n$mention"
-                ),
-                "summary_into_text": config.get(
-                    "formatter.templates.merge_strategies.summary_into_text",
-                    "$summary\n\n$text"
-                ),
-            },
-            MessageType.NONE: {
-                "summary": config.get(
-                    "formatter.templates.message_type.none.summary", "$summary"
-                ),
-                "text": config.get("formatter.templates.message_type.none.text", "$text")
-            },
-            MessageType.INFO: {
-                "summary": config.get(
-                    "formatter.templates.message_type.info.summary", "$summary"
+                "text_with_mention": Template(
+                    config.get(
+                        "formatter.templates.merge_strategies.mention_into_text",
+                        "$text\n\n$mention"
+                    )
                 ),
-                "text": config.get("formatter.templates.message_type.info.text", "$text")
-            },
-            MessageType.WARNING: {
-                "summary": config.get(
-                    "formatter.templates.message_type.warning.summary", "$summary"
+                "summary_into_text": Template(
+                    config.get(
+                        "formatter.templates.merge_strategies.summary_into_text",
+                        "$summary\n\n$text"
+                    )
                 ),
-                "text": config.get("formatter.templates.message_type.warning.text", "$text")
             },
-            MessageType.ERROR: {
-                "summary": config.get(
-                    "formatter.templates.message_type.error.summary", "$summary"
-                ),
-                "text": config.get("formatter.templates.message_type.error.text", "$text")
-            },
-            MessageType.ALARM: {
-                "summary": config.get(
-                    "formatter.templates.message_type.alarm.summary", "$summary"
-                ),
-                "text": config.get("formatter.templates.message_type.alarm.text", "$text")
+            **{
+                message_type: {
+                    "summary": Template(
+                        config.get(
+                            f"formatter.templates.message_type.{message_type}.summary",
+                            "$summary"
+                        )
+                    ),
+                    "text": Template(
+                        config.get(
+                            f"formatter.templates.message_type.{message_type}.text", "$text"
+                        )
+                    )
+                }
+                for message_type in MessageType.priority()
             }
         }
 
@@ -84,20 +82,20 @@ class Formatter:
         return status_post
 
     def _format_spoiler(self, message: Message) -> str:
-        content = Template(self._templates[message.message_type]["summary"]
-                           ).substitute(summary=message.summary)
+        content = self._templates[message.message_type]["summary"]\
+            .substitute(summary=message.summary)
         return content
 
     def _format_status(self, message: Message) -> str:
         # Can happen that we receive only the summary, then we use it as text
-        content = Template(self._templates[message.message_type]["text"]
-                           ).substitute(text=message.text if message.text else message.summary)
+        content = self._templates[message.message_type]["text"]\
+            .substitute(text=message.text if message.text else message.summary)
 
         # Following up, even we are meant to merge summary and text,
         #   if there is no text we just ignore, as we already used summary as text.
         if self._merge_summary_into_text and message.summary and message.text:
             summary = self._format_spoiler(message=message)
-            content = Template(self._templates["merge_strategies"]["summary_into_text"])\
+            content = self._templates["merge_strategies"]["summary_into_text"]\
                 .substitute(
                     summary=summary,
                     text=content
@@ -112,7 +110,7 @@ class Formatter:
 
         if is_dm and mention:
             self._logger.debug(f"It's a DM posting, applying mention to {mention}")
-            return Template(self._templates["merge_strategies"]["text_with_mention"])\
+            return self._templates["merge_strategies"]["text_with_mention"]\
                 .substitute(mention=mention, text=text)
         else:
             if is_dm and not mention:
@@ -1,19 +1,31 @@
 from pyxavi.config import Config
 from pyxavi.storage import Storage
 from pyxavi.dictionary import Dictionary
+from janitor.lib.compiled_cache import CompiledCache
 from typing import Protocol
-from git import Repo
+from git import Repo, Git, GitCommandError
 from string import Template
 from slugify import slugify
 import logging
+import codecs
 import os
 import re
 
 DEFAULT_FILENAME = "storage/git_monitor.yaml"
 DEFAULT_VERSION_REGEX = r"\[(v[0-9]+\.[0-9]+\.?[0-9]?)\]"
 DEFAULT_SECTION_SEPARATOR = "\n## "
+CHANGELOG_CHUNK_SIZE = 64 * 1024
 DEFAULT_MONITORING_METHOD = "commits"
+DEFAULT_MAX_COMMITS = 100
+UPDATE_METHOD_PULL = "pull"
+UPDATE_METHOD_FETCH = "fetch"
+DEFAULT_UPDATE_METHOD = UPDATE_METHOD_PULL
+# Bare mirrors have no remote tracking branches, the fetched heads are the local ones
+FETCH_REFSPEC = "+refs/heads/*:refs/heads/*"
+DEFAULT_CLONE_FILTER = "blob:none"
 TEMPLATE_UPDATE_TEXT = "**[$project]($link) $version** published!\n\n$text\n$tags\n"
+UPDATE_TEXT_TEMPLATE = Template(TEMPLATE_UPDATE_TEXT)
+MARKDOWN_SUBSECTION_REGEX = re.compile(r"###\s{1}([a-zA-Z]+)\n")
 
 
 class ChangesProtocol(Protocol):
@@ -23,7 +35,8 @@ class ChangesProtocol(Protocol):
         config: Config,
         logger: logging,
         repository_info: Dictionary,
-        repository_object: Repo
+        repository_object: Repo,
+        storage: Storage = None
     ) -> None:
         """Initializing the class"""
 
@@ -62,11 +75,14 @@ class BaseChanges(ChangesProtocol):
         config: Config,
         logger: logging,
         repository_info: Dictionary,
-        repository_object: Repo
+        repository_object: Repo,
+        storage: Storage = None
     ) -> None:
         self._config = config
         self._logger = logger
-        self._storage = Storage(config.get("git_monitor.file", DEFAULT_FILENAME))
+        # The state can be shared with other repositories, see BufferedStorage
+        self._storage = storage if storage is not None\
+            else Storage(config.get("git_monitor.file", DEFAULT_FILENAME))
         self._repo_info = repository_info
         self._repo_object = repository_object
         # The changes stack should keep the changes_id => changes_content dictionary
@@ -119,15 +135,19 @@ class ChangelogChanges(BaseChanges):
     STORAGE_PARAMETER_NAME = "last_version"
 
     def discover_changes(self, parameters: dict = None) -> None:
-        # Get the content of the file to analyse
-        content = self.__get_changelog_content()
-        self._changes_stack = self.__parse_changelog(content=content)
+        # Compiled once per pattern and config, used for every section
+        version_regex = self._repo_info.get("params.version_regex", DEFAULT_VERSION_REGEX)
+        self._version_regex = CompiledCache.get(
+            self._config, ("version_regex", version_regex), lambda _: re.compile(version_regex)
+        )
+        # The content of the file to analyse is read as it is parsed
+        self._changes_stack = self.__parse_changelog(chunks=self.__iter_changelog_chunks())
 
     def get_current_last_known(self) -> str:
         return self._storage.get(self._get_param_name(self.STORAGE_PARAMETER_NAME), None)
 
     def build_update_message(self, parameters: dict = None) -> str:
-        return Template(TEMPLATE_UPDATE_TEXT).substitute(
+        return UPDATE_TEXT_TEMPLATE.substitute(
             project=self._repo_info.get("name"),
             link=self._repo_info.get("url"),
             version=self.get_changes_note(),
@@ -158,26 +178,64 @@ class ChangelogChanges(BaseChanges):
             all_but_last = versions[:-1]
             return ", ".join(all_but_last) + " & " + versions[-1]
 
-    def __get_changelog_content(self) -> str:
+    def __iter_changelog_chunks(self):
+        update_method = self._repo_info.get("update_method", DEFAULT_UPDATE_METHOD)
+        if update_method == UPDATE_METHOD_FETCH:
+            yield from self.__iter_changelog_chunks_from_head()
+            return
+
         changelog_filename = os.path.join(
             self._repo_object.working_tree_dir, self._repo_info.get("params.file")
         )
 
         if os.path.isfile(changelog_filename):
             with open(changelog_filename, 'r') as file:
-                content = file.read()
-                return content
+                yield from iter(lambda: file.read(CHANGELOG_CHUNK_SIZE), "")
         else:
             raise RuntimeError("File not found in the repository")
 
+    def __iter_changelog_chunks_from_head(self):
+        # Fetch mode repositories have no working tree: read the blob from HEAD.
+        #   In a partial clone git brings this single blob on demand.
+        try:
+            blob = self._repo_object.head.commit.tree / self._repo_info.get("params.file")
+        except KeyError:
+            raise RuntimeError("File not found in the repository")
+
+        stream = blob.data_stream
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        while True:
+            data = stream.read(CHANGELOG_CHUNK_SIZE)
+            if not data:
+                break
+            yield decoder.decode(data)
+        yield decoder.decode(b"", final=True)
+
+    @staticmethod
+    def _iter_sections(chunks, separator: str):
+        '''
+        Yields the same sections that content.split(separator) would,
+        but only keeping in memory the section that is being read.
+        '''
+        buffer = ""
+        for chunk in chunks:
+            # The separator could be split between the previous chunk and this one
+            start = max(0, len(buffer) - len(separator) + 1)
+            buffer += chunk
+            position = buffer.find(separator, start)
+            while position >= 0:
+                yield buffer[:position]
+                buffer = buffer[position + len(separator):]
+                position = buffer.find(separator)
+        yield buffer
+
     def __extract_version_from_section(self, section: str) -> str:
-        regex = self._repo_info.get("params.version_regex", DEFAULT_VERSION_REGEX)
-        matched = re.search(regex, section)
+        matched = self._version_regex.search(section)
         if matched is None:
             return None
         return matched.group(1)
 
-    def __parse_changelog(self, content: str) -> dict:
+    def __parse_changelog(self, chunks) -> dict:
         version_section_separator = self._repo_info.get(
             "params.section_separator", DEFAULT_SECTION_SEPARATOR
         )
@@ -188,15 +246,16 @@ class ChangelogChanges(BaseChanges):
         self._logger.debug(f"Last known version: {last_known_version}")
         self._logger.debug(f"Will ignore the versions: {', '.join(versions_to_ignore)}")
 
-        sections = content.split(version_section_separator)
-        # Discarding position 0, it's the title and won't match the version cleaner.
-        sections = sections[1:]
-        self._logger.debug(f"Found {len(sections)} sections")
+        sections = self._iter_sections(chunks=chunks, separator=version_section_separator)
+        # Discarding the first one, it's the title and won't match the version cleaner.
+        next(sections, None)
 
-        # Classify the content by version.
-        # We already have the last known version, so stop when appears.
+        # Classify the content by version, from newer to older.
+        # We already have the last known version, so stop reading when appears.
         sections_by_version = {}
+        read_sections = 0
         for section in sections:
+            read_sections += 1
             version = self.__extract_version_from_section(section)
             if version is None:
                 raise RuntimeError("I could not get a version from this section")
@@ -210,6 +269,7 @@ class ChangelogChanges(BaseChanges):
                 break
             self._logger.debug(f"Found version {version}, kept in parsed sections.")
             sections_by_version[version] = section
+        self._logger.debug(f"Read {read_sections} sections")
 
         return sections_by_version
 
@@ -218,7 +278,7 @@ class ChangelogChanges(BaseChanges):
         Markdown is not fully supported. We need to do some transforming
         '''
 
-        text = re.sub(r"###\s{1}([a-zA-Z]+)\n", r"**\1**", text)
+        text = MARKDOWN_SUBSECTION_REGEX.sub(r"**\1**", text)
 
         return text
 
@@ -227,28 +287,42 @@ class CommitsChanges(BaseChanges):
 
     STORAGE_PARAMETER_NAME = "last_commit"
 
+    _truncated: bool = False
+
     def discover_changes(self, parameters: dict = None) -> None:
+        self._changes_stack = {}
+        self._truncated = False
+
         last_known_commit = self.get_current_last_known()
         if last_known_commit is None:
-            self._logger.debug("Getting all commits since last gut pull")
-            commits = list(self._repo_object.iter_commits())
-        else:
-            self._logger.debug(f"Getting all commits since [{last_known_commit}]")
-            git_rev_list_limits = f"{last_known_commit}..HEAD"
-            commits = list(self._repo_object.iter_commits(rev=git_rev_list_limits))
-        self._logger.debug(f"Got {len(commits)} commits")
-
-        self._changes_stack = {}
-        for c in commits:
-            self._changes_stack[c.binsha.hex()] = {
-                "author": str(c.author), "message": c.message.replace("\n", " ")
-            }
+            # First run: only the newest commit is kept, so do not walk the history
+            self._logger.debug("First run, getting only the HEAD commit")
+            try:
+                self._add_commit(self._repo_object.head.commit)
+            except ValueError:
+                # The repository has no commits yet
+                self._logger.debug("The repository has no HEAD commit")
+            return
+
+        max_commits = self._repo_info.get("params.max_commits", DEFAULT_MAX_COMMITS)
+        since = self._repo_info.get("params.since", None)
+        self._logger.debug(f"Getting up to {max_commits} commits since [{last_known_commit}]")
+        git_rev_list_limits = f"{last_known_commit}..HEAD"
+        options = {"max_count": max_commits}
+        if since is not None:
+            options["since"] = since
+
+        # Streamed from newer to older, commits are loaded as we go
+        for commit in self._repo_object.iter_commits(rev=git_rev_list_limits, **options):
+            self._add_commit(commit)
+        self._truncated = len(self._changes_stack) >= max_commits
+        self._logger.debug(f"Got {len(self._changes_stack)} commits")
 
     def get_current_last_known(self) -> str:
         return self._storage.get(self._get_param_name(self.STORAGE_PARAMETER_NAME), None)
 
     def build_update_message(self, parameters: dict = None) -> str:
-        return Template(TEMPLATE_UPDATE_TEXT).substitute(
+        return UPDATE_TEXT_TEMPLATE.substitute(
             project=self._repo_info.get("name"),
             link=self._repo_info.get("url"),
             version=self.get_changes_note(),
@@ -263,19 +337,30 @@ class CommitsChanges(BaseChanges):
         self._storage.write_file()
 
     def get_changes_note(self) -> str:
-        return f"{len(self._changes_stack)} new commits"
+        more = "+" if self._truncated else ""
+        return f"{len(self._changes_stack)}{more} new commits"
+
+    def _add_commit(self, commit) -> None:
+        self._changes_stack[commit.binsha.hex()] = {
+            "author": str(commit.author), "message": commit.message.replace("\n", " ")
+        }
 
 
 class GitMonitor:
 
+    STORAGE_REMOTE_HEAD_PARAMETER_NAME = "last_remote_head"
+
     repository_info: Dictionary
     current_repository: Repo
     changes_instance: ChangesProtocol = None
+    remote_head: str = None
+    remote_unchanged: bool = False
 
-    def __init__(self, config: Config) -> None:
+    def __init__(self, config: Config, storage: Storage = None) -> None:
         self._config = config
         self._logger = logging.getLogger(config.get("logger.name"))
-        self._storage = Storage(self._config.get("git_monitor.file", DEFAULT_FILENAME))
+        self._storage = storage if storage is not None\
+            else Storage(self._config.get("git_monitor.file", DEFAULT_FILENAME))
 
     def initiate_or_clone_repository(self, repository_info: Dictionary) -> Repo:
         # Checking for mandatory parameters
@@ -286,22 +371,119 @@ class GitMonitor:
                 "Mandatory parameters [path] or [git] and [path] are not present"
             )
 
+        update_method = repository_info.get("update_method", DEFAULT_UPDATE_METHOD)
+        if update_method not in [UPDATE_METHOD_PULL, UPDATE_METHOD_FETCH]:
+            raise RuntimeError(
+                f"The repository {repository_info.get('name')} has an unknown " +
+                f"update method [{update_method}]"
+            )
+
         if os.path.exists(repository_info.get("path")):
             self._logger.debug(f"Initializing repo {repository_info.get('name')}")
-            self.current_repository = Repo.init(repository_info.get("path"))
+            if update_method == UPDATE_METHOD_FETCH:
+                self.current_repository = Repo(repository_info.get("path"))
+                if not self.current_repository.bare:
+                    raise RuntimeError(
+                        f"The repository {repository_info.get('name')} is set to be " +
+                        "fetched but its path is not a bare repository. " +
+                        "Use a different path."
+                    )
+            else:
+                self.current_repository = Repo.init(repository_info.get("path"))
         else:
             self._logger.debug(f"Cloning repo {repository_info.get('name')}")
-            self.current_repository = Repo.clone_from(
-                repository_info.get("git"), repository_info.get("path")
-            )
+            if update_method == UPDATE_METHOD_FETCH:
+                self.current_repository = Repo.clone_from(
+                    repository_info.get("git"),
+                    repository_info.get("path"),
+                    **self._get_fetch_clone_options(repository_info=repository_info)
+                )
+            else:
+                self.current_repository = Repo.clone_from(
+                    repository_info.get("git"), repository_info.get("path")
+                )
 
         self.repository_info = repository_info
         return self.current_repository
 
-    def get_updates(self):
+    def get_updates(self, timeout: float = None):
         self._logger.debug(f"Getting updates for repo {self.repository_info.get('name')}")
         origin = self.current_repository.remotes.origin
-        origin.pull()
+        # With a timeout, git gets killed if it did not finish by then
+        update_method = self.repository_info.get("update_method", DEFAULT_UPDATE_METHOD)
+        if update_method == UPDATE_METHOD_FETCH:
+            # Only the refs and the missing commits and trees, nothing is checked out
+            origin.fetch(refspec=FETCH_REFSPEC, kill_after_timeout=timeout)
+        else:
+            origin.pull(kill_after_timeout=timeout)
+
+    def check_remote_head(self, repository_info: Dictionary, timeout: float = None) -> bool:
+        '''
+        Asks the remote for its HEAD and compares it with the one stored the last time
+        that the repository was processed.
+
+        Returns True when it did not change, so the repository can be skipped
+        without cloning, pulling nor walking it.
+        '''
+        self.repository_info = repository_info
+        self.remote_head = self.get_remote_head(timeout=timeout)
+        self.remote_unchanged = self.remote_head is not None\
+            and self.remote_head == self.get_last_remote_head()
+        return self.remote_unchanged
+
+    def get_remote_head(self, timeout: float = None) -> str:
+        if self.repository_info.get("git", None) is None:
+            return None
+
+        try:
+            # A single ref advertisement, nothing is downloaded
+            output = Git().ls_remote(
+                self.repository_info.get("git"), "HEAD", kill_after_timeout=timeout
+            )
+        except GitCommandError as e:
+            self._logger.warning(
+                f"Could not get the remote HEAD of {self.repository_info.get('name')}: {e}"
+            )
+            return None
+
+        return output.split()[0] if output else None
+
+    def get_last_remote_head(self) -> str:
+        return self._storage.get(
+            self._get_remote_head_param_name(self.STORAGE_REMOTE_HEAD_PARAMETER_NAME), None
+        )
+
+    def write_last_remote_head(self) -> None:
+        if self.remote_head is None:
+            return
+
+        self._storage.set(
+            self._get_remote_head_param_name(self.STORAGE_REMOTE_HEAD_PARAMETER_NAME),
+            self.remote_head
+        )
+        self._storage.write_file()
+
+    def _get_remote_head_param_name(self, param_name: str) -> str:
+        current_repo_id = slugify(self.repository_info.get("git"))
+        # This get/set dance ensures that the parameter parent will exist always
+        current_value = self._storage.get(current_repo_id, {})
+        self._storage.set(current_repo_id, current_value)
+
+        return f"{current_repo_id}.{param_name}"
+
+    def get_head_commit(self) -> str:
+        return self.current_repository.head.commit.hexsha
+
+    def _get_fetch_clone_options(self, repository_info: Dictionary) -> dict:
+        # Bare and partial: only the commit graph is downloaded,
+        #   the blobs are fetched on demand when something reads them.
+        options = {
+            "bare": True, "filter": repository_info.get("clone_filter", DEFAULT_CLONE_FILTER)
+        }
+        shallow_since = repository_info.get("shallow_since", None)
+        if shallow_since is not None:
+            options["shallow_since"] = shallow_since
+        return options
 
     def initialise_changes_instance(self) -> None:
         monitoring_method = self.repository_info.get(
@@ -313,14 +495,16 @@ class GitMonitor:
                 config=self._config,
                 logger=self._logger,
                 repository_info=self.repository_info,
-                repository_object=self.current_repository
+                repository_object=self.current_repository,
+                storage=self._storage
             )
         elif monitoring_method == "commits":
             self.changes_instance = CommitsChanges(
                 config=self._config,
                 logger=self._logger,
                 repository_info=self.repository_info,
-                repository_object=self.current_repository
+                repository_object=self.current_repository,
+                storage=self._storage
             )
         else:
             raise RuntimeError(
@@ -0,0 +1,550 @@
+from pyxavi.config import Config
+from array import array
+import threading
+import logging
+import sqlite3
+import time
+import os
+
+DEFAULT_HISTORY_FILE = "storage/history.db"
+DEFAULT_FLUSH_SECONDS = 60
+# Raw points for 2 days, 5 minutes aggregates for a month and hourly ones for a year
+DEFAULT_TIERS = [
+    {
+        "resolution_seconds": 0, "retention_days": 2
+    },
+    {
+        "resolution_seconds": 300, "retention_days": 30
+    },
+    {
+        "resolution_seconds": 3600, "retention_days": 365
+    },
+]
+# Points per stored chunk, counting one per minute for the raw tier
+CHUNK_POINTS = 30
+RETENTION_EVERY_SECONDS = 3600
+# Raw tiers store the values as they come, aggregated tiers one point per bucket
+RAW_COLUMNS = ["timestamp", "value"]
+AGGREGATED_COLUMNS = ["timestamp", "min", "max", "sum", "count"]
+
+
+class HistoryStore:
+    '''
+    HistoryStore
+
+    Keeps the history of the numeric metrics of the received System Info
+    reports, per host and metric, in a few tiers: the raw values and
+    aggregates (min, max, sum, count) over coarser buckets, every tier with
+    its own retention.
+
+    A series is stored in chunks of consecutive points. Every chunk is a
+    single SQLite row holding its columns as packed arrays of doubles.
+    Appending only touches the chunks in memory. A background thread
+    writes the changes every few seconds, so a report costs no disk access.
+
+    A chunk is written once, when it closes. Until then, every flush only
+    appends its new complete points to a journal table, that is replayed
+    on start. Aggregated buckets still being filled are only journaled when
+    stopping, so the same bucket is not written again and again.
+    '''
+
+    def __init__(self, config: Config, storage_file: str = None) -> None:
+        self._config = config
+        self._logger = logging.getLogger(config.get("logger.name"))
+        self._tiers = self._get_tiers_config()
+        self._flush_seconds = config.get(
+            "app.service.listen.history.flush_seconds", DEFAULT_FLUSH_SECONDS
+        )
+        storage_file = storage_file if storage_file is not None\
+            else config.get("app.service.listen.history.file", DEFAULT_HISTORY_FILE)
+        if storage_file != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(storage_file)), exist_ok=True)
+        self._lock = threading.RLock()
+        # Transactions are opened explicitly, see flush()
+        self._connection = sqlite3.connect(
+            storage_file, timeout=30, check_same_thread=False, isolation_level=None
+        )
+        self._create_schema()
+        # The chunk being filled of every series, as {(hostname, metric, tier): chunk}
+        self._heads = {}
+        # Chunks already replaced by a newer one, still to be written
+        self._closed = []
+        self._series = self._load_series()
+        self._load_heads()
+        self._new_series = set()
+        self._last_retention_at = None
+        self._stop_event = threading.Event()
+        self._worker = None
+
+    def _create_schema(self) -> None:
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS history (
+                    hostname TEXT NOT NULL,
+                    metric TEXT NOT NULL,
+                    tier INTEGER NOT NULL,
+                    chunk_start REAL NOT NULL,
+                    chunk_end REAL NOT NULL,
+                    data BLOB NOT NULL,
+                    PRIMARY KEY (hostname, metric, tier, chunk_start)
+                ) WITHOUT ROWID
+                """
+            )
+            # For the retention, that deletes by age
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS history_expiry ON history (tier, chunk_end)"
+            )
+            # The new points of the open chunks, appended in order and replayed on start.
+            #   With a rowid, so appending never touches other pages than the last one.
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS history_head (
+                    hostname TEXT NOT NULL,
+                    metric TEXT NOT NULL,
+                    tier INTEGER NOT NULL,
+                    chunk_start REAL NOT NULL,
+                    data BLOB NOT NULL
+                )
+                """
+            )
+            # Listing the hosts and metrics from the history table would scan all of it
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS history_series (
+                    hostname TEXT NOT NULL,
+                    metric TEXT NOT NULL,
+                    PRIMARY KEY (hostname, metric)
+                ) WITHOUT ROWID
+                """
+            )
+
+    def start(self) -> None:
+        if self.is_running():
+            return
+
+        self._stop_event.clear()
+        self._worker = threading.Thread(target=self._work, name="janitor-history", daemon=True)
+        self._worker.start()
+
+    def is_running(self) -> bool:
+        return self._worker is not None and self._worker.is_alive()
+
+    def stop(self) -> None:
+        """
+        Stops the worker, writes what is pending and closes the database
+        """
+        self._stop_event.set()
+        if self._worker is not None:
+            self._worker.join()
+            self._worker = None
+        self.flush(final=True)
+        with self._lock:
+            self._connection.close()
+
+    def append(self, sys_data: dict, timestamp: float = None) -> None:
+        '''
+        Adds the numeric metrics of the report to the history of its host
+        '''
+        hostname = sys_data.get("hostname", "unknown host")
+        timestamp = timestamp if timestamp is not None else time.time()
+        with self._lock:
+            for metric, value in sys_data.items():
+                # Booleans are ints for Python, but they are not metrics
+                if not isinstance(value, (int, float)) or isinstance(value, bool):
+                    continue
+                if (hostname, metric) not in self._series:
+                    self._series.add((hostname, metric))
+                    self._new_series.add((hostname, metric))
+                for tier_index in range(len(self._tiers)):
+                    head = self._get_head(hostname, metric, tier_index, timestamp)
+                    if head is not None:
+                        self._add_point(head, tier_index, timestamp, float(value))
+
+    def flush(self, now: float = None, final: bool = False) -> int:
+        '''
+        Writes the closed chunks, journals the new points of the open ones and
+            applies the retention. Returns the chunks written or journaled
+
+        With `final`, the aggregated buckets still being filled are journaled too.
+        '''
+        now = now if now is not None else time.time()
+        with self._lock:
+            # Chunks that nobody filled for a while are closed as well, and freed
+            for key in list(self._heads.keys()):
+                if self._get_chunk_end(key[2], self._heads[key]) <= now:
+                    self._closed.append((key, self._heads.pop(key)))
+            closed = self._closed
+            journaled = []
+            for key, head in self._heads.items():
+                length = self._get_complete_length(key[2], head, final)
+                if length > head["persisted"]:
+                    journaled.append((key, head, length))
+            apply_retention = self._last_retention_at is None\
+                or now - self._last_retention_at >= RETENTION_EVERY_SECONDS
+            if len(closed) == 0 and len(journaled) == 0 and len(self._new_series) == 0\
+                    and not apply_retention:
+                return 0
+
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                # Chunks loaded back from the history table live in the journal from now on
+                self._connection.executemany(
+                    "DELETE FROM history " +
+                    "WHERE hostname = ? AND metric = ? AND tier = ? AND chunk_start = ?",
+                    [key + (head["start"], ) for key, head, _ in journaled if head["reopened"]]
+                )
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO history " +
+                    "(hostname, metric, tier, chunk_start, chunk_end, data) " +
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    [self._to_row(key, chunk) for key, chunk in closed]
+                )
+                self._connection.executemany(
+                    "INSERT INTO history_head (hostname, metric, tier, chunk_start, data) " +
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [
+                        key + (
+                            head["start"],
+                            self._pack(
+                                [
+                                    column[head["persisted"]:length]
+                                    for column in head["columns"]
+                                ]
+                            )
+                        ) for key,
+                        head,
+                        length in journaled
+                    ]
+                )
+                self._connection.executemany(
+                    "INSERT OR IGNORE INTO history_series (hostname, metric) VALUES (?, ?)",
+                    list(self._new_series)
+                )
+                if apply_retention:
+                    self._apply_retention(now)
+                self._connection.execute("COMMIT")
+            except Exception:
+                self._connection.execute("ROLLBACK")
+                raise
+
+            self._logger.debug(
+                f"Wrote {len(closed)} history chunks and journaled {len(journaled)}"
+            )
+            for key, head, length in journaled:
+                head["persisted"] = self._get_complete_length(key[2], head, final=False)
+                head["reopened"] = False
+            self._closed = []
+            self._new_series = set()
+        return len(closed) + len(journaled)
+
+    def get_hosts(self) -> list:
+        with self._lock:
+            return sorted(set([hostname for hostname, _ in self._series]))
+
+    def get_metrics(self, hostname: str) -> list:
+        with self._lock:
+            return sorted([metric for host, metric in self._series if host == hostname])
+
+    def query(
+        self,
+        hostname: str,
+        metric: str,
+        start: float,
+        end: float,
+        step: float = None,
+        now: float = None
+    ) -> dict:
+        '''
+        The points of a metric of a host between the given timestamps, from
+            the finest tier that still keeps them, as columns:
+            {"timestamp": [...], "min": [...], "max": [...], "avg": [...], "count": [...]}
+
+        With a step, the points are aggregated again into buckets of that many seconds.
+        '''
+        now = now if now is not None else time.time()
+        tier_index = self._choose_tier(start, step, now)
+        key = (hostname, metric, tier_index)
+
+        with self._lock:
+            chunks = {
+                row[0]: self._unpack(row[1], tier_index)
+                for row in self._connection.execute(
+                    "SELECT chunk_start, data FROM history " +
+                    "WHERE hostname = ? AND metric = ? AND tier = ? " +
+                    "AND chunk_start <= ? AND chunk_end >= ? ORDER BY chunk_start",
+                    (hostname, metric, tier_index, end, start)
+                )
+            }
+            # What is in memory is newer than what is stored
+            for chunk_key, chunk in self._closed + [(key, self._heads.get(key, None))]:
+                if chunk_key == key and chunk is not None:
+                    chunks[chunk["start"]] = [array("d", column) for column in chunk["columns"]]
+
+        points = []
+        for chunk_start in sorted(chunks.keys()):
+            for point in self._to_points(chunks[chunk_start], tier_index):
+                if start <= point[0] <= end:
+                    points.append(point)
+        if step is not None:
+            points = self._rebucket(points, step)
+
+        result = {
+            "hostname": hostname,
+            "metric": metric,
+            "resolution_seconds": self._tiers[tier_index]["resolution_seconds"],
+            "timestamp": [point[0] for point in points],
+            "min": [point[1] for point in points],
+            "max": [point[2] for point in points],
+            "avg": [round(point[3] / point[4], 2) for point in points],
+            "count": [int(point[4]) for point in points],
+            "summary": None,
+        }
+        if len(points) > 0:
+            count = sum(result["count"])
+            result["summary"] = {
+                "min": min(result["min"]),
+                "max": max(result["max"]),
+                "avg": round(sum([point[3] for point in points]) / count, 2),
+                "count": count,
+            }
+        return result
+
+    def _work(self) -> None:
+        while not self._stop_event.wait(self._flush_seconds):
+            try:
+                self.flush()
+            except Exception as e:
+                self._logger.exception(e)
+
+    def _get_head(self, hostname: str, metric: str, tier_index: int, timestamp: float) -> dict:
+        tier = self._tiers[tier_index]
+        chunk_start = timestamp - timestamp % tier["chunk_seconds"]
+        key = (hostname, metric, tier_index)
+        head = self._heads.get(key, None)
+        if head is not None:
+            if head["start"] == chunk_start:
+                return head
+            if chunk_start < head["start"]:
+                # The clock went back, these would be out of order
+                return None
+            self._closed.append((key, head))
+            head = self._new_head(chunk_start, self._new_columns(tier))
+        else:
+            # Unknown since we started, it may be stored from before a restart
+            head = self._load_chunk(key, chunk_start)
+        self._heads[key] = head
+        return head
+
+    def _load_chunk(self, key: tuple, chunk_start: float) -> dict:
+        row = self._connection.execute(
+            "SELECT data FROM history " +
+            "WHERE hostname = ? AND metric = ? AND tier = ? AND chunk_start = ?",
+            key + (chunk_start, )
+        ).fetchone()
+        if row is None:
+            return self._new_head(chunk_start, self._new_columns(self._tiers[key[2]]))
+        # It gets all its points journaled and its row deleted in the next flush
+        return self._new_head(chunk_start, self._unpack(row[0], key[2]), reopened=True)
+
+    def _new_head(self, chunk_start: float, columns: list, reopened: bool = False) -> dict:
+        # Persisted counts the points already in the journal
+        return {"start": chunk_start, "columns": columns, "persisted": 0, "reopened": reopened}
+
+    def _get_complete_length(self, tier_index: int, head: dict, final: bool) -> int:
+        '''
+        The amount of points of the head that won't change anymore
+        '''
+        length = len(head["columns"][0])
+        if final or self._tiers[tier_index]["resolution_seconds"] == 0:
+            return length
+        # The last bucket keeps aggregating until a newer one starts
+        return max(length - 1, 0)
+
+    def _load_heads(self) -> None:
+        '''
+        Rebuilds the open chunks from the journal
+        '''
+        chunks = {}
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT hostname, metric, tier, chunk_start, data FROM history_head " +
+                "ORDER BY rowid"
+            )
+            for hostname, metric, tier_index, chunk_start, data in rows:
+                if tier_index >= len(self._tiers):
+                    # From a configuration with more tiers
+                    continue
+                key = (hostname, metric, tier_index)
+                if (key, chunk_start) not in chunks:
+                    chunks[(key, chunk_start)] = self._new_columns(self._tiers[tier_index])
+                columns = chunks[(key, chunk_start)]
+                points = self._unpack(data, tier_index)
+                # A bucket journaled before it was complete comes again, replace it
+                if self._tiers[tier_index]["resolution_seconds"] > 0 and len(columns[0]) > 0\
+                        and len(points[0]) > 0 and points[0][0] == columns[0][-1]:
+                    for column in columns:
+                        column.pop()
+                for column, values in zip(columns, points):
+                    column.extend(values)
+
+            for key, chunk_start in sorted(chunks.keys(), key=lambda item: item[1]):
+                if self._connection.execute(
+                        "SELECT 1 FROM history WHERE hostname = ? AND metric = ? " +
+                        "AND tier = ? AND chunk_start = ?",
+                        key + (chunk_start, )).fetchone() is not None:
+                    # Closed and written already, these rows are just not cleaned yet
+                    continue
+                head = self._new_head(chunk_start, chunks[(key, chunk_start)])
+                head["persisted"] = self._get_complete_length(key[2], head, final=False)
+                if key in self._heads:
+                    # An older one that was never closed
+                    self._closed.append((key, self._heads[key]))
+                self._heads[key] = head
+
+    def _add_point(self, head: dict, tier_index: int, timestamp: float, value: float) -> None:
+        columns = head["columns"]
+        resolution = self._tiers[tier_index]["resolution_seconds"]
+        if resolution == 0:
+            if len(columns[0]) > 0 and timestamp < columns[0][-1]:
+                return
+            columns[0].append(timestamp)
+            columns[1].append(value)
+            return
+
+        bucket = timestamp - timestamp % resolution
+        if len(columns[0]) > 0 and bucket == columns[0][-1]:
+            columns[1][-1] = min(columns[1][-1], value)
+            columns[2][-1] = max(columns[2][-1], value)
+            columns[3][-1] += value
+            columns[4][-1] += 1
+        elif len(columns[0]) == 0 or bucket > columns[0][-1]:
+            for column, column_value in zip(columns, [bucket, value, value, value, 1]):
+                column.append(column_value)
+
+    def _apply_retention(self, now: float) -> None:
+        # The journal of the chunks already written, before they may expire below
+        self._connection.execute(
+            """
+            DELETE FROM history_head WHERE tier >= ? OR EXISTS (
+                SELECT 1 FROM history WHERE history.hostname = history_head.hostname
+                AND history.metric = history_head.metric AND history.tier = history_head.tier
+                AND history.chunk_start = history_head.chunk_start
+            )
+            """, (len(self._tiers), )
+        )
+        for tier_index, tier in enumerate(self._tiers):
+            self._connection.execute(
+                "DELETE FROM history WHERE tier = ? AND chunk_end < ?",
+                (tier_index, now - tier["retention_seconds"])
+            )
+
+        # Hosts or metrics that are gone, once nothing of them is left.
+        #   The closed chunks are already written at this point.
+        open_series = set([(key[0], key[1]) for key in self._heads.keys()])
+        gone = [
+            series for series in self._series
+            if series not in open_series and self._connection.execute(
+                "SELECT 1 FROM history WHERE hostname = ? AND metric = ? LIMIT 1", series
+            ).fetchone() is None
+        ]
+        self._connection.executemany(
+            "DELETE FROM history_series WHERE hostname = ? AND metric = ?", gone
+        )
+        self._series.difference_update(gone)
+        self._new_series.difference_update(gone)
+        self._last_retention_at = now
+
+    def _choose_tier(self, start: float, step: float, now: float) -> int:
+        # The tiers that still keep the start, or the one that keeps the most
+        candidates = [
+            index for index in range(len(self._tiers))
+            if now - start <= self._tiers[index]["retention_seconds"]
+        ]
+        if len(candidates) == 0:
+            return max(
+                range(len(self._tiers)),
+                key=lambda index: self._tiers[index]["retention_seconds"]
+            )
+        # The coarsest that is still finer than the asked step, or else the finest
+        fitting = [
+            index for index in candidates
+            if step is not None and self._tiers[index]["resolution_seconds"] <= step
+        ]
+        if len(fitting) > 0:
+            return max(fitting, key=lambda index: self._tiers[index]["resolution_seconds"])
+        return min(candidates, key=lambda index: self._tiers[index]["resolution_seconds"])
+
+    def _to_points(self, columns: list, tier_index: int) -> list:
+        '''
+        Points as (timestamp, min, max, sum, count), whatever the tier
+        '''
+        if self._tiers[tier_index]["resolution_seconds"] == 0:
+            return [(timestamp, value, value, value, 1) for timestamp, value in zip(*columns)]
+        return list(zip(*columns))
+
+    def _rebucket(self, points: list, step: float) -> list:
+        buckets = {}
+        for timestamp, minimum, maximum, total, count in points:
+            bucket = timestamp - timestamp % step
+            if bucket not in buckets:
+                buckets[bucket] = [bucket, minimum, maximum, total, count]
+            else:
+                current = buckets[bucket]
+                current[1] = min(current[1], minimum)
+                current[2] = max(current[2], maximum)
+                current[3] += total
+                current[4] += count
+        return [tuple(buckets[bucket]) for bucket in sorted(buckets.keys())]
+
+    def _new_columns(self, tier: dict) -> list:
+        amount = len(RAW_COLUMNS) if tier["resolution_seconds"] == 0\
+            else len(AGGREGATED_COLUMNS)
+        return [array("d") for _ in range(amount)]
+
+    def _to_row(self, key: tuple, chunk: dict) -> tuple:
+        return key + (
+            chunk["start"], self._get_chunk_end(key[2], chunk), self._pack(chunk["columns"])
+        )
+
+    def _get_chunk_end(self, tier_index: int, chunk: dict) -> float:
+        return chunk["start"] + self._tiers[tier_index]["chunk_seconds"]
+
+    def _pack(self, columns: list) -> bytes:
+        # Column after column, all of them with the same length
+        return b"".join([column.tobytes() for column in columns])
+
+    def _unpack(self, data: bytes, tier_index: int) -> list:
+        values = array("d")
+        values.frombytes(data)
+        amount = len(self._new_columns(self._tiers[tier_index]))
+        length = len(values) // amount
+        return [values[index * length:(index + 1) * length] for index in range(amount)]
+
+    def _load_series(self) -> set:
+        with self._lock:
+            return set(
+                [
+                    (row[0], row[1]) for row in
+                    self._connection.execute("SELECT hostname, metric FROM history_series")
+                ]
+            )
+
+    def _get_tiers_config(self) -> list:
+        tiers = []
+        for tier in self._config.get("app.service.listen.history.tiers", DEFAULT_TIERS):
+            resolution = tier.get("resolution_seconds", 0)
+            if resolution < 0:
+                raise RuntimeError("The resolution of a history tier can't be negative")
+            tiers.append(
+                {
+                    "resolution_seconds": resolution,
+                    "retention_seconds": tier.get("retention_days", 1) * 86400,
+                    # A raw tier counts one point per minute
+                    "chunk_seconds": max(resolution, 60) * CHUNK_POINTS,
+                }
+            )
+        if len(tiers) == 0:
+            raise RuntimeError("At least one history tier is needed")
+        return tiers
@@ -0,0 +1,156 @@
+from pyxavi.config import Config
+from pyxavi.terminal_color import TerminalColor
+from typing import Callable
+import threading
+import logging
+import heapq
+import time
+
+DEFAULT_INTERVAL_SECONDS = 300
+DEFAULT_MISSED_INTERVALS = 3
+DEFAULT_MAX_HOSTS = 10000
+
+
+class HostLiveness:
+    '''
+    HostLiveness
+
+    Remembers when every host reported for the last time, and calls
+    `on_missing` for the ones that stay silent longer than expected:
+    `missed_intervals` times their reporting interval. When a missing host
+    reports again, `on_back` is called.
+
+    The deadlines live in a heap with a single entry per host, and a single
+    thread sleeps until the earliest one. A host that reported meanwhile is
+    just pushed back with its new deadline, so every wake up only touches
+    the hosts that are due, never the whole index.
+    '''
+
+    def __init__(
+        self,
+        config: Config,
+        on_missing: Callable[[str, float], None],
+        on_back: Callable[[str, float], None] = None
+    ) -> None:
+        self._config = config
+        self._logger = logging.getLogger(config.get("logger.name"))
+        self._on_missing = on_missing
+        self._on_back = on_back
+        self._interval = config.get(
+            "app.service.listen.liveness.interval_seconds", DEFAULT_INTERVAL_SECONDS
+        )
+        self._missed_intervals = config.get(
+            "app.service.listen.liveness.missed_intervals", DEFAULT_MISSED_INTERVALS
+        )
+        # Hosts reporting at another pace than the rest, as {hostname: interval_seconds}
+        self._host_intervals = dict(config.get("app.service.listen.liveness.hosts", {}))
+        self._max_hosts = config.get("app.service.listen.liveness.max_hosts", DEFAULT_MAX_HOSTS)
+        self._last_seen = {}
+        self._missing = set()
+        # (deadline, hostname), at most one per host
+        self._deadlines = []
+        self._condition = threading.Condition()
+        self._stopping = False
+        self._worker = None
+        self._clock = time.monotonic
+
+    def start(self) -> None:
+        if self.is_running():
+            return
+
+        with self._condition:
+            self._stopping = False
+        self._worker = threading.Thread(target=self._work, name="janitor-liveness", daemon=True)
+        self._worker.start()
+
+    def is_running(self) -> bool:
+        return self._worker is not None and self._worker.is_alive()
+
+    def stop(self) -> None:
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self._worker is not None:
+            self._worker.join()
+            self._worker = None
+
+    def seen(self, hostname: str, now: float = None) -> bool:
+        """
+        Records that the host just reported.
+
+        Returns False when the host is new and too many are already tracked.
+        """
+        now = now if now is not None else self._clock()
+        with self._condition:
+            if hostname not in self._last_seen and len(self._last_seen) >= self._max_hosts:
+                self._logger.warning(
+                    f"{TerminalColor.RED_BRIGHT}Already tracking {self._max_hosts} hosts, " +
+                    f"not tracking the liveness of {hostname}{TerminalColor.END}"
+                )
+                return False
+
+            # Hosts missing or new have no deadline in the heap
+            needs_deadline = hostname not in self._last_seen or hostname in self._missing
+            self._last_seen[hostname] = now
+            was_missing = hostname in self._missing
+            self._missing.discard(hostname)
+            if needs_deadline:
+                deadline = now + self.get_timeout(hostname)
+                heapq.heappush(self._deadlines, (deadline, hostname))
+                # It may be earlier than the one the worker sleeps for
+                if self._deadlines[0][1] == hostname:
+                    self._condition.notify()
+
+        if was_missing and self._on_back is not None:
+            self._on_back(hostname, now)
+        return True
+
+    def get_timeout(self, hostname: str) -> float:
+        return self._host_intervals.get(hostname, self._interval) * self._missed_intervals
+
+    def sweep(self, now: float = None) -> list:
+        """
+        Calls `on_missing` for the hosts past their deadline, and returns them
+        """
+        now = now if now is not None else self._clock()
+        missing = []
+        with self._condition:
+            while len(self._deadlines) > 0 and self._deadlines[0][0] <= now:
+                _, hostname = heapq.heappop(self._deadlines)
+                deadline = self._last_seen[hostname] + self.get_timeout(hostname)
+                if deadline > now:
+                    # Reported after this entry was pushed, wait for the new deadline
+                    heapq.heappush(self._deadlines, (deadline, hostname))
+                else:
+                    self._missing.add(hostname)
+                    missing.append(hostname)
+
+        # Out of the lock, publishing may take a while
+        for hostname in missing:
+            try:
+                self._on_missing(hostname, now - self._last_seen[hostname])
+            except Exception as e:
+                self._logger.exception(e)
+        return missing
+
+    def get_stats(self) -> dict:
+        with self._condition:
+            return {
+                "hosts": len(self._last_seen),
+                "missing": sorted(self._missing),
+            }
+
+    def _work(self) -> None:
+        while True:
+            with self._condition:
+                if self._stopping:
+                    return
+                self._condition.wait(self._get_wait_seconds())
+                if self._stopping:
+                    return
+            self.sweep()
+
+    def _get_wait_seconds(self) -> float:
+        if len(self._deadlines) == 0:
+            return None
+        return max(self._deadlines[0][0] - self._clock(), 0)
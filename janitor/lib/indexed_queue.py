@@ -0,0 +1,63 @@
+from pyxavi.queue_stack import Queue, QueueItemProtocol
+from collections import Counter
+
+
+class IndexedQueue(Queue):
+    '''
+    IndexedQueue
+
+    pyxavi's Queue plus an in-memory index of the unique values of its items,
+    so checking if an item is already queued is O(1) instead of a full scan.
+
+    The index is a multiset: a loaded file may already contain duplicates.
+    It is rebuilt on every load() and is not persisted.
+    '''
+
+    def load(self) -> int:
+        length = super().load()
+        self._reindex()
+        return length
+
+    def append(self, item: QueueItemProtocol) -> None:
+        super().append(item)
+        self._unique_values[item.unique_value()] += 1
+
+    def unpop(self, item: QueueItemProtocol) -> None:
+        super().unpop(item)
+        self._unique_values[item.unique_value()] += 1
+
+    def pop(self) -> QueueItemProtocol:
+        item = super().pop()
+        if item is not None:
+            self._forget(item)
+        return item
+
+    def clean(self) -> None:
+        super().clean()
+        self._unique_values = Counter()
+
+    def deduplicate(self, param: str = None) -> None:
+        self._logger.debug("Deduplicating queue")
+        seen = set()
+        output_queue = []
+        for item in self._queue:
+            unique = item.unique_value(param=param)
+            if unique is None:
+                raise RuntimeError("The unique value can't be None while deduplicating.")
+            if unique not in seen:
+                output_queue.append(item)
+                seen.add(unique)
+        self._queue = output_queue
+        self._reindex()
+
+    def contains(self, item: QueueItemProtocol) -> bool:
+        return self._unique_values[item.unique_value()] > 0
+
+    def _forget(self, item: QueueItemProtocol) -> None:
+        unique = item.unique_value()
+        self._unique_values[unique] -= 1
+        if self._unique_values[unique] <= 0:
+            del self._unique_values[unique]
+
+    def _reindex(self) -> None:
+        self._unique_values = Counter([item.unique_value() for item in self._queue])
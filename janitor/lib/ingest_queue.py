@@ -0,0 +1,189 @@
+from pyxavi.config import Config
+from pyxavi.terminal_color import TerminalColor
+from janitor.lib.publisher_pool import PublisherPool
+from janitor.objects.message import Message
+from typing import Callable
+import threading
+import logging
+import queue
+import time
+
+
+class IngestQueue:
+    '''
+    IngestQueue
+
+    In-process bounded queue that decouples receiving a Message from publishing it.
+    A set of worker threads drain the queue through the Publisher of the related
+    named account, so the request handlers can answer straight away.
+
+    When the queue is full, new messages are rejected (backpressure) and counted.
+    '''
+
+    DEFAULT_WORKERS = 2
+    DEFAULT_MAX_SIZE = 100
+    DEFAULT_DRAIN_TIMEOUT = 30
+    POLL_INTERVAL = 0.5
+
+    def __init__(
+        self,
+        config: Config,
+        publisher_pool: PublisherPool,
+        workers: int = None,
+        max_size: int = None
+    ) -> None:
+        self._config = config
+        self._logger = logging.getLogger(config.get("logger.name"))
+        self._publisher_pool = publisher_pool
+        self._workers_amount = workers if workers is not None\
+            else config.get("app.service.listen.ingest.workers", self.DEFAULT_WORKERS)
+        self._max_size = max_size if max_size is not None\
+            else config.get("app.service.listen.ingest.max_size", self.DEFAULT_MAX_SIZE)
+        self._queue = queue.Queue(maxsize=self._max_size)
+        self._workers = []
+        self._stopping = threading.Event()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "enqueued": 0,
+            "rejected": 0,
+            "published": 0,
+            "failed": 0,
+            "high_water": 0,
+        }
+
+    def start(self) -> None:
+        if self.is_running():
+            return
+
+        self._stopping.clear()
+        self._logger.debug(f"Starting {self._workers_amount} ingest workers")
+        self._workers = [
+            threading.Thread(target=self._work, name=f"janitor-ingest-{index}", daemon=True)
+            for index in range(0, self._workers_amount)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def is_running(self) -> bool:
+        return any([worker.is_alive() for worker in self._workers])
+
+    def put(
+        self,
+        message: Message,
+        named_account: str = "default",
+        on_done: Callable[[bool], None] = None
+    ) -> bool:
+        """
+        Enqueues the Message to be published without blocking.
+
+        Returns False when the queue is full or stopping, so the caller can reject it.
+        `on_done` is called from the worker once the message is published, with True,
+        or with False when it could not be published or is discarded.
+        """
+        if self._stopping.is_set():
+            self._count("rejected")
+            return False
+
+        try:
+            self._queue.put_nowait((message, named_account, on_done))
+        except queue.Full:
+            self._logger.warning(
+                f"{TerminalColor.RED_BRIGHT}Ingest queue is full " +
+                f"({self._max_size}), rejecting the message{TerminalColor.END}"
+            )
+            self._count("rejected")
+            return False
+
+        with self._stats_lock:
+            self._stats["enqueued"] += 1
+            self._stats["high_water"] = max(self._stats["high_water"], self._queue.qsize())
+        return True
+
+    def stop(self, drain: bool = True, timeout: float = None) -> None:
+        """
+        Stops the workers.
+
+        With `drain` the workers first publish what is already in the queue,
+        waiting up to `timeout` seconds. Anything left after is discarded.
+        """
+        timeout = timeout if timeout is not None\
+            else self._config.get(
+                "app.service.listen.ingest.drain_timeout", self.DEFAULT_DRAIN_TIMEOUT
+            )
+        self._logger.info(
+            f"{TerminalColor.CYAN}Stopping ingest workers with {self._queue.qsize()}" +
+            f" messages in the queue{TerminalColor.END}"
+        )
+
+        if not drain:
+            self._discard_pending()
+        self._stopping.set()
+
+        # A single deadline, the workers drain at the same time
+        deadline = time.monotonic() + timeout
+        for worker in self._workers:
+            worker.join(timeout=max(0, deadline - time.monotonic()))
+
+        left = self._discard_pending()
+        if left > 0:
+            self._logger.warning(
+                f"{TerminalColor.RED_BRIGHT}Discarded {left} messages not published " +
+                f"before stopping{TerminalColor.END}"
+            )
+        self._workers = []
+
+    def get_stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        return {
+            **stats,
+            "depth": self._queue.qsize(),
+            "max_size": self._max_size,
+            "workers": self._workers_amount,
+        }
+
+    def _work(self) -> None:
+        while True:
+            try:
+                message, named_account, on_done = self._queue.get(timeout=self.POLL_INTERVAL)
+            except queue.Empty:
+                # Only leave once we're stopping and there is nothing else to publish
+                if self._stopping.is_set():
+                    return
+                continue
+
+            published = False
+            try:
+                published = self._publisher_pool.get(named_account).publish_message(
+                    message=message
+                ) is not False
+                self._count("published" if published else "failed")
+            except Exception as e:
+                self._logger.exception(e)
+                self._count("failed")
+            finally:
+                self._queue.task_done()
+            self._call(on_done, published)
+
+    def _discard_pending(self) -> int:
+        discarded = 0
+        while True:
+            try:
+                _, _, on_done = self._queue.get_nowait()
+                self._queue.task_done()
+                discarded += 1
+            except queue.Empty:
+                return discarded
+            self._call(on_done, False)
+
+    def _call(self, on_done: Callable[[bool], None], published: bool) -> None:
+        if on_done is None:
+            return
+        try:
+            on_done(published)
+        except Exception as e:
+            self._logger.exception(e)
+
+    def _count(self, stat: str) -> None:
+        with self._stats_lock:
+            self._stats[stat] += 1
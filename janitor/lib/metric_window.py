@@ -0,0 +1,145 @@
+from array import array
+import math
+import re
+
+AGGREGATION_AVG = "avg"
+AGGREGATION_MIN = "min"
+AGGREGATION_MAX = "max"
+AGGREGATION_LAST = "last"
+AGGREGATIONS = [AGGREGATION_AVG, AGGREGATION_MIN, AGGREGATION_MAX, AGGREGATION_LAST]
+# Percentiles are given as "p" and the percentile, like "p95"
+PERCENTILE_REGEX = re.compile(r"^p(\d{1,2}(\.\d+)?)$")
+
+
+class RingBuffer:
+    '''
+    RingBuffer
+
+    Keeps the last `capacity` samples of a metric, with their timestamps, in
+    two preallocated arrays of doubles. Appending overwrites the oldest sample
+    once it is full, so its memory does not grow while running for days.
+    '''
+
+    __slots__ = ["_capacity", "_values", "_timestamps", "_head", "_size"]
+
+    def __init__(self, capacity: int) -> None:
+        if capacity < 1:
+            raise ValueError("The capacity of a RingBuffer must be at least 1")
+        self._capacity = capacity
+        self._values = array("d", bytes(8 * capacity))
+        self._timestamps = array("d", bytes(8 * capacity))
+        # Position where the next sample goes
+        self._head = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def get_capacity(self) -> int:
+        return self._capacity
+
+    def append(self, timestamp: float, value: float) -> None:
+        self._values[self._head] = value
+        self._timestamps[self._head] = timestamp
+        self._head = (self._head + 1) % self._capacity
+        self._size = min(self._size + 1, self._capacity)
+
+    def get_last(self) -> float:
+        if self._size == 0:
+            return None
+        return self._values[self._head - 1]
+
+    def get_since(self, since: float) -> list:
+        '''
+        Values with a timestamp equal or after the given one, oldest first
+        '''
+        values = []
+        # From the newest backwards, so we stop at the first one out of the window
+        for offset in range(1, self._size + 1):
+            position = self._head - offset
+            if self._timestamps[position] < since:
+                break
+            values.append(self._values[position])
+        values.reverse()
+        return values
+
+
+class MetricWindows:
+    '''
+    MetricWindows
+
+    A RingBuffer for every numeric metric recorded, that can be aggregated
+    over a time window: "avg", "min", "max", "last" or a percentile like "p95".
+    '''
+
+    def __init__(self, capacity: int) -> None:
+        self._capacity = capacity
+        self._buffers = {}
+        self._last_data = {}
+
+    def record(self, data: dict, timestamp: float) -> None:
+        for name, value in data.items():
+            # Booleans are ints for Python, but they are not metrics
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                if name not in self._buffers:
+                    self._buffers[name] = RingBuffer(self._capacity)
+                self._buffers[name].append(timestamp, value)
+        self._last_data = data
+
+    def get_names(self) -> list:
+        return list(self._buffers.keys())
+
+    def aggregate(self, name: str, aggregation: str, seconds: float, now: float) -> float:
+        '''
+        Aggregates the values of the metric in the last given seconds.
+
+        Returns None when there are no values in the window.
+        '''
+        if name not in self._buffers:
+            return None
+        values = self._buffers[name].get_since(now - seconds)
+        if len(values) == 0:
+            return None
+
+        if aggregation == AGGREGATION_AVG:
+            return round(sum(values) / len(values), 2)
+        elif aggregation == AGGREGATION_MIN:
+            return min(values)
+        elif aggregation == AGGREGATION_MAX:
+            return max(values)
+        elif aggregation == AGGREGATION_LAST:
+            return values[-1]
+
+        percentile = self.parse_percentile(aggregation)
+        if percentile is None:
+            raise RuntimeError(f"Unknown aggregation [{aggregation}]")
+        # Nearest rank, so it is always one of the sampled values
+        values.sort()
+        rank = max(math.ceil(percentile / 100 * len(values)), 1)
+        return values[rank - 1]
+
+    def summarize(self, windows: dict, now: float) -> dict:
+        '''
+        The last recorded data, with the metrics in the given windows aggregated.
+
+        The windows come as {metric: {"aggregation": str, "seconds": float}}
+        '''
+        summary = dict(self._last_data)
+        for name, window in windows.items():
+            value = self.aggregate(name, window["aggregation"], window["seconds"], now)
+            if value is not None:
+                summary[name] = value
+        return summary
+
+    @staticmethod
+    def parse_percentile(aggregation: str) -> float:
+        match = PERCENTILE_REGEX.match(aggregation)
+        if match is None:
+            return None
+        return float(match.group(1))
+
+    @staticmethod
+    def is_valid_aggregation(aggregation: str) -> bool:
+        if aggregation in AGGREGATIONS:
+            return True
+        return MetricWindows.parse_percentile(aggregation) is not None
@@ -0,0 +1,246 @@
+from typing import Callable
+import threading
+import bisect
+import math
+
+# Seconds. From a fast in-memory operation to a slow Mastodon request.
+DEFAULT_BUCKETS = [0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+CONTENT_TYPE_PROMETHEUS = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Counter:
+    '''
+    Counter
+
+    A monotonic counter with optional labels, meant to be incremented from
+    many threads at the same time without a lock.
+
+    Every thread increments its own shard, and nobody else writes on it, so
+    there are no lost updates even if `+=` is not atomic. Reading sums all
+    the shards, which is only done when scraping.
+
+    Shards are keyed by the thread identifier, which the OS reuses once a
+    thread ends, so their amount stays around the threads alive at once.
+    '''
+
+    TYPE = "counter"
+
+    def __init__(self, name: str, help: str, label_names: list = []) -> None:
+        self.name = name
+        self.help = help
+        self.label_names = list(label_names)
+        self._shards = {}
+
+    def inc(self, *label_values, amount: float = 1) -> None:
+        shard = self._get_shard()
+        shard[label_values] = shard.get(label_values, 0) + amount
+
+    def get_value(self, *label_values) -> float:
+        return self.collect().get(label_values, 0)
+
+    def collect(self) -> dict:
+        '''
+        The totals of all shards, as {label values tuple: value}
+        '''
+        totals = {}
+        # Copying is atomic under the GIL, the owner thread may keep writing meanwhile
+        for shard in list(self._shards.values()):
+            for labels, value in dict(shard).items():
+                totals[labels] = totals.get(labels, 0) + value
+        return totals
+
+    def expose(self) -> list:
+        lines = []
+        for labels, value in sorted(self.collect().items()):
+            lines.append(_sample(self.name, self.label_names, labels, value))
+        return lines
+
+    def _get_shard(self) -> dict:
+        ident = threading.get_ident()
+        shard = self._shards.get(ident, None)
+        if shard is None:
+            # Only this thread creates its own key
+            shard = {}
+            self._shards[ident] = shard
+        return shard
+
+
+class Histogram(Counter):
+    '''
+    Histogram
+
+    Counts the observed values (usually durations in seconds) into fixed
+    buckets, plus their sum and amount. Sharded per thread like Counter.
+    '''
+
+    TYPE = "histogram"
+
+    def __init__(
+        self, name: str, help: str, label_names: list = [], buckets: list = None
+    ) -> None:
+        super().__init__(name=name, help=help, label_names=label_names)
+        self.buckets = sorted(buckets if buckets is not None else DEFAULT_BUCKETS)
+
+    def observe(self, *label_values, value: float) -> None:
+        shard = self._get_shard()
+        observations = shard.get(label_values, None)
+        if observations is None:
+            # A count per bucket plus the +Inf one, then the sum
+            observations = [0] * (len(self.buckets) + 2)
+            shard[label_values] = observations
+        # bisect_left, so a value equal to a bucket bound falls into it
+        observations[bisect.bisect_left(self.buckets, value)] += 1
+        observations[-1] += value
+
+    def get_count(self, *label_values) -> int:
+        observations = self.collect().get(label_values, None)
+        return 0 if observations is None else sum(observations[:-1])
+
+    def collect(self) -> dict:
+        totals = {}
+        for shard in list(self._shards.values()):
+            for labels, observations in dict(shard).items():
+                observations = list(observations)
+                if labels not in totals:
+                    totals[labels] = observations
+                else:
+                    totals[labels] = [a + b for a, b in zip(totals[labels], observations)]
+        return totals
+
+    def expose(self) -> list:
+        lines = []
+        for labels, observations in sorted(self.collect().items()):
+            cumulative = 0
+            for bound, amount in zip(self.buckets + [math.inf], observations[:-1]):
+                cumulative += amount
+                lines.append(
+                    _sample(
+                        self.name + "_bucket",
+                        self.label_names + ["le"],
+                        labels + ("+Inf" if bound == math.inf else repr(float(bound)), ),
+                        cumulative
+                    )
+                )
+            lines.append(
+                _sample(self.name + "_sum", self.label_names, labels, observations[-1])
+            )
+            lines.append(_sample(self.name + "_count", self.label_names, labels, cumulative))
+        return lines
+
+
+class Gauge:
+    '''
+    Gauge
+
+    A value read only when scraping, from a callback that returns a number,
+    or a {label values tuple: number} dict when the gauge has labels.
+    '''
+
+    TYPE = "gauge"
+
+    def __init__(
+        self, name: str, help: str, callback: Callable, label_names: list = []
+    ) -> None:
+        self.name = name
+        self.help = help
+        self.label_names = list(label_names)
+        self.callback = callback
+
+    def collect(self) -> dict:
+        value = self.callback()
+        if value is None:
+            return {}
+        return value if isinstance(value, dict) else {(): value}
+
+    def expose(self) -> list:
+        lines = []
+        for labels, value in sorted(self.collect().items()):
+            lines.append(_sample(self.name, self.label_names, labels, value))
+        return lines
+
+
+class MetricsRegistry:
+    '''
+    MetricsRegistry
+
+    Holds the metrics of the process and renders them in the Prometheus
+    text exposition format.
+
+    Registering is idempotent: asking again for a metric by its name returns
+    the existing one, so modules can declare theirs at import time.
+    '''
+
+    def __init__(self) -> None:
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help: str, label_names: list = []) -> Counter:
+        return self._register(Counter, name, help=help, label_names=label_names)
+
+    def histogram(
+        self, name: str, help: str, label_names: list = [], buckets: list = None
+    ) -> Histogram:
+        return self._register(
+            Histogram, name, help=help, label_names=label_names, buckets=buckets
+        )
+
+    def gauge(self, name: str, help: str, callback: Callable, label_names: list = []) -> Gauge:
+        '''
+        Gauges are registered by the running instance, so a new one replaces the previous
+        '''
+        with self._lock:
+            self._metrics[name] = Gauge(
+                name=name, help=help, callback=callback, label_names=label_names
+            )
+            return self._metrics[name]
+
+    def get(self, name: str):
+        return self._metrics.get(name, None)
+
+    def expose(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            try:
+                samples = metric.expose()
+            except Exception:
+                # A broken gauge must not take down the whole scrape
+                continue
+            lines.append(f"# HELP {metric.name} {_escape(metric.help, quotes=False)}")
+            lines.append(f"# TYPE {metric.name} {metric.TYPE}")
+            lines += samples
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric_class, name: str, **kwargs):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = metric_class(name=name, **kwargs)
+            metric = self._metrics[name]
+        if not isinstance(metric, metric_class):
+            raise RuntimeError(f"The metric [{name}] is already registered as a {metric.TYPE}")
+        return metric
+
+
+def _escape(value: str, quotes: bool = True) -> str:
+    value = str(value).replace("\\", "\\\\").replace("\n", "\\n")
+    return value.replace("\"", "\\\"") if quotes else value
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, float):
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        return repr(value)
+    return str(value)
+
+
+def _sample(name: str, label_names: list, label_values: tuple, value: float) -> str:
+    if len(label_names) == 0:
+        return f"{name} {_format_value(value)}"
+    labels = ",".join(
+        [f"{label}=\"{_escape(value)}\"" for label, value in zip(label_names, label_values)]
+    )
+    return f"{name}{{{labels}}} {_format_value(value)}"
+
+
+# The registry of the process, scraped from the listener's /metrics
+REGISTRY = MetricsRegistry()
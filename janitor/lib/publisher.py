@@ -2,12 +2,29 @@ from pyxavi.config import Config
 from pyxavi.logger import Logger
 from pyxavi.terminal_color import TerminalColor
 from pyxavi.mastodon_publisher import MastodonPublisher, MastodonPublisherException
-from pyxavi.queue_stack import Queue
 from janitor.objects.queue_item import QueueItem
 from janitor.objects.message import Message, MessageType
 from .formatter import Formatter
+from .sqlite_queue import SqliteQueue
+from .indexed_queue import IndexedQueue
+from .metrics import REGISTRY
+import threading
+import time
 import os
 
+PUBLISH_SECONDS = REGISTRY.histogram(
+    "janitor_publish_seconds",
+    "Time to publish a message, per named account", ["named_account"]
+)
+PUBLISH_FAILURES = REGISTRY.counter(
+    "janitor_publish_failures_total",
+    "Messages that could not be published, per named account", ["named_account"]
+)
+PUBLISH_REQUEUES = REGISTRY.counter(
+    "janitor_publish_requeues_total",
+    "Failed messages moved back to the queue, per named account", ["named_account"]
+)
+
 
 class Publisher(MastodonPublisher):
     '''
@@ -19,6 +36,9 @@ class Publisher(MastodonPublisher):
     MAX_RETRIES = 3
     SLEEP_TIME = 10
     DEFAULT_QUEUE_FILE = "storage/queue.yaml"
+    DEFAULT_SQLITE_QUEUE_FILE = "storage/queue.db"
+    QUEUE_BACKEND_YAML = "yaml"
+    QUEUE_BACKEND_SQLITE = "sqlite"
 
     def __init__(
         self,
@@ -34,18 +54,41 @@ class Publisher(MastodonPublisher):
             config=config, logger=logger, named_account=named_account, base_path=base_path
         )
 
-        queue_storage_file = config.get("queue_storage.file", self.DEFAULT_QUEUE_FILE)
-        if base_path is not None:
-            queue_storage_file = os.path.join(base_path, queue_storage_file)
-        self._queue = Queue(
-            logger=logger, storage_file=queue_storage_file, queue_item_object=QueueItem
-        )
+        self._named_account = named_account
+        # Reentrant, the shorthands go through publish_message too
+        self._lock = threading.RLock()
+        self._queue = self._build_queue(config=config, logger=logger, base_path=base_path)
         self._formatter = Formatter(config, self._connection_params.status_params)
         # Janitor has the dry_run set up somewhere else. Overwriting.
         self._is_dry_run = config.get("app.run_control.dry_run", False)
         self._only_oldest = only_oldest if only_oldest is not None\
             else config.get("publisher.only_oldest_post_every_iteration", False)
 
+    def _build_queue(self, config: Config, logger, base_path: str = None):
+        backend, queue_storage_file = self.get_queue_storage(config=config, base_path=base_path)
+        queue_class = SqliteQueue if backend == self.QUEUE_BACKEND_SQLITE else IndexedQueue
+        return queue_class(
+            logger=logger, storage_file=queue_storage_file, queue_item_object=QueueItem
+        )
+
+    @staticmethod
+    def get_queue_storage(config: Config, base_path: str = None) -> tuple:
+        """
+        Returns the backend and the file of the queue, as (backend, file)
+        """
+        backend = config.get("queue_storage.backend", Publisher.QUEUE_BACKEND_YAML)
+        if backend == Publisher.QUEUE_BACKEND_SQLITE:
+            default_file = Publisher.DEFAULT_SQLITE_QUEUE_FILE
+        elif backend == Publisher.QUEUE_BACKEND_YAML:
+            default_file = Publisher.DEFAULT_QUEUE_FILE
+        else:
+            raise RuntimeError(f"Unknown queue storage backend [{backend}]")
+
+        queue_storage_file = config.get("queue_storage.file", default_file)
+        if base_path is not None:
+            queue_storage_file = os.path.join(base_path, queue_storage_file)
+        return backend, queue_storage_file
+
     def text(self, content: str, summary: str = None, requeue_if_fails: bool = False) -> dict:
         """
         Shorthand to publish a message with MessageType.NONE
@@ -109,21 +152,43 @@ class Publisher(MastodonPublisher):
         - It captures PublisherException errors thrown from publish_status_post
             when max retries is reached. with `requeue_if_fails` the failed message
             moves to the beginning of the queue, but the queue is not cared: you need
-            to process it from another endpoint.
+            to process it from another endpoint. If the same message is already queued
+            it is not requeued again.
         - It delegates to publish_status_post for proper publishing
+        - Returns False when the message could not be published
+        - Threads sharing the instance publish one at a time
         """
 
-        status_post = self._formatter.build_status_post(message=message)
-        try:
-            return self.publish_status_post(status_post=status_post)
-        except MastodonPublisherException as e:
-            self._logger.error(e)
+        # The Mastodon session and the queue are not thread-safe
+        with self._lock:
+            status_post = self._formatter.build_status_post(message=message)
+            started_at = time.perf_counter()
+            try:
+                return self.publish_status_post(status_post=status_post)
+            except MastodonPublisherException as e:
+                self._logger.error(e)
+                PUBLISH_FAILURES.inc(self._named_account)
+
+                if requeue_if_fails:
+                    queue_item = QueueItem(message=message)
+                    if self._queue.contains(queue_item):
+                        self._logger.info(
+                            f"{TerminalColor.CYAN}The same message is already queued," +
+                            f" not requeueing it.{TerminalColor.END}"
+                        )
+                        return False
+                    self._queue.unpop(queue_item)
+                    PUBLISH_REQUEUES.inc(self._named_account)
+                    if self._is_dry_run:
+                        self._queue.save()
+                return False
+            finally:
+                PUBLISH_SECONDS.observe(
+                    self._named_account, value=time.perf_counter() - started_at
+                )
 
-            if requeue_if_fails:
-                queue_item = QueueItem(message=message)
-                self._queue.unpop(queue_item)
-                if self._is_dry_run:
-                    self._queue.save()
+    def queue_length(self) -> int:
+        return self._queue.length()
 
     def reload_queue(self) -> int:
         # Previous length
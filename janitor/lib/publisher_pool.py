@@ -0,0 +1,56 @@
+from pyxavi.config import Config
+from janitor.lib.publisher import Publisher
+import threading
+import logging
+
+
+class PublisherPool:
+    '''
+    PublisherPool
+
+    Keeps a long-lived Publisher instance per named account, so that
+    long running processes (like the Listener) do not pay the set up
+    (logger, queue load, Mastodon connection) on every publish.
+
+    Publishers are created lazily the first time they are requested. Each
+    one keeps its own HTTP session, reusing its connections, and publishes
+    one message at a time, so the request threads and the ingest workers
+    can share them.
+    '''
+
+    def __init__(self, config: Config, base_path: str = None) -> None:
+        self._config = config
+        self._base_path = base_path
+        self._logger = logging.getLogger(config.get("logger.name"))
+        self._publishers = {}
+        self._lock = threading.Lock()
+
+    def get(self, named_account: str = "default") -> Publisher:
+        """
+        Returns the Publisher for the given named account, creating it if needed
+        """
+        publisher = self._publishers.get(named_account, None)
+        if publisher is not None:
+            return publisher
+
+        with self._lock:
+            # Another thread could have created it while we were waiting
+            if named_account not in self._publishers:
+                self._logger.debug(f"Creating a Publisher for named account {named_account}")
+                self._publishers[named_account] = self._build_publisher(named_account)
+            return self._publishers[named_account]
+
+    def named_accounts(self) -> list:
+        return list(self._publishers.keys())
+
+    def length(self) -> int:
+        return len(self._publishers)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._publishers = {}
+
+    def _build_publisher(self, named_account: str) -> Publisher:
+        return Publisher(
+            config=self._config, named_account=named_account, base_path=self._base_path
+        )
@@ -0,0 +1,58 @@
+from pyxavi.config import Config
+from janitor.lib.publisher import Publisher
+import threading
+import sqlite3
+import yaml
+import os
+
+
+class QueueDepth:
+    '''
+    QueueDepth
+
+    Counts the messages waiting in the publishing queue straight from its
+    file, so it follows what other processes (like the `publish_queue` run
+    from cron) enqueue and drain, without building a Publisher.
+
+    - YAML: the file is only parsed again when its modification time or
+        size change.
+    - SQLite: a COUNT(*) in a short-lived read only connection.
+    '''
+
+    def __init__(self, config: Config, base_path: str = None) -> None:
+        self._backend, self._storage_file = Publisher.get_queue_storage(
+            config=config, base_path=base_path
+        )
+        self._lock = threading.Lock()
+        # (modification time, size) of the file when it was counted
+        self._counted_version = None
+        self._count = 0
+
+    def get(self) -> int:
+        if not os.path.exists(self._storage_file):
+            return 0
+        if self._backend == Publisher.QUEUE_BACKEND_SQLITE:
+            return self._count_sqlite()
+        return self._count_yaml()
+
+    def _count_sqlite(self) -> int:
+        connection = sqlite3.connect(f"file:{self._storage_file}?mode=ro", uri=True, timeout=5)
+        try:
+            return connection.execute("SELECT COUNT(*) FROM queue").fetchone()[0]
+        except sqlite3.OperationalError:
+            # Not created yet
+            return 0
+        finally:
+            connection.close()
+
+    def _count_yaml(self) -> int:
+        stat = os.stat(self._storage_file)
+        version = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if version != self._counted_version:
+                with open(self._storage_file, "r") as stream:
+                    content = yaml.safe_load(stream)
+                queue = content.get("queue", []) if isinstance(content, dict) else []
+                self._count = len(queue) if isinstance(queue, list) else 0
+                self._counted_version = version
+            return self._count
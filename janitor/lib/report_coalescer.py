@@ -0,0 +1,190 @@
+from pyxavi.config import Config
+from pyxavi.terminal_color import TerminalColor
+from typing import Callable
+import threading
+import logging
+import time
+
+
+class ReportCoalescer:
+    '''
+    ReportCoalescer
+
+    Holds the System Info reports of every host during a window of time,
+    merging the ones that arrive meanwhile, and hands a single report per
+    host and window to be processed once the window ends.
+
+    The merged report keeps the worst case value of every metric with a
+    threshold (the highest, as thresholds are crossed by greater values),
+    and the latest value of the rest.
+
+    The amount of hosts held at the same time is limited, and new hosts
+    are rejected once it is reached.
+    '''
+
+    DEFAULT_WINDOW_SECONDS = 30
+    DEFAULT_MAX_HOSTS = 1000
+
+    def __init__(
+        self,
+        config: Config,
+        process: Callable[[dict], None],
+        window_seconds: float = None,
+        max_hosts: int = None
+    ) -> None:
+        self._config = config
+        self._logger = logging.getLogger(config.get("logger.name"))
+        self._process = process
+        self._window_seconds = window_seconds if window_seconds is not None\
+            else config.get(
+                "app.service.listen.coalesce.window_seconds", self.DEFAULT_WINDOW_SECONDS
+            )
+        self._max_hosts = max_hosts if max_hosts is not None\
+            else config.get("app.service.listen.coalesce.max_hosts", self.DEFAULT_MAX_HOSTS)
+        self._thresholds = dict(config.get("system_info.thresholds", {}))
+        # All windows have the same length, so insertion order is also deadline order
+        self._pending = {}
+        self._condition = threading.Condition()
+        self._stopping = False
+        self._worker = None
+        self._clock = time.monotonic
+        self._stats = {
+            "received": 0,
+            "merged": 0,
+            "rejected": 0,
+            "processed": 0,
+            "failed": 0,
+        }
+
+    def start(self) -> None:
+        if self.is_running():
+            return
+
+        with self._condition:
+            self._stopping = False
+        self._worker = threading.Thread(
+            target=self._work, name="janitor-coalescer", daemon=True
+        )
+        self._worker.start()
+
+    def is_running(self) -> bool:
+        return self._worker is not None and self._worker.is_alive()
+
+    def add(self, sys_data: dict, now: float = None) -> bool:
+        """
+        Holds the report until the window of its host ends.
+
+        Returns False when stopping or when too many hosts are already held.
+        """
+        now = now if now is not None else self._clock()
+        hostname = sys_data.get("hostname", "unknown host")
+        with self._condition:
+            if self._stopping:
+                self._stats["rejected"] += 1
+                return False
+
+            self._stats["received"] += 1
+            if hostname in self._pending:
+                pending = self._pending[hostname]
+                pending["report"] = self.merge(pending["report"], sys_data)
+                self._stats["merged"] += 1
+                return True
+
+            if len(self._pending) >= self._max_hosts:
+                self._logger.warning(
+                    f"{TerminalColor.RED_BRIGHT}Already holding reports of {self._max_hosts}" +
+                    f" hosts, rejecting the one from {hostname}{TerminalColor.END}"
+                )
+                self._stats["rejected"] += 1
+                return False
+
+            self._pending[hostname] = {
+                "deadline": now + self._window_seconds,
+                "report": dict(sys_data),
+            }
+            self._condition.notify()
+        return True
+
+    def merge(self, current: dict, new: dict) -> dict:
+        merged = dict(current)
+        for name, value in new.items():
+            if name in self._thresholds and self._is_number(value)\
+                    and self._is_number(merged.get(name, None)):
+                merged[name] = max(merged[name], value)
+            else:
+                merged[name] = value
+        return merged
+
+    def stop(self, flush: bool = True) -> None:
+        """
+        Stops the worker. With `flush`, the held reports are processed first.
+        """
+        with self._condition:
+            self._stopping = True
+            if not flush:
+                self._pending.clear()
+            self._condition.notify()
+        if self._worker is not None:
+            self._worker.join()
+            self._worker = None
+
+    def get_stats(self) -> dict:
+        with self._condition:
+            return {
+                **self._stats,
+                "hosts": len(self._pending),
+                "window_seconds": self._window_seconds,
+            }
+
+    def process_due(self, now: float = None) -> int:
+        """
+        Processes the reports whose window ended, and returns how many
+        """
+        now = now if now is not None else self._clock()
+        with self._condition:
+            due = self._pop_due(now)
+
+        # Out of the lock, processing may take a while
+        for report in due:
+            try:
+                self._process(report)
+                self._count("processed")
+            except Exception as e:
+                self._logger.exception(e)
+                self._count("failed")
+        return len(due)
+
+    def _work(self) -> None:
+        while True:
+            if self.process_due() > 0:
+                continue
+            with self._condition:
+                if self._stopping:
+                    # Unless it was asked meanwhile, everything held is processed
+                    if len(self._pending) == 0:
+                        return
+                    continue
+                self._condition.wait(self._get_wait_seconds())
+
+    def _pop_due(self, now: float) -> list:
+        due = []
+        while len(self._pending) > 0:
+            hostname, pending = next(iter(self._pending.items()))
+            # When stopping, everything held is due
+            if pending["deadline"] > now and not self._stopping:
+                break
+            due.append(self._pending.pop(hostname)["report"])
+        return due
+
+    def _get_wait_seconds(self) -> float:
+        if len(self._pending) == 0:
+            return None
+        first = next(iter(self._pending.values()))
+        return max(first["deadline"] - self._clock(), 0)
+
+    def _count(self, stat: str) -> None:
+        with self._condition:
+            self._stats[stat] += 1
+
+    def _is_number(self, value: any) -> bool:
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
@@ -0,0 +1,215 @@
+from pyxavi.queue_stack import QueueItemProtocol, SimpleQueueItem
+from pyxavi.storage import Storage
+from datetime import datetime
+import threading
+import logging
+import sqlite3
+import json
+import os
+
+MEMORY_DATABASE = ":memory:"
+
+
+class SqliteQueue:
+    '''
+    SqliteQueue
+
+    Drop-in replacement of pyxavi's Queue that keeps the items in a SQLite database
+    instead of a YAML file that has to be fully read and rewritten every time.
+
+    - The position of every item is the table's primary key, so getting,
+        popping and unpopping the edges of the queue is O(log n).
+    - The sort and unique values are indexed, for sorting and deduplicating.
+    - Changes are held in a transaction until save() is called, and load()
+        discards them, so it behaves like the file based Queue (dry runs included).
+    '''
+
+    DEFAULT_LOGGER_NAME = "janitor-sqlite-queue"
+
+    def __init__(
+        self,
+        logger: logging.Logger = None,
+        storage_file: str = None,
+        queue_item_object: QueueItemProtocol = SimpleQueueItem
+    ) -> None:
+        self._logger = logger if logger is not None\
+            else logging.getLogger(self.DEFAULT_LOGGER_NAME)
+        self._storage_file = storage_file
+        self._queue_item_object = queue_item_object
+        self._lock = threading.RLock()
+        self._connection = sqlite3.connect(
+            storage_file if storage_file is not None else MEMORY_DATABASE,
+            timeout=30,
+            check_same_thread=False
+        )
+        self._create_schema()
+        self.load()
+
+    def _create_schema(self) -> None:
+        with self._lock:
+            self._connection.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS queue (
+                    position INTEGER PRIMARY KEY,
+                    sort_value,
+                    unique_value TEXT,
+                    item TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS queue_sort_value ON queue (sort_value);
+                CREATE INDEX IF NOT EXISTS queue_unique_value ON queue (unique_value);
+                """
+            )
+            self._connection.commit()
+
+    def load(self) -> int:
+        # Anything not saved yet is discarded, as the file based Queue would do.
+        with self._lock:
+            self._connection.rollback()
+        return self.length()
+
+    def append(self, item: QueueItemProtocol) -> None:
+        with self._lock:
+            self._connection.execute(
+                "INSERT INTO queue (position, sort_value, unique_value, item) VALUES " +
+                "((SELECT COALESCE(MAX(position), 0) + 1 FROM queue), ?, ?, ?)",
+                self._to_row(item)
+            )
+
+    def sort(self, param: str = None) -> None:
+        self._logger.debug("Sorting queue by date ASC")
+        with self._lock:
+            if param is None:
+                # The stored sort values are the ones without parameters, use the index.
+                rows = self._connection.execute(
+                    "SELECT item FROM queue ORDER BY sort_value, position"
+                ).fetchall()
+                items = [self._from_row(row) for row in rows]
+            else:
+                items = sorted(self.get_all(), key=lambda x: x.sort_value(param=param))
+            self._connection.execute("DELETE FROM queue")
+            self._connection.executemany(
+                "INSERT INTO queue (position, sort_value, unique_value, item) " +
+                "VALUES (?, ?, ?, ?)",
+                [(index + 1, ) + self._to_row(item) for index, item in enumerate(items)]
+            )
+
+    def deduplicate(self, param: str = None) -> None:
+        self._logger.debug("Deduplicating queue")
+        with self._lock:
+            if param is not None:
+                # The stored unique values are built without parameters, refresh them.
+                self._reindex(param=param)
+            if self._connection.execute("SELECT 1 FROM queue WHERE unique_value IS NULL LIMIT 1"
+                                        ).fetchone():
+                raise RuntimeError("The unique value can't be None while deduplicating.")
+            self._connection.execute(
+                "DELETE FROM queue WHERE position NOT IN " +
+                "(SELECT MIN(position) FROM queue GROUP BY unique_value)"
+            )
+
+    def save(self) -> None:
+        if self._storage_file is None:
+            self._logger.warning(
+                "This queue has no state and a call to save() is received. Ignoring"
+            )
+            return
+
+        self._logger.debug("Saving the queue")
+        with self._lock:
+            self._connection.commit()
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            return self._connection.execute("SELECT 1 FROM queue LIMIT 1").fetchone() is None
+
+    def get_all(self) -> list:
+        with self._lock:
+            rows = self._connection.execute("SELECT item FROM queue ORDER BY position"
+                                            ).fetchall()
+        return [self._from_row(row) for row in rows]
+
+    def clean(self) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM queue")
+
+    def length(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM queue").fetchone()[0]
+
+    def pop(self) -> QueueItemProtocol:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT position, item FROM queue ORDER BY position LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            self._connection.execute("DELETE FROM queue WHERE position = ?", (row[0], ))
+        return self._from_row(row[1:])
+
+    def unpop(self, item: QueueItemProtocol) -> None:
+        with self._lock:
+            self._connection.execute(
+                "INSERT INTO queue (position, sort_value, unique_value, item) VALUES " +
+                "((SELECT COALESCE(MIN(position), 1) - 1 FROM queue), ?, ?, ?)",
+                self._to_row(item)
+            )
+
+    def contains(self, item: QueueItemProtocol) -> bool:
+        unique_value = item.unique_value()
+        if unique_value is None:
+            return False
+        with self._lock:
+            return self._connection.execute(
+                "SELECT 1 FROM queue WHERE unique_value = ? LIMIT 1", (str(unique_value), )
+            ).fetchone() is not None
+
+    def first(self) -> QueueItemProtocol:
+        return self._get_edge("ASC")
+
+    def last(self) -> QueueItemProtocol:
+        return self._get_edge("DESC")
+
+    def import_from_yaml(self, filename: str) -> int:
+        """
+        Appends all items from a pyxavi's Queue YAML file and saves.
+
+        Meant to migrate an existing queue. Returns the amount of imported items.
+        """
+        if not os.path.exists(filename):
+            raise RuntimeError(f"Queue file [{filename}] not found")
+
+        items = Storage(filename=filename).get("queue", [])
+        with self._lock:
+            for item in items:
+                self.append(self._queue_item_object.from_dict(item))
+            self.save()
+        self._logger.info(f"Imported {len(items)} items from {filename}")
+        return len(items)
+
+    def _get_edge(self, direction: str) -> QueueItemProtocol:
+        with self._lock:
+            row = self._connection.execute(
+                f"SELECT item FROM queue ORDER BY position {direction} LIMIT 1"
+            ).fetchone()
+        return self._from_row(row) if row is not None else None
+
+    def _reindex(self, param: str = None) -> None:
+        rows = self._connection.execute("SELECT position, item FROM queue").fetchall()
+        self._connection.executemany(
+            "UPDATE queue SET sort_value = ?, unique_value = ? WHERE position = ?",
+            [self._to_row(self._from_row(row[1:]), param)[:2] + (row[0], ) for row in rows]
+        )
+
+    def _to_row(self, item: QueueItemProtocol, param: str = None) -> tuple:
+        sort_value = item.sort_value(param=param)
+        if isinstance(sort_value, datetime):
+            sort_value = datetime.timestamp(sort_value)
+        unique_value = item.unique_value(param=param)
+        return (
+            sort_value,
+            str(unique_value) if unique_value is not None else None,
+            json.dumps(item.to_dict())
+        )
+
+    def _from_row(self, row: tuple) -> QueueItemProtocol:
+        return self._queue_item_object.from_dict(json.loads(row[0]))
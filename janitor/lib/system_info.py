@@ -1,7 +1,17 @@
 from pyxavi.config import Config
+from janitor.objects.message import MessageType
+from janitor.lib.cpu_sampler import CpuSampler, DEFAULT_STATE_FILE, DEFAULT_MAX_SAMPLE_AGE,\
+    DEFAULT_FALLBACK_INTERVAL, DEFAULT_PERSIST_INTERVAL
+from janitor.lib.metrics import REGISTRY
 import psutil
 import socket
 import logging
+import time
+
+THRESHOLD_EVALUATION_SECONDS = REGISTRY.histogram(
+    "janitor_threshold_evaluation_seconds",
+    "Time to compare a System Info report against the thresholds"
+)
 
 
 class SystemInfo:
@@ -16,11 +26,39 @@ class SystemInfo:
 
     def get_cpu_data(self) -> dict:
         self._logger.debug("Getting CPU data")
-        return {
-            'cpu_percent': psutil.cpu_percent(1),
+        cpu_sampler = self._get_cpu_sampler()
+        cpu_sample = cpu_sampler.sample()
+        data = {
+            'cpu_percent': cpu_sample["cpu_percent"],
             'cpu_count': psutil.cpu_count(),
         }
 
+        if self._config.get("system_info.cpu.per_core", False):
+            for index, percent in enumerate(cpu_sample["cpu_percent_per_core"]):
+                data[f"cpu_percent_core_{index}"] = percent
+
+        if self._config.get("system_info.cpu.load_average", False):
+            load_1, load_5, load_15 = cpu_sampler.get_load_average()
+            data["cpu_load_1"] = round(load_1, 2)
+            data["cpu_load_5"] = round(load_5, 2)
+            data["cpu_load_15"] = round(load_15, 2)
+
+        return data
+
+    def _get_cpu_sampler(self) -> CpuSampler:
+        return CpuSampler(
+            state_file=self._config.get("system_info.cpu.state_file", DEFAULT_STATE_FILE),
+            max_sample_age=self._config.get(
+                "system_info.cpu.max_sample_age", DEFAULT_MAX_SAMPLE_AGE
+            ),
+            fallback_interval=self._config.get(
+                "system_info.cpu.fallback_interval", DEFAULT_FALLBACK_INTERVAL
+            ),
+            persist_interval=self._config.get(
+                "system_info.cpu.persist_interval", DEFAULT_PERSIST_INTERVAL
+            )
+        )
+
     def get_mem_data(self) -> dict:
         self._logger.debug("Getting Memory data")
         memory = psutil.virtual_memory()
@@ -50,12 +88,23 @@ class SystemInfo:
 
     def crossed_thresholds(self, data_to_check: dict, exceptions: list = []) -> bool:
         self._logger.debug("Checking if values crossed thresholds")
+        return len(self.get_crossed_metrics(data_to_check, exceptions)) > 0
+
+    def get_crossed_metrics(self, data_to_check: dict, exceptions: list = []) -> dict:
+        '''
+        Returns the metrics that crossed their threshold, with their MessageType
+        '''
+        started_at = time.perf_counter()
         thresholds = dict(self._config.get("system_info.thresholds"))
 
+        crossed = {}
         for name, value in data_to_check.items():
             # Check if we're monitoring this metric and if the condition applies
             if name in thresholds.keys() and name not in exceptions:
                 if "value" in thresholds[name] and value > thresholds[name]["value"]:
-                    return True
+                    crossed[name] = str(
+                        thresholds[name].get("message_type", MessageType.WARNING)
+                    )
 
-        return False
+        THRESHOLD_EVALUATION_SECONDS.observe(value=time.perf_counter() - started_at)
+        return crossed
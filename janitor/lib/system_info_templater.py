@@ -1,8 +1,13 @@
 from pyxavi.config import Config
 from janitor.objects.message import Message, MessageType
+from janitor.lib.compiled_cache import CompiledCache
 from string import Template
 import logging
 
+DEFAULT_REPORT_HOST_TEMPLATE = "**$hostname**\n$lines"
+DEFAULT_RESOLVED_SUMMARY_TEMPLATE = "✅ $summary"
+DEFAULT_RESOLVED_TEXT_TEMPLATE = "$text"
+
 
 class SystemInfoTemplater:
     """
@@ -18,13 +23,94 @@ class SystemInfoTemplater:
         self._logger = logging.getLogger(config.get("logger.name"))
 
     def process_report(self, system_info_data: dict) -> Message:
-        thresholds = dict(self._config.get("system_info.thresholds"))
-        humansize_exceptions = list(
-            self._config.get("system_info.formatting.human_readable_exceptions")
-        )
+        compiled = self._get_compiled()
         hostname = system_info_data.pop("hostname") if "hostname" in system_info_data\
             else "unknown host"
 
+        report_lines, error_level = self._evaluate_report(
+            system_info_data, compiled["thresholds"], compiled["humansize_exceptions"]
+        )
+
+        # Apply the template related to the MessageType
+        template = self._get_message_template(error_level)
+        return Message(
+            summary=template["summary"].substitute(summary=hostname),
+            text=template["text"].substitute(summary=hostname, text="\n".join(report_lines)),
+            message_type=error_level
+        )
+
+    def process_reports(self, reports: list, group_by_severity: bool = False) -> list:
+        """
+        Folds several hosts reports into a single Message
+
+        With `group_by_severity` it returns one Message per MessageType instead,
+            sorted from the highest to the lowest.
+        """
+        compiled = self._get_compiled()
+        host_template = compiled["report_host"]
+
+        blocks_per_level = {}
+        for report in reports:
+            # Avoid touching the received data
+            system_info_data = dict(report)
+            hostname = system_info_data.pop("hostname") if "hostname" in system_info_data\
+                else "unknown host"
+            report_lines, error_level = self._evaluate_report(
+                system_info_data, compiled["thresholds"], compiled["humansize_exceptions"]
+            )
+            group = error_level if group_by_severity else MessageType.NONE
+            if group not in blocks_per_level:
+                blocks_per_level[group] = {"hostnames": [], "blocks": [], "levels": []}
+            blocks_per_level[group]["hostnames"].append(hostname)
+            blocks_per_level[group]["blocks"].append(
+                host_template.substitute(hostname=hostname, lines="\n".join(report_lines))
+            )
+            blocks_per_level[group]["levels"].append(MessageType.priority().index(error_level))
+
+        messages = []
+        for group in blocks_per_level.values():
+            error_level = MessageType.priority()[max(group["levels"])]
+            summary = f"{len(group['hostnames'])} hosts: " + ", ".join(group["hostnames"])
+            template = self._get_message_template(error_level)
+            messages.append(
+                Message(
+                    summary=template["summary"].substitute(summary=summary),
+                    text=template["text"].substitute(
+                        summary=summary, text="\n\n".join(group["blocks"])
+                    ),
+                    message_type=error_level
+                )
+            )
+
+        return sorted(
+            messages, key=lambda x: MessageType.priority().index(x.message_type), reverse=True
+        )
+
+    def process_resolved(self, hostname: str, metrics: list, system_info_data: dict) -> Message:
+        """
+        Builds the Message telling that the given metrics are back under their thresholds
+        """
+        compiled = self._get_compiled()
+        report_lines = []
+        for name in metrics:
+            value = system_info_data.get(name, None)
+            if value is not None and name not in compiled["humansize_exceptions"]:
+                value = self._humansize(value)
+            report_lines.append(self._build_report_line(name, value, False))
+
+        template = compiled["resolved"]
+        return Message(
+            summary=template["summary"].substitute(summary=hostname),
+            text=template["text"].substitute(summary=hostname, text="\n".join(report_lines)),
+            message_type=MessageType.INFO
+        )
+
+    def _evaluate_report(
+        self, system_info_data: dict, thresholds: dict, humansize_exceptions: list
+    ) -> tuple:
+        """
+        Builds the report lines of a host and gets its highest MessageType
+        """
         report_lines = []
         error_type = []
         for name, value in system_info_data.items():
@@ -55,89 +141,63 @@ class SystemInfoTemplater:
         else:
             error_level = MessageType.INFO
 
-        # Apply the template related to the MessageType
-        template = self._get_message_template(error_level)
-        return Message(
-            summary=template["summary"].substitute(summary=hostname),
-            text=template["text"].substitute(summary=hostname, text="\n".join(report_lines)),
-            message_type=error_level
-        )
+        return report_lines, error_level
 
-    def _get_message_template(self, message_type: MessageType) -> dict:
-        templates = {
-            MessageType.NONE: {
-                "summary": Template(
-                    self._config.
-                    get("system_info.formatting.templates.message_type.none.summary")
-                ),
-                "text": Template(
-                    self._config.get("system_info.formatting.templates.message_type.none.text")
-                )
-            },
-            MessageType.INFO: {
-                "summary": Template(
-                    self._config.
-                    get("system_info.formatting.templates.message_type.info.summary")
-                ),
-                "text": Template(
-                    self._config.get("system_info.formatting.templates.message_type.info.text")
-                )
-            },
-            MessageType.WARNING: {
+    def _get_compiled(self) -> dict:
+        return CompiledCache.get(self._config, self.__class__.__name__, self._compile)
+
+    @staticmethod
+    def _compile(config: Config) -> dict:
+        """
+        Reads and compiles once everything the reports need from the config
+        """
+        prefix = "system_info.formatting"
+        return {
+            "thresholds": dict(config.get("system_info.thresholds", {})),
+            "humansize_exceptions": list(config.get(f"{prefix}.human_readable_exceptions", [])),
+            "human_readable": config.get(f"{prefix}.human_readable", False),
+            "item_names_map": dict(config.get(f"{prefix}.report_item_names_map", {}) or {}),
+            "report_host": Template(
+                config.get(f"{prefix}.templates.report_host", DEFAULT_REPORT_HOST_TEMPLATE)
+            ),
+            "line_ok": Template(config.get(f"{prefix}.templates.report_lines.line_ok")),
+            "line_fail": Template(config.get(f"{prefix}.templates.report_lines.line_fail")),
+            "resolved": {
                 "summary": Template(
-                    self._config.
-                    get("system_info.formatting.templates.message_type.warning.summary")
+                    config.get(
+                        f"{prefix}.templates.resolved.summary",
+                        DEFAULT_RESOLVED_SUMMARY_TEMPLATE
+                    )
                 ),
                 "text": Template(
-                    self._config.
-                    get("system_info.formatting.templates.message_type.warning.text")
-                )
-            },
-            MessageType.ERROR: {
-                "summary": Template(
-                    self._config.
-                    get("system_info.formatting.templates.message_type.error.summary")
+                    config.get(
+                        f"{prefix}.templates.resolved.text", DEFAULT_RESOLVED_TEXT_TEMPLATE
+                    )
                 ),
-                "text": Template(
-                    self._config.
-                    get("system_info.formatting.templates.message_type.error.text")
-                )
             },
-            MessageType.ALARM: {
-                "summary": Template(
-                    self._config.
-                    get("system_info.formatting.templates.message_type.alarm.summary")
-                ),
-                "text": Template(
-                    self._config.
-                    get("system_info.formatting.templates.message_type.alarm.text")
-                )
+            "message_type": {
+                message_type: {
+                    "summary": Template(
+                        config.get(f"{prefix}.templates.message_type.{message_type}.summary")
+                    ),
+                    "text": Template(
+                        config.get(f"{prefix}.templates.message_type.{message_type}.text")
+                    ),
+                }
+                for message_type in MessageType.priority()
             }
         }
 
-        return templates[message_type]
-
-    def _get_line_ok_template(self) -> Template:
-        return Template(
-            self._config.get("system_info.formatting.templates.report_lines.line_ok")
-        )
-
-    def _get_line_fail_template(self) -> Template:
-        return Template(
-            self._config.get("system_info.formatting.templates.report_lines.line_fail")
-        )
+    def _get_message_template(self, message_type: MessageType) -> dict:
+        return self._get_compiled()["message_type"][message_type]
 
     def _build_report_line(
         self, item_name: str, item_value: any, field_has_issue: bool = False
     ) -> str:
-
-        title = self._config.get(
-            "system_info.formatting.report_item_names_map." + item_name, item_name
-        )
+        compiled = self._get_compiled()
+        title = compiled["item_names_map"].get(item_name, item_name)
         self._logger.debug(f"Will receive the title [{title}]")
-        template = self._get_line_ok_template()
-        if field_has_issue:
-            template = self._get_line_fail_template()
+        template = compiled["line_fail"] if field_has_issue else compiled["line_ok"]
         return template.substitute(title=title, value=item_value)
 
     def _humansize(self, nbytes):
@@ -145,7 +205,7 @@ class SystemInfoTemplater:
         Based on https://stackoverflow.com/questions/14996453/python-libraries-to-calculate-human-readable-filesize-from-bytes # noqa: E501
         """
 
-        if not self._config.get("system_info.formatting.human_readable", False):
+        if not self._get_compiled()["human_readable"]:
             return f"{nbytes} {self.SUFFIXES[0]}"
 
         i = 0
@@ -0,0 +1,235 @@
+import struct
+import gzip
+import io
+import json
+import zlib
+
+FORMAT_JSON = "json"
+FORMAT_BINARY = "binary"
+COMPRESSION_NONE = "none"
+COMPRESSION_GZIP = "gzip"
+COMPRESSION_ZSTD = "zstd"
+CONTENT_TYPE_JSON = "application/json"
+CONTENT_TYPE_BINARY = "application/vnd.janitor.sysinfo"
+CONTENT_TYPES = {FORMAT_JSON: CONTENT_TYPE_JSON, FORMAT_BINARY: CONTENT_TYPE_BINARY}
+# A report is a few hundred bytes, anything much bigger is not one
+MAX_DECODED_SIZE = 1024 * 1024
+
+MAGIC = b"JS"
+VERSION = 1
+# Metrics get a 1 byte id instead of their name.
+#   NEVER reorder or remove: only append, or older clients would be misread.
+FIELDS = [
+    "hostname",
+    "cpu_percent",
+    "cpu_count",
+    "memory_total",
+    "memory_avail",
+    "memory_used",
+    "memory_free",
+    "memory_percent",
+    "disk_usage_total",
+    "disk_usage_used",
+    "disk_usage_free",
+    "disk_usage_percent",
+    "cpu_load_1",
+    "cpu_load_5",
+    "cpu_load_15",
+]
+FIELD_IDS = {name: index + 1 for index, name in enumerate(FIELDS)}
+# Metrics out of the table (like the per core ones) carry their name
+NAMED_FIELD_ID = 0
+TYPE_INT = ord("q")
+TYPE_FLOAT = ord("d")
+TYPE_STRING = ord("s")
+HEADER = struct.Struct("!2sBB")
+FIELD = struct.Struct("!BB")
+LENGTH = struct.Struct("!H")
+INT = struct.Struct("!q")
+FLOAT = struct.Struct("!d")
+
+
+class WireFormat:
+    '''
+    WireFormat
+
+    Encodes the System Info reports that the remote instances send to the
+    listener, and decodes them on the listener side.
+
+    - "json": the original {"sys_data": {...}} JSON body.
+    - "binary": a compact struct packed body, where the known metrics are
+        referenced by a 1 byte id from a fixed table instead of their names.
+
+    Both can be compressed with "gzip" or "zstd", sent as Content-Encoding.
+    "zstd" needs the optional package [zstandard], from the `compression` extra.
+    '''
+
+    @staticmethod
+    def encode(
+        sys_data: dict, wire_format: str = FORMAT_JSON, compression: str = None
+    ) -> tuple:
+        '''
+        Returns the body and the headers to send
+        '''
+        if wire_format == FORMAT_JSON:
+            body = json.dumps({"sys_data": sys_data}).encode("utf-8")
+        elif wire_format == FORMAT_BINARY:
+            body = WireFormat.pack(sys_data)
+        else:
+            raise RuntimeError(f"Unknown wire format [{wire_format}]")
+
+        headers = {"Content-Type": CONTENT_TYPES[wire_format]}
+        if compression is not None and compression != COMPRESSION_NONE:
+            body = WireFormat.compress(body, compression)
+            headers["Content-Encoding"] = compression
+        return body, headers
+
+    @staticmethod
+    def decode(body: bytes, content_type: str, content_encoding: str = None) -> dict:
+        '''
+        Returns the sys_data dict of a received body.
+
+        Raises ValueError when it is malformed, and LookupError when the
+            content type or encoding is not supported.
+        '''
+        if content_encoding not in [None, "", "identity"]:
+            body = WireFormat.decompress(body, content_encoding)
+        elif len(body) > MAX_DECODED_SIZE:
+            raise ValueError("The body is too big")
+
+        if content_type == CONTENT_TYPE_BINARY:
+            return WireFormat.unpack(body)
+        elif content_type == CONTENT_TYPE_JSON:
+            try:
+                data = json.loads(body)
+            except UnicodeDecodeError as e:
+                raise ValueError(str(e))
+            if not isinstance(data, dict) or not isinstance(data.get("sys_data"), dict):
+                raise ValueError("Expected dict under a \"sys_data\" variable was not present.")
+            return data["sys_data"]
+        else:
+            raise LookupError(f"Unsupported content type [{content_type}]")
+
+    @staticmethod
+    def pack(sys_data: dict) -> bytes:
+        if len(sys_data) > 255:
+            raise ValueError("Too many metrics for a single report")
+
+        chunks = [HEADER.pack(MAGIC, VERSION, len(sys_data))]
+        for name, value in sys_data.items():
+            # Booleans are ints for Python, but they are not metrics
+            if isinstance(value, int) and not isinstance(value, bool):
+                value_type, packed_value = TYPE_INT, INT.pack(value)
+            elif isinstance(value, float):
+                value_type, packed_value = TYPE_FLOAT, FLOAT.pack(value)
+            elif isinstance(value, str):
+                value_type, packed_value = TYPE_STRING, WireFormat._pack_string(value)
+            else:
+                raise ValueError(f"Unsupported value type for [{name}]")
+
+            field_id = FIELD_IDS.get(name, NAMED_FIELD_ID)
+            chunks.append(FIELD.pack(field_id, value_type))
+            if field_id == NAMED_FIELD_ID:
+                chunks.append(WireFormat._pack_string(name))
+            chunks.append(packed_value)
+        return b"".join(chunks)
+
+    @staticmethod
+    def unpack(body: bytes) -> dict:
+        try:
+            magic, version, amount = HEADER.unpack_from(body, 0)
+            if magic != MAGIC:
+                raise ValueError("Not a System Info report")
+            if version != VERSION:
+                raise ValueError(f"Unsupported report version [{version}]")
+
+            sys_data = {}
+            offset = HEADER.size
+            for _ in range(amount):
+                field_id, value_type = FIELD.unpack_from(body, offset)
+                offset += FIELD.size
+                if field_id == NAMED_FIELD_ID:
+                    name, offset = WireFormat._unpack_string(body, offset)
+                elif field_id <= len(FIELDS):
+                    name = FIELDS[field_id - 1]
+                else:
+                    # Appended by a newer client. We can't know its name.
+                    raise ValueError(f"Unknown field id [{field_id}]")
+
+                if value_type == TYPE_INT:
+                    value = INT.unpack_from(body, offset)[0]
+                    offset += INT.size
+                elif value_type == TYPE_FLOAT:
+                    value = FLOAT.unpack_from(body, offset)[0]
+                    offset += FLOAT.size
+                elif value_type == TYPE_STRING:
+                    value, offset = WireFormat._unpack_string(body, offset)
+                else:
+                    raise ValueError(f"Unknown value type [{value_type}]")
+                sys_data[name] = value
+        except (struct.error, UnicodeDecodeError) as e:
+            raise ValueError(f"Malformed report: {e}")
+
+        if offset != len(body):
+            raise ValueError("Malformed report: unexpected trailing bytes")
+        return sys_data
+
+    @staticmethod
+    def compress(body: bytes, compression: str) -> bytes:
+        if compression == COMPRESSION_GZIP:
+            return gzip.compress(body)
+        elif compression == COMPRESSION_ZSTD:
+            return WireFormat._get_zstandard().ZstdCompressor().compress(body)
+        else:
+            raise RuntimeError(f"Unknown compression [{compression}]")
+
+    @staticmethod
+    def decompress(body: bytes, compression: str) -> bytes:
+        '''
+        Decompresses up to MAX_DECODED_SIZE, so a small body can't blow up in memory
+        '''
+        if compression == COMPRESSION_GZIP:
+            # wbits 16 + MAX_WBITS is the gzip container
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            try:
+                decoded = decompressor.decompress(body, MAX_DECODED_SIZE + 1)
+            except zlib.error as e:
+                raise ValueError(f"Malformed gzip body: {e}")
+        elif compression == COMPRESSION_ZSTD:
+            zstandard = WireFormat._get_zstandard(LookupError)
+            try:
+                reader = zstandard.ZstdDecompressor().stream_reader(io.BytesIO(body))
+                decoded = reader.read(MAX_DECODED_SIZE + 1)
+            except zstandard.ZstdError as e:
+                raise ValueError(f"Malformed zstd body: {e}")
+        else:
+            raise LookupError(f"Unsupported content encoding [{compression}]")
+
+        if len(decoded) > MAX_DECODED_SIZE:
+            raise ValueError("The decompressed body is too big")
+        return decoded
+
+    @staticmethod
+    def _get_zstandard(error_class=RuntimeError):
+        try:
+            # Only needed for the zstd compression, so it is an optional dependency
+            import zstandard
+        except ImportError:
+            raise error_class(
+                "The zstd compression needs the package [zstandard]. " +
+                "Install it with: poetry install --extras compression"
+            )
+        return zstandard
+
+    @staticmethod
+    def _pack_string(value: str) -> bytes:
+        encoded = value.encode("utf-8")
+        return LENGTH.pack(len(encoded)) + encoded
+
+    @staticmethod
+    def _unpack_string(body: bytes, offset: int) -> tuple:
+        length = LENGTH.unpack_from(body, offset)[0]
+        offset += LENGTH.size
+        if offset + length > len(body):
+            raise ValueError("Malformed report: string out of bounds")
+        return body[offset:offset + length].decode("utf-8"), offset + length
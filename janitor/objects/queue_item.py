@@ -2,10 +2,13 @@ from __future__ import annotations
 from pyxavi.queue_stack import QueueItemProtocol
 from .message import Message, MessageMedia
 from datetime import datetime
+import hashlib
 
 
 class QueueItem(QueueItemProtocol):
 
+    DIGEST_SIZE = 16
+
     message: Message
     media: list[MessageMedia]
     published_at: datetime
@@ -45,4 +48,5 @@ class QueueItem(QueueItemProtocol):
     def unique_value(self, param: any = None) -> any:
         result = f"s{self.message.summary}" if self.message.summary is not None else ""
         result += f"m{self.message.text}" if self.message.text is not None else ""
-        return result
+        # A fixed size digest is cheaper to keep in an index than the whole text
+        return hashlib.blake2b(result.encode(), digest_size=self.DIGEST_SIZE).hexdigest()
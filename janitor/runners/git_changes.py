@@ -2,23 +2,38 @@ from pyxavi.terminal_color import TerminalColor
 from pyxavi.config import Config
 from pyxavi.dictionary import Dictionary
 from janitor.lib.publisher import Publisher
-from janitor.lib.git_monitor import GitMonitor
+from janitor.lib.git_monitor import GitMonitor, DEFAULT_FILENAME
+from janitor.lib.buffered_storage import BufferedStorage
 from janitor.runners.runner_protocol import RunnerProtocol
 from definitions import ROOT_DIR
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import logging
+import time
 
 
 class GitChanges(RunnerProtocol):
     '''
     Runner that goes through all monitored git repositories and detect changes,
     publishing them into the mastodon-like defined account
+
+    Repositories are updated and analysed concurrently, while storing
+    the new state and publishing is done sequentially in the config order.
+    The state is shared by all repositories and written once at the end.
     '''
 
+    DEFAULT_MAX_WORKERS = 4
+    DEFAULT_TIMEOUT = 300
+    # Max seconds between checks for timed out repositories
+    POLL_SECONDS = 1
+
     def __init__(
         self, config: Config = None, logger: logging = None, params: dict = None
     ) -> None:
         self._config = config
         self._logger = logger
+        self._storage = None
+        # Monotonic, replaceable to test the timeouts without waiting for them
+        self._clock = time.monotonic
 
         self._service_publisher = Publisher(
             config=self._config, named_account="default", base_path=ROOT_DIR
@@ -32,28 +47,35 @@ class GitChanges(RunnerProtocol):
             self._logger.info(
                 f"{TerminalColor.MAGENTA}Starting Git Changes Monitoring{TerminalColor.END}"
             )
-            # Initialize
-            monitor = GitMonitor(self._config)
+            # One state for the whole run, shared by all repositories and written once
+            self._storage = BufferedStorage(
+                self._config.get("git_monitor.file", DEFAULT_FILENAME)
+            )
 
             # Get all repos to monitor
-            repositories = self._config.get("git_monitor.repositories", [])
-            published_projects = []
-            for repository in repositories:
-                repo = Dictionary(repository)
-                self._logger.info(
-                    f"{TerminalColor.YELLOW}Processing repo " +
-                    f"{repo.get('name')}{TerminalColor.END}"
-                )
+            repositories = [
+                Dictionary(repository)
+                for repository in self._config.get("git_monitor.repositories", [])
+            ]
 
-                # Check if we already have the repo cloned
-                # If not, clone it localy
-                monitor.initiate_or_clone_repository(repository_info=repo)
+            # Bring the updates and discover the changes concurrently.
+            #   Storing and publishing happens afterwards, one by one in config order.
+            monitors = self._analyse_repositories(repositories=repositories)
 
-                # Bring the new updates
-                monitor.get_updates()
+            published_projects = []
+            failed_projects = []
+            for repo, monitor in zip(repositories, monitors):
+                if monitor is None:
+                    failed_projects.append(f"- {repo.get('name')}")
+                    continue
 
-                # Reset the Changes controller that we use
-                monitor.initialise_changes_instance()
+                # The remote did not move since the last run, it was not even touched
+                if monitor.remote_unchanged:
+                    self._logger.info(
+                        f"{TerminalColor.BLUE}Remote HEAD did not change for repository " +
+                        f"{repo.get('name')}{TerminalColor.END}"
+                    )
+                    continue
 
                 # So get the values to compare
                 current_last_known = monitor.get_current_last_known()
@@ -63,10 +85,11 @@ class GitChanges(RunnerProtocol):
                 #   Just save the new value but avoid messaging around.
                 if current_last_known is None:
                     self._logger.info(
-                        f"{TerminalColor.BLUE}First run. Writting only." +
-                        f"{TerminalColor.END}"
+                        f"{TerminalColor.BLUE}First run for repository {repo.get('name')}." +
+                        f" Writting only.{TerminalColor.END}"
                     )
                     monitor.write_new_last_known(value=new_last_known)
+                    monitor.write_last_remote_head()
                     continue
 
                 # Now let's chech if we have new changes
@@ -76,6 +99,7 @@ class GitChanges(RunnerProtocol):
                         f"{TerminalColor.BLUE}No new version for repository " +
                         f"{repo.get('name')}{TerminalColor.END}"
                     )
+                    monitor.write_last_remote_head()
                     continue
 
                 # Still here? So we have changes!
@@ -103,6 +127,7 @@ class GitChanges(RunnerProtocol):
                 # And finally store this new last known
                 self._logger.debug(f"Storing a new last known change id: {new_last_known}")
                 monitor.write_new_last_known(new_last_known)
+                monitor.write_last_remote_head()
 
             if len(published_projects) > 0:
                 self._logger.debug("Publishing an notice into account default")
@@ -110,6 +135,138 @@ class GitChanges(RunnerProtocol):
                     "Published an update for:\n\n" + "\n".join(published_projects)
                 )
 
+            if len(failed_projects) > 0:
+                self._service_publisher.error(
+                    "Error while getting updates for:\n\n" + "\n".join(failed_projects)
+                )
+
         except Exception as e:
             self._logger.exception(e)
             self._service_publisher.error("Error while publishing updates:\n\n" + str(e))
+
+        finally:
+            # Whatever was already published has to be remembered, also on errors
+            if self._storage is not None and self._storage.flush():
+                self._logger.debug("Stored the new Git Monitor state")
+
+    def _analyse_repositories(self, repositories: list) -> list:
+        '''
+        Runs _analyse_repository for all repositories in a bounded pool of threads.
+
+        Returns the GitMonitor of each repository in the same order as received,
+        or None for the ones that failed or did not finish within the timeout.
+        '''
+        if len(repositories) == 0:
+            return []
+
+        max_workers = self._config.get("git_monitor.max_workers", self.DEFAULT_MAX_WORKERS)
+        timeout = self._config.get("git_monitor.timeout", self.DEFAULT_TIMEOUT)
+        workers = min(max_workers, len(repositories))
+        self._logger.debug(f"Analysing {len(repositories)} repositories with {workers} workers")
+
+        # The timeout of every repository counts from when a worker picks it up,
+        #   which is later than now for the ones waiting for a free worker.
+        started_at = {}
+
+        def analyse(index: int, repo: Dictionary) -> GitMonitor:
+            started_at[index] = self._clock()
+            return self._analyse_repository(repo, timeout)
+
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="git-monitor")
+        futures = {
+            executor.submit(analyse, index, repo): index
+            for index,
+            repo in enumerate(repositories)
+        }
+
+        monitors = [None] * len(repositories)
+        pending = set(futures.keys())
+        timed_out = set()
+        while len(pending) > 0:
+            done, pending = wait(
+                pending,
+                timeout=self._get_wait_seconds(pending, futures, started_at, timeout),
+                return_when=FIRST_COMPLETED
+            )
+            for future in done:
+                repo = repositories[futures[future]]
+                try:
+                    monitors[futures[future]] = future.result()
+                except Exception as e:
+                    self._logger.error(
+                        f"{TerminalColor.RED_BRIGHT}Error while processing repository " +
+                        f"{repo.get('name')}: {e}{TerminalColor.END}"
+                    )
+
+            now = self._clock()
+            for future in list(pending):
+                index = futures[future]
+                if index in started_at and now - started_at[index] >= timeout:
+                    self._logger.error(
+                        f"{TerminalColor.RED_BRIGHT}Repository " +
+                        f"{repositories[index].get('name')} did not finish within " +
+                        f"{timeout} seconds. Skipping it.{TerminalColor.END}"
+                    )
+                    pending.discard(future)
+                    timed_out.add(future)
+
+            # Git gets killed once the time of the repository is over, but cloning can't be.
+            #   If all workers are still stuck, the queued repositories would never start.
+            if len([future for future in timed_out if not future.done()]) >= workers:
+                for future in list(pending):
+                    if future.cancel():
+                        self._logger.error(
+                            f"{TerminalColor.RED_BRIGHT}Repository " +
+                            f"{repositories[futures[future]].get('name')} could not start, " +
+                            "all workers are busy with the ones that timed out. " +
+                            f"Skipping it.{TerminalColor.END}"
+                        )
+                        pending.discard(future)
+
+        # Do not wait for the ones that timed out.
+        executor.shutdown(wait=False, cancel_futures=True)
+
+        return monitors
+
+    def _get_wait_seconds(
+        self, pending: set, futures: dict, started_at: dict, timeout: float
+    ) -> float:
+        # Until the first running repository times out, but checking every now and then
+        #   for the ones that start meanwhile
+        now = self._clock()
+        deadlines = [
+            started_at[futures[future]] + timeout for future in pending
+            if futures[future] in started_at
+        ]
+        return max(0, min(deadlines + [now + self.POLL_SECONDS]) - now)
+
+    def _analyse_repository(self, repo: Dictionary, timeout: float = None) -> GitMonitor:
+        self._logger.info(
+            f"{TerminalColor.YELLOW}Processing repo {repo.get('name')}{TerminalColor.END}"
+        )
+        # Every git call gets only what is left of the timeout of the repository,
+        #   so git gets killed and the thread ends when the time is over.
+        deadline = self._clock() + timeout if timeout is not None else None
+
+        def remaining() -> float:
+            return None if deadline is None else max(0, deadline - self._clock())
+
+        # Every thread has its own monitor, as it keeps the state of the current repo
+        monitor = GitMonitor(self._config, storage=self._storage)
+
+        # Cheap pre-check: skip everything if the remote HEAD is the same as last time
+        if self._config.get("git_monitor.remote_precheck", True)\
+                and monitor.check_remote_head(repository_info=repo, timeout=remaining()):
+            return monitor
+
+        # Check if we already have the repo cloned
+        # If not, clone it localy
+        monitor.initiate_or_clone_repository(repository_info=repo)
+
+        # Bring the new updates
+        monitor.get_updates(timeout=remaining())
+
+        # Reset the Changes controller that we use. This discovers the changes.
+        monitor.initialise_changes_instance()
+
+        return monitor
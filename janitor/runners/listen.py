@@ -2,21 +2,73 @@ from pyxavi.terminal_color import TerminalColor
 from pyxavi.config import Config
 from janitor.lib.system_info import SystemInfo
 from janitor.lib.system_info_templater import SystemInfoTemplater
-from janitor.lib.publisher import Publisher
+from janitor.lib.publisher_pool import PublisherPool
+from janitor.lib.ingest_queue import IngestQueue
+from janitor.lib.alert_state import AlertState
+from janitor.lib.report_coalescer import ReportCoalescer
+from janitor.lib.host_liveness import HostLiveness
+from janitor.lib.history_store import HistoryStore
+from janitor.lib.queue_depth import QueueDepth
+from janitor.lib.metrics import REGISTRY, CONTENT_TYPE_PROMETHEUS
+from janitor.lib.wire_format import WireFormat, CONTENT_TYPE_BINARY, CONTENT_TYPES,\
+    COMPRESSION_GZIP, COMPRESSION_ZSTD
 from janitor.objects.message import Message, MessageType
 from janitor.runners.runner_protocol import RunnerProtocol
 from definitions import ROOT_DIR
-from flask import Flask, request
+from flask import Flask, Response, request, g
 from flask_restful import Resource, Api, reqparse
+from werkzeug.serving import make_server
+from typing import Callable
 import logging
+import signal
+import time
+import os
 
 app = Flask(__name__)
 api = Api(app)
 
 DEFAULT_MESSAGE_TYPE = str(MessageType.NONE)
 MASTODON_NAMED_ACCOUNT = "default"
+SERVER_DEVELOPMENT = "development"
+SERVER_PRODUCTION = "production"
+DEFAULT_READY_FILE = "storage/listener.ready"
+# Binding to them listens on every interface, loopback included
+WILDCARD_HOSTS = ["", "0.0.0.0", "::"]
+DEFAULT_THREADS = 8
+DEFAULT_CONNECTION_LIMIT = 100
+DEFAULT_KEEP_ALIVE = 120
+DEFAULT_BACKLOG = 1024
+DEFAULT_BATCH_MAX_REPORTS = 500
+DEFAULT_HISTORY_RANGE_SECONDS = 3600
 # MASTODON_NAMED_ACCOUNT = "test"
 
+REQUESTS = REGISTRY.counter(
+    "janitor_listener_requests_total",
+    "Requests received, per endpoint and status code", ["endpoint", "code"]
+)
+REQUEST_SECONDS = REGISTRY.histogram(
+    "janitor_listener_request_seconds", "Time to answer a request, per endpoint", ["endpoint"]
+)
+PARSE_SECONDS = REGISTRY.histogram(
+    "janitor_listener_parse_seconds",
+    "Time to parse the received data, per endpoint", ["endpoint"]
+)
+
+
+@app.before_request
+def _start_request_timer():
+    g.started_at = time.perf_counter()
+
+
+@app.after_request
+def _count_request(response):
+    # The route and not the path, so unknown paths can't grow the amount of labels
+    endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    REQUESTS.inc(endpoint, str(response.status_code))
+    if "started_at" in g:
+        REQUEST_SECONDS.observe(endpoint, value=time.perf_counter() - g.started_at)
+    return response
+
 
 class Listen(RunnerProtocol):
 
@@ -29,46 +81,355 @@ class Listen(RunnerProtocol):
         # Make that Flask only logs from Warning on:
         logging.getLogger('werkzeug').setLevel(logging.WARNING)
 
+        # Publishers live as long as the listener does, one per named account
+        self._publisher_pool = PublisherPool(config=self._config, base_path=ROOT_DIR)
+
+        # Publishing can be moved out of the request into background workers
+        self._ingest_queue = None
+        if self._config.get("app.service.listen.ingest.active", False):
+            self._ingest_queue = IngestQueue(
+                config=self._config, publisher_pool=self._publisher_pool
+            )
+
+        # Publish only the changes of the alerts, instead of every crossing report
+        self._alert_state = None
+        if self._config.get("system_info.alert_state.active", False):
+            self._alert_state = AlertState(config=self._config)
+
+        # Merge the reports that a host sends in a short time into a single one
+        self._coalescer = None
+        if self._config.get("app.service.listen.coalesce.active", False):
+            self._sys_info = SystemInfo(self._config)
+            self._coalescer = ReportCoalescer(
+                config=self._config, process=self._process_coalesced_report
+            )
+
+        # Alarm about the hosts that stop reporting
+        self._liveness = None
+        if self._config.get("app.service.listen.liveness.active", False):
+            self._liveness = HostLiveness(
+                config=self._config,
+                on_missing=self._publish_missing_host,
+                on_back=self._publish_host_back
+            )
+
+        # Keep the history of the received metrics
+        self._history = None
+        if self._config.get("app.service.listen.history.active", False):
+            self._history = HistoryStore(config=self._config)
+
+        self._metrics_active = self._config.get("app.service.listen.metrics.active", False)
+        if self._metrics_active:
+            self._register_gauges()
+
     def run(self):
+        resource_class_kwargs = {
+            "config": self._config,
+            "logger": self._logger,
+            "publisher_pool": self._publisher_pool,
+            "ingest_queue": self._ingest_queue,
+            "alert_state": self._alert_state,
+            "coalescer": self._coalescer,
+            "liveness": self._liveness,
+            "history": self._history
+        }
+        api.add_resource(ListenSysInfo, '/sysinfo', resource_class_kwargs=resource_class_kwargs)
         api.add_resource(
-            ListenSysInfo,
-            '/sysinfo',
-            resource_class_kwargs={
-                "config": self._config, "logger": self._logger
-            }
+            ListenSysInfoBatch, '/sysinfo/batch', resource_class_kwargs=resource_class_kwargs
         )
-        api.add_resource(
-            ListenMessage,
-            '/message',
-            resource_class_kwargs={
-                "config": self._config, "logger": self._logger
-            }
+        api.add_resource(ListenMessage, '/message', resource_class_kwargs=resource_class_kwargs)
+        if self._history is not None:
+            api.add_resource(
+                ListenSysInfoHistory,
+                '/sysinfo/history',
+                resource_class_kwargs=resource_class_kwargs
+            )
+        api.add_resource(ListenHealth, '/health', resource_class_kwargs=resource_class_kwargs)
+        if self._metrics_active:
+            api.add_resource(
+                ListenMetrics, '/metrics', resource_class_kwargs=resource_class_kwargs
+            )
+
+        if self._ingest_queue is not None:
+            self._ingest_queue.start()
+        if self._coalescer is not None:
+            self._coalescer.start()
+        if self._liveness is not None:
+            self._liveness.start()
+        if self._history is not None:
+            self._history.start()
+
+        # SIGTERM should also let us drain the ingest queue before leaving
+        signal.signal(signal.SIGTERM, self._handle_termination)
+        try:
+            self._serve()
+        finally:
+            self._remove_ready_file()
+            if self._liveness is not None:
+                self._liveness.stop()
+            if self._history is not None:
+                self._history.stop()
+            # Before the ingest queue, that has to publish what they hand over
+            if self._coalescer is not None:
+                self._coalescer.stop(flush=True)
+            if self._ingest_queue is not None:
+                self._ingest_queue.stop(drain=True)
+
+    def _serve(self):
+        host = self._config.get("app.service.listen.host")
+        port = self._config.get("app.service.listen.port")
+        server_type = self._config.get("app.service.listen.server", SERVER_DEVELOPMENT)
+
+        if server_type == SERVER_PRODUCTION:
+            try:
+                # Only needed for the production mode, so it is an optional dependency
+                from waitress import create_server
+            except ImportError:
+                raise RuntimeError(
+                    "The production server mode needs the package [waitress]. " +
+                    "Install it with: poetry install --extras production"
+                )
+
+            # Waitress serves from threads in a single process,
+            #   so the Publishers pool and the ingest queue are shared by all requests.
+            server = create_server(
+                app,
+                host=host,
+                port=port,
+                threads=self._config.get("app.service.listen.threads", DEFAULT_THREADS),
+                connection_limit=self._config.get(
+                    "app.service.listen.connection_limit", DEFAULT_CONNECTION_LIMIT
+                ),
+                channel_timeout=self._config.get(
+                    "app.service.listen.keep_alive", DEFAULT_KEEP_ALIVE
+                ),
+                backlog=self._config.get("app.service.listen.backlog", DEFAULT_BACKLOG),
+            )
+            # The socket is already bound here, we're ready to receive.
+            self._write_ready_file(host=host, port=port)
+            self._logger.info(
+                f"{TerminalColor.MAGENTA}Listening in production mode on " +
+                f"{host}:{port}{TerminalColor.END}"
+            )
+            server.run()
+        elif server_type == SERVER_DEVELOPMENT:
+            # The Werkzeug server behind app.run(), but binding before serving so we know
+            #   when we're ready. Its reloader would serve from a child process instead.
+            app.debug = self._config.get("app.service.listen.debug", False)
+            server = make_server(host, port, app, threaded=True)
+            self._write_ready_file(host=host, port=port)
+            self._logger.info(
+                f"{TerminalColor.MAGENTA}Listening in development mode on " +
+                f"{host}:{port}{TerminalColor.END}"
+            )
+            server.serve_forever()
+        else:
+            raise RuntimeError(f"Unknown listener server mode [{server_type}]")
+
+    def _process_coalesced_report(self, sys_data: dict):
+        if self._alert_state is not None:
+            self._alert_state.publish_changes(sys_data, self._publish)
+        elif self._sys_info.crossed_thresholds(sys_data, ["hostname"]):
+            self._publish(SystemInfoTemplater(self._config).process_report(dict(sys_data)))
+
+    def _publish_missing_host(self, hostname: str, silent_seconds: float):
+        self._logger.warning(
+            f"{TerminalColor.RED_BRIGHT}{hostname} has not reported for " +
+            f"{int(silent_seconds)} seconds{TerminalColor.END}"
+        )
+        icon = MessageType.icon_per_type(MessageType.ALARM)
+        self._publish(
+            Message(
+                summary=f"{icon} {hostname} is not reporting",
+                text=f"No System Info reports from {hostname} for the last " +
+                f"{int(silent_seconds // 60)} minutes.",
+                message_type=MessageType.ALARM
+            )
         )
 
-        app.run(
-            debug=self._config.get("app.service.listen.debug"),
-            host=self._config.get("app.service.listen.host"),
-            port=self._config.get("app.service.listen.port")
+    def _publish_host_back(self, hostname: str, now: float):
+        self._publish(
+            Message(
+                summary=f"✅ {hostname} is reporting again",
+                text=f"{hostname} sent a System Info report again.",
+                message_type=MessageType.INFO
+            )
         )
 
+    def _publish(self, message: Message, on_done: Callable[[bool], None] = None):
+        """
+        Publishes the messages that are not the answer to a request
+        """
+        if self._ingest_queue is None:
+            published = self._publisher_pool.get(MASTODON_NAMED_ACCOUNT).publish_message(
+                message=message
+            ) is not False
+        elif not self._ingest_queue.put(message=message, on_done=on_done):
+            self._logger.warning(
+                f"{TerminalColor.RED_BRIGHT}The ingest queue is full, a message " +
+                f"is lost{TerminalColor.END}"
+            )
+            published = False
+        else:
+            # The ingest worker calls on_done
+            return
+        if on_done is not None:
+            on_done(published)
+
+    def _register_gauges(self) -> None:
+        # Read from the queue file when scraped, cron runs fill and drain it
+        queue_depth = QueueDepth(config=self._config, base_path=ROOT_DIR)
+        REGISTRY.gauge(
+            "janitor_queue_depth", "Messages waiting in the publishing queue", queue_depth.get
+        )
+        if self._ingest_queue is not None:
+            REGISTRY.gauge(
+                "janitor_listener_ingest_depth",
+                "Messages waiting in the ingest queue of the listener",
+                lambda: self._ingest_queue.get_stats()["depth"]
+            )
 
-class ListenSysInfo(Resource):
+    def _get_ready_file(self) -> str:
+        return os.path.join(
+            ROOT_DIR, self._config.get("app.service.listen.ready_file", DEFAULT_READY_FILE)
+        )
+
+    def _write_ready_file(self, host: str, port: int) -> None:
+        # bin/jan waits for this file to know that the listener is up,
+        #   and reads from it the URL to ask for the health.
+        if host is None or host in WILDCARD_HOSTS:
+            host = "127.0.0.1"
+        elif ":" in host:
+            # IPv6 addresses go in brackets in a URL
+            host = f"[{host}]"
+        with open(self._get_ready_file(), "w") as file:
+            file.write(f"http://{host}:{port}\n")
+
+    def _remove_ready_file(self) -> None:
+        if os.path.exists(self._get_ready_file()):
+            os.remove(self._get_ready_file())
+
+    def _handle_termination(self, signum, frame):
+        self._logger.info(
+            f"{TerminalColor.MAGENTA}Listener received signal {signum}, " +
+            f"shutting down{TerminalColor.END}"
+        )
+        raise SystemExit(0)
+
+
+class ListenerResource(Resource):
     '''
-    Listener from remote SysInfo Report requests to log
+    Common base for the Listener endpoints
     '''
 
-    def __init__(self, config: Config = None, logger: logging = None) -> None:
+    def __init__(
+        self,
+        config: Config = None,
+        logger: logging = None,
+        publisher_pool: PublisherPool = None,
+        ingest_queue: IngestQueue = None,
+        alert_state: AlertState = None,
+        coalescer: ReportCoalescer = None,
+        liveness: HostLiveness = None,
+        history: HistoryStore = None
+    ) -> None:
         self._config = config
         self._logger = logger
         self._current_flask_app = app
+        self._publisher_pool = publisher_pool
+        self._ingest_queue = ingest_queue
+        self._alert_state = alert_state
+        self._coalescer = coalescer
+        self._liveness = liveness
+        self._history = history
+        self._set_up()
+
+        super(ListenerResource, self).__init__()
+
+    def _set_up(self) -> None:
+        """
+        Builds what the endpoint needs, like its arguments parser
+        """
+        pass
+
+    def _get_publisher_pool(self) -> PublisherPool:
+        # When not given by the Listen runner, fall back to a pool for this request
+        if self._publisher_pool is None:
+            self._publisher_pool = PublisherPool(config=self._config, base_path=ROOT_DIR)
+        return self._publisher_pool
+
+    def _publish(
+        self,
+        message: Message,
+        named_account: str = MASTODON_NAMED_ACCOUNT,
+        on_done: Callable[[bool], None] = None
+    ):
+        """
+        Publishes the message straight away, or hands it to the ingest queue if we have it
+
+        `on_done` is called with whether the message got published, once it is known.
+        """
+        if self._ingest_queue is None:
+            published = self._get_publisher_pool().get(named_account).publish_message(
+                message=message
+            ) is not False
+            if on_done is not None:
+                on_done(published)
+            if not published:
+                return {"error": "The message could not be published."}, 502
+            return 200
+
+        if not self._ingest_queue.put(
+                message=message, named_account=named_account, on_done=on_done):
+            if on_done is not None:
+                on_done(False)
+            return {"error": "The listener is busy, try again later."}, 503
+        return 202
+
+    def _coalesce(self, sys_data: dict):
+        # Reports without issues only matter to resolve the tracked alerts
+        if self._alert_state is None\
+                and not self._sys_info.crossed_thresholds(sys_data, ["hostname"]):
+            self._logger.info(
+                f"{TerminalColor.CYAN}No issues found. Ending here.{TerminalColor.END}"
+            )
+            return 200
+
+        if not self._coalescer.add(sys_data):
+            return {"error": "The listener is busy, try again later."}, 503
+        self._logger.debug("Report held to be merged with the next ones of the host")
+        return 202
+
+    def _publish_alert_changes(self, sys_data: dict):
+        results = self._alert_state.publish_changes(
+            sys_data, lambda message, on_done: self._publish(message=message, on_done=on_done)
+        )
+        if len(results) == 0:
+            self._logger.info(
+                f"{TerminalColor.CYAN}No changes in the alerts. Ending here.{TerminalColor.END}"
+            )
+            return 200
+
+        self._logger.debug(f"Published {len(results)} alert changes")
+        for result in results:
+            if isinstance(result, tuple):
+                # Something went wrong, return it as it is
+                return result
+        return results[-1]
+
+
+class ListenSysInfo(ListenerResource):
+    '''
+    Listener from remote SysInfo Report requests to log
+    '''
+
+    def _set_up(self) -> None:
         self._sys_info = SystemInfo(self._config)
         self._parser = reqparse.RequestParser()
         self._parser.add_argument(
             'sys_data', type=dict, required=True, help='No sys_data provided', location='json'
         )
 
-        super(ListenSysInfo, self).__init__()
-
     def post(self):
         """
         This is going to receive the POST request
@@ -80,13 +441,23 @@ class ListenSysInfo(Resource):
         )
 
         # Get the data
-        args = self._parser.parse_args()
-        if "sys_data" in args:
-            sys_data = args["sys_data"]
-        else:
-            return {
-                "error": "Expected dict under a \"sys_data\" variable was not present."
-            }, 400
+        started_at = time.perf_counter()
+        sys_data = self._get_sys_data()
+        PARSE_SECONDS.observe("/sysinfo", value=time.perf_counter() - started_at)
+        if isinstance(sys_data, tuple):
+            # Could not get it, this is the error to return
+            return sys_data
+
+        if self._liveness is not None:
+            self._liveness.seen(sys_data.get("hostname", "unknown host"))
+        if self._history is not None:
+            self._history.append(sys_data)
+
+        if self._coalescer is not None:
+            return self._coalesce(sys_data)
+
+        if self._alert_state is not None:
+            return self._publish_alert_changes(sys_data)
 
         # If there is no issue, just stop here.
         if not self._sys_info.crossed_thresholds(sys_data, ["hostname"]):
@@ -100,22 +471,174 @@ class ListenSysInfo(Resource):
 
         # Publish the message
         self._logger.debug("Publishing a report")
-        Publisher(
-            config=self._config, named_account=MASTODON_NAMED_ACCOUNT, base_path=ROOT_DIR
-        ).publish_message(message=message)
+        return self._publish(message=message)
+
+    def _get_sys_data(self):
+        if request.mimetype == CONTENT_TYPE_BINARY or request.content_encoding:
+            # Compact and/or compressed reports, reqparse only understands plain JSON
+            try:
+                return WireFormat.decode(
+                    request.get_data(), request.mimetype, request.content_encoding
+                )
+            except LookupError as e:
+                return {
+                    "error": str(e),
+                    "content_types": list(CONTENT_TYPES.values()),
+                    "content_encodings": [COMPRESSION_GZIP, COMPRESSION_ZSTD]
+                }, 415
+            except ValueError as e:
+                return {"error": str(e)}, 400
+
+        args = self._parser.parse_args()
+        if "sys_data" in args:
+            return args["sys_data"]
+        return {"error": "Expected dict under a \"sys_data\" variable was not present."}, 400
+
+
+class ListenSysInfoBatch(ListenerResource):
+    '''
+    Listener from remote requests carrying several SysInfo Reports at once
+    '''
+
+    def _set_up(self) -> None:
+        self._sys_info = SystemInfo(self._config)
+        self._parser = reqparse.RequestParser()
+        self._parser.add_argument(
+            'reports', type=list, required=True, help='No reports provided', location='json'
+        )
+
+    def post(self):
+        """
+        This is going to receive the POST request
+        """
+
+        self._logger.info(
+            f"{TerminalColor.MAGENTA}System Info Batch Listener{TerminalColor.END}" +
+            f" received a request from {request.remote_addr}"
+        )
+
+        # Get the data
+        started_at = time.perf_counter()
+        args = self._parser.parse_args()
+        PARSE_SECONDS.observe("/sysinfo/batch", value=time.perf_counter() - started_at)
+        if "reports" in args and isinstance(args["reports"], list):
+            reports = args["reports"]
+        else:
+            return {"error": "Expected list under a \"reports\" variable was not present."}, 400
+        if not all([isinstance(report, dict) for report in reports]):
+            return {"error": "Every item under \"reports\" is expected to be a dict."}, 400
+        max_reports = self._config.get(
+            "app.service.listen.batch.max_reports", DEFAULT_BATCH_MAX_REPORTS
+        )
+        if len(reports) > max_reports:
+            return {"error": f"Too many reports, the max is {max_reports}."}, 413
+        if self._liveness is not None:
+            for report in reports:
+                self._liveness.seen(report.get("hostname", "unknown host"))
+        if self._history is not None:
+            for report in reports:
+                self._history.append(report)
+
+        # Every report goes the same way as in /sysinfo, unless we can fold them
+        result = {"received": len(reports)}
+        if self._coalescer is not None:
+            statuses = [self._coalesce(report) for report in reports]
+        elif self._alert_state is not None:
+            # Every host gets its own messages, so each one is marked as notified
+            #   only when the messages about it are published
+            statuses = [self._publish_alert_changes(report) for report in reports]
+        else:
+            statuses = self._publish_folded(reports, result)
+
+        return self._build_response(reports, statuses, result)
+
+    def _publish_folded(self, reports: list, result: dict) -> list:
+        """
+        Folds the reports crossing thresholds into a message, or one per severity.
+
+        Returns the status of every report: the one of its message, if any.
+        """
+        crossed = [
+            index for index,
+            report in enumerate(reports)
+            if self._sys_info.crossed_thresholds(report, ["hostname"])
+        ]
+        self._logger.debug(f"{len(crossed)} of {len(reports)} reports crossed thresholds")
+        result["crossed"] = len(crossed)
+        result["messages"] = 0
+        statuses = [200] * len(reports)
+        if len(crossed) == 0:
+            self._logger.info(
+                f"{TerminalColor.CYAN}No issues found. Ending here.{TerminalColor.END}"
+            )
+            return statuses
 
-        return 200
+        if self._config.get("app.service.listen.batch.group_by_severity", False):
+            groups = self._group_by_severity(reports, crossed)
+        else:
+            groups = [crossed]
 
+        self._logger.debug(f"Publishing {len(groups)} aggregated reports")
+        templater = SystemInfoTemplater(self._config)
+        for group in groups:
+            message = templater.process_reports(
+                [reports[index] for index in group], group_by_severity=False
+            )[0]
+            published = self._publish(message=message)
+            if not isinstance(published, tuple):
+                result["messages"] += 1
+            for index in group:
+                statuses[index] = published
+        return statuses
 
-class ListenMessage(Resource):
+    def _group_by_severity(self, reports: list, indexes: list) -> list:
+        """
+        The indexes of the reports per highest severity, from the highest to the lowest
+        """
+        priorities = MessageType.priority()
+        groups = {}
+        for index in indexes:
+            severities = self._sys_info.get_crossed_metrics(reports[index], ["hostname"])
+            level = max(
+                [
+                    priorities.index(severity)
+                    for severity in severities.values() if severity in priorities
+                ] + [0]
+            )
+            groups[level] = groups.get(level, []) + [index]
+        return [groups[level] for level in sorted(groups.keys(), reverse=True)]
+
+    def _build_response(self, reports: list, statuses: list, result: dict) -> tuple:
+        """
+        Adds the status of every report, so a client can retry only the failed ones.
+
+        Answers 207 when some of them failed and some did not.
+        """
+        result["results"] = []
+        for report, status in zip(reports, statuses):
+            item = {"hostname": report.get("hostname", "unknown host")}
+            if isinstance(status, tuple):
+                item.update(status[0])
+                status = status[1]
+            item["status"] = status
+            result["results"].append(item)
+
+        codes = [item["status"] for item in result["results"]]
+        failed = [code for code in codes if code >= 400]
+        if len(failed) == 0:
+            # 202 when any was only queued
+            return result, max(codes + [200])
+        if len(failed) == len(codes):
+            return result, failed[0]
+        return result, 207
+
+
+class ListenMessage(ListenerResource):
     '''
     Listener from remote Message requests to log
     '''
 
-    def __init__(self, config: Config = None, logger: logging = None) -> None:
-        self._config = config
-        self._logger = logger
-        self._current_flask_app = app
+    def _set_up(self) -> None:
         self._parser = reqparse.RequestParser()
         self._parser.add_argument(
             'summary',
@@ -146,8 +669,6 @@ class ListenMessage(Resource):
             location='form'
         )
 
-        super(ListenMessage, self).__init__()
-
     def post(self):
         """
         This is going to receive the POST request
@@ -159,7 +680,9 @@ class ListenMessage(Resource):
         )
 
         # Get the data
+        started_at = time.perf_counter()
         args = self._parser.parse_args()
+        PARSE_SECONDS.observe("/message", value=time.perf_counter() - started_at)
         if "summary" in args and args["summary"] is not None:
             summary = args["summary"]
         else:
@@ -190,7 +713,69 @@ class ListenMessage(Resource):
 
         # Publish the message
         self._logger.debug("Publishing a message")
-        Publisher(
-            config=self._config, named_account=MASTODON_NAMED_ACCOUNT, base_path=ROOT_DIR
-        ).publish_message(message=message)
-        return 200
+        return self._publish(message=message)
+
+
+class ListenSysInfoHistory(ListenerResource):
+    '''
+    Answers the history of the metrics received from the hosts
+    '''
+
+    def _set_up(self) -> None:
+        self._parser = reqparse.RequestParser()
+        self._parser.add_argument('hostname', type=str, location='args')
+        self._parser.add_argument('metric', type=str, location='args')
+        self._parser.add_argument('from', type=float, dest='start', location='args')
+        self._parser.add_argument('to', type=float, dest='end', location='args')
+        self._parser.add_argument('step', type=float, location='args')
+
+    def get(self):
+        """
+        Without a hostname lists the hosts, without a metric lists the metrics of
+            the host, and with both returns the points of the metric in the range
+        """
+        args = self._parser.parse_args()
+        if args.get("hostname", None) is None:
+            return {"hosts": self._history.get_hosts()}, 200
+        hostname = args["hostname"]
+        if args.get("metric", None) is None:
+            return {"hostname": hostname, "metrics": self._history.get_metrics(hostname)}, 200
+
+        end = args["end"] if args.get("end", None) is not None else time.time()
+        start = args["start"] if args.get("start", None) is not None\
+            else end - DEFAULT_HISTORY_RANGE_SECONDS
+        if start > end:
+            return {"error": "The \"from\" timestamp is after the \"to\" one."}, 400
+        step = args.get("step", None)
+        if step is not None and step <= 0:
+            return {"error": "The \"step\" has to be a positive amount of seconds."}, 400
+
+        return self._history.query(
+            hostname=hostname, metric=args["metric"], start=start, end=end, step=step
+        ), 200
+
+
+class ListenHealth(ListenerResource):
+    '''
+    Answers if the listener is up, used to check its readiness
+    '''
+
+    def get(self):
+        health = {"status": "ok"}
+        if self._ingest_queue is not None:
+            health["ingest"] = self._ingest_queue.get_stats()
+        if self._coalescer is not None:
+            health["coalesce"] = self._coalescer.get_stats()
+        if self._liveness is not None:
+            health["liveness"] = self._liveness.get_stats()
+
+        return health, 200
+
+
+class ListenMetrics(ListenerResource):
+    '''
+    Exposes the metrics of the listener in the Prometheus text format
+    '''
+
+    def get(self):
+        return Response(REGISTRY.expose(), status=200, content_type=CONTENT_TYPE_PROMETHEUS)
@@ -0,0 +1,175 @@
+from pyxavi.terminal_color import TerminalColor
+from pyxavi.config import Config
+from janitor.lib.system_info import SystemInfo
+from janitor.lib.metric_window import MetricWindows, AGGREGATION_AVG
+from janitor.runners.runner_protocol import RunnerProtocol
+from janitor.runners.runner_loader import load_runner
+import threading
+import logging
+import signal
+import math
+import time
+
+MODE_LOCAL = "local"
+MODE_REMOTE = "remote"
+# Imported only for the mode in use, see runner_loader
+MODE_MAP = {
+    MODE_LOCAL: "janitor.runners.run_local:RunLocal",
+    MODE_REMOTE: "janitor.runners.run_remote:RunRemote",
+}
+DEFAULT_MODE = MODE_LOCAL
+DEFAULT_INTERVAL_SECONDS = 10
+DEFAULT_EVALUATE_SECONDS = 60
+DEFAULT_WINDOW_AGGREGATION = AGGREGATION_AVG
+DEFAULT_WINDOW_MINUTES = 5
+DEFAULT_REPEAT_ALERT_SECONDS = 900
+
+
+class MetricsAgent(RunnerProtocol):
+    '''
+    Resident collector of the System Info metrics
+
+    Instead of a snapshot per cron run, it samples the metrics every few
+    seconds into ring buffers, and every evaluation period it compares the
+    thresholds against the metrics aggregated over a time window
+    (avg, min, max, last or a percentile like p95), so a single spike does
+    not trigger an alert.
+
+    In "local" mode it publishes the report like `sys_info local` does, and
+    in "remote" mode it sends the aggregated metrics to the listener like
+    `sys_info remote` does.
+    '''
+
+    def __init__(
+        self, config: Config = None, logger: logging = None, params: dict = None
+    ) -> None:
+        self._config = config
+        self._logger = logger
+        self._sys_info = SystemInfo(self._config)
+        self._mode = config.get("system_info.agent.mode", DEFAULT_MODE)
+        if self._mode not in MODE_MAP:
+            raise RuntimeError(f"Unknown mode [{self._mode}] for the metrics agent")
+        self._interval = config.get(
+            "system_info.agent.interval_seconds", DEFAULT_INTERVAL_SECONDS
+        )
+        self._evaluate_every = config.get(
+            "system_info.agent.evaluate_seconds", DEFAULT_EVALUATE_SECONDS
+        )
+        self._repeat_alert_every = config.get(
+            "system_info.agent.repeat_alert_seconds", DEFAULT_REPEAT_ALERT_SECONDS
+        )
+        # The alert state already decides what is worth publishing
+        self._alert_state_active = config.get("system_info.alert_state.active", False)
+        self._windows = self._get_windows_config()
+        longest_window = max(
+            [window["seconds"] for window in self._windows.values()] + [self._evaluate_every]
+        )
+        # One more, so the window is complete even when the samples drift a bit
+        self._metric_windows = MetricWindows(
+            capacity=math.ceil(longest_window / self._interval) + 1
+        )
+        self._stop_event = threading.Event()
+        self._handler = None
+        self._last_alert_at = None
+
+    def run(self):
+        '''
+        Sample and evaluate the metrics until we get stopped
+        '''
+        signal.signal(signal.SIGTERM, self._handle_termination)
+        signal.signal(signal.SIGINT, self._handle_termination)
+
+        self._logger.info(
+            f"{TerminalColor.MAGENTA}Metrics agent started in {self._mode} mode, sampling " +
+            f"every {self._interval} seconds{TerminalColor.END}"
+        )
+        # Monotonic, so a clock jump does not make us sample in a burst or stop sampling
+        next_sample_at = time.monotonic()
+        next_evaluation_at = next_sample_at + self._evaluate_every
+        while not self._stop_event.is_set():
+            try:
+                self._sample(time.time())
+                if time.monotonic() >= next_evaluation_at:
+                    next_evaluation_at += self._evaluate_every
+                    self._evaluate(time.time())
+            except Exception as e:
+                self._logger.exception(e)
+
+            next_sample_at += self._interval
+            # When we're late, better skip the lost samples than running them in a burst
+            if next_sample_at < time.monotonic():
+                next_sample_at = time.monotonic()
+            self._stop_event.wait(next_sample_at - time.monotonic())
+
+        self._logger.info(f"{TerminalColor.MAGENTA}Metrics agent stopped{TerminalColor.END}")
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _handle_termination(self, signum, frame):
+        self._logger.info("Termination signal received, stopping the metrics agent")
+        self.stop()
+
+    def _sample(self, now: float):
+        self._metric_windows.record(self._collect_data(), now)
+
+    def _evaluate(self, now: float) -> bool:
+        '''
+        Processes the aggregated metrics, returns if an alert was published or sent
+        '''
+        sys_data = self._metric_windows.summarize(self._windows, now)
+        if self._mode == MODE_REMOTE:
+            # The listener compares the thresholds
+            self._get_handler().send_data(sys_data)
+            return True
+
+        if not self._alert_state_active and self._last_alert_at is not None\
+                and now - self._last_alert_at < self._repeat_alert_every:
+            self._logger.debug("Alerted recently, not checking the thresholds yet")
+            return False
+        if self._get_handler().process_data(sys_data):
+            self._last_alert_at = now
+            return True
+        return False
+
+    def _get_handler(self) -> RunnerProtocol:
+        if self._handler is None:
+            handler_class = load_runner(MODE_MAP[self._mode])
+            self._handler = handler_class(config=self._config, logger=self._logger)
+        return self._handler
+
+    def _get_windows_config(self) -> dict:
+        '''
+        The window to aggregate every metric with a threshold.
+
+        It is given per threshold, or else the default one applies
+        '''
+        default_aggregation = self._config.get(
+            "system_info.agent.window.aggregation", DEFAULT_WINDOW_AGGREGATION
+        )
+        default_minutes = self._config.get(
+            "system_info.agent.window.minutes", DEFAULT_WINDOW_MINUTES
+        )
+        windows = {}
+        for name, threshold in dict(self._config.get("system_info.thresholds", {})).items():
+            window = threshold.get("window", {}) if isinstance(threshold, dict) else {}
+            aggregation = window.get("aggregation", default_aggregation)
+            if not MetricWindows.is_valid_aggregation(aggregation):
+                raise RuntimeError(
+                    f"Unknown aggregation [{aggregation}] for the metric [{name}]"
+                )
+            windows[name] = {
+                "aggregation": aggregation,
+                "seconds": window.get("minutes", default_minutes) * 60,
+            }
+        return windows
+
+    def _collect_data(self) -> dict:
+        return {
+            **{
+                "hostname": self._sys_info.get_hostname()
+            },
+            **self._sys_info.get_cpu_data(),
+            **self._sys_info.get_mem_data(),
+            **self._sys_info.get_disk_data(),
+        }
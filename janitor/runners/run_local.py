@@ -3,6 +3,7 @@ from pyxavi.terminal_color import TerminalColor
 from janitor.lib.system_info import SystemInfo
 from janitor.lib.system_info_templater import SystemInfoTemplater
 from janitor.lib.publisher import Publisher
+from janitor.lib.alert_state import AlertState
 from janitor.runners.runner_protocol import RunnerProtocol
 from definitions import ROOT_DIR
 import logging
@@ -28,6 +29,15 @@ class RunLocal(RunnerProtocol):
         # Get the data
         sys_data = self._collect_data()
 
+        return self.process_data(sys_data)
+
+    def process_data(self, sys_data: dict) -> bool:
+        '''
+        Publishes a report of the given data if it crosses the thresholds
+        '''
+        if self._config.get("system_info.alert_state.active", False):
+            return self._publish_alert_changes(sys_data)
+
         # If there is no issue, just stop here.
         if not self._sys_info.crossed_thresholds(sys_data, ["hostname"]):
             self._logger.info(
@@ -42,6 +52,24 @@ class RunLocal(RunnerProtocol):
         Publisher(
             config=self._config, named_account="default", base_path=ROOT_DIR
         ).publish_message(message=message)
+        return True
+
+    def _publish_alert_changes(self, sys_data: dict) -> bool:
+        publisher = Publisher(config=self._config, named_account="default", base_path=ROOT_DIR)
+
+        def publish(message, on_done) -> bool:
+            # When not published it stays as not notified, the next run will try again
+            published = publisher.publish_message(message=message) is not False
+            on_done(published)
+            return published
+
+        results = AlertState(self._config).publish_changes(sys_data, publish)
+        if len(results) == 0:
+            self._logger.info(
+                f"{TerminalColor.CYAN}No changes in the alerts. Ending here.{TerminalColor.END}"
+            )
+            return False
+        return True
 
     def _collect_data(self) -> dict:
         return {
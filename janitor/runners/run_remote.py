@@ -1,6 +1,7 @@
 from pyxavi.terminal_color import TerminalColor
 from pyxavi.config import Config
 from janitor.lib.system_info import SystemInfo
+from janitor.lib.wire_format import WireFormat, FORMAT_JSON, COMPRESSION_NONE
 from janitor.runners.runner_protocol import RunnerProtocol
 import requests
 import logging
@@ -26,12 +27,18 @@ class RunRemote(RunnerProtocol):
         # Get the data
         sys_data = self._collect_data()
 
-        # Send the data
+        self.send_data(sys_data)
+
+    def send_data(self, sys_data: dict):
+        '''
+        Sends the given data to the listener, that will process it
+        '''
         if not self._config.get("app.run_control.dry_run"):
             remote_url = self._config.get("app.service.remote_url")
             self._logger.debug("Sending sys_data away")
-            r = requests.post(f"{remote_url}/sysinfo", json={'sys_data': sys_data})
-            if r.status_code == 200:
+            r = self._post(f"{remote_url}/sysinfo", sys_data)
+            # The listener may answer 202 when it queues the report to publish later
+            if r.status_code in [200, 202]:
                 self._logger.info(
                     f"{TerminalColor.CYAN}Request was successful{TerminalColor.END}"
                 )
@@ -43,6 +50,25 @@ class RunRemote(RunnerProtocol):
         else:
             self._logger.info(f"{TerminalColor.CYAN}Dry Run, not sent.{TerminalColor.END}")
 
+    def _post(self, url: str, sys_data: dict) -> requests.Response:
+        wire_format = self._config.get("app.service.remote_format", FORMAT_JSON)
+        compression = self._config.get("app.service.remote_compression", COMPRESSION_NONE)
+        if wire_format == FORMAT_JSON and compression == COMPRESSION_NONE:
+            return requests.post(url, json={'sys_data': sys_data})
+
+        body, headers = WireFormat.encode(
+            sys_data, wire_format=wire_format, compression=compression
+        )
+        r = requests.post(url, data=body, headers=headers)
+        if r.status_code in [400, 415]:
+            # Listeners older than the compact format only understand plain JSON
+            self._logger.warning(
+                f"{TerminalColor.YELLOW}The listener did not accept the [{wire_format}] format "
+                + f"with [{compression}] compression, sending plain JSON{TerminalColor.END}"
+            )
+            r = requests.post(url, json={'sys_data': sys_data})
+        return r
+
     def _collect_data(self) -> dict:
         return {
             **{
@@ -0,0 +1,16 @@
+from janitor.runners.runner_protocol import RunnerProtocol
+import importlib
+
+
+def load_runner(path: str) -> RunnerProtocol:
+    """
+    Imports and returns the Runner class referenced as "package.module:ClassName"
+
+    Runners pull heavy dependencies (Flask, GitPython, the Mastodon stack...),
+        so they are only imported once we know which one is going to run.
+    """
+    module_name, _, class_name = path.partition(":")
+    if not module_name or not class_name:
+        raise RuntimeError(f"The runner [{path}] is not set up as [module:Class]")
+
+    return getattr(importlib.import_module(module_name), class_name)
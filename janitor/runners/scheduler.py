@@ -1,15 +1,33 @@
 from pyxavi.terminal_color import TerminalColor
 from pyxavi.config import Config
 from croniter import croniter
-from datetime import datetime
+from datetime import datetime, timedelta
 from janitor.runners.runner_protocol import RunnerProtocol
+from janitor.lib.action_pool import ActionPool
+from definitions import ROOT_DIR
+import threading
 import logging
+import signal
+import heapq
 
-from janitor.runners.run_local import RunLocal
-from janitor.runners.run_remote import RunRemote
-from janitor.runners.update_ddns import UpdateDdns
-from janitor.runners.git_changes import GitChanges
-from janitor.runners.publish_queue import PublishQueue
+from janitor.runners.runner_loader import load_runner
+
+# Imported only when they run, see runner_loader
+ACTION_MAP = {
+    "sysinfo_local": "janitor.runners.run_local:RunLocal",
+    "sysinfo_remote": "janitor.runners.run_remote:RunRemote",
+    "update_ddns": "janitor.runners.update_ddns:UpdateDdns",
+    "git_changes": "janitor.runners.git_changes:GitChanges",
+    "publish_queue": "janitor.runners.publish_queue:PublishQueue",
+}
+
+CATCH_UP_ONCE = "once"
+CATCH_UP_SKIP = "skip"
+CATCH_UP_ALL = "all"
+DEFAULT_CATCH_UP = CATCH_UP_ONCE
+DEFAULT_GRACE_SECONDS = 60
+DEFAULT_MAX_CATCH_UP = 10
+DEFAULT_MAX_SLEEP_SECONDS = 60
 
 
 class Scheduler(RunnerProtocol):
@@ -22,6 +40,9 @@ class Scheduler(RunnerProtocol):
     ) -> None:
         self._config = config
         self._logger = logger
+        # Run the actions in worker processes instead of one after the other
+        self._workers_active = config.get("scheduler.workers.active", False)
+        self._pool = None
 
     def run(self):
         '''
@@ -33,24 +54,173 @@ class Scheduler(RunnerProtocol):
 
             for schedule in schedules:
                 if croniter.match(schedule["when"], now_dt):
-                    self._logger.info(
-                        f"{TerminalColor.YELLOW_BRIGHT}Running schedule" +
-                        f" {TerminalColor.ORANGE_BRIGHT}" + schedule["name"] +
-                        f"{TerminalColor.END}"
-                    )
-                    self._execute_action(schedule["action"])
+                    self._run_schedule(schedule)
 
         except Exception as e:
             self._logger.exception(e)
+        finally:
+            # The workers would die with us, so wait for them
+            if self._pool is not None:
+                self._pool.wait()
+
+    def _run_schedule(self, schedule: dict):
+        self._logger.info(
+            f"{TerminalColor.YELLOW_BRIGHT}Running schedule" +
+            f" {TerminalColor.ORANGE_BRIGHT}" + schedule["name"] + f"{TerminalColor.END}"
+        )
+        if self._workers_active:
+            self._get_pool().dispatch(schedule)
+        else:
+            self._execute_action(schedule["action"])
+
+    def _get_pool(self) -> ActionPool:
+        if self._pool is None:
+            self._pool = ActionPool(
+                config=self._config,
+                logger=self._logger,
+                target=self._execute_action,
+                base_path=ROOT_DIR
+            )
+        return self._pool
 
     def _execute_action(self, action: str):
-        if action == "sysinfo_local":
-            RunLocal(config=self._config, logger=self._logger).run()
-        elif action == "sysinfo_remote":
-            RunRemote(config=self._config, logger=self._logger).run()
-        elif action == "update_ddns":
-            UpdateDdns(config=self._config, logger=self._logger).run()
-        elif action == "git_changes":
-            GitChanges(config=self._config, logger=self._logger).run()
-        elif action == "publish_queue":
-            PublishQueue(config=self._config, logger=self._logger).run()
+        if action not in ACTION_MAP:
+            self._logger.error(
+                f"{TerminalColor.RED_BRIGHT}Unknown action [{action}]{TerminalColor.END}"
+            )
+            return
+        load_runner(ACTION_MAP[action])(config=self._config, logger=self._logger).run()
+
+
+class SchedulerDaemon(Scheduler):
+    '''
+    Runner for scheduled actions that stays resident
+
+    Instead of being spawned by cron every minute, it computes the next time
+    every schedule has to run, and sleeps until the earliest one.
+
+    When a schedule is found late (the machine was suspended, the clock jumped
+    or a previous action took longer), its `catch_up` parameter decides:
+    - "once": run it once for all the missed ticks (default)
+    - "skip": run it only if the last tick is not older than the grace period
+    - "all": run it once per missed tick, up to a maximum
+    '''
+
+    def __init__(
+        self, config: Config = None, logger: logging = None, params: dict = None
+    ) -> None:
+        super().__init__(config=config, logger=logger, params=params)
+        self._grace = timedelta(
+            seconds=self._config.get("scheduler.daemon.grace_seconds", DEFAULT_GRACE_SECONDS)
+        )
+        self._max_catch_up = self._config.get(
+            "scheduler.daemon.max_catch_up", DEFAULT_MAX_CATCH_UP
+        )
+        # Sleeping in slices lets us notice wall clock jumps, like the NTP sync after boot
+        self._max_sleep = self._config.get(
+            "scheduler.daemon.max_sleep_seconds", DEFAULT_MAX_SLEEP_SECONDS
+        )
+        self._stop_event = threading.Event()
+        self._heap = []
+
+    def run(self):
+        '''
+        Run the schedules as they come, until we get stopped
+        '''
+        signal.signal(signal.SIGTERM, self._handle_termination)
+        signal.signal(signal.SIGINT, self._handle_termination)
+
+        self._build_heap(list(self._config.get("schedules", [])), datetime.now())
+        if len(self._heap) == 0:
+            self._logger.warning("No valid schedules to run. Leaving.")
+            return
+
+        self._logger.info(
+            f"{TerminalColor.MAGENTA}Scheduler daemon started with {len(self._heap)}" +
+            f" schedules{TerminalColor.END}"
+        )
+        while not self._stop_event.is_set():
+            if self._pool is not None:
+                self._pool.reap()
+            next_run = self._run_due(datetime.now())
+            delay = (next_run - datetime.now()).total_seconds()
+            if delay > 0:
+                self._stop_event.wait(min(delay, self._get_max_sleep()))
+        if self._pool is not None:
+            # Let the running actions finish, within their timeouts
+            self._pool.wait(drop_pending=True)
+        self._logger.info(f"{TerminalColor.MAGENTA}Scheduler daemon stopped{TerminalColor.END}")
+
+    def _get_max_sleep(self) -> float:
+        # Running actions need to be checked for timeouts and for the queued ones
+        if self._pool is not None and self._pool.is_busy():
+            return min(self._max_sleep, self._pool.get_poll_seconds())
+        return self._max_sleep
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _handle_termination(self, signum, frame):
+        self._logger.info("Termination signal received, stopping the scheduler daemon")
+        self.stop()
+
+    def _build_heap(self, schedules: list, now: datetime):
+        self._heap = []
+        for index, schedule in enumerate(schedules):
+            if not croniter.is_valid(schedule["when"]):
+                self._logger.error(
+                    f"{TerminalColor.RED_BRIGHT}The schedule [{schedule['name']}] has an " +
+                    f"invalid [when] expression: {schedule['when']}{TerminalColor.END}"
+                )
+                continue
+            catch_up = schedule.get("catch_up", DEFAULT_CATCH_UP)
+            if catch_up not in [CATCH_UP_ONCE, CATCH_UP_SKIP, CATCH_UP_ALL]:
+                raise RuntimeError(
+                    f"Unknown catch up [{catch_up}] for the schedule [{schedule['name']}]"
+                )
+            # The index keeps the order of the config file for the ones due at the same time
+            self._heap.append((self._get_next(schedule, now), index, schedule))
+        heapq.heapify(self._heap)
+
+    def _run_due(self, now: datetime) -> datetime:
+        '''
+        Runs every schedule due at the given time, and returns when the next one is due.
+        '''
+        while self._heap and self._heap[0][0] <= now:
+            fire_at, index, schedule = heapq.heappop(self._heap)
+            for _ in range(self._get_runs_amount(schedule, fire_at, now)):
+                try:
+                    self._run_schedule(schedule)
+                except Exception as e:
+                    self._logger.exception(e)
+            # From the time we were asked, as the actions could take a while to run
+            heapq.heappush(self._heap, (self._get_next(schedule, now), index, schedule))
+
+        return self._heap[0][0]
+
+    def _get_runs_amount(self, schedule: dict, fire_at: datetime, now: datetime) -> int:
+        if now - fire_at <= self._grace:
+            return 1
+
+        catch_up = schedule.get("catch_up", DEFAULT_CATCH_UP)
+        if catch_up == CATCH_UP_SKIP:
+            last_tick = max(fire_at, croniter(schedule["when"], now).get_prev(datetime))
+            if now - last_tick <= self._grace:
+                return 1
+            self._logger.info(f"Skipping the missed ticks of schedule [{schedule['name']}]")
+            return 0
+        elif catch_up == CATCH_UP_ALL:
+            missed_ticks = 1
+            ticks = croniter(schedule["when"], fire_at)
+            while missed_ticks < self._max_catch_up and ticks.get_next(datetime) <= now:
+                missed_ticks += 1
+            self._logger.info(
+                f"Catching up {missed_ticks} ticks of schedule [{schedule['name']}]"
+            )
+            return missed_ticks
+        else:
+            self._logger.info(f"Catching up once the schedule [{schedule['name']}]")
+            return 1
+
+    def _get_next(self, schedule: dict, now: datetime) -> datetime:
+        return croniter(schedule["when"], now).get_next(datetime)
@@ -0,0 +1,31 @@
+from pyxavi.terminal_color import TerminalColor
+from pyxavi.config import Config
+from janitor.runners.runner_protocol import RunnerProtocol
+from janitor.lib.config_snapshot import ConfigSnapshot
+from definitions import CONFIG_DIR, CONFIG_SNAPSHOT_FILE
+import logging
+
+
+class WarmConfig(RunnerProtocol):
+    '''
+    Runner that rebuilds the config snapshot from the YAML files
+
+    Meant to be run after deploying or changing the config files,
+        so the next calls find the snapshot already built.
+    '''
+
+    def __init__(
+        self, config: Config = None, logger: logging = None, params: dict = None
+    ) -> None:
+        self._config = config
+        self._logger = logger
+
+    def run(self):
+        try:
+            ConfigSnapshot(config_dir=CONFIG_DIR, snapshot_file=CONFIG_SNAPSHOT_FILE).build()
+            self._logger.info(
+                f"{TerminalColor.GREEN}Config snapshot built in " +
+                f"{CONFIG_SNAPSHOT_FILE}{TerminalColor.END}"
+            )
+        except Exception as e:
+            self._logger.exception(e)
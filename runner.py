@@ -1,37 +1,27 @@
 from argparse import ArgumentParser, Namespace
-import pkg_resources
+from importlib import metadata
 from janitor.runners.runner_protocol import RunnerProtocol
+from janitor.runners.runner_loader import load_runner
 from pyxavi.terminal_color import TerminalColor
 from pyxavi.config import Config
 from pyxavi.logger import Logger
-import os
-from definitions import ROOT_DIR, CONFIG_DIR
+from definitions import ROOT_DIR, CONFIG_DIR, CONFIG_SNAPSHOT_FILE
+from janitor.lib.config_snapshot import ConfigSnapshot
 from pyxavi.debugger import full_stack
 from string import Template
-import glob
 import logging
 
-from janitor.runners.create_app import CreateApp
-from janitor.runners.run_local import RunLocal
-from janitor.runners.run_remote import RunRemote
-from janitor.runners.listen import Listen
-from janitor.runners.scheduler import Scheduler
-from janitor.runners.publish_queue import PublishQueue
-from janitor.runners.publish_test import PublishTest
-from janitor.runners.update_ddns import UpdateDdns
-from janitor.runners.git_changes import GitChanges
-from janitor.runners.whatismyip import WhatIsMyIp
-
 PROGRAM_NAME = "janitor"
 CLI_NAME = "jan"
 PROGRAM_DESC = "CLI command to execute runners and tasks"
 PROGRAM_EPILOG = f"Use [{CLI_NAME} commands] to get a list of available commands."
-PROGRAM_VERSION = pkg_resources.get_distribution(PROGRAM_NAME).version
+PROGRAM_VERSION = metadata.version(PROGRAM_NAME)
 VERBOSE_LOGLEVEL = 10
 
 SUBCOMMAND_TOKEN = "#SUBCOMMAND#"
 HELP_TOKEN = "#HELP#"
 IMPLEMENTED_IN_BASH_TOKEN = "#BASH#"
+# Runners are referenced as "module:Class", so only the one to run gets imported
 COMMAND_MAP = {
     "commands": (HELP_TOKEN, "Shows the list of available commands and subcommands"),
     "mastodon": (SUBCOMMAND_TOKEN, "Performs tasks related to the Mastodon-like API"),
@@ -41,45 +31,70 @@ COMMAND_MAP = {
         "Perform tasks related to the Server side listener," +
         "that receives System Info and arbitrary messages"
     ),
-    "scheduler": (Scheduler, "Perform scheduled tasks, set up in the config file"),
+    "scheduler": (SUBCOMMAND_TOKEN, "Perform scheduled tasks, set up in the config file"),
     "update_ddns": (
-        UpdateDdns,
+        "janitor.runners.update_ddns:UpdateDdns",
         "Discovers the current external IP and updates the Directnic Dynamic DNS registers"
     ),
     "git_changes": (
-        GitChanges, "Discovers changes in the monitored Git repositories and publishes them"
+        "janitor.runners.git_changes:GitChanges",
+        "Discovers changes in the monitored Git repositories and publishes them"
+    ),
+    "warm_config": (
+        "janitor.runners.warm_config:WarmConfig",
+        "Rebuilds the cached snapshot of the config files, to have it ready for next calls"
     ),
     "validate_config": (
         IMPLEMENTED_IN_BASH_TOKEN, "Validates the config.yaml Configuration file"
     ),
     "migrate_config": (SUBCOMMAND_TOKEN, "Migrates the configuration file(s) between versions"),
-    "ip": (WhatIsMyIp, "Returns the current external IP"),
+    "migrate_queue": (
+        IMPLEMENTED_IN_BASH_TOKEN, "Migrates the YAML queue file into the SQLite queue backend"
+    ),
+    "ip": ("janitor.runners.whatismyip:WhatIsMyIp", "Returns the current external IP"),
 }
 
 SUBCOMMAND_MAP = {
     "sys_info": {
         "local": (
-            RunLocal,
+            "janitor.runners.run_local:RunLocal",
             "Gathers the local System Info, compares with thresholds and publishes if crossed."
         ),
         "remote": (
-            RunRemote,
+            "janitor.runners.run_remote:RunRemote",
             "Gathers the local System Info and sends them to a listening server to be processed"
         ),
+        "agent": (
+            "janitor.runners.metrics_agent:MetricsAgent",
+            "Stays running sampling the System Info, checking the thresholds over time windows"
+        ),
     },
     "mastodon": {
-        "create_app": (CreateApp, "Creates the Mastodon-like API application session file"),
+        "create_app": (
+            "janitor.runners.create_app:CreateApp",
+            "Creates the Mastodon-like API application session file"
+        ),
         "test": (
-            PublishTest,
+            "janitor.runners.publish_test:PublishTest",
             "Publishes a test message to the Mastodon-like API to ensure that all is set up ok."
         ),
         "publish_queue": (
-            PublishQueue,
+            "janitor.runners.publish_queue:PublishQueue",
             "Publishes the current queue to the Mastodon-like API, attending the config file."
         ),
     },
+    "scheduler": {
+        "run": (
+            "janitor.runners.scheduler:Scheduler",
+            "Runs the tasks due now. Meant to be called by cron every minute."
+        ),
+        "daemon": (
+            "janitor.runners.scheduler:SchedulerDaemon",
+            "Stays running and runs every task when it is due, without cron."
+        ),
+    },
     "listener": {
-        "start": (Listen, "Starts the listener."),
+        "start": ("janitor.runners.listen:Listen", "Starts the listener."),
         "status": (
             IMPLEMENTED_IN_BASH_TOKEN,
             "Requests the status of the listener. Will print the PID if running"
@@ -161,7 +176,9 @@ def _get_runner_by_command(args: Namespace) -> RunnerProtocol:
                     else:
                         # It is a direct Runner.
                         # DO NOT return the instance, let it be in the main.
-                        return SUBCOMMAND_MAP[command_candidate][subcommand_candidate][0]
+                        return load_runner(
+                            SUBCOMMAND_MAP[command_candidate][subcommand_candidate][0]
+                        )
                 elif subcommand_candidate is None:
                     # A subcommand is expected
                     raise RuntimeError(
@@ -197,7 +214,7 @@ def _get_runner_by_command(args: Namespace) -> RunnerProtocol:
             else:
                 # It is a direct Runner.
                 # DO NOT return the instance, let it be in the main.
-                return COMMAND_MAP[command_candidate][0]
+                return load_runner(COMMAND_MAP[command_candidate][0])
     else:
         # Oops! It's not here, return an error
         raise RuntimeError(f"The requested command '{command_candidate}' does not exist")
@@ -232,17 +249,10 @@ def load_config_files() -> Config:
     """
     Loads all configs existing in CONFIG_DIR.
 
-    This is a merge-all-to-one approach, so may be the case that later objects
-        overwrite older ones
+    The merged result is cached in a snapshot, and the YAML files are only
+        parsed and merged again when any of them changes.
     """
-    config_files = glob.glob(os.path.join(CONFIG_DIR, "*.yaml"))
-
-    # Yes, technically we're loading main.yaml twice
-    config = Config(filename=os.path.join(CONFIG_DIR, "main.yaml"))
-    for file in config_files:
-        config.merge_from_file(filename=os.path.join(CONFIG_DIR, file))
-
-    return config
+    return ConfigSnapshot(config_dir=CONFIG_DIR, snapshot_file=CONFIG_SNAPSHOT_FILE).load()
 
 
 def load_logger(config: Config, loglevel: int = None) -> logging:
@@ -0,0 +1,63 @@
+import os
+from definitions import ROOT_DIR
+from pyxavi.terminal_color import TerminalColor
+from pyxavi.debugger import full_stack
+from janitor.lib.sqlite_queue import SqliteQueue
+from janitor.objects.queue_item import QueueItem
+from string import Template
+
+REQUEST_ORIGIN_NAME = "Origin YAML queue file [$path] (press ENTER to accept default):"
+REQUEST_TARGET_NAME = "Target SQLite queue file [$path] (press ENTER to accept default):"
+DEFAULT_ORIGIN_FILE = "storage/queue.yaml"
+DEFAULT_TARGET_FILE = "storage/queue.db"
+MIGRATED_SUFFIX = ".migrated"
+DEBUG = True
+
+
+def get_path_from_user(request: str, file_path: str) -> str:
+    path = input(Template(request).substitute(path=file_path))
+    if path == "":
+        log("Using suggested default path and name")
+        return file_path
+
+    log(f"Using user input path: [{path}]")
+    return path
+
+
+def run():
+    try:
+        origin_path = get_path_from_user(
+            REQUEST_ORIGIN_NAME, os.path.join(ROOT_DIR, DEFAULT_ORIGIN_FILE)
+        )
+        target_path = get_path_from_user(
+            REQUEST_TARGET_NAME, os.path.join(ROOT_DIR, DEFAULT_TARGET_FILE)
+        )
+
+        # The SQLite queue creates the database if it does not exist yet.
+        #   If it already has items, the imported ones are appended after them.
+        queue = SqliteQueue(storage_file=target_path, queue_item_object=QueueItem)
+        log(f"Target queue is loaded with {queue.length()} items")
+
+        imported = queue.import_from_yaml(origin_path)
+        log(f"Imported {imported} items. Target queue has now {queue.length()} items")
+
+        # Keep the original file around, but out of the way so it is not imported twice.
+        os.rename(origin_path, f"{origin_path}{MIGRATED_SUFFIX}")
+        log(
+            f"{TerminalColor.GREEN_BRIGHT}Renamed the origin file to" +
+            f" {origin_path}{MIGRATED_SUFFIX}{TerminalColor.END}"
+        )
+        log(
+            f"{TerminalColor.GREEN_BRIGHT}Done. Remember to set queue_storage.backend" +
+            f" to \"sqlite\" in the main.yaml config file{TerminalColor.END}"
+        )
+
+    except Exception as e:
+        print(f"{TerminalColor.RED_BRIGHT}{e}{TerminalColor.END}")
+        print(full_stack())
+
+
+def log(message: str):
+    if DEBUG:
+        message = f"{TerminalColor.BLUE}{message}{TerminalColor.END}"
+        print(message)
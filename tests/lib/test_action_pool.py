@@ -0,0 +1,237 @@
+from pyxavi.config import Config
+from janitor.lib.action_pool import ActionPool, DEFAULT_POLL_SECONDS
+from unittest.mock import patch, Mock
+import multiprocessing
+import pytest
+import psutil
+import time
+import os
+
+SCHEDULE = {"name": "Git", "action": "git_changes"}
+# Set at the end of every test, so no sleeping child outlives it.
+#   Without a lock, as the children get killed while reading it.
+RELEASE = multiprocessing.get_context("fork").RawValue("b", 0)
+
+
+def patched_config_init(self):
+    pass
+
+
+def get_config_get(pid_dir: str):
+
+    def config_get(self, param: str, default=None):
+        config = {"scheduler.workers.pid_dir": pid_dir, "scheduler.workers.poll_seconds": 0.05}
+        return config[param] if param in config else default
+
+    return config_get
+
+
+@pytest.fixture(autouse=True)
+def release_children():
+    RELEASE.value = 0
+    yield
+    RELEASE.value = 1
+
+
+def sleeping_target(action: str):
+    deadline = time.monotonic() + 5
+    while RELEASE.value == 0 and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+
+def quick_target(action: str):
+    pass
+
+
+def failing_target(action: str):
+    raise RuntimeError("Oops")
+
+
+def get_instance(tmp_path, target=sleeping_target) -> ActionPool:
+    with patch.object(Config, "__init__", new=patched_config_init):
+        with patch.object(Config, "get", new=get_config_get(str(tmp_path / "pids"))):
+            return ActionPool(config=Config(), logger=Mock(), target=target)
+
+
+@pytest.fixture
+def pool_cleanup():
+    pools = []
+    yield pools
+    for pool in pools:
+        for pid in list(pool._processes.keys()):
+            pool._kill(pid)
+
+
+def test_initialize(tmp_path):
+    with patch.object(Config, "__init__", new=patched_config_init):
+        with patch.object(Config, "get", new=lambda self, param, default=None: default):
+            pool = ActionPool(
+                config=Config(), logger=Mock(), target=quick_target, base_path=str(tmp_path)
+            )
+
+    assert pool.get_poll_seconds() == DEFAULT_POLL_SECONDS
+    assert os.path.isdir(tmp_path / "storage" / "scheduler")
+    assert pool.is_busy() is False
+
+
+def test_dispatch_runs_and_cleans_up(tmp_path):
+    pool = get_instance(tmp_path, target=quick_target)
+
+    assert pool.dispatch(SCHEDULE) is True
+    assert pool.is_busy() is True
+    pool.wait()
+
+    assert pool.is_busy() is False
+    assert os.listdir(tmp_path / "pids") == []
+    pool._logger.error.assert_not_called()
+
+
+def test_failing_action_is_logged(tmp_path):
+    pool = get_instance(tmp_path, target=failing_target)
+
+    pool.dispatch(SCHEDULE)
+    pool.wait()
+
+    pool._logger.error.assert_called_once()
+
+
+def test_overlap_skip(tmp_path, pool_cleanup):
+    pool = get_instance(tmp_path)
+    pool_cleanup.append(pool)
+
+    assert pool.dispatch(SCHEDULE) is True
+    assert pool.dispatch(SCHEDULE) is False
+
+    assert len(pool.get_running_pids("git_changes")) == 1
+    # Other actions are not limited by this one
+    assert pool.dispatch({"name": "DDNS", "action": "update_ddns"}) is True
+
+
+def test_max_concurrency(tmp_path, pool_cleanup):
+    pool = get_instance(tmp_path)
+    pool_cleanup.append(pool)
+    schedule = {**SCHEDULE, "max_concurrency": 2}
+
+    assert pool.dispatch(schedule) is True
+    assert pool.dispatch(schedule) is True
+    assert pool.dispatch(schedule) is False
+
+    assert len(pool.get_running_pids("git_changes")) == 2
+
+
+def test_overlap_queue(tmp_path):
+    pool = get_instance(tmp_path)
+    schedule = {**SCHEDULE, "overlap": "queue"}
+
+    pool.dispatch(schedule)
+    first_pid = pool.get_running_pids("git_changes")[0]
+    assert pool.dispatch(schedule) is True
+    assert len(pool._pending) == 1
+
+    # Once the first one is gone, the queued one takes its place
+    pool._kill(first_pid)
+    pool.reap()
+
+    running = pool.get_running_pids("git_changes")
+    assert len(pool._pending) == 0
+    assert len(running) == 1
+    assert running[0] != first_pid
+    pool._kill(running[0])
+
+
+def test_overlap_kill(tmp_path, pool_cleanup):
+    pool = get_instance(tmp_path)
+    pool_cleanup.append(pool)
+    schedule = {**SCHEDULE, "overlap": "kill"}
+
+    pool.dispatch(schedule)
+    first_pid = pool.get_running_pids("git_changes")[0]
+    assert pool.dispatch(schedule) is True
+
+    running = pool.get_running_pids("git_changes")
+    assert len(running) == 1
+    assert running[0] != first_pid
+
+
+def test_unknown_overlap(tmp_path, pool_cleanup):
+    pool = get_instance(tmp_path)
+    pool_cleanup.append(pool)
+    schedule = {**SCHEDULE, "overlap": "maybe"}
+
+    pool.dispatch(schedule)
+    with pytest.raises(RuntimeError):
+        pool.dispatch(schedule)
+
+
+def test_timeout_stops_the_action(tmp_path):
+    pool = get_instance(tmp_path)
+
+    pool.dispatch({**SCHEDULE, "timeout": 0.2})
+    started = time.monotonic()
+    pool.wait()
+
+    assert time.monotonic() - started < 10
+    assert pool.is_busy() is False
+    pool._logger.error.assert_called_once()
+
+
+def test_sees_the_actions_started_elsewhere(tmp_path, pool_cleanup):
+    pool = get_instance(tmp_path)
+    other_pool = get_instance(tmp_path)
+    pool_cleanup.extend([pool, other_pool])
+
+    assert other_pool.dispatch(SCHEDULE) is True
+    assert pool.dispatch(SCHEDULE) is False
+
+
+def test_stale_pid_files_are_removed(tmp_path):
+    pool = get_instance(tmp_path)
+    # A PID that can not exist, as they are limited to 2^22
+    stale_pid_file = tmp_path / "pids" / "git_changes.99999999.pid"
+    stale_pid_file.write_text("99999999")
+
+    assert pool.get_running_pids("git_changes") == []
+    assert not stale_pid_file.exists()
+
+
+def test_pid_files_of_reused_pids_are_stale(tmp_path):
+    pool = get_instance(tmp_path)
+    # Our own PID is alive, but it is not the process that wrote the file
+    reused_pid_file = tmp_path / "pids" / f"git_changes.{os.getpid()}.pid"
+    reused_pid_file.write_text(f"{os.getpid()} {psutil.Process().create_time() - 3600}")
+    # Written without a start time, can not be trusted
+    unknown_pid_file = tmp_path / "pids" / f"update_ddns.{os.getpid()}.pid"
+    unknown_pid_file.write_text(str(os.getpid()))
+
+    assert pool.get_running_pids("git_changes") == []
+    assert pool.get_running_pids("update_ddns") == []
+    assert not reused_pid_file.exists()
+    assert not unknown_pid_file.exists()
+
+
+def test_overlap_kill_does_not_signal_reused_pids(tmp_path, pool_cleanup):
+    pool = get_instance(tmp_path)
+    pool_cleanup.append(pool)
+    reused_pid_file = tmp_path / "pids" / f"git_changes.{os.getpid()}.pid"
+    reused_pid_file.write_text(f"{os.getpid()} {psutil.Process().create_time() - 3600}")
+
+    with patch.object(psutil.Process, "terminate") as mocked_terminate:
+        assert pool.dispatch({**SCHEDULE, "overlap": "kill"}) is True
+
+    mocked_terminate.assert_not_called()
+    assert len(pool.get_running_pids("git_changes")) == 1
+
+
+def test_stops_the_actions_started_elsewhere(tmp_path, pool_cleanup):
+    pool = get_instance(tmp_path)
+    other_pool = get_instance(tmp_path)
+    pool_cleanup.extend([pool, other_pool])
+    other_pool.dispatch(SCHEDULE)
+    other_pid = other_pool.get_running_pids("git_changes")[0]
+
+    assert pool.dispatch({**SCHEDULE, "overlap": "kill"}) is True
+
+    # Both pools share this process here, so the other one can't reap its child anymore
+    other_pool._processes.clear()
+    assert not psutil.pid_exists(other_pid)
+    assert pool.get_running_pids("git_changes") == list(pool._processes.keys())
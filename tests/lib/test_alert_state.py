@@ -0,0 +1,358 @@
+from pyxavi.config import Config
+from pyxavi.mastodon_publisher import MastodonPublisherException
+from janitor.objects.message import Message, MessageType
+from janitor.lib.alert_state import AlertStateStore, AlertState
+import pytest
+import sqlite3
+
+HOSTNAME = "endor"
+TEMPLATES = {
+    "report_lines": {
+        "line_ok": "- **$title**: $value", "line_fail": "- **$title**: $value ❗️"
+    },
+    "message_type": {
+        str(message_type): {
+            "summary": f"{message_type} $summary", "text": "$text"
+        }
+        for message_type in MessageType.priority()
+    },
+}
+
+
+def get_store() -> AlertStateStore:
+    return AlertStateStore(storage_file=":memory:")
+
+
+def get_alert_state(renotify_seconds: int = 0) -> AlertState:
+    config = Config(
+        params={
+            "system_info": {
+                "thresholds": {
+                    "cpu_percent": {
+                        "value": 80.0, "message_type": "warning"
+                    },
+                    "disk_usage_percent": {
+                        "value": 90.0, "message_type": "alarm"
+                    },
+                },
+                "alert_state": {
+                    "renotify_seconds": renotify_seconds
+                },
+                "formatting": {
+                    "human_readable_exceptions": ["cpu_percent", "disk_usage_percent"],
+                    "templates": TEMPLATES,
+                },
+            }
+        }
+    )
+    return AlertState(config=config, store=get_store())
+
+
+def notify(
+    store: AlertStateStore,
+    hostname: str,
+    crossed: dict,
+    now: float,
+    renotify_seconds: float = 0
+) -> dict:
+    # Updates and confirms the notification, as after a successful publish
+    transitions = store.update(hostname, crossed, now=now, renotify_seconds=renotify_seconds)
+    store.mark_notified(hostname, transitions, now=now)
+    return transitions
+
+
+def publish_all(message: Message, on_done) -> Message:
+    on_done(True)
+    return message
+
+
+def fail_all(message: Message, on_done) -> bool:
+    # Like a failed Publisher.publish_message()
+    on_done(False)
+    return False
+
+
+def test_firing_is_notified_once():
+    store = get_store()
+
+    first = notify(store, HOSTNAME, {"cpu_percent": "warning"}, now=100)
+    second = notify(store, HOSTNAME, {"cpu_percent": "warning"}, now=160)
+
+    assert first["firing"] == ["cpu_percent"]
+    assert second == {"firing": [], "escalated": [], "renotify": [], "resolved": []}
+    assert store.get_firing() == [
+        {
+            "hostname": HOSTNAME,
+            "metric": "cpu_percent",
+            "severity": "warning",
+            "fired_at": 100,
+            "notified_at": 100
+        }
+    ]
+
+
+def test_escalation_is_notified_but_not_the_deescalation():
+    store = get_store()
+    notify(store, HOSTNAME, {"cpu_percent": "warning"}, now=100)
+
+    escalated = notify(store, HOSTNAME, {"cpu_percent": "alarm"}, now=160)
+    deescalated = notify(store, HOSTNAME, {"cpu_percent": "warning"}, now=220)
+
+    assert escalated["escalated"] == ["cpu_percent"]
+    assert deescalated["escalated"] == []
+    assert store.get_firing(HOSTNAME)[0]["severity"] == "warning"
+    assert store.get_firing(HOSTNAME)[0]["notified_at"] == 160
+
+
+@pytest.mark.parametrize(
+    argnames=('renotify_seconds', 'now', 'expected_renotify'),
+    argvalues=[
+        (0, 100000, []),
+        (3600, 3000, []),
+        (3600, 3700, ["cpu_percent"]),
+    ],
+)
+def test_renotify(renotify_seconds, now, expected_renotify):
+    store = get_store()
+    notify(store, HOSTNAME, {"cpu_percent": "warning"}, now=100)
+
+    transitions = store.update(
+        HOSTNAME, {"cpu_percent": "warning"}, now=now, renotify_seconds=renotify_seconds
+    )
+
+    assert transitions["renotify"] == expected_renotify
+
+
+def test_resolved_and_hosts_are_independent():
+    store = get_store()
+    notify(store, HOSTNAME, {"cpu_percent": "warning", "disk_usage_percent": "alarm"}, now=100)
+    notify(store, "hoth", {"cpu_percent": "warning"}, now=100)
+
+    transitions = store.update(HOSTNAME, {"disk_usage_percent": "alarm"}, now=160)
+
+    assert transitions["resolved"] == ["cpu_percent"]
+    assert [(alert["hostname"], alert["metric"]) for alert in store.get_firing()] == [
+        ("endor", "disk_usage_percent"), ("hoth", "cpu_percent")
+    ]
+
+
+def test_not_notified_changes_come_again():
+    store = get_store()
+
+    # Fires, but the message could not be published
+    first = store.update(HOSTNAME, {"cpu_percent": "warning"}, now=100)
+    second = store.update(HOSTNAME, {"cpu_percent": "warning"}, now=160)
+    store.mark_notified(HOSTNAME, second, now=160)
+    # Resolves, but the message could not be published
+    third = store.update(HOSTNAME, {}, now=220)
+    fourth = store.update(HOSTNAME, {}, now=280)
+    store.mark_notified(HOSTNAME, fourth, now=280)
+    fifth = store.update(HOSTNAME, {}, now=340)
+
+    assert first["firing"] == ["cpu_percent"]
+    assert second["firing"] == ["cpu_percent"]
+    assert third["resolved"] == ["cpu_percent"]
+    assert fourth["resolved"] == ["cpu_percent"]
+    assert fifth["resolved"] == []
+    assert store.get_firing() == []
+
+
+def test_never_notified_alerts_resolve_silently():
+    store = get_store()
+    store.update(HOSTNAME, {"cpu_percent": "warning"}, now=100)
+
+    transitions = store.update(HOSTNAME, {}, now=160)
+
+    assert transitions["resolved"] == []
+    assert store.get_firing() == []
+
+
+def test_firing_again_before_the_resolution_is_notified():
+    store = get_store()
+    notify(store, HOSTNAME, {"cpu_percent": "warning"}, now=100)
+    resolved = store.update(HOSTNAME, {}, now=160)
+
+    transitions = store.update(HOSTNAME, {"cpu_percent": "warning"}, now=220)
+    # The late confirmation of the resolution does not drop the new state
+    store.mark_notified(HOSTNAME, resolved, now=230)
+
+    assert transitions == {"firing": [], "escalated": [], "renotify": [], "resolved": []}
+    assert [alert["metric"] for alert in store.get_firing()] == ["cpu_percent"]
+
+
+def test_state_is_shared_through_the_file(tmp_path):
+    storage_file = str(tmp_path / "storage" / "alert_state.db")
+    notify(
+        AlertStateStore(storage_file=storage_file),
+        HOSTNAME, {"cpu_percent": "warning"},
+        now=100
+    )
+
+    transitions = AlertStateStore(storage_file=storage_file
+                                  ).update(HOSTNAME, {"cpu_percent": "warning"})
+
+    assert transitions["firing"] == []
+
+
+def test_databases_before_the_notified_columns_are_migrated(tmp_path):
+    storage_file = str(tmp_path / "alert_state.db")
+    connection = sqlite3.connect(storage_file)
+    connection.execute(
+        "CREATE TABLE alert_state (hostname TEXT NOT NULL, metric TEXT NOT NULL, " +
+        "severity TEXT NOT NULL, fired_at REAL NOT NULL, notified_at REAL NOT NULL, " +
+        "PRIMARY KEY (hostname, metric)) WITHOUT ROWID"
+    )
+    connection.execute(
+        "INSERT INTO alert_state VALUES (?, ?, ?, ?, ?)",
+        (HOSTNAME, "cpu_percent", "warning", 100, 100)
+    )
+    connection.commit()
+    connection.close()
+
+    store = AlertStateStore(storage_file=storage_file)
+    transitions = store.update(HOSTNAME, {"cpu_percent": "warning"}, now=160)
+
+    # Those rows were notified already
+    assert transitions["firing"] == []
+    assert store.update(HOSTNAME, {}, now=220)["resolved"] == ["cpu_percent"]
+
+
+def test_publish_changes():
+    alert_state = get_alert_state()
+    crossing = {"hostname": HOSTNAME, "cpu_percent": 85.0, "disk_usage_percent": 50.0}
+    normal = {"hostname": HOSTNAME, "cpu_percent": 20.0, "disk_usage_percent": 50.0}
+
+    firing_messages = alert_state.publish_changes(crossing, publish_all, now=100)
+    repeated_messages = alert_state.publish_changes(crossing, publish_all, now=160)
+    resolved_messages = alert_state.publish_changes(normal, publish_all, now=220)
+    normal_messages = alert_state.publish_changes(normal, publish_all, now=280)
+
+    assert len(firing_messages) == 1
+    assert firing_messages[0].message_type == MessageType.WARNING
+    assert firing_messages[0].summary == "warning endor"
+    assert repeated_messages == []
+    assert len(resolved_messages) == 1
+    assert resolved_messages[0].message_type == MessageType.INFO
+    assert resolved_messages[0].summary == "✅ endor"
+    assert resolved_messages[0].text == "- **cpu_percent**: 20.0"
+    assert normal_messages == []
+
+
+def test_publish_changes_renotifies():
+    alert_state = get_alert_state(renotify_seconds=3600)
+    crossing = {"hostname": HOSTNAME, "cpu_percent": 85.0}
+
+    assert len(alert_state.publish_changes(crossing, publish_all, now=100)) == 1
+    assert len(alert_state.publish_changes(crossing, publish_all, now=200)) == 0
+    assert len(alert_state.publish_changes(crossing, publish_all, now=3800)) == 1
+
+
+def test_publish_changes_fires_again_when_the_publisher_raises():
+    alert_state = get_alert_state()
+    crossing = {"hostname": HOSTNAME, "cpu_percent": 85.0}
+
+    def failing_publish(message: Message, on_done):
+        raise MastodonPublisherException("Mastodon is down")
+
+    with pytest.raises(MastodonPublisherException):
+        alert_state.publish_changes(crossing, failing_publish, now=100)
+    messages = alert_state.publish_changes(crossing, publish_all, now=160)
+    repeated_messages = alert_state.publish_changes(crossing, publish_all, now=220)
+
+    assert len(messages) == 1
+    assert messages[0].message_type == MessageType.WARNING
+    assert repeated_messages == []
+
+
+def test_publish_changes_fires_again_when_the_publish_fails():
+    alert_state = get_alert_state()
+    crossing = {"hostname": HOSTNAME, "cpu_percent": 85.0}
+    normal = {"hostname": HOSTNAME, "cpu_percent": 20.0}
+
+    failed = alert_state.publish_changes(crossing, fail_all, now=100)
+    retried = alert_state.publish_changes(crossing, publish_all, now=160)
+    failed_resolution = alert_state.publish_changes(normal, fail_all, now=220)
+    retried_resolution = alert_state.publish_changes(normal, publish_all, now=280)
+
+    assert failed == [False]
+    assert len(retried) == 1
+    assert failed_resolution == [False]
+    assert len(retried_resolution) == 1
+    assert retried_resolution[0].summary == "✅ endor"
+
+
+def test_publish_changes_does_not_repeat_the_pending_ones():
+    alert_state = get_alert_state()
+    crossing = {"hostname": HOSTNAME, "cpu_percent": 85.0}
+    normal = {"hostname": HOSTNAME, "cpu_percent": 20.0}
+    queued = []
+
+    def enqueue(message: Message, on_done) -> Message:
+        # Like the ingest queue, that publishes later on
+        queued.append(on_done)
+        return message
+
+    first = alert_state.publish_changes(crossing, enqueue, now=100)
+    second = alert_state.publish_changes(crossing, enqueue, now=160)
+    assert len(first) == 1
+    assert second == []
+
+    queued.pop(0)(True)
+    assert alert_state.publish_changes(crossing, enqueue, now=220) == []
+    # Same for a resolution
+    assert len(alert_state.publish_changes(normal, enqueue, now=280)) == 1
+    assert alert_state.publish_changes(normal, enqueue, now=340) == []
+    queued.pop(0)(True)
+    assert alert_state.publish_changes(normal, enqueue, now=400) == []
+    assert alert_state._pending == {}
+
+
+def test_publish_changes_fires_again_when_the_pending_one_fails():
+    alert_state = get_alert_state()
+    crossing = {"hostname": HOSTNAME, "cpu_percent": 85.0}
+    queued = []
+
+    def enqueue(message: Message, on_done) -> Message:
+        queued.append(on_done)
+        return message
+
+    alert_state.publish_changes(crossing, enqueue, now=100)
+    queued.pop(0)(False)
+
+    assert len(alert_state.publish_changes(crossing, enqueue, now=160)) == 1
+
+
+def test_pending_report_does_not_cover_an_escalation():
+    alert_state = get_alert_state()
+    alert_state._set_pending(HOSTNAME, {"firing": ["cpu_percent"]}, {"cpu_percent": "warning"})
+
+    assert alert_state._is_pending(HOSTNAME, "cpu_percent", "warning") is True
+    assert alert_state._is_pending(HOSTNAME, "cpu_percent", "alarm") is False
+    # Nor a resolution
+    assert alert_state._is_pending(HOSTNAME, "cpu_percent", None) is False
+
+
+def test_mark_notified_keeps_an_escalation_that_came_meanwhile():
+    store = get_store()
+    firing = store.update(HOSTNAME, {"cpu_percent": "warning"}, now=100)
+    store.update(HOSTNAME, {"cpu_percent": "alarm"}, now=160)
+
+    # The message published is the one of the warning
+    store.mark_notified(HOSTNAME, firing, now=170, severities={"cpu_percent": "warning"})
+
+    assert store.update(
+        HOSTNAME, {"cpu_percent": "alarm"}, now=220
+    )["escalated"] == ["cpu_percent"]
+
+
+def test_publish_changes_clears_the_pending_ones_when_the_publisher_raises():
+    alert_state = get_alert_state()
+    crossing = {"hostname": HOSTNAME, "cpu_percent": 85.0}
+
+    def failing_publish(message: Message, on_done):
+        raise RuntimeError("Oops")
+
+    with pytest.raises(RuntimeError):
+        alert_state.publish_changes(crossing, failing_publish, now=100)
+
+    assert alert_state._pending == {}
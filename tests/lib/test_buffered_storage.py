@@ -0,0 +1,96 @@
+from pyxavi.storage import Storage
+from janitor.lib.buffered_storage import BufferedStorage
+from unittest.mock import patch
+import pytest
+import stat
+import yaml
+import os
+
+
+@pytest.fixture
+def filename(tmp_path) -> str:
+    filename = os.path.join(tmp_path, "state.yaml")
+    with open(filename, "w") as stream:
+        yaml.safe_dump({"repo": {"last_commit": "abc"}}, stream)
+    return filename
+
+
+def read(filename: str) -> dict:
+    with open(filename, "r") as stream:
+        return yaml.safe_load(stream)
+
+
+def test_initialize(filename):
+    storage = BufferedStorage(filename)
+
+    assert isinstance(storage, Storage)
+    assert storage.get("repo.last_commit") == "abc"
+    assert storage.is_dirty() is False
+
+
+def test_write_file_only_buffers(filename):
+    storage = BufferedStorage(filename)
+
+    storage.set("repo.last_commit", "def")
+    storage.write_file()
+
+    assert storage.is_dirty() is True
+    assert read(filename) == {"repo": {"last_commit": "abc"}}
+
+
+def test_flush_writes_once(filename):
+    storage = BufferedStorage(filename)
+    storage.set("repo.last_commit", "def")
+    storage.write_file()
+    storage.set("other", {"last_version": "v1.0"})
+    storage.write_file()
+
+    assert storage.flush() is True
+
+    assert read(filename) == {"repo": {"last_commit": "def"}, "other": {"last_version": "v1.0"}}
+    assert storage.is_dirty() is False
+    assert storage.flush() is False
+    # No temporary files are left around
+    assert os.listdir(os.path.dirname(filename)) == ["state.yaml"]
+
+
+def test_flush_keeps_the_original_when_failing(filename):
+    storage = BufferedStorage(filename)
+    storage.set("repo.last_commit", "def")
+    storage.write_file()
+
+    with patch.object(yaml, "safe_dump", side_effect=RuntimeError("Oops")):
+        with pytest.raises(RuntimeError):
+            storage.flush()
+
+    assert read(filename) == {"repo": {"last_commit": "abc"}}
+    assert storage.is_dirty() is True
+    assert os.listdir(os.path.dirname(filename)) == ["state.yaml"]
+
+
+def test_flush_keeps_the_mode_of_the_original(filename):
+    os.chmod(filename, 0o644)
+    storage = BufferedStorage(filename)
+    storage.set("repo.last_commit", "def")
+    storage.write_file()
+
+    storage.flush()
+
+    assert stat.S_IMODE(os.stat(filename).st_mode) == 0o644
+
+
+def test_flush_applies_the_umask_to_a_new_file(tmp_path):
+    filename = os.path.join(tmp_path, "new_state.yaml")
+    storage = BufferedStorage(filename)
+    storage.set("repo", {"last_commit": "def"})
+    storage.write_file()
+    if os.path.exists(filename):
+        os.unlink(filename)
+
+    previous_umask = os.umask(0o027)
+    try:
+        storage.flush()
+    finally:
+        os.umask(previous_umask)
+
+    assert stat.S_IMODE(os.stat(filename).st_mode) == 0o640
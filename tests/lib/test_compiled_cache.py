@@ -0,0 +1,64 @@
+from pyxavi.config import Config
+from janitor.lib.compiled_cache import CompiledCache
+from unittest.mock import Mock
+import gc
+
+
+def get_config(params: dict = None) -> Config:
+    return Config(params=params if params is not None else {"template": "$text"})
+
+
+def test_builds_once_per_config_and_name():
+    config = get_config()
+    builder = Mock()
+    builder.return_value = "compiled"
+
+    assert CompiledCache.get(config, "name", builder) == "compiled"
+    assert CompiledCache.get(config, "name", builder) == "compiled"
+
+    builder.assert_called_once_with(config)
+
+
+def test_names_and_configs_are_independent():
+    config_1 = get_config()
+    config_2 = get_config()
+
+    assert CompiledCache.get(config_1, "one", lambda _: 1) == 1
+    assert CompiledCache.get(config_1, ("two", "x"), lambda _: 2) == 2
+    assert CompiledCache.get(config_2, "one", lambda _: 3) == 3
+
+
+def test_rebuilds_when_the_config_content_is_reloaded():
+    config = get_config()
+    CompiledCache.get(config, "name", lambda c: c.get("template"))
+
+    config.merge_from_dict({"template": "$summary"})
+
+    assert CompiledCache.get(config, "name", lambda c: c.get("template")) == "$summary"
+
+
+def test_invalidate():
+    config_1 = get_config()
+    config_2 = get_config()
+    CompiledCache.get(config_1, "name", lambda _: "old")
+    CompiledCache.get(config_2, "name", lambda _: "old")
+
+    CompiledCache.invalidate(config_1)
+
+    assert CompiledCache.get(config_1, "name", lambda _: "new") == "new"
+    assert CompiledCache.get(config_2, "name", lambda _: "new") == "old"
+
+    CompiledCache.invalidate()
+
+    assert CompiledCache.get(config_2, "name", lambda _: "new") == "new"
+
+
+def test_entries_go_away_with_the_config():
+    config = get_config()
+    CompiledCache.get(config, "name", lambda _: "compiled")
+    entries = len(CompiledCache._entries)
+
+    del config
+    gc.collect()
+
+    assert len(CompiledCache._entries) == entries - 1
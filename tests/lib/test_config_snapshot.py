@@ -0,0 +1,184 @@
+from pyxavi.config import Config
+from pyxavi.storage import Storage
+from janitor.lib.config_snapshot import ConfigSnapshot
+from unittest.mock import patch, Mock, call
+import pytest
+import glob
+import json
+import stat
+import os
+
+FILES = {
+    "main.yaml": "param1: value1\nparam2: value2\n",
+    "second.yaml": "param2: value2b\n",
+    "third.yaml": "param3: value3\n",
+}
+
+
+@pytest.fixture
+def config_dir(tmp_path):
+    directory = tmp_path / "config"
+    directory.mkdir()
+    for name, content in FILES.items():
+        (directory / name).write_text(content)
+    return directory
+
+
+def get_instance(config_dir) -> ConfigSnapshot:
+    return ConfigSnapshot(
+        config_dir=str(config_dir),
+        snapshot_file=str(config_dir.parent / "storage" / "config.snapshot.json")
+    )
+
+
+def test_merge_files():
+    files = {
+        "main.yaml": {
+            "param1": "value1", "param2": "value2"
+        },
+        "second.yaml": {
+            "param2": "value2b"
+        },
+        "third.yaml": {
+            "param3": "value3"
+        },
+    }
+
+    mocked_glob = Mock()
+    mocked_glob.return_value = list(files.keys())
+    mocked_path_exists = Mock()
+    mocked_path_exists.return_value = True
+    mocked_load_file_contents = Mock()
+    mocked_load_file_contents.side_effect = [
+        list(files.values())[0],
+        list(files.values())[0],
+        list(files.values())[1],
+        list(files.values())[2],
+    ]
+    with patch.object(glob, "glob", new=mocked_glob):
+        with patch.object(os.path, "exists", new=mocked_path_exists):
+            with patch.object(Storage, "_load_file_contents", new=mocked_load_file_contents):
+                config = ConfigSnapshot(config_dir="config", snapshot_file="x").merge_files()
+
+    mocked_load_file_contents.assert_has_calls(
+        [
+            call(os.path.join("config", "main.yaml")),
+            call(os.path.join("config", "main.yaml")),
+            call(os.path.join("config", "second.yaml")),
+            call(os.path.join("config", "third.yaml")),
+        ]
+    )
+
+    assert config.get("param1") == "value1"
+    assert config.get("param2") == "value2b"
+    assert config.get("param3") == "value3"
+
+
+def test_load_builds_the_snapshot_the_first_time(config_dir):
+    snapshot = get_instance(config_dir)
+
+    config = snapshot.load()
+
+    assert config.get("param1") == "value1"
+    assert config.get("param3") == "value3"
+    with open(snapshot._snapshot_file) as file:
+        content = json.load(file)
+    assert content["version"] == ConfigSnapshot.VERSION
+    assert sorted(content["sources"].keys()) == sorted(FILES.keys())
+    assert content["config"] == config.get_all()
+
+
+def test_load_uses_the_snapshot_when_fresh(config_dir):
+    get_instance(config_dir).load()
+    snapshot = get_instance(config_dir)
+
+    with patch.object(ConfigSnapshot, "merge_files") as mocked_merge_files:
+        with patch.object(ConfigSnapshot, "_hash_file") as mocked_hash_file:
+            config = snapshot.load()
+
+    mocked_merge_files.assert_not_called()
+    mocked_hash_file.assert_not_called()
+    assert isinstance(config, Config)
+    assert config.get("param2") == "value2b"
+
+
+def test_load_rebuilds_when_a_file_changes(config_dir):
+    get_instance(config_dir).load()
+    (config_dir / "third.yaml").write_text("param3: changed value\n")
+
+    config = get_instance(config_dir).load()
+
+    assert config.get("param3") == "changed value"
+
+
+def test_load_rebuilds_when_a_file_appears(config_dir):
+    get_instance(config_dir).load()
+    (config_dir / "fourth.yaml").write_text("param4: value4\n")
+
+    config = get_instance(config_dir).load()
+
+    assert config.get("param4") == "value4"
+
+
+def test_load_keeps_the_snapshot_when_only_touched(config_dir):
+    get_instance(config_dir).load()
+    path = config_dir / "second.yaml"
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    with patch.object(ConfigSnapshot, "merge_files") as mocked_merge_files:
+        config = get_instance(config_dir).load()
+
+    mocked_merge_files.assert_not_called()
+    assert config.get("param2") == "value2b"
+    # The new stats are saved, so next time it does not hash again
+    with patch.object(ConfigSnapshot, "_hash_file") as mocked_hash_file:
+        get_instance(config_dir).load()
+    mocked_hash_file.assert_not_called()
+
+
+def test_load_rebuilds_a_broken_snapshot(config_dir):
+    snapshot = get_instance(config_dir)
+    os.makedirs(os.path.dirname(snapshot._snapshot_file))
+    with open(snapshot._snapshot_file, "w") as file:
+        file.write("{ not json")
+
+    config = snapshot.load()
+
+    assert config.get("param1") == "value1"
+    with open(snapshot._snapshot_file) as file:
+        assert json.load(file)["config"] == config.get_all()
+
+
+def test_load_applies_the_umask_to_a_new_snapshot(config_dir):
+    snapshot = get_instance(config_dir)
+
+    previous_umask = os.umask(0o027)
+    try:
+        snapshot.load()
+    finally:
+        os.umask(previous_umask)
+
+    assert stat.S_IMODE(os.stat(snapshot._snapshot_file).st_mode) == 0o640
+
+
+def test_load_keeps_the_mode_of_the_snapshot_when_rebuilding(config_dir):
+    get_instance(config_dir).load()
+    snapshot = get_instance(config_dir)
+    os.chmod(snapshot._snapshot_file, 0o644)
+    (config_dir / "third.yaml").write_text("param3: changed value\n")
+
+    snapshot.load()
+
+    assert stat.S_IMODE(os.stat(snapshot._snapshot_file).st_mode) == 0o644
+
+
+def test_config_that_json_can_not_hold_is_not_cached(config_dir):
+    (config_dir / "fourth.yaml").write_text("ports:\n  80: http\n")
+    snapshot = get_instance(config_dir)
+
+    config = snapshot.load()
+
+    assert config.get("ports") == {80: "http"}
+    assert not os.path.exists(snapshot._snapshot_file)
+    assert os.listdir(os.path.dirname(snapshot._snapshot_file)) == []
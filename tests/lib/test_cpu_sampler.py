@@ -0,0 +1,187 @@
+from janitor.lib.cpu_sampler import CpuSampler
+from collections import namedtuple
+from unittest.mock import patch, Mock
+import psutil
+import pytest
+import atexit
+import json
+import time
+
+CpuTimes = namedtuple("CpuTimes", ["user", "nice", "system", "idle", "iowait", "guest"])
+
+
+def cpu_times(user: float, idle: float, iowait: float = 0.0, guest: float = 0.0) -> CpuTimes:
+    return CpuTimes(user=user, nice=0.0, system=0.0, idle=idle, iowait=iowait, guest=guest)
+
+
+def get_cpu_times_mock(samples: list) -> Mock:
+    '''
+    Every sample is a list of per core CpuTimes, the total is their sum
+    '''
+    side_effect = []
+    for cores in samples:
+        side_effect.append(CpuTimes(*[sum(values) for values in zip(*cores)]))
+        side_effect.append(cores)
+    return Mock(side_effect=lambda percpu=False: side_effect.pop(0))
+
+
+def reset_sampler_state():
+    CpuSampler._last_sample = None
+    CpuSampler._persisted_at = None
+    CpuSampler._first_sample_at = None
+    CpuSampler._exit_hooks = set()
+
+
+@pytest.fixture(autouse=True)
+def reset_last_sample():
+    reset_sampler_state()
+    # Not leaving persist hooks behind when the tests end
+    with patch.object(atexit, "register"):
+        yield
+    reset_sampler_state()
+
+
+def test_sample_from_the_previous_one_in_memory():
+    sampler = CpuSampler(state_file=None)
+    mocked_cpu_times = get_cpu_times_mock(
+        [
+            [cpu_times(user=10, idle=90), cpu_times(user=20, idle=80)],
+            [cpu_times(user=15, idle=95), cpu_times(user=30, idle=80)],
+        ]
+    )
+    CpuSampler._last_sample = None
+    with patch.object(psutil, "cpu_times", new=mocked_cpu_times):
+        first_sample = sampler._take_sample()
+        first_sample["timestamp"] -= 60
+        CpuSampler._last_sample = first_sample
+        mocked_sleep = Mock()
+        with patch.object(time, "sleep", new=mocked_sleep):
+            result = sampler.sample()
+
+    mocked_sleep.assert_not_called()
+    # Core 0: 5 busy of 10, Core 1: 10 busy of 10, Total: 15 busy of 20
+    assert result == {"cpu_percent": 75.0, "cpu_percent_per_core": [50.0, 100.0]}
+
+
+def test_sample_without_previous_measures_a_short_interval():
+    sampler = CpuSampler(state_file=None, fallback_interval=0.01)
+    mocked_cpu_times = get_cpu_times_mock(
+        [
+            [cpu_times(user=10, idle=90)],
+            [cpu_times(user=11, idle=93, iowait=1)],
+        ]
+    )
+    mocked_sleep = Mock()
+    with patch.object(psutil, "cpu_times", new=mocked_cpu_times):
+        with patch.object(time, "sleep", new=mocked_sleep):
+            result = sampler.sample()
+
+    mocked_sleep.assert_called_once_with(0.01)
+    # iowait counts as idle
+    assert result == {"cpu_percent": 20.0, "cpu_percent_per_core": [20.0]}
+    assert CpuSampler._last_sample["cpu"] == [105, 11]
+
+
+def test_guest_time_is_not_counted_twice():
+    sampler = CpuSampler(state_file=None)
+
+    assert sampler._to_times(cpu_times(user=10, idle=90, guest=5)) == [100, 10]
+
+
+@pytest.mark.parametrize(
+    argnames=('previous', 'expected_usable'),
+    argvalues=[
+        ({
+            "timestamp": 940, "cpu": [100, 10], "cores": [[100, 10]]
+        }, True),
+        ({
+            "timestamp": 1000, "cpu": [100, 10], "cores": [[100, 10]]
+        }, False),
+        ({
+            "timestamp": 10, "cpu": [100, 10], "cores": [[100, 10]]
+        }, False),
+        ({
+            "timestamp": 940, "cpu": [100, 10], "cores": [[50, 5], [50, 5]]
+        }, False),
+        ({
+            "timestamp": 940, "cpu": [500, 10], "cores": [[500, 10]]
+        }, False),
+    ],
+)
+def test_is_usable(previous, expected_usable):
+    sampler = CpuSampler(state_file=None, max_sample_age=900)
+    current = {"timestamp": 1000, "cpu": [200, 20], "cores": [[200, 20]]}
+
+    assert sampler._is_usable(previous, current) is expected_usable
+
+
+def test_sample_persists_and_reads_the_state_file(tmp_path):
+    state_file = tmp_path / "storage" / "cpu_sample.json"
+    sampler = CpuSampler(state_file=str(state_file))
+    previous = {"timestamp": time.time() - 60, "cpu": [100, 10], "cores": [[100, 10]]}
+    state_file.parent.mkdir()
+    state_file.write_text(json.dumps(previous))
+    mocked_cpu_times = get_cpu_times_mock([[cpu_times(user=30, idle=120)]])
+
+    with patch.object(psutil, "cpu_times", new=mocked_cpu_times):
+        result = sampler.sample()
+
+    assert result["cpu_percent"] == 40.0
+    # Only written at the exit
+    assert json.loads(state_file.read_text())["cpu"] == [100, 10]
+    atexit.register.assert_called_once_with(sampler.persist)
+    sampler.persist()
+    assert json.loads(state_file.read_text())["cpu"] == [150, 30]
+
+
+def test_sample_persists_every_interval(tmp_path):
+    state_file = tmp_path / "cpu_sample.json"
+    sampler = CpuSampler(state_file=str(state_file), persist_interval=300)
+    samples = [
+        {
+            "timestamp": timestamp,
+            "cpu": [100 + timestamp, 10],
+            "cores": [[100 + timestamp, 10]]
+        } for timestamp in [1000, 1010, 1299, 1300, 1310]
+    ]
+    mocked_get_previous_sample = Mock(return_value=samples[0])
+
+    with patch.object(CpuSampler, "_take_sample", new=Mock(side_effect=samples)):
+        with patch.object(CpuSampler, "_get_previous_sample", new=mocked_get_previous_sample):
+            written = []
+            for _ in samples:
+                sampler.sample()
+                written.append(
+                    json.loads(state_file.read_text())["timestamp"] if state_file.exists(
+                    ) else None
+                )
+
+    assert written == [None, None, None, 1300, 1300]
+    # Only once per state file
+    atexit.register.assert_called_once_with(sampler.persist)
+    sampler.persist()
+    assert json.loads(state_file.read_text())["timestamp"] == 1310
+
+
+def test_broken_state_file_is_ignored(tmp_path):
+    state_file = tmp_path / "cpu_sample.json"
+    state_file.write_text("{ not json")
+    sampler = CpuSampler(state_file=str(state_file))
+
+    assert sampler._read_state() is None
+
+
+def test_get_load_average():
+    mocked_getloadavg = Mock()
+    mocked_getloadavg.return_value = (1.0, 0.5, 0.25)
+    with patch.object(psutil, "getloadavg", new=mocked_getloadavg):
+        assert CpuSampler(state_file=None).get_load_average() == (1.0, 0.5, 0.25)
+
+
+def test_sample_with_the_real_psutil():
+    sampler = CpuSampler(state_file=None, fallback_interval=0.01)
+
+    result = sampler.sample()
+
+    assert 0.0 <= result["cpu_percent"] <= 100.0
+    assert len(result["cpu_percent_per_core"]) == psutil.cpu_count()
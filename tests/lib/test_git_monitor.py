@@ -4,11 +4,11 @@ from pyxavi.storage import Storage
 from pyxavi.dictionary import Dictionary
 from janitor.lib.git_monitor import GitMonitor, ChangelogChanges,\
     ChangesProtocol, CommitsChanges
-from unittest.mock import patch, Mock, mock_open, MagicMock, call
+from unittest.mock import patch, Mock, mock_open, MagicMock, call, PropertyMock
 import pytest
 from unittest import TestCase
 from logging import Logger as Logging
-from git import Repo
+from git import Repo, Git, GitCommandError
 import os
 import builtins
 from slugify import slugify
@@ -157,9 +157,198 @@ def test_get_updates():
     with patch.object(mocked_origin, "pull", new=mocked_pull):
         with patch.object(mocked_remotes, "origin", new=mocked_origin):
             with patch.object(mocked_repo, "remotes", new=mocked_remotes):
-                monitor.get_updates()
+                monitor.get_updates(timeout=30)
 
-    mocked_pull.assert_called_once()
+    mocked_pull.assert_called_once_with(kill_after_timeout=30)
+
+
+@pytest.mark.parametrize(
+    argnames=('repository', 'expected_options'),
+    argvalues=[
+        (
+            {
+                "name": "test_name", "path": "yes", "git": "yes", "update_method": "fetch"
+            }, {
+                "bare": True, "filter": "blob:none"
+            }
+        ),
+        (
+            {
+                "name": "test_name",
+                "path": "yes",
+                "git": "yes",
+                "update_method": "fetch",
+                "clone_filter": "tree:0",
+                "shallow_since": "2023-01-01"
+            }, {
+                "bare": True, "filter": "tree:0", "shallow_since": "2023-01-01"
+            }
+        ),
+    ],
+)
+def test_clone_repository_for_fetch(repository, expected_options):
+    monitor = get_instance()
+
+    mocked_clone_from = Mock()
+    mocked_path_exists = Mock()
+    mocked_path_exists.return_value = False
+    with patch.object(os.path, "exists", new=mocked_path_exists):
+        with patch.object(Repo, "clone_from", new=mocked_clone_from):
+            monitor.initiate_or_clone_repository(repository_info=Dictionary(repository))
+
+    mocked_clone_from.assert_called_once_with(
+        repository["git"], repository["path"], **expected_options
+    )
+
+
+@pytest.mark.parametrize(
+    argnames=('is_bare', 'expected_exception'),
+    argvalues=[
+        (True, False),
+        (False, True),
+    ],
+)
+def test_initiate_existing_repository_for_fetch(is_bare, expected_exception):
+    repository = {"name": "test_name", "path": "yes", "update_method": "fetch"}
+    monitor = get_instance()
+
+    mocked_repo_init = Mock()
+    mocked_repo_init.return_value = None
+    mocked_path_exists = Mock()
+    mocked_path_exists.return_value = True
+    with patch.object(os.path, "exists", new=mocked_path_exists):
+        with patch.object(Repo, "__init__", new=mocked_repo_init):
+            with patch.object(Repo, "bare", new=is_bare):
+                if expected_exception:
+                    with TestCase.assertRaises(monitor, RuntimeError):
+                        monitor.initiate_or_clone_repository(
+                            repository_info=Dictionary(repository)
+                        )
+                else:
+                    result = monitor.initiate_or_clone_repository(
+                        repository_info=Dictionary(repository)
+                    )
+                    assert isinstance(result, Repo)
+
+    mocked_repo_init.assert_called_once_with(repository["path"])
+
+
+def test_initiate_repository_unknown_update_method():
+    repository = {"name": "test_name", "path": "yes", "update_method": "wrong"}
+    monitor = get_instance()
+
+    with TestCase.assertRaises(monitor, RuntimeError):
+        monitor.initiate_or_clone_repository(repository_info=Dictionary(repository))
+
+
+def test_get_updates_for_fetch():
+    mocked_repo = Mock()
+
+    monitor = get_instance()
+    monitor.repository_info = Dictionary({**REPOSITORY_COMMITS, "update_method": "fetch"})
+    monitor.current_repository = mocked_repo
+
+    monitor.get_updates(timeout=30)
+
+    mocked_repo.remotes.origin.fetch.assert_called_once_with(
+        refspec="+refs/heads/*:refs/heads/*", kill_after_timeout=30
+    )
+    mocked_repo.remotes.origin.pull.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    argnames=('ls_remote', 'last_remote_head', 'expected_head', 'expected_unchanged'),
+    argvalues=[
+        ("abc123\tHEAD", "abc123", "abc123", True),
+        ("def456\tHEAD", "abc123", "def456", False),
+        ("abc123\tHEAD", None, "abc123", False),
+        ("", None, None, False),
+        (GitCommandError("ls-remote"), None, None, False),
+    ],
+)
+def test_check_remote_head(ls_remote, last_remote_head, expected_head, expected_unchanged):
+    monitor = get_instance()
+
+    mocked_ls_remote = Mock()
+    if isinstance(ls_remote, Exception):
+        mocked_ls_remote.side_effect = ls_remote
+    else:
+        mocked_ls_remote.return_value = ls_remote
+    mocked_storage_get = Mock()
+    mocked_storage_get.side_effect = [{}, last_remote_head]
+    with patch.object(Git, "ls_remote", new=mocked_ls_remote, create=True):
+        with patch.object(Storage, "get", new=mocked_storage_get):
+            with patch.object(Storage, "set", new=Mock()):
+                result = monitor.check_remote_head(
+                    repository_info=Dictionary(REPOSITORY_COMMITS), timeout=10
+                )
+
+    mocked_ls_remote.assert_called_once_with(
+        REPOSITORY_COMMITS["git"], "HEAD", kill_after_timeout=10
+    )
+    assert result is expected_unchanged
+    assert monitor.remote_unchanged is expected_unchanged
+    assert monitor.remote_head == expected_head
+
+
+def test_check_remote_head_without_git_url():
+    monitor = get_instance()
+
+    mocked_ls_remote = Mock()
+    with patch.object(Git, "ls_remote", new=mocked_ls_remote, create=True):
+        result = monitor.check_remote_head(
+            repository_info=Dictionary({
+                "name": "test_name", "path": "yes"
+            })
+        )
+
+    mocked_ls_remote.assert_not_called()
+    assert result is False
+
+
+def test_write_last_remote_head():
+    monitor = get_instance()
+    monitor.repository_info = Dictionary(REPOSITORY_COMMITS)
+    monitor.remote_head = "abc123"
+
+    mocked_storage_get = Mock()
+    mocked_storage_get.return_value = {}
+    mocked_storage_set = Mock()
+    mocked_storage_write = Mock()
+    with patch.object(Storage, "get", new=mocked_storage_get):
+        with patch.object(Storage, "set", new=mocked_storage_set):
+            with patch.object(Storage, "write_file", new=mocked_storage_write):
+                monitor.write_last_remote_head()
+
+    mocked_storage_set.assert_has_calls(
+        [
+            call(slugify(REPOSITORY_COMMITS["git"]), {}),
+            call(slugify(REPOSITORY_COMMITS["git"]) + ".last_remote_head", "abc123")
+        ]
+    )
+    mocked_storage_write.assert_called_once()
+
+
+def test_write_last_remote_head_when_unknown():
+    monitor = get_instance()
+    monitor.repository_info = Dictionary(REPOSITORY_COMMITS)
+    monitor.remote_head = None
+
+    mocked_storage_write = Mock()
+    with patch.object(Storage, "write_file", new=mocked_storage_write):
+        monitor.write_last_remote_head()
+
+    mocked_storage_write.assert_not_called()
+
+
+def test_get_head_commit():
+    mocked_repo = Mock()
+    mocked_repo.head.commit.hexsha = "abc123"
+
+    monitor = get_instance()
+    monitor.current_repository = mocked_repo
+
+    assert monitor.get_head_commit() == "abc123"
 
 
 def test_get_changes_instance_for_changelog():
@@ -188,7 +377,8 @@ def test_get_changes_instance_for_changelog():
         config=monitor._config,
         logger=monitor._logger,
         repository_info=monitor.repository_info,
-        repository_object=monitor.current_repository
+        repository_object=monitor.current_repository,
+        storage=monitor._storage
     )
     mocked_commits_changes_init.assert_not_called()
 
@@ -220,7 +410,8 @@ def test_get_changes_instance_for_commits():
         config=monitor._config,
         logger=monitor._logger,
         repository_info=monitor.repository_info,
-        repository_object=monitor.current_repository
+        repository_object=monitor.current_repository,
+        storage=monitor._storage
     )
 
 
@@ -445,6 +636,97 @@ def test_changelog_discover_changes_exception_when_not_file():
     )
 
 
+def test_changelog_discover_changes_reads_blob_for_fetch(content_1, content_2):
+    mocked_repo = MagicMock()
+    mocked_blob = Mock()
+    mocked_blob.data_stream.read.side_effect = [
+        f"# Changelog\n\n{content_2}\n{content_1}".encode("utf-8"), b""
+    ]
+    mocked_repo.head.commit.tree.__truediv__.return_value = mocked_blob
+
+    mocked_get_current_last_known = Mock()
+    mocked_get_current_last_known.return_value = "v1.0"
+    with patch.object(ChangelogChanges,
+                      "get_current_last_known",
+                      new=mocked_get_current_last_known):
+        instance = get_changelog_instance(
+            repo_info=Dictionary({
+                **REPOSITORY_CHANGELOG, "update_method": "fetch"
+            }),
+            repo_object=mocked_repo
+        )
+
+    mocked_repo.head.commit.tree.__truediv__.assert_called_once_with(
+        REPOSITORY_CHANGELOG["params"]["file"]
+    )
+    assert list(instance._changes_stack.keys()) == ["v2.0"]
+
+
+def test_changelog_discover_changes_exception_when_not_blob():
+    mocked_repo = MagicMock()
+    mocked_repo.head.commit.tree.__truediv__.side_effect = KeyError("CHANGELOG.md")
+
+    with patch.object(ChangelogChanges, "get_current_last_known", new=Mock()):
+        with TestCase.assertRaises(ChangelogChanges, RuntimeError):
+            _ = get_changelog_instance(
+                repo_info=Dictionary({
+                    **REPOSITORY_CHANGELOG, "update_method": "fetch"
+                }),
+                repo_object=mocked_repo
+            )
+
+
+@pytest.mark.parametrize(
+    argnames=('content', 'chunk_size', 'separator'),
+    argvalues=[
+        ("# Title\n\n## [v2.0]\n\n- Two\n\n## [v1.0]\n\n- One\n", 1, "\n## "),
+        ("# Title\n\n## [v2.0]\n\n- Two\n\n## [v1.0]\n\n- One\n", 3, "\n## "),
+        ("# Title\n\n## [v2.0]\n\n- Two\n\n## [v1.0]\n\n- One\n", 1000, "\n## "),
+        ("# Title\n\n## [v2.0]\n\n- Two\n\n## [v1.0]\n\n- One\n", 2, "\n\n"),
+        ("# Title without sections\n", 4, "\n## "),
+        ("", 4, "\n## "),
+        ("\n## \n## ", 1, "\n## "),
+    ],
+)
+def test_changelog_iter_sections_splits_like_split(content, chunk_size, separator):
+    chunks = [content[i:i + chunk_size] for i in range(0, len(content), chunk_size)]
+
+    result = list(ChangelogChanges._iter_sections(chunks=chunks, separator=separator))
+
+    assert result == content.split(separator)
+
+
+def test_changelog_discover_changes_stops_reading_at_last_known(
+    content_1, content_2, content_3
+):
+    content = f"# Title\n\n{content_3}\n{content_2}\n{content_1}"
+    chunk_size = 10
+    read_chunks = []
+
+    def chunks():
+        for i in range(0, len(content), chunk_size):
+            read_chunks.append(i)
+            yield content[i:i + chunk_size]
+
+    mocked_iter_changelog_chunks = Mock()
+    mocked_iter_changelog_chunks.return_value = chunks()
+    mocked_get_current_last_known = Mock()
+    mocked_get_current_last_known.return_value = "v2.0"
+    with patch.object(ChangelogChanges,
+                      "_ChangelogChanges__iter_changelog_chunks",
+                      new=mocked_iter_changelog_chunks):
+        with patch.object(ChangelogChanges,
+                          "get_current_last_known",
+                          new=mocked_get_current_last_known):
+            instance = get_changelog_instance(
+                repo_info=Dictionary(REPOSITORY_CHANGELOG), repo_object=Mock()
+            )
+
+    assert list(instance._changes_stack.keys()) == ["v3.0"]
+    # The oldest section was never read
+    assert len(read_chunks) < len(range(0, len(content), chunk_size))
+
+
 @pytest.mark.parametrize(
     argnames=(
         'last_version', 'expected_parsed', 'content1_name', 'content2_name', 'content3_name'
@@ -661,7 +943,10 @@ def test_changelog_changes_note(changes_stack, expected_note):
 
 
 def get_commits_instance(
-    repo_info, repo_object, avoid_discover_changes=False
+    repo_info,
+    repo_object,
+    avoid_discover_changes=False,
+    current_last_known="abc"
 ) -> ChangesProtocol:
     mock_logger = Mock()
     mock_logger.return_value = None
@@ -679,7 +964,7 @@ def get_commits_instance(
                         with patch.object(Storage, "__init__", new=patched_storage_init):
                             with patch.object(CommitsChanges,
                                               "get_current_last_known",
-                                              new=Mock()):
+                                              new=Mock(return_value=current_last_known)):
                                 if avoid_discover_changes:
                                     with patch.object(CommitsChanges,
                                                       "discover_changes",
@@ -701,34 +986,93 @@ def get_commits_instance(
                                     )
 
 
-def test_commits_discover_changes_rev_list_empty():
+class Commit:
+    binsha: bytes
+    author: str
+    message: str
+
+    def __init__(self, binsha: bytes, author: str, message: str) -> None:
+        self.binsha = binsha
+        self.author = author
+        self.message = message
+
+
+def test_commits_discover_changes_first_run_without_head():
     last_known_commit = None
-    commits = []
     expected_stack = {}
 
     mocked_last_knwon = Mock()
     mocked_last_knwon.return_value = last_known_commit
     mocked_iter_commits = Mock()
-    mocked_iter_commits.return_value = commits
     mocked_repo = Mock()
+    type(mocked_repo.head).commit = PropertyMock(side_effect=ValueError("No HEAD"))
     with patch.object(CommitsChanges, "get_current_last_known", new=mocked_last_knwon):
         with patch.object(mocked_repo, "iter_commits", new=mocked_iter_commits):
-            controller = get_commits_instance(Dictionary(REPOSITORY_COMMITS), mocked_repo)
+            controller = get_commits_instance(
+                Dictionary(REPOSITORY_COMMITS), mocked_repo, current_last_known=None
+            )
             assert controller._changes_stack == expected_stack
 
+    mocked_iter_commits.assert_not_called()
+
 
-def test_commits_discover_changes_rev_list_full():
+def test_commits_discover_changes_first_run_reads_only_head():
     last_known_commit = None
+    expected_stack = {
+        "test1".encode("utf-8").hex(): {
+            "author": "Xavi", "message": "Description 1"
+        },
+    }
+
+    mocked_last_knwon = Mock()
+    mocked_last_knwon.return_value = last_known_commit
+    mocked_iter_commits = Mock()
+    mocked_repo = Mock()
+    mocked_repo.head.commit = Commit(bytes("test1".encode("utf-8")), "Xavi", "Description 1")
+    with patch.object(CommitsChanges, "get_current_last_known", new=mocked_last_knwon):
+        with patch.object(mocked_repo, "iter_commits", new=mocked_iter_commits):
+            controller = get_commits_instance(
+                Dictionary(REPOSITORY_COMMITS), mocked_repo, current_last_known=None
+            )
+            assert controller._changes_stack == expected_stack
+
+    mocked_iter_commits.assert_not_called()
 
-    class Commit:
-        binsha: bytes
-        author: str
-        message: str
 
-        def __init__(self, binsha: bytes, author: str, message: str) -> None:
-            self.binsha = binsha
-            self.author = author
-            self.message = message
+def test_commits_discover_changes_rev_list_empty():
+    last_known_commit = "abc"
+    commits = []
+    expected_stack = {}
+
+    mocked_last_knwon = Mock()
+    mocked_last_knwon.return_value = last_known_commit
+    mocked_iter_commits = Mock()
+    mocked_iter_commits.return_value = iter(commits)
+    mocked_repo = Mock()
+    with patch.object(CommitsChanges, "get_current_last_known", new=mocked_last_knwon):
+        with patch.object(mocked_repo, "iter_commits", new=mocked_iter_commits):
+            controller = get_commits_instance(Dictionary(REPOSITORY_COMMITS), mocked_repo)
+            assert controller._changes_stack == expected_stack
+
+
+@pytest.mark.parametrize(
+    argnames=('params', 'expected_options', 'expected_note'),
+    argvalues=[
+        ({}, {
+            "max_count": 100
+        }, "3 new commits"),
+        (
+            {
+                "max_commits": 3, "since": "2 weeks ago"
+            }, {
+                "max_count": 3, "since": "2 weeks ago"
+            },
+            "3+ new commits"
+        ),
+    ],
+)
+def test_commits_discover_changes_rev_list_full(params, expected_options, expected_note):
+    last_known_commit = "abc"
 
     commits = [
         Commit(bytes("test1".encode("utf-8")), "Xavi", "Description 1"),
@@ -750,13 +1094,17 @@ def test_commits_discover_changes_rev_list_full():
     mocked_last_knwon = Mock()
     mocked_last_knwon.return_value = last_known_commit
     mocked_iter_commits = Mock()
-    mocked_iter_commits.return_value = commits
+    mocked_iter_commits.return_value = iter(commits)
     mocked_repo = Mock()
+    repository = {**REPOSITORY_COMMITS, "params": {**REPOSITORY_COMMITS["params"], **params}}
     with patch.object(CommitsChanges, "get_current_last_known", new=mocked_last_knwon):
         with patch.object(mocked_repo, "iter_commits", new=mocked_iter_commits):
-            controller = get_commits_instance(Dictionary(REPOSITORY_COMMITS), mocked_repo)
+            controller = get_commits_instance(Dictionary(repository), mocked_repo)
             assert controller._changes_stack == expected_stack
 
+    mocked_iter_commits.assert_called_once_with(rev="abc..HEAD", **expected_options)
+    assert controller.get_changes_note() == expected_note
+
 
 def test_commits_get_current_last_known():
     value_to_read = "v1.2"
@@ -0,0 +1,232 @@
+from pyxavi.config import Config
+from janitor.lib.history_store import HistoryStore, DEFAULT_TIERS, CHUNK_POINTS
+from unittest.mock import patch
+import pytest
+
+CONFIG = {
+    "logger.name": "logger_test",
+    "app.service.listen.history.tiers": [
+        {
+            "resolution_seconds": 0, "retention_days": 1
+        },
+        {
+            "resolution_seconds": 300, "retention_days": 10
+        },
+    ],
+}
+# Aligned to the chunks of both tiers
+START = 1_700_000_000 - 1_700_000_000 % (300 * CHUNK_POINTS)
+
+
+def patched_config_init(self):
+    pass
+
+
+def get_instance(storage_file: str = ":memory:", config: dict = CONFIG) -> HistoryStore:
+
+    def patched_get(self, param: str, default=None) -> str:
+        return config[param] if param in config else default
+
+    with patch.object(Config, "__init__", new=patched_config_init):
+        with patch.object(Config, "get", new=patched_get):
+            return HistoryStore(config=Config(), storage_file=storage_file)
+
+
+def append_minutes(store: HistoryStore, minutes: int, hostname: str = "endor"):
+    for minute in range(minutes):
+        store.append(
+            {
+                "hostname": hostname,
+                "cpu_percent": float(minute % 10),
+                "is_ok": True,
+                "os": "linux"
+            },
+            timestamp=START + minute * 60
+        )
+
+
+def test_initialize_with_default_tiers():
+    store = get_instance(config={})
+
+    assert [tier["resolution_seconds"] for tier in store._tiers] ==\
+        [tier["resolution_seconds"] for tier in DEFAULT_TIERS]
+
+
+def test_initialize_without_tiers():
+    with pytest.raises(RuntimeError):
+        get_instance(config={"app.service.listen.history.tiers": []})
+
+
+def test_only_numeric_metrics_are_kept():
+    store = get_instance()
+    append_minutes(store, 1)
+
+    assert store.get_hosts() == ["endor"]
+    assert store.get_metrics("endor") == ["cpu_percent"]
+
+
+def test_query_the_raw_points():
+    store = get_instance()
+    append_minutes(store, 20)
+
+    result = store.query(
+        "endor", "cpu_percent", start=START + 60, end=START + 180, now=START + 1200
+    )
+
+    assert result["resolution_seconds"] == 0
+    assert result["timestamp"] == [START + 60, START + 120, START + 180]
+    assert result["avg"] == [1.0, 2.0, 3.0]
+    assert result["count"] == [1, 1, 1]
+    assert result["summary"] == {"min": 1.0, "max": 3.0, "avg": 2.0, "count": 3}
+
+
+def test_query_with_a_step_uses_the_aggregated_tier():
+    store = get_instance()
+    append_minutes(store, 20)
+
+    result = store.query(
+        "endor", "cpu_percent", start=START, end=START + 1200, step=600, now=START + 1200
+    )
+
+    assert result["resolution_seconds"] == 300
+    assert result["timestamp"] == [START, START + 600]
+    assert result["min"] == [0.0, 0.0]
+    assert result["max"] == [9.0, 9.0]
+    assert result["avg"] == [4.5, 4.5]
+    assert result["count"] == [10, 10]
+
+
+def test_query_older_than_the_raw_retention_uses_the_aggregated_tier():
+    store = get_instance()
+    append_minutes(store, 10)
+
+    result = store.query(
+        "endor", "cpu_percent", start=START, end=START + 600, now=START + 2 * 86400
+    )
+
+    assert result["resolution_seconds"] == 300
+    assert result["count"] == [5, 5]
+
+
+def test_query_unknown_series():
+    store = get_instance()
+
+    result = store.query("hoth", "cpu_percent", start=START, end=START + 600, now=START)
+
+    assert result["timestamp"] == []
+    assert result["summary"] is None
+
+
+def test_flush_writes_the_chunks_and_they_survive_a_restart(tmp_path):
+    storage_file = str(tmp_path / "history.db")
+    store = get_instance(storage_file=storage_file)
+    # Two chunks of the raw tier, as they are CHUNK_POINTS minutes, and one aggregated
+    append_minutes(store, CHUNK_POINTS + 5)
+
+    assert store.flush(now=START + 3600) == 3
+    assert store.flush(now=START + 3600) == 0
+    # The chunks of the raw tier already ended, no need to keep them in memory
+    assert [key[2] for key in store._heads.keys()] == [1]
+    store._connection.close()
+
+    store = get_instance(storage_file=storage_file)
+    # Appending to a stored chunk keeps its previous points
+    store.append({"hostname": "endor", "cpu_percent": 50.0}, timestamp=START + 60 * 36)
+    result = store.query("endor", "cpu_percent", start=START, end=START + 3600, now=START)
+
+    assert store.get_metrics("endor") == ["cpu_percent"]
+    assert len(result["timestamp"]) == CHUNK_POINTS + 6
+    assert result["summary"]["max"] == 50.0
+
+
+def test_retention_deletes_the_old_chunks(tmp_path):
+    store = get_instance(storage_file=str(tmp_path / "history.db"))
+    append_minutes(store, 10)
+    store.flush(now=START + 600)
+
+    store.flush(now=START + 86400 * 5)
+
+    tiers = [row[0] for row in store._connection.execute("SELECT tier FROM history")]
+    assert tiers == [1]
+
+
+def test_points_going_back_in_time_are_ignored():
+    store = get_instance()
+    store.append({"hostname": "endor", "cpu_percent": 1.0}, timestamp=START + 120)
+    store.append({"hostname": "endor", "cpu_percent": 2.0}, timestamp=START + 60)
+
+    result = store.query("endor", "cpu_percent", start=START, end=START + 600, now=START)
+
+    assert result["avg"] == [1.0]
+
+
+def test_start_and_stop_flushes(tmp_path):
+    store = get_instance(storage_file=str(tmp_path / "history.db"))
+    store.start()
+    assert store.is_running() is True
+    append_minutes(store, 1)
+    flushed = []
+    original_flush = store.flush
+
+    def spied_flush(now=None, final=False):
+        flushed.append(original_flush(now=START, final=final))
+        return flushed[-1]
+
+    store.flush = spied_flush
+    store.stop()
+
+    assert store.is_running() is False
+    assert flushed == [2]
+
+
+def test_flush_journals_only_the_new_points_of_the_open_chunks(tmp_path):
+    store = get_instance(storage_file=str(tmp_path / "history.db"))
+    append_minutes(store, 10)
+    store.flush(now=START + 600)
+    store.append({"hostname": "endor", "cpu_percent": 50.0}, timestamp=START + 600)
+
+    assert store.flush(now=START + 660) == 2
+
+    rows = list(store._connection.execute("SELECT tier, data FROM history_head ORDER BY rowid"))
+    # 10 raw points and the complete bucket, then 1 raw point and the bucket it completed
+    assert [(tier, len(data) // 8) for tier, data in rows] == [(0, 20), (1, 5), (0, 2), (1, 5)]
+    assert store._connection.execute("SELECT COUNT(*) FROM history").fetchone()[0] == 0
+
+
+def test_buckets_being_filled_are_journaled_when_stopping(tmp_path):
+    storage_file = str(tmp_path / "history.db")
+    store = get_instance(storage_file=storage_file)
+    append_minutes(store, 3)
+    store.flush(now=START + 180)
+    tiers = [row[0] for row in store._connection.execute("SELECT tier FROM history_head")]
+    assert tiers == [0]
+    # Like stop() does
+    store.flush(now=START + 180, final=True)
+    store._connection.close()
+
+    # The bucket keeps aggregating after a restart, without being counted twice
+    store = get_instance(storage_file=storage_file)
+    store.append({"hostname": "endor", "cpu_percent": 9.0}, timestamp=START + 240)
+    store.flush(now=START + 240, final=True)
+    store._connection.close()
+    store = get_instance(storage_file=storage_file)
+    result = store.query(
+        "endor", "cpu_percent", start=START, end=START + 600, step=300, now=START
+    )
+
+    assert result["timestamp"] == [START]
+    assert result["count"] == [4]
+    assert result["max"] == [9.0]
+
+
+def test_retention_forgets_the_gone_hosts(tmp_path):
+    store = get_instance(storage_file=str(tmp_path / "history.db"))
+    append_minutes(store, 10, hostname="hoth")
+    store.flush(now=START + 600)
+    assert store.get_hosts() == ["hoth"]
+
+    store.flush(now=START + 86400 * 11)
+
+    assert store.get_hosts() == []
+    for table in ["history", "history_head", "history_series"]:
+        assert store._connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] == 0
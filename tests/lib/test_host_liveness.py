@@ -0,0 +1,132 @@
+from pyxavi.config import Config
+from janitor.lib.host_liveness import HostLiveness, DEFAULT_INTERVAL_SECONDS,\
+    DEFAULT_MISSED_INTERVALS
+from unittest.mock import patch, Mock, call
+import threading
+
+CONFIG = {
+    "logger.name": "logger_test",
+    "app.service.listen.liveness.interval_seconds": 60,
+    "app.service.listen.liveness.missed_intervals": 2,
+    "app.service.listen.liveness.hosts": {
+        "hoth": 600
+    },
+    "app.service.listen.liveness.max_hosts": 3,
+}
+
+
+def patched_config_init(self):
+    pass
+
+
+def patched_config_get(self, param: str, default=None) -> str:
+    return CONFIG[param] if param in CONFIG else default
+
+
+def get_instance(on_missing=None, on_back=None, config: dict = CONFIG) -> HostLiveness:
+
+    def patched_get(self, param: str, default=None) -> str:
+        return config[param] if param in config else default
+
+    with patch.object(Config, "__init__", new=patched_config_init):
+        with patch.object(Config, "get", new=patched_get):
+            return HostLiveness(
+                config=Config(),
+                on_missing=on_missing if on_missing is not None else Mock(),
+                on_back=on_back
+            )
+
+
+def test_initialize_with_defaults():
+    liveness = get_instance(config={})
+
+    assert liveness.get_timeout("endor") == DEFAULT_INTERVAL_SECONDS * DEFAULT_MISSED_INTERVALS
+    assert liveness.is_running() is False
+
+
+def test_timeout_per_host():
+    liveness = get_instance()
+
+    assert liveness.get_timeout("endor") == 120
+    assert liveness.get_timeout("hoth") == 1200
+
+
+def test_sweep_reports_the_silent_hosts_once():
+    on_missing = Mock()
+    liveness = get_instance(on_missing=on_missing)
+    liveness.seen("endor", now=0)
+    liveness.seen("hoth", now=0)
+
+    assert liveness.sweep(now=119) == []
+    assert liveness.sweep(now=120) == ["endor"]
+    assert liveness.sweep(now=500) == []
+
+    on_missing.assert_called_once_with("endor", 120)
+    assert liveness.get_stats() == {"hosts": 2, "missing": ["endor"]}
+
+
+def test_reporting_moves_the_deadline():
+    on_missing = Mock()
+    liveness = get_instance(on_missing=on_missing)
+    liveness.seen("endor", now=0)
+    liveness.seen("endor", now=100)
+
+    assert liveness.sweep(now=150) == []
+    # Still a single entry per host
+    assert len(liveness._deadlines) == 1
+    assert liveness.sweep(now=220) == ["endor"]
+
+
+def test_a_missing_host_that_reports_is_back():
+    on_missing = Mock()
+    on_back = Mock()
+    liveness = get_instance(on_missing=on_missing, on_back=on_back)
+    liveness.seen("endor", now=0)
+    liveness.sweep(now=120)
+
+    liveness.seen("endor", now=130)
+
+    on_back.assert_called_once_with("endor", 130)
+    assert liveness.get_stats()["missing"] == []
+    # And it can go missing again
+    assert liveness.sweep(now=250) == ["endor"]
+    assert on_missing.call_args_list == [call("endor", 120), call("endor", 120)]
+
+
+def test_max_hosts_stops_tracking_new_hosts():
+    liveness = get_instance()
+
+    assert all([liveness.seen(hostname, now=0) for hostname in ["a", "b", "c"]])
+    assert liveness.seen("d", now=0) is False
+    # The tracked ones keep being updated
+    assert liveness.seen("a", now=10) is True
+
+
+def test_failing_callback_does_not_stop_the_sweep():
+    on_missing = Mock(side_effect=[RuntimeError("Oops"), None])
+    liveness = get_instance(on_missing=on_missing)
+    liveness.seen("a", now=0)
+    liveness.seen("b", now=0)
+
+    assert liveness.sweep(now=120) == ["a", "b"]
+    assert on_missing.call_count == 2
+
+
+def test_worker_sweeps_at_the_deadline():
+    swept = threading.Event()
+    on_missing = Mock(side_effect=lambda hostname, silent_seconds: swept.set())
+    liveness = get_instance(on_missing=on_missing)
+    now = [0]
+    liveness._clock = lambda: now[0]
+    liveness.start()
+    liveness.seen("endor")
+    assert swept.wait(timeout=0.05) is False
+
+    now[0] = 120
+    with liveness._condition:
+        liveness._condition.notify()
+    assert swept.wait(timeout=5) is True
+    liveness.stop()
+
+    on_missing.assert_called_once_with("endor", 120)
+    assert liveness.is_running() is False
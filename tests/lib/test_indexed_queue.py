@@ -0,0 +1,91 @@
+from pyxavi.queue_stack import Queue
+from janitor.lib.indexed_queue import IndexedQueue
+from janitor.objects.queue_item import QueueItem
+from janitor.objects.message import Message
+from datetime import datetime
+import pytest
+import os
+
+
+@pytest.fixture
+def queue_item_1() -> QueueItem:
+    return QueueItem(message=Message(text="one"), published_at=datetime(2023, 3, 21))
+
+
+@pytest.fixture
+def queue_item_2() -> QueueItem:
+    return QueueItem(message=Message(text="two"), published_at=datetime(2023, 3, 22))
+
+
+def get_instance(storage_file: str = None) -> IndexedQueue:
+    return IndexedQueue(storage_file=storage_file, queue_item_object=QueueItem)
+
+
+def test_initialize():
+    queue = get_instance()
+
+    assert isinstance(queue, IndexedQueue)
+    assert isinstance(queue, Queue)
+    assert queue.is_empty() is True
+    assert len(queue._unique_values) == 0
+
+
+def test_contains_follows_append_unpop_and_pop(queue_item_1, queue_item_2):
+    queue = get_instance()
+
+    queue.append(queue_item_1)
+    queue.unpop(queue_item_2)
+
+    assert queue.contains(QueueItem(message=Message(text="one"))) is True
+    assert queue.contains(queue_item_2) is True
+    assert queue.pop() == queue_item_2
+    assert queue.contains(queue_item_2) is False
+    assert queue.contains(queue_item_1) is True
+
+
+def test_contains_counts_duplicates(queue_item_1):
+    queue = get_instance()
+
+    queue.append(queue_item_1)
+    queue.append(QueueItem(message=Message(text="one")))
+    queue.pop()
+
+    assert queue.contains(queue_item_1) is True
+    queue.pop()
+    assert queue.contains(queue_item_1) is False
+
+
+def test_clean(queue_item_1):
+    queue = get_instance()
+
+    queue.append(queue_item_1)
+    queue.clean()
+
+    assert queue.contains(queue_item_1) is False
+
+
+def test_deduplicate(queue_item_1, queue_item_2):
+    queue = get_instance()
+
+    queue.append(queue_item_1)
+    queue.append(queue_item_2)
+    queue.append(QueueItem(message=Message(text="one"), published_at=datetime(2023, 3, 25)))
+    queue.deduplicate()
+
+    assert queue.length() == 2
+    assert queue.get_all() == [queue_item_1, queue_item_2]
+    queue.pop()
+    assert queue.contains(queue_item_1) is False
+
+
+def test_load_rebuilds_the_index(tmp_path, queue_item_1, queue_item_2):
+    storage_file = os.path.join(tmp_path, "queue.yaml")
+    queue = get_instance(storage_file)
+    queue.append(queue_item_1)
+    queue.save()
+    queue.append(queue_item_2)
+
+    queue.load()
+
+    assert queue.contains(queue_item_1) is True
+    assert queue.contains(queue_item_2) is False
@@ -0,0 +1,169 @@
+from pyxavi.config import Config
+from janitor.lib.ingest_queue import IngestQueue
+from janitor.lib.publisher_pool import PublisherPool
+from janitor.objects.message import Message
+from unittest.mock import patch, Mock, call
+from logging import Logger
+import time
+
+CONFIG = {"logger.name": "logger_test"}
+
+
+def patched_config_init(self):
+    pass
+
+
+def patched_config_get(self, param: str, default=None) -> str:
+    return CONFIG[param] if param in CONFIG else default
+
+
+def get_instance(publisher_pool=None, workers: int = None, max_size: int = None):
+    if publisher_pool is None:
+        publisher_pool = Mock()
+        publisher_pool.__class__ = PublisherPool
+    with patch.object(Config, "__init__", new=patched_config_init):
+        with patch.object(Config, "get", new=patched_config_get):
+            return IngestQueue(
+                config=Config(),
+                publisher_pool=publisher_pool,
+                workers=workers,
+                max_size=max_size
+            )
+
+
+def test_initialize():
+    ingest_queue = get_instance()
+
+    assert isinstance(ingest_queue, IngestQueue)
+    assert isinstance(ingest_queue._config, Config)
+    assert isinstance(ingest_queue._logger, Logger)
+    assert isinstance(ingest_queue._publisher_pool, PublisherPool)
+    assert ingest_queue._workers_amount == IngestQueue.DEFAULT_WORKERS
+    assert ingest_queue._max_size == IngestQueue.DEFAULT_MAX_SIZE
+    assert ingest_queue.is_running() is False
+
+
+def test_put_rejects_when_full():
+    ingest_queue = get_instance(max_size=2)
+
+    assert ingest_queue.put(Message(text="one")) is True
+    assert ingest_queue.put(Message(text="two")) is True
+    assert ingest_queue.put(Message(text="three")) is False
+
+    stats = ingest_queue.get_stats()
+    assert stats["enqueued"] == 2
+    assert stats["rejected"] == 1
+    assert stats["depth"] == 2
+    assert stats["high_water"] == 2
+    assert stats["max_size"] == 2
+
+
+def test_workers_publish_through_the_named_account_publisher():
+    message_1 = Message(text="one")
+    message_2 = Message(text="two")
+    publisher = Mock()
+    publisher_pool = Mock()
+    publisher_pool.get.return_value = publisher
+    ingest_queue = get_instance(publisher_pool=publisher_pool, workers=1)
+
+    ingest_queue.put(message_1, named_account="default")
+    ingest_queue.put(message_2, named_account="updates")
+    with patch.object(Config, "get", new=patched_config_get):
+        ingest_queue.start()
+        ingest_queue.stop(drain=True, timeout=5)
+
+    assert publisher_pool.get.call_args_list == [call("default"), call("updates")]
+    publisher.publish_message.assert_has_calls(
+        [call(message=message_1), call(message=message_2)]
+    )
+    stats = ingest_queue.get_stats()
+    assert stats["published"] == 2
+    assert stats["depth"] == 0
+    assert ingest_queue.is_running() is False
+
+
+def test_failed_publishing_is_counted_and_does_not_stop_the_worker():
+    publisher = Mock()
+    publisher.publish_message.side_effect = [RuntimeError("Oops"), None]
+    publisher_pool = Mock()
+    publisher_pool.get.return_value = publisher
+    ingest_queue = get_instance(publisher_pool=publisher_pool, workers=1)
+
+    ingest_queue.put(Message(text="one"))
+    ingest_queue.put(Message(text="two"))
+    with patch.object(Config, "get", new=patched_config_get):
+        ingest_queue.start()
+        ingest_queue.stop(drain=True, timeout=5)
+
+    stats = ingest_queue.get_stats()
+    assert stats["failed"] == 1
+    assert stats["published"] == 1
+
+
+def test_on_done_tells_if_the_messages_were_published():
+    publisher = Mock()
+    # A Publisher returns False when it could not publish
+    publisher.publish_message.side_effect = [False, RuntimeError("Oops"), {"id": 1}]
+    publisher_pool = Mock()
+    publisher_pool.get.return_value = publisher
+    ingest_queue = get_instance(publisher_pool=publisher_pool, workers=1)
+    done = []
+
+    for text in ["one", "two", "three"]:
+        ingest_queue.put(
+            Message(text=text),
+            on_done=lambda published,
+            text=text: done.append((text, published))
+        )
+    with patch.object(Config, "get", new=patched_config_get):
+        ingest_queue.start()
+        ingest_queue.stop(drain=True, timeout=5)
+
+    assert done == [("one", False), ("two", False), ("three", True)]
+    stats = ingest_queue.get_stats()
+    assert stats["failed"] == 2
+    assert stats["published"] == 1
+
+
+def test_stop_without_drain_discards_pending():
+    publisher_pool = Mock()
+    ingest_queue = get_instance(publisher_pool=publisher_pool)
+
+    done = []
+    ingest_queue.put(Message(text="one"), on_done=done.append)
+    ingest_queue.put(Message(text="two"))
+    with patch.object(Config, "get", new=patched_config_get):
+        ingest_queue.stop(drain=False, timeout=1)
+
+    publisher_pool.get.assert_not_called()
+    # Not published, so whoever waits for it can try again
+    assert done == [False]
+    assert ingest_queue.get_stats()["depth"] == 0
+
+
+def test_stop_drains_all_the_workers_within_the_same_timeout():
+    ingest_queue = get_instance(workers=3)
+    ingest_queue._workers = [Mock(), Mock(), Mock()]
+    workers = ingest_queue._workers
+
+    # The deadline is taken at 100, then every join takes its time
+    mocked_monotonic = Mock(side_effect=[100, 101, 104, 107])
+    with patch.object(Config, "get", new=patched_config_get):
+        with patch.object(time, "monotonic", new=mocked_monotonic):
+            ingest_queue.stop(drain=True, timeout=5)
+
+    assert [worker.join.call_args for worker in workers] == [
+        call(timeout=4),
+        call(timeout=1),
+        call(timeout=0),
+    ]
+
+
+def test_put_rejects_when_stopping():
+    ingest_queue = get_instance()
+
+    with patch.object(Config, "get", new=patched_config_get):
+        ingest_queue.stop(drain=True, timeout=1)
+
+    assert ingest_queue.put(Message(text="one")) is False
+    assert ingest_queue.get_stats()["rejected"] == 1
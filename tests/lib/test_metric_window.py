@@ -0,0 +1,116 @@
+from janitor.lib.metric_window import RingBuffer, MetricWindows
+import pytest
+
+
+def test_ring_buffer_wraps_around():
+    buffer = RingBuffer(capacity=3)
+
+    assert len(buffer) == 0
+    assert buffer.get_last() is None
+
+    for timestamp in range(1, 6):
+        buffer.append(float(timestamp), timestamp * 10.0)
+
+    assert len(buffer) == 3
+    assert buffer.get_capacity() == 3
+    assert buffer.get_last() == 50.0
+    assert buffer.get_since(0) == [30.0, 40.0, 50.0]
+    assert buffer.get_since(4) == [40.0, 50.0]
+    assert buffer.get_since(6) == []
+
+
+def test_ring_buffer_not_full():
+    buffer = RingBuffer(capacity=5)
+    buffer.append(1.0, 10.0)
+    buffer.append(2.0, 20.0)
+
+    assert len(buffer) == 2
+    assert buffer.get_since(0) == [10.0, 20.0]
+
+
+def test_ring_buffer_needs_capacity():
+    with pytest.raises(ValueError):
+        RingBuffer(capacity=0)
+
+
+def get_windows() -> MetricWindows:
+    windows = MetricWindows(capacity=10)
+    for timestamp, value in enumerate([10, 20, 30, 40, 100]):
+        windows.record(
+            {
+                "hostname": "endor", "cpu_percent": value, "active": True
+            }, float(timestamp)
+        )
+    return windows
+
+
+@pytest.mark.parametrize(
+    argnames=('aggregation', 'seconds', 'expected_value'),
+    argvalues=[
+        ("avg", 10, 40.0),
+        ("avg", 2, 56.67),
+        ("min", 10, 10),
+        ("max", 10, 100),
+        ("last", 10, 100),
+        ("p50", 10, 30),
+        ("p95", 10, 100),
+        ("p80", 10, 40),
+    ],
+)
+def test_aggregate(aggregation, seconds, expected_value):
+    windows = get_windows()
+
+    assert windows.aggregate("cpu_percent", aggregation, seconds, now=4.0) == expected_value
+
+
+def test_aggregate_without_values():
+    windows = get_windows()
+
+    assert windows.aggregate("memory_percent", "avg", 10, now=4.0) is None
+    assert windows.aggregate("cpu_percent", "avg", 10, now=100.0) is None
+
+
+def test_aggregate_unknown_aggregation():
+    windows = get_windows()
+
+    with pytest.raises(RuntimeError):
+        windows.aggregate("cpu_percent", "median", 10, now=4.0)
+
+
+def test_only_numeric_metrics_are_kept():
+    windows = get_windows()
+
+    assert windows.get_names() == ["cpu_percent"]
+
+
+def test_summarize():
+    windows = get_windows()
+
+    summary = windows.summarize(
+        {
+            "cpu_percent": {
+                "aggregation": "avg", "seconds": 10
+            },
+            "memory_percent": {
+                "aggregation": "avg", "seconds": 10
+            }
+        },
+        now=4.0
+    )
+
+    assert summary == {"hostname": "endor", "cpu_percent": 40.0, "active": True}
+
+
+@pytest.mark.parametrize(
+    argnames=('aggregation', 'expected_valid'),
+    argvalues=[
+        ("avg", True),
+        ("last", True),
+        ("p95", True),
+        ("p99.9", True),
+        ("p100", False),
+        ("median", False),
+    ],
+)
+def test_is_valid_aggregation(aggregation, expected_valid):
+    assert MetricWindows.is_valid_aggregation(aggregation) is expected_valid
@@ -0,0 +1,93 @@
+from janitor.lib.metrics import MetricsRegistry, Counter, Histogram
+import threading
+import pytest
+
+
+def test_counter_with_labels():
+    counter = Counter("requests_total", "Requests", ["endpoint", "code"])
+
+    counter.inc("/sysinfo", "200")
+    counter.inc("/sysinfo", "200")
+    counter.inc("/message", "400", amount=3)
+
+    assert counter.get_value("/sysinfo", "200") == 2
+    assert counter.get_value("/message", "400") == 3
+    assert counter.get_value("/health", "200") == 0
+    assert counter.expose() == [
+        "requests_total{endpoint=\"/message\",code=\"400\"} 3",
+        "requests_total{endpoint=\"/sysinfo\",code=\"200\"} 2",
+    ]
+
+
+def test_counter_does_not_lose_increments_from_several_threads():
+    counter = Counter("hits_total", "Hits")
+
+    def hit():
+        for _ in range(10000):
+            counter.inc()
+
+    threads = [threading.Thread(target=hit) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert counter.get_value() == 80000
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("parse_seconds", "Parse time", ["endpoint"], buckets=[0.1, 1])
+
+    histogram.observe("/sysinfo", value=0.05)
+    histogram.observe("/sysinfo", value=0.1)
+    histogram.observe("/sysinfo", value=0.5)
+    histogram.observe("/sysinfo", value=5)
+
+    assert histogram.get_count("/sysinfo") == 4
+    assert histogram.expose() == [
+        "parse_seconds_bucket{endpoint=\"/sysinfo\",le=\"0.1\"} 2",
+        "parse_seconds_bucket{endpoint=\"/sysinfo\",le=\"1.0\"} 3",
+        "parse_seconds_bucket{endpoint=\"/sysinfo\",le=\"+Inf\"} 4",
+        "parse_seconds_sum{endpoint=\"/sysinfo\"} 5.65",
+        "parse_seconds_count{endpoint=\"/sysinfo\"} 4",
+    ]
+
+
+def test_registry_returns_the_registered_metric():
+    registry = MetricsRegistry()
+
+    counter = registry.counter("hits_total", "Hits")
+
+    assert registry.counter("hits_total", "Hits") is counter
+    with pytest.raises(RuntimeError):
+        registry.histogram("hits_total", "Hits")
+
+
+def test_registry_expose():
+    registry = MetricsRegistry()
+    registry.counter("hits_total", "Hits with a \\ backslash").inc()
+    registry.gauge("depth", "Queue depth", lambda: 7)
+    registry.gauge("broken", "Fails", lambda: 1 / 0)
+    registry.gauge("per_account", "Per account", lambda: {("a\"b", ): 1}, ["account"])
+
+    assert registry.expose() == "\n".join(
+        [
+            "# HELP hits_total Hits with a \\\\ backslash",
+            "# TYPE hits_total counter",
+            "hits_total 1",
+            "# HELP depth Queue depth",
+            "# TYPE depth gauge",
+            "depth 7",
+            "# HELP per_account Per account",
+            "# TYPE per_account gauge",
+            "per_account{account=\"a\\\"b\"} 1",
+        ]
+    ) + "\n"
+
+
+def test_gauge_is_replaced_when_registered_again():
+    registry = MetricsRegistry()
+    registry.gauge("depth", "Queue depth", lambda: 1)
+    registry.gauge("depth", "Queue depth", lambda: 2)
+
+    assert registry.get("depth").collect() == {(): 2}
@@ -1,7 +1,10 @@
 from pyxavi.config import Config
 from pyxavi.mastodon_publisher import MastodonPublisher, MastodonPublisherException
-from janitor.lib.publisher import Publisher
+from janitor.lib.publisher import Publisher, PUBLISH_FAILURES, PUBLISH_REQUEUES,\
+    PUBLISH_SECONDS
 from janitor.lib.formatter import Formatter
+from janitor.lib.sqlite_queue import SqliteQueue
+from janitor.lib.indexed_queue import IndexedQueue
 from pyxavi.queue_stack import Queue
 from pyxavi.mastodon_helper import MastodonHelper, StatusPost, MastodonStatusParams
 from janitor.objects.message import Message, MessageType
@@ -11,6 +14,7 @@ from unittest.mock import patch, Mock, call
 import pytest
 from logging import Logger
 from datetime import datetime
+import threading
 import copy
 
 CONFIG = {
@@ -95,11 +99,31 @@ def test_initialize():
     assert isinstance(publisher, MastodonPublisher)
     assert isinstance(publisher._config, Config)
     assert isinstance(publisher._logger, Logger)
-    assert isinstance(publisher._queue, Queue)
+    assert isinstance(publisher._queue, IndexedQueue)
     assert isinstance(publisher._formatter, Formatter)
     assert isinstance(publisher._mastodon, Mastodon)
 
 
+def test_initialize_sqlite_queue_backend():
+    CONFIG["queue_storage"] = {"backend": "sqlite"}
+    mocked_sqlite_queue_init = Mock()
+    mocked_sqlite_queue_init.return_value = None
+    with patch.object(SqliteQueue, "__init__", new=mocked_sqlite_queue_init):
+        publisher = get_instance()
+
+    assert isinstance(publisher._queue, SqliteQueue)
+    mocked_sqlite_queue_init.assert_called_once()
+    assert mocked_sqlite_queue_init.call_args.kwargs["storage_file"] == "bla/storage/queue.db"
+    assert mocked_sqlite_queue_init.call_args.kwargs["queue_item_object"] == QueueItem
+
+
+def test_initialize_unknown_queue_backend():
+    CONFIG["queue_storage"] = {"backend": "wrong"}
+
+    with pytest.raises(RuntimeError):
+        get_instance()
+
+
 @pytest.fixture
 def datetime_1():
     return datetime(2023, 3, 21)
@@ -149,6 +173,42 @@ def test_publish_message_no_requeue(queue_item_1: QueueItem):
     assert result == {"id": 123}
 
 
+def test_publish_message_one_thread_at_a_time(queue_item_1: QueueItem):
+    publisher = get_instance()
+    first_entered = threading.Event()
+    release_first = threading.Event()
+    calls = []
+
+    def publish_status_post(self, status_post):
+        calls.append(status_post)
+        if len(calls) == 1:
+            first_entered.set()
+            release_first.wait(timeout=5)
+        return {"id": len(calls)}
+
+    with patch.object(Formatter, "build_status_post", new=Mock(return_value="post")):
+        with patch.object(Publisher, "publish_status_post", new=publish_status_post):
+            first = threading.Thread(
+                target=publisher.publish_message, kwargs={"message": queue_item_1.message}
+            )
+            first.start()
+            first_entered.wait(timeout=5)
+            second = threading.Thread(
+                target=publisher.publish_message, kwargs={"message": queue_item_1.message}
+            )
+            second.start()
+            # Waits for the first one, that is still publishing
+            second.join(timeout=0.1)
+            assert second.is_alive()
+            assert len(calls) == 1
+
+            release_first.set()
+            first.join(timeout=5)
+            second.join(timeout=5)
+
+    assert len(calls) == 2
+
+
 def test_publish_message_no_requeue_exception(queue_item_1: QueueItem):
     status_post = StatusPost(status=queue_item_1.message.text)
     publisher = get_instance()
@@ -160,10 +220,11 @@ def test_publish_message_no_requeue_exception(queue_item_1: QueueItem):
     mocked_queue_unpop = Mock()
     with patch.object(Formatter, "build_status_post", new=mocked_build_status_post):
         with patch.object(publisher, "publish_status_post", new=mocked_publish_status_post):
-            _ = publisher.publish_message(message=queue_item_1.message)
+            result = publisher.publish_message(message=queue_item_1.message)
 
     mocked_build_status_post.assert_called_once_with(message=queue_item_1.message)
     mocked_queue_unpop.assert_not_called()
+    assert result is False
 
 
 def test_publish_message_requeue_exception(queue_item_1: QueueItem):
@@ -174,17 +235,56 @@ def test_publish_message_requeue_exception(queue_item_1: QueueItem):
     mocked_build_status_post = Mock()
     mocked_build_status_post.return_value = status_post
     mocked_queue_unpop = Mock()
+    mocked_queue_contains = Mock()
+    mocked_queue_contains.return_value = False
     mocked_publish_status_post = Mock()
     mocked_publish_status_post.side_effect = MastodonPublisherException("test")
+    failures = PUBLISH_FAILURES.get_value("test")
+    requeues = PUBLISH_REQUEUES.get_value("test")
+    published = PUBLISH_SECONDS.get_count("test")
     with patch.object(Formatter, "build_status_post", new=mocked_build_status_post):
-        with patch.object(Queue, "unpop", new=mocked_queue_unpop):
-            with patch.object(publisher, "publish_status_post", new=mocked_publish_status_post):
-                _ = publisher.publish_message(
-                    message=queue_item_1.message, requeue_if_fails=True
-                )
+        with patch.object(IndexedQueue, "unpop", new=mocked_queue_unpop):
+            with patch.object(IndexedQueue, "contains", new=mocked_queue_contains):
+                with patch.object(publisher,
+                                  "publish_status_post",
+                                  new=mocked_publish_status_post):
+                    result = publisher.publish_message(
+                        message=queue_item_1.message, requeue_if_fails=True
+                    )
 
     mocked_build_status_post.assert_called_once_with(message=queue_item_1.message)
+    mocked_queue_contains.assert_called_once()
     mocked_queue_unpop.assert_called_once()
+    assert result is False
+    assert PUBLISH_FAILURES.get_value("test") == failures + 1
+    assert PUBLISH_REQUEUES.get_value("test") == requeues + 1
+    assert PUBLISH_SECONDS.get_count("test") == published + 1
+
+
+def test_publish_message_requeue_exception_already_queued(queue_item_1: QueueItem):
+    status_post = StatusPost(status=queue_item_1.message.text)
+    publisher = get_instance()
+    publisher._is_dry_run = False
+
+    mocked_build_status_post = Mock()
+    mocked_build_status_post.return_value = status_post
+    mocked_queue_unpop = Mock()
+    mocked_queue_contains = Mock()
+    mocked_queue_contains.return_value = True
+    mocked_publish_status_post = Mock()
+    mocked_publish_status_post.side_effect = MastodonPublisherException("test")
+    with patch.object(Formatter, "build_status_post", new=mocked_build_status_post):
+        with patch.object(IndexedQueue, "unpop", new=mocked_queue_unpop):
+            with patch.object(IndexedQueue, "contains", new=mocked_queue_contains):
+                with patch.object(publisher,
+                                  "publish_status_post",
+                                  new=mocked_publish_status_post):
+                    _ = publisher.publish_message(
+                        message=queue_item_1.message, requeue_if_fails=True
+                    )
+
+    mocked_queue_contains.assert_called_once()
+    mocked_queue_unpop.assert_not_called()
 
 
 def test_publish_all_from_queue_is_empty():
@@ -210,7 +310,7 @@ def test_publish_all_from_queue_not_is_empty_dry_run(queue_item_1, queue_item_2)
     mocked_queue_pop.side_effect = [queue_item_1, queue_item_2]
     mocked_publish_queue_item = Mock()
     with patch.object(Queue, "is_empty", new=mocked_queue_is_empty):
-        with patch.object(Queue, "pop", new=mocked_queue_pop):
+        with patch.object(IndexedQueue, "pop", new=mocked_queue_pop):
             with patch.object(publisher, "publish_queue_item", new=mocked_publish_queue_item):
                 result = publisher.publish_all_from_queue()
 
@@ -231,7 +331,7 @@ def test_publish_all_from_queue_not_is_empty_dry_run_oldest(queue_item_1, queue_
     mocked_queue_pop.side_effect = [queue_item_1, queue_item_2]
     mocked_publish_queue_item = Mock()
     with patch.object(Queue, "is_empty", new=mocked_queue_is_empty):
-        with patch.object(Queue, "pop", new=mocked_queue_pop):
+        with patch.object(IndexedQueue, "pop", new=mocked_queue_pop):
             with patch.object(publisher, "publish_queue_item", new=mocked_publish_queue_item):
                 result = publisher.publish_all_from_queue()
 
@@ -253,7 +353,7 @@ def test_publish_all_from_queue_not_is_empty_no_dry_run(queue_item_1, queue_item
     mocked_publish_queue_item = Mock()
     mocked_queue_save = Mock()
     with patch.object(Queue, "is_empty", new=mocked_queue_is_empty):
-        with patch.object(Queue, "pop", new=mocked_queue_pop):
+        with patch.object(IndexedQueue, "pop", new=mocked_queue_pop):
             with patch.object(publisher, "publish_queue_item", new=mocked_publish_queue_item):
                 with patch.object(Queue, "save", new=mocked_queue_save):
                     result = publisher.publish_all_from_queue()
@@ -277,7 +377,7 @@ def test_publish_all_from_queue_not_is_empty_no_dry_run_oldest(queue_item_1, que
     mocked_publish_queue_item = Mock()
     mocked_queue_save = Mock()
     with patch.object(Queue, "is_empty", new=mocked_queue_is_empty):
-        with patch.object(Queue, "pop", new=mocked_queue_pop):
+        with patch.object(IndexedQueue, "pop", new=mocked_queue_pop):
             with patch.object(publisher, "publish_queue_item", new=mocked_publish_queue_item):
                 with patch.object(Queue, "save", new=mocked_queue_save):
                     result = publisher.publish_all_from_queue()
@@ -317,14 +417,32 @@ def patch_queue_load(self):
     self._queue = []
 
 
-def test_reload_queue():
+def test_reload_queue(queue_item_1, queue_item_2):
     publisher = get_instance()
 
-    publisher._queue.append("one")
-    publisher._queue.append("two")
+    publisher._queue.clean()
+    publisher._queue.append(queue_item_1)
+    publisher._queue.append(queue_item_2)
 
     assert publisher._queue.length() == 2
 
     with patch.object(Queue, "load", new=patch_queue_load):
         assert publisher.reload_queue() == -2
     assert publisher._queue.length() == 0
+
+
+def test_reload_queue_sqlite_backend(tmp_path, queue_item_1, queue_item_2):
+    CONFIG["queue_storage"] = {"backend": "sqlite", "file": str(tmp_path / "queue.db")}
+    publisher = get_instance()
+
+    assert isinstance(publisher._queue, SqliteQueue)
+    publisher._queue.append(queue_item_1)
+    publisher._queue.save()
+    publisher._queue.append(queue_item_2)
+
+    assert publisher._queue.length() == 2
+
+    # Reloading discards what was not saved, as the YAML file does
+    assert publisher.reload_queue() == -1
+    assert publisher._queue.length() == 1
+    assert publisher._queue.first().message.text == queue_item_1.message.text
@@ -0,0 +1,85 @@
+from pyxavi.config import Config
+from janitor.lib.publisher import Publisher
+from janitor.lib.publisher_pool import PublisherPool
+from unittest.mock import patch, Mock
+from logging import Logger
+
+CONFIG = {"logger.name": "logger_test"}
+
+
+def patched_config_init(self):
+    pass
+
+
+def patched_config_get(self, param: str, default=None) -> str:
+    return CONFIG[param] if param in CONFIG else default
+
+
+def patched_publisher_init(self, config, named_account, base_path):
+    self._named_account = named_account
+    self._mastodon = Mock()
+
+
+def get_instance() -> PublisherPool:
+    with patch.object(Config, "__init__", new=patched_config_init):
+        with patch.object(Config, "get", new=patched_config_get):
+            return PublisherPool(config=Config(), base_path="bla")
+
+
+def test_initialize():
+    pool = get_instance()
+
+    assert isinstance(pool, PublisherPool)
+    assert isinstance(pool._config, Config)
+    assert isinstance(pool._logger, Logger)
+    assert pool._base_path == "bla"
+    assert pool.length() == 0
+
+
+@patch.object(Publisher, "__init__", new=patched_publisher_init)
+def test_get_creates_lazily_and_reuses():
+    pool = get_instance()
+
+    first = pool.get("default")
+    second = pool.get("default")
+
+    assert isinstance(first, Publisher)
+    assert first is second
+    assert pool.length() == 1
+    assert pool.named_accounts() == ["default"]
+
+
+@patch.object(Publisher, "__init__", new=patched_publisher_init)
+def test_get_one_publisher_per_named_account():
+    pool = get_instance()
+
+    default = pool.get("default")
+    updates = pool.get("updates")
+
+    assert default is not updates
+    assert default._named_account == "default"
+    assert updates._named_account == "updates"
+    assert pool.length() == 2
+
+
+@patch.object(Publisher, "__init__", new=patched_publisher_init)
+def test_publishers_keep_their_own_http_session():
+    pool = get_instance()
+
+    default = pool.get("default")
+    updates = pool.get("updates")
+
+    # Sessions are not thread-safe, and publishers of other accounts run in parallel
+    assert default._mastodon.session is not updates._mastodon.session
+
+
+@patch.object(Publisher, "__init__", new=patched_publisher_init)
+def test_clear():
+    pool = get_instance()
+
+    first = pool.get("default")
+    pool.clear()
+    second = pool.get("default")
+
+    assert pool.length() == 1
+    assert first is not second
@@ -0,0 +1,80 @@
+from pyxavi.config import Config
+from janitor.lib.queue_depth import QueueDepth
+from janitor.lib.sqlite_queue import SqliteQueue
+from janitor.objects.queue_item import QueueItem
+from janitor.objects.message import Message
+from unittest.mock import patch
+import yaml
+import os
+
+
+def patched_config_init(self):
+    pass
+
+
+def get_instance(config: dict, base_path: str = None) -> QueueDepth:
+
+    def patched_get(self, param: str, default=None) -> str:
+        return config[param] if param in config else default
+
+    with patch.object(Config, "__init__", new=patched_config_init):
+        with patch.object(Config, "get", new=patched_get):
+            return QueueDepth(config=Config(), base_path=base_path)
+
+
+def write_yaml_queue(filename: str, amount: int) -> None:
+    with open(filename, "w") as stream:
+        yaml.safe_dump(
+            {"queue": [{
+                "text": f"message {index}"
+            } for index in range(amount)]}, stream
+        )
+
+
+def test_missing_file_is_empty(tmp_path):
+    depth = get_instance({}, base_path=str(tmp_path))
+
+    assert depth.get() == 0
+    # Reading does not create it
+    assert not os.path.exists(os.path.join(tmp_path, "storage", "queue.yaml"))
+
+
+def test_yaml_follows_the_changes_in_the_file(tmp_path):
+    storage_file = os.path.join(tmp_path, "queue.yaml")
+    depth = get_instance({"queue_storage.file": storage_file})
+
+    write_yaml_queue(storage_file, 3)
+    assert depth.get() == 3
+
+    write_yaml_queue(storage_file, 1)
+    assert depth.get() == 1
+
+
+def test_yaml_is_not_parsed_again_when_unchanged(tmp_path):
+    storage_file = os.path.join(tmp_path, "queue.yaml")
+    write_yaml_queue(storage_file, 2)
+    depth = get_instance({"queue_storage.file": storage_file})
+
+    assert depth.get() == 2
+    with patch.object(yaml, "safe_load") as mocked_safe_load:
+        assert depth.get() == 2
+    mocked_safe_load.assert_not_called()
+
+
+def test_sqlite_counts_the_saved_items(tmp_path):
+    storage_file = os.path.join(tmp_path, "queue.db")
+    depth = get_instance(
+        {
+            "queue_storage.backend": "sqlite", "queue_storage.file": storage_file
+        }
+    )
+    queue = SqliteQueue(storage_file=storage_file, queue_item_object=QueueItem)
+    queue.append(QueueItem(message=Message(text="one")))
+    queue.append(QueueItem(message=Message(text="two")))
+    queue.save()
+
+    assert depth.get() == 2
+
+    queue.pop()
+    queue.save()
+    assert depth.get() == 1
@@ -0,0 +1,176 @@
+from pyxavi.config import Config
+from janitor.lib.report_coalescer import ReportCoalescer
+from unittest.mock import patch, Mock
+import threading
+
+CONFIG = {
+    "logger.name": "logger_test",
+    "system_info.thresholds": {
+        "cpu_percent": {
+            "value": 80.0, "message_type": "warning"
+        },
+        "disk_usage_percent": {
+            "value": 80.0, "message_type": "alarm"
+        },
+    }
+}
+
+
+def patched_config_init(self):
+    pass
+
+
+def patched_config_get(self, param: str, default=None) -> str:
+    return CONFIG[param] if param in CONFIG else default
+
+
+def get_instance(process=None, window_seconds: float = 60, max_hosts: int = None):
+    with patch.object(Config, "__init__", new=patched_config_init):
+        with patch.object(Config, "get", new=patched_config_get):
+            return ReportCoalescer(
+                config=Config(),
+                process=process if process is not None else Mock(),
+                window_seconds=window_seconds,
+                max_hosts=max_hosts
+            )
+
+
+def test_initialize_with_defaults():
+    with patch.object(Config, "__init__", new=patched_config_init):
+        with patch.object(Config, "get", new=patched_config_get):
+            coalescer = ReportCoalescer(config=Config(), process=Mock())
+
+    assert coalescer._window_seconds == ReportCoalescer.DEFAULT_WINDOW_SECONDS
+    assert coalescer._max_hosts == ReportCoalescer.DEFAULT_MAX_HOSTS
+    assert coalescer.is_running() is False
+
+
+def test_merge_keeps_the_worst_case_of_the_thresholded_metrics():
+    coalescer = get_instance()
+
+    merged = coalescer.merge(
+        {
+            "hostname": "endor",
+            "cpu_percent": 95.0,
+            "disk_usage_percent": 50,
+            "memory_free": 10
+        },
+        {
+            "hostname": "endor",
+            "cpu_percent": 60.0,
+            "disk_usage_percent": 85,
+            "memory_free": 20
+        },
+    )
+
+    assert merged == {
+        "hostname": "endor", "cpu_percent": 95.0, "disk_usage_percent": 85, "memory_free": 20
+    }
+
+
+def test_reports_of_a_host_are_processed_once_per_window():
+    process = Mock()
+    coalescer = get_instance(process=process, window_seconds=60)
+
+    assert coalescer.add({"hostname": "endor", "cpu_percent": 90.0}, now=0) is True
+    assert coalescer.add({"hostname": "endor", "cpu_percent": 99.0}, now=10) is True
+    assert coalescer.add({"hostname": "hoth", "cpu_percent": 85.0}, now=30) is True
+
+    assert coalescer.process_due(now=59) == 0
+    process.assert_not_called()
+    # The window counts from the first report of the host
+    assert coalescer.process_due(now=60) == 1
+    assert coalescer.process_due(now=90) == 1
+
+    assert [call.args[0] for call in process.call_args_list] == [
+        {
+            "hostname": "endor", "cpu_percent": 99.0
+        },
+        {
+            "hostname": "hoth", "cpu_percent": 85.0
+        },
+    ]
+    assert coalescer.get_stats() == {
+        "received": 3,
+        "merged": 1,
+        "rejected": 0,
+        "processed": 2,
+        "failed": 0,
+        "hosts": 0,
+        "window_seconds": 60,
+    }
+
+
+def test_worker_processes_at_the_end_of_the_window():
+    processed = threading.Event()
+    process = Mock(side_effect=lambda report: processed.set())
+    coalescer = get_instance(process=process, window_seconds=60)
+    now = [0]
+    coalescer._clock = lambda: now[0]
+    coalescer.start()
+
+    coalescer.add({"hostname": "endor", "cpu_percent": 90.0})
+    assert processed.wait(timeout=0.05) is False
+
+    now[0] = 60
+    with coalescer._condition:
+        coalescer._condition.notify()
+    assert processed.wait(timeout=5) is True
+    coalescer.stop()
+
+    process.assert_called_once_with({"hostname": "endor", "cpu_percent": 90.0})
+    assert coalescer.is_running() is False
+
+
+def test_max_hosts_rejects_new_hosts():
+    coalescer = get_instance(max_hosts=1)
+
+    assert coalescer.add({"hostname": "endor", "cpu_percent": 90.0}) is True
+    assert coalescer.add({"hostname": "hoth", "cpu_percent": 90.0}) is False
+    # Already held hosts still get merged
+    assert coalescer.add({"hostname": "endor", "cpu_percent": 95.0}) is True
+
+    assert coalescer.get_stats()["rejected"] == 1
+
+
+def test_stop_flushes_the_held_reports():
+    process = Mock()
+    coalescer = get_instance(process=process, window_seconds=3600)
+    coalescer.start()
+    coalescer.add({"hostname": "endor", "cpu_percent": 90.0})
+
+    coalescer.stop(flush=True)
+
+    process.assert_called_once_with({"hostname": "endor", "cpu_percent": 90.0})
+    assert coalescer.is_running() is False
+    assert coalescer.add({"hostname": "endor", "cpu_percent": 90.0}) is False
+
+
+def test_stop_without_flush_discards_them():
+    process = Mock()
+    coalescer = get_instance(process=process, window_seconds=3600)
+    coalescer.start()
+    coalescer.add({"hostname": "endor", "cpu_percent": 90.0})
+
+    coalescer.stop(flush=False)
+
+    process.assert_not_called()
+
+
+def test_failed_processing_is_counted_and_does_not_stop_the_worker():
+    process = Mock(side_effect=[RuntimeError("Oops"), None])
+    coalescer = get_instance(process=process, window_seconds=60)
+    now = [0]
+    coalescer._clock = lambda: now[0]
+    coalescer.start()
+
+    coalescer.add({"hostname": "endor", "cpu_percent": 90.0})
+    now[0] = 60
+    with coalescer._condition:
+        coalescer._condition.notify()
+    coalescer.add({"hostname": "hoth", "cpu_percent": 90.0})
+    coalescer.stop(flush=True)
+
+    assert process.call_count == 2
+    assert coalescer.get_stats()["failed"] == 1
+    assert coalescer.get_stats()["processed"] == 1
@@ -0,0 +1,171 @@
+from pyxavi.queue_stack import Queue
+from janitor.lib.sqlite_queue import SqliteQueue
+from janitor.objects.queue_item import QueueItem
+from janitor.objects.message import Message
+from datetime import datetime
+from logging import Logger
+import pytest
+import os
+
+
+@pytest.fixture
+def storage_file(tmp_path) -> str:
+    return os.path.join(tmp_path, "queue.db")
+
+
+@pytest.fixture
+def queue_item_1() -> QueueItem:
+    return QueueItem(message=Message(text="one"), published_at=datetime(2023, 3, 21))
+
+
+@pytest.fixture
+def queue_item_2() -> QueueItem:
+    return QueueItem(message=Message(text="two"), published_at=datetime(2023, 3, 22))
+
+
+@pytest.fixture
+def queue_item_3() -> QueueItem:
+    return QueueItem(message=Message(text="three"), published_at=datetime(2023, 3, 23))
+
+
+def get_instance(storage_file: str = None) -> SqliteQueue:
+    return SqliteQueue(storage_file=storage_file, queue_item_object=QueueItem)
+
+
+def test_initialize(storage_file):
+    queue = get_instance(storage_file)
+
+    assert isinstance(queue, SqliteQueue)
+    assert isinstance(queue._logger, Logger)
+    assert queue._storage_file == storage_file
+    assert queue._queue_item_object == QueueItem
+    assert queue.is_empty() is True
+    assert queue.length() == 0
+    assert os.path.exists(storage_file)
+
+
+def test_append_pop_and_unpop(queue_item_1, queue_item_2, queue_item_3):
+    queue = get_instance()
+
+    queue.append(queue_item_1)
+    queue.append(queue_item_2)
+    queue.unpop(queue_item_3)
+
+    assert queue.length() == 3
+    assert queue.first().message.text == "three"
+    assert queue.last().message.text == "two"
+    assert queue.pop().message.text == "three"
+    assert queue.pop().message.text == "one"
+    assert queue.pop().message.text == "two"
+    assert queue.pop() is None
+    assert queue.first() is None
+    assert queue.is_empty() is True
+
+
+def test_items_keep_their_values(queue_item_1):
+    queue = get_instance()
+
+    queue.append(queue_item_1)
+    item = queue.pop()
+
+    assert isinstance(item, QueueItem)
+    assert item.to_dict() == queue_item_1.to_dict()
+
+
+def test_sort(queue_item_1, queue_item_2, queue_item_3):
+    queue = get_instance()
+
+    queue.append(queue_item_3)
+    queue.append(queue_item_1)
+    queue.append(queue_item_2)
+    queue.sort()
+
+    assert [item.message.text for item in queue.get_all()] == ["one", "two", "three"]
+
+    # Positions are rebuilt, so the edges keep working after sorting
+    queue.unpop(queue_item_3)
+    queue.append(queue_item_1)
+    assert queue.first().message.text == "three"
+    assert queue.last().message.text == "one"
+
+
+def test_deduplicate(queue_item_1, queue_item_2):
+    queue = get_instance()
+
+    queue.append(queue_item_1)
+    queue.append(queue_item_2)
+    queue.append(QueueItem(message=Message(text="one"), published_at=datetime(2023, 3, 25)))
+    queue.deduplicate()
+
+    assert queue.length() == 2
+    assert [item.message.text for item in queue.get_all()] == ["one", "two"]
+    assert queue.first().published_at == datetime(2023, 3, 21)
+
+
+def test_contains(queue_item_1, queue_item_2):
+    queue = get_instance()
+
+    queue.append(queue_item_1)
+
+    assert queue.contains(queue_item_1) is True
+    assert queue.contains(QueueItem(message=Message(text="one"))) is True
+    assert queue.contains(queue_item_2) is False
+    queue.pop()
+    assert queue.contains(queue_item_1) is False
+
+
+def test_clean(queue_item_1, queue_item_2):
+    queue = get_instance()
+
+    queue.append(queue_item_1)
+    queue.append(queue_item_2)
+    queue.clean()
+
+    assert queue.is_empty() is True
+
+
+def test_save_persists_between_instances(storage_file, queue_item_1, queue_item_2):
+    queue = get_instance(storage_file)
+    queue.append(queue_item_1)
+    queue.append(queue_item_2)
+    queue.save()
+
+    other_queue = get_instance(storage_file)
+
+    assert other_queue.length() == 2
+    assert other_queue.first().message.text == "one"
+
+
+def test_load_discards_unsaved_changes(storage_file, queue_item_1, queue_item_2):
+    queue = get_instance(storage_file)
+    queue.append(queue_item_1)
+    queue.save()
+
+    queue.append(queue_item_2)
+    queue.pop()
+    assert queue.length() == 1
+
+    assert queue.load() == 1
+    assert queue.first().message.text == "one"
+
+
+def test_import_from_yaml(tmp_path, storage_file, queue_item_1, queue_item_2):
+    yaml_file = os.path.join(tmp_path, "queue.yaml")
+    yaml_queue = Queue(storage_file=yaml_file, queue_item_object=QueueItem)
+    yaml_queue.append(queue_item_1)
+    yaml_queue.append(queue_item_2)
+    yaml_queue.save()
+
+    queue = get_instance(storage_file)
+    imported = queue.import_from_yaml(yaml_file)
+
+    assert imported == 2
+    assert get_instance(storage_file).length() == 2
+    assert [item.message.text for item in queue.get_all()] == ["one", "two"]
+
+
+def test_import_from_yaml_file_not_found(tmp_path):
+    queue = get_instance()
+
+    with pytest.raises(RuntimeError):
+        queue.import_from_yaml(os.path.join(tmp_path, "missing.yaml"))
@@ -1,5 +1,6 @@
 from pyxavi.config import Config
 from janitor.lib.system_info import SystemInfo
+from janitor.lib.cpu_sampler import CpuSampler
 from unittest.mock import patch, Mock
 import psutil
 import socket
@@ -26,7 +27,7 @@ def patched_config_init(self):
 
 
 def patched_config_get(self, param: str, default=None) -> str:
-    return CONFIG[param]
+    return CONFIG[param] if param in CONFIG else default
 
 
 def get_instance() -> SystemInfo:
@@ -54,19 +55,53 @@ def test_hostname():
 
 
 def test_cpu_data():
-    cpu_percent = "50"
-    cpu_count = "2"
+    cpu_percent = 50.0
+    cpu_count = 2
     system_info = get_instance()
 
-    mocked_cpu_percent = Mock()
-    mocked_cpu_percent.return_value = cpu_percent
+    mocked_cpu_sample = Mock()
+    mocked_cpu_sample.return_value = {
+        "cpu_percent": cpu_percent, "cpu_percent_per_core": [40.0, 60.0]
+    }
     mocked_cpu_count = Mock()
     mocked_cpu_count.return_value = cpu_count
-    with patch.object(psutil, "cpu_percent", new=mocked_cpu_percent):
-        with patch.object(psutil, "cpu_count", new=mocked_cpu_count):
-            data = system_info.get_cpu_data()
+    with patch.object(Config, "get", new=patched_config_get):
+        with patch.object(CpuSampler, "sample", new=mocked_cpu_sample):
+            with patch.object(psutil, "cpu_count", new=mocked_cpu_count):
+                data = system_info.get_cpu_data()
+
+    assert data == {"cpu_percent": cpu_percent, "cpu_count": cpu_count}
 
-    assert data, {"cpu_percent": cpu_percent, "cpu_count": cpu_count}
+
+def test_cpu_data_per_core_and_load_average():
+    system_info = get_instance()
+
+    def config_get(self, param: str, default=None):
+        if param in ["system_info.cpu.per_core", "system_info.cpu.load_average"]:
+            return True
+        return patched_config_get(self, param, default)
+
+    mocked_cpu_sample = Mock()
+    mocked_cpu_sample.return_value = {"cpu_percent": 50.0, "cpu_percent_per_core": [40.0, 60.0]}
+    mocked_load_average = Mock()
+    mocked_load_average.return_value = (0.5, 0.25, 0.125)
+    mocked_cpu_count = Mock()
+    mocked_cpu_count.return_value = 2
+    with patch.object(Config, "get", new=config_get):
+        with patch.object(CpuSampler, "sample", new=mocked_cpu_sample):
+            with patch.object(CpuSampler, "get_load_average", new=mocked_load_average):
+                with patch.object(psutil, "cpu_count", new=mocked_cpu_count):
+                    data = system_info.get_cpu_data()
+
+    assert data == {
+        "cpu_percent": 50.0,
+        "cpu_count": 2,
+        "cpu_percent_core_0": 40.0,
+        "cpu_percent_core_1": 60.0,
+        "cpu_load_1": 0.5,
+        "cpu_load_5": 0.25,
+        "cpu_load_15": 0.12,
+    }
 
 
 def test_mem_data():
@@ -160,3 +195,34 @@ def test_crossed_thresholds_return_true():
 
     with patch.object(Config, "get", new=patched_config_get):
         assert system_info.crossed_thresholds(data, ["hostname"]) is True
+
+
+def test_get_crossed_metrics():
+    data = {
+        "hostname": "endor",
+        "cpu_percent": 90,
+        "memory_percent": 40,
+        "disk_usage_percent": 85,
+    }
+    system_info = get_instance()
+
+    def config_get(self, param: str, default=None):
+        if param == "system_info.thresholds":
+            return {
+                "cpu_percent": {
+                    "value": 80.0
+                },
+                "memory_percent": {
+                    "value": 80.0, "message_type": "warning"
+                },
+                "disk_usage_percent": {
+                    "value": 80.0, "message_type": "alarm"
+                },
+            }
+        return patched_config_get(self, param, default)
+
+    with patch.object(Config, "get", new=config_get):
+        crossed = system_info.get_crossed_metrics(data, ["hostname"])
+
+    # Without a message type, it is a warning
+    assert crossed == {"cpu_percent": "warning", "disk_usage_percent": "alarm"}
@@ -32,6 +32,8 @@ CONFIG = {
     "system_info.formatting.templates.message_type.error.text": "$text",
     "system_info.formatting.templates.message_type.alarm.summary": "⚠️ $summary",
     "system_info.formatting.templates.message_type.alarm.text": "$text",
+    "system_info.formatting.templates.report_lines.line_ok": "- **$title**: $value",
+    "system_info.formatting.templates.report_lines.line_fail": "- **$title**: $value ❗️",
 }
 
 
@@ -40,7 +42,16 @@ def patched_config_init(self):
 
 
 def patched_config_get(self, param: str, default=None) -> str:
-    return CONFIG[param]
+    return CONFIG[param] if param in CONFIG else default
+
+
+def get_config_get(overrides: dict):
+    config = {**CONFIG, **overrides}
+
+    def config_get(self, param: str, default=None) -> str:
+        return config[param] if param in config else default
+
+    return config_get
 
 
 def get_instance() -> SystemInfoTemplater:
@@ -66,9 +77,15 @@ def test_build_report_line_no_issue():
 
     templater = get_instance()
 
-    mocked_config_get = Mock()
-    mocked_config_get.side_effect = [title_item_name, line_template]
-    with patch.object(Config, "get", new=mocked_config_get):
+    config_get = get_config_get(
+        {
+            "system_info.formatting.report_item_names_map": {
+                item_name: title_item_name
+            },
+            "system_info.formatting.templates.report_lines.line_ok": line_template,
+        }
+    )
+    with patch.object(Config, "get", new=config_get):
         templated_line = templater._build_report_line(
             item_name=item_name, item_value=item_value, field_has_issue=field_has_issue
         )
@@ -85,14 +102,19 @@ def test_build_report_line_with_issue():
     title_item_name = "Title for the metric name"
     item_value = 45
     field_has_issue = True
-    line_template = "- **$title**: $value"
     line_template_fail = "- **$title**: $value ❗️"
 
     templater = get_instance()
 
-    mocked_config_get = Mock()
-    mocked_config_get.side_effect = [title_item_name, line_template, line_template_fail]
-    with patch.object(Config, "get", new=mocked_config_get):
+    config_get = get_config_get(
+        {
+            "system_info.formatting.report_item_names_map": {
+                item_name: title_item_name
+            },
+            "system_info.formatting.templates.report_lines.line_fail": line_template_fail,
+        }
+    )
+    with patch.object(Config, "get", new=config_get):
         templated_line = templater._build_report_line(
             item_name=item_name, item_value=item_value, field_has_issue=field_has_issue
         )
@@ -104,6 +126,32 @@ def test_build_report_line_with_issue():
     assert templated_line == expected_string
 
 
+def test_build_report_line_without_title_uses_the_name():
+    templater = get_instance()
+
+    with patch.object(Config, "get", new=patched_config_get):
+        templated_line = templater._build_report_line(item_name="metric_name", item_value=45)
+
+    assert templated_line == "- **metric_name**: 45"
+
+
+def test_compiled_artefacts_are_built_once_per_config():
+    templater = get_instance()
+
+    mocked_config_get = Mock()
+    mocked_config_get.side_effect = lambda param, default=None: CONFIG.get(param, default)
+    with patch.object(Config, "get", new=mocked_config_get):
+        other_templater = SystemInfoTemplater(config=templater._config)
+        templater._build_report_line(item_name="metric_name", item_value=45)
+        calls_after_first_line = mocked_config_get.call_count
+        templater._build_report_line(item_name="metric_name", item_value=45)
+        other_templater._build_report_line(item_name="metric_name", item_value=45)
+        templater._humansize(2048)
+        templater._get_message_template(MessageType.INFO)
+
+    assert mocked_config_get.call_count == calls_after_first_line
+
+
 @pytest.mark.parametrize(
     argnames=('value', 'expected_result'),
     argvalues=[
@@ -121,9 +169,8 @@ def test_build_report_line_with_issue():
 def test_humansize(value, expected_result):
     templater = get_instance()
 
-    mocked_readable = Mock()
-    mocked_readable.return_value = True
-    with patch.object(Config, "get", new=mocked_readable):
+    config_get = get_config_get({"system_info.formatting.human_readable": True})
+    with patch.object(Config, "get", new=config_get):
         result = templater._humansize(value)
 
     print(result)
@@ -147,9 +194,8 @@ def test_humansize(value, expected_result):
 def test_humansize_no(value, expected_result):
     templater = get_instance()
 
-    mocked_readable = Mock()
-    mocked_readable.return_value = False
-    with patch.object(Config, "get", new=mocked_readable):
+    config_get = get_config_get({"system_info.formatting.human_readable": False})
+    with patch.object(Config, "get", new=config_get):
         result = templater._humansize(value)
 
     print(result)
@@ -170,23 +216,6 @@ def test_process_report():
 
     templater = get_instance()
 
-    mocked_config_get = Mock()
-    # The first call to "get" returns the thresholds
-    # and the second the exceptions
-    mocked_config_get.side_effect = [
-        CONFIG["system_info.thresholds"],
-        CONFIG["system_info.formatting.human_readable_exceptions"],
-        CONFIG["system_info.formatting.templates.message_type.none.summary"],
-        CONFIG["system_info.formatting.templates.message_type.none.text"],
-        CONFIG["system_info.formatting.templates.message_type.info.summary"],
-        CONFIG["system_info.formatting.templates.message_type.info.text"],
-        CONFIG["system_info.formatting.templates.message_type.warning.summary"],
-        CONFIG["system_info.formatting.templates.message_type.warning.text"],
-        CONFIG["system_info.formatting.templates.message_type.error.summary"],
-        CONFIG["system_info.formatting.templates.message_type.error.text"],
-        CONFIG["system_info.formatting.templates.message_type.alarm.summary"],
-        CONFIG["system_info.formatting.templates.message_type.alarm.text"],
-    ]
     mocked_build_line = Mock()
     mocked_build_line.side_effect = [
         template_ok.substitute(value=50),
@@ -196,7 +225,7 @@ def test_process_report():
     ]
     mocked_humansize = Mock()
     mocked_humansize.return_value = "2 MB"
-    with patch.object(Config, "get", new=mocked_config_get):
+    with patch.object(Config, "get", new=patched_config_get):
         with patch.object(templater, "_build_report_line", new=mocked_build_line):
             with patch.object(templater, "_humansize", new=mocked_humansize):
                 content = templater.process_report(data)
@@ -217,3 +246,112 @@ def test_process_report():
     assert content.summary == expected_content.summary
     assert content.text == expected_content.text
     assert content.message_type == expected_content.message_type
+
+
+def get_batch_config_get(group_template: str = None):
+
+    def batch_config_get(self, param: str, default=None) -> str:
+        if param == "system_info.formatting.templates.report_host":
+            return group_template if group_template is not None else default
+        return patched_config_get(self, param, default)
+
+    return batch_config_get
+
+
+def test_process_reports_folds_all_hosts_in_one_message():
+    reports = [
+        {
+            "hostname": "endor", "cpu_percent": 85, "memory_percent": 40
+        },
+        {
+            "hostname": "hoth", "cpu_percent": 20, "disk_usage_percent": 90
+        },
+    ]
+    thresholds = {
+        "cpu_percent": {
+            "value": 80.0, "message_type": "warning"
+        },
+        "disk_usage_percent": {
+            "value": 80.0, "message_type": "alarm"
+        },
+    }
+
+    templater = get_instance()
+
+    def config_get(self, param: str, default=None):
+        if param == "system_info.thresholds":
+            return thresholds
+        return get_batch_config_get()(self, param, default)
+
+    mocked_build_line = Mock()
+    mocked_build_line.side_effect = lambda name, value, has_issue:\
+        f"{name}={value}{'!' if has_issue else ''}"
+    with patch.object(Config, "get", new=config_get):
+        with patch.object(templater, "_build_report_line", new=mocked_build_line):
+            messages = templater.process_reports(reports)
+
+    assert len(messages) == 1
+    assert messages[0].message_type == MessageType.ALARM
+    assert messages[0].summary == "⚠️ 2 hosts: endor, hoth"
+    assert messages[0].text == "**endor**\ncpu_percent=85!\nmemory_percent=40" +\
+        "\n\n**hoth**\ncpu_percent=20\ndisk_usage_percent=90!"
+    # The received reports are not modified
+    assert reports[0]["hostname"] == "endor"
+
+
+def test_process_reports_group_by_severity():
+    reports = [
+        {
+            "hostname": "endor", "cpu_percent": 85
+        },
+        {
+            "hostname": "hoth", "disk_usage_percent": 90
+        },
+        {
+            "hostname": "naboo", "cpu_percent": 95
+        },
+    ]
+    thresholds = {
+        "cpu_percent": {
+            "value": 80.0, "message_type": "warning"
+        },
+        "disk_usage_percent": {
+            "value": 80.0, "message_type": "alarm"
+        },
+    }
+
+    templater = get_instance()
+
+    def config_get(self, param: str, default=None):
+        if param == "system_info.thresholds":
+            return thresholds
+        return get_batch_config_get("$hostname: $lines")(self, param, default)
+
+    mocked_build_line = Mock()
+    mocked_build_line.side_effect = lambda name, value, has_issue: f"{name}={value}"
+    with patch.object(Config, "get", new=config_get):
+        with patch.object(templater, "_build_report_line", new=mocked_build_line):
+            messages = templater.process_reports(reports, group_by_severity=True)
+
+    assert len(messages) == 2
+    assert messages[0].message_type == MessageType.ALARM
+    assert messages[0].summary == "⚠️ 1 hosts: hoth"
+    assert messages[0].text == "hoth: disk_usage_percent=90"
+    assert messages[1].message_type == MessageType.WARNING
+    assert messages[1].summary == "⚠️ 2 hosts: endor, naboo"
+    assert messages[1].text == "endor: cpu_percent=85\n\nnaboo: cpu_percent=95"
+
+
+def test_process_resolved():
+    templater = get_instance()
+
+    with patch.object(Config, "get", new=patched_config_get):
+        message = templater.process_resolved(
+            "endor", ["cpu_percent", "memory_free"], {
+                "cpu_percent": 20.0, "memory_free": 2048
+            }
+        )
+
+    assert message.message_type == MessageType.INFO
+    assert message.summary == "✅ endor"
+    assert message.text == "- **cpu_percent**: 20.0\n- **memory_free**: 2048 B"
@@ -0,0 +1,103 @@
+from janitor.lib.wire_format import WireFormat, CONTENT_TYPE_BINARY, CONTENT_TYPE_JSON,\
+    MAX_DECODED_SIZE, FIELDS
+import pytest
+import gzip
+import json
+
+SYS_DATA = {
+    "hostname": "endor",
+    "cpu_percent": 50.5,
+    "cpu_count": 2,
+    "memory_total": 8 * 1024 * 1024 * 1024,
+    "memory_percent": 40.25,
+    "cpu_percent_core_0": 45.0,
+    "custom_label": "ñandú",
+}
+
+
+@pytest.mark.parametrize(
+    argnames=('wire_format', 'compression', 'expected_content_type'),
+    argvalues=[
+        ("json", None, CONTENT_TYPE_JSON),
+        ("json", "gzip", CONTENT_TYPE_JSON),
+        ("binary", None, CONTENT_TYPE_BINARY),
+        ("binary", "none", CONTENT_TYPE_BINARY),
+        ("binary", "gzip", CONTENT_TYPE_BINARY),
+    ],
+)
+def test_round_trip(wire_format, compression, expected_content_type):
+    body, headers = WireFormat.encode(
+        SYS_DATA, wire_format=wire_format, compression=compression
+    )
+
+    assert headers["Content-Type"] == expected_content_type
+    content_encoding = headers.get("Content-Encoding", None)
+    if compression in [None, "none"]:
+        assert content_encoding is None
+    else:
+        assert content_encoding == compression
+    decoded = WireFormat.decode(body, expected_content_type, content_encoding)
+
+    assert decoded == SYS_DATA
+    assert [type(value)
+            for value in decoded.values()] == [type(value) for value in SYS_DATA.values()]
+
+
+def test_binary_is_smaller_than_json():
+    sys_data = {name: 12345.67 for name in FIELDS[1:]}
+    sys_data["hostname"] = "endor"
+
+    binary_body, _ = WireFormat.encode(sys_data, wire_format="binary")
+    json_body, _ = WireFormat.encode(sys_data, wire_format="json")
+
+    assert len(binary_body) < len(json_body) / 2
+
+
+def test_encode_unknown_format():
+    with pytest.raises(RuntimeError):
+        WireFormat.encode(SYS_DATA, wire_format="xml")
+
+
+def test_encode_unsupported_value():
+    with pytest.raises(ValueError):
+        WireFormat.pack({"active": True})
+
+
+@pytest.mark.parametrize(
+    argnames=('body'),
+    argvalues=[
+        b"",
+        b"XX\x01\x00",
+        b"JS\x02\x00",
+        b"JS\x01\x01",
+        b"JS\x01\x01\x02d\x00",
+        b"JS\x01\x01\xfed\x00\x00\x00\x00\x00\x00\x00\x00",
+        b"JS\x01\x01\x02x",
+        b"JS\x01\x01\x00d\x00\x10ab",
+        b"JS\x01\x00trailing",
+    ],
+)
+def test_unpack_malformed(body):
+    with pytest.raises(ValueError):
+        WireFormat.unpack(body)
+
+
+def test_decode_json_without_sys_data():
+    with pytest.raises(ValueError):
+        WireFormat.decode(json.dumps({"data": {}}).encode(), CONTENT_TYPE_JSON)
+
+
+def test_decode_unsupported():
+    body, _ = WireFormat.encode(SYS_DATA, wire_format="binary")
+
+    with pytest.raises(LookupError):
+        WireFormat.decode(body, "text/xml")
+    with pytest.raises(LookupError):
+        WireFormat.decode(body, CONTENT_TYPE_BINARY, "br")
+
+
+def test_decompress_is_limited():
+    bomb = gzip.compress(b"\x00" * (MAX_DECODED_SIZE * 2))
+
+    with pytest.raises(ValueError):
+        WireFormat.decompress(bomb, "gzip")
@@ -97,6 +97,16 @@ def test_sorting_uses_published_at_field():
     assert items[2] == instance3
 
 
+def test_unique_value_is_a_fixed_size_digest():
+    short = QueueItem(Message(text="aa"))
+    long = QueueItem(Message(text="aa" * 1000, summary="bb"))
+
+    assert len(short.unique_value()) == QueueItem.DIGEST_SIZE * 2
+    assert len(long.unique_value()) == QueueItem.DIGEST_SIZE * 2
+    assert short.unique_value() == QueueItem(Message(text="aa")).unique_value()
+    assert short.unique_value() != QueueItem(Message(summary="aa")).unique_value()
+
+
 def test_deduplication_uses_message_text_and_summary_field():
     instance1 = QueueItem(Message(text="aa"))
     instance2 = QueueItem(Message(text="aa", summary="bb"))
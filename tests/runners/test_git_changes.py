@@ -0,0 +1,309 @@
+from pyxavi.config import Config
+from pyxavi.dictionary import Dictionary
+from janitor.lib.publisher import Publisher
+from janitor.lib.git_monitor import GitMonitor
+from janitor.lib.buffered_storage import BufferedStorage
+from janitor.runners.git_changes import GitChanges
+from unittest.mock import patch, Mock
+from logging import Logger as PythonLogger
+import pytest
+import threading
+
+REPOSITORIES = [
+    {
+        "name": "first", "named_account": "updates"
+    },
+    {
+        "name": "second", "named_account": "updates"
+    },
+    {
+        "name": "third", "named_account": "updates"
+    },
+]
+CONFIG = {
+    "git_monitor.repositories": REPOSITORIES,
+    "git_monitor.max_workers": 3,
+    "git_monitor.timeout": 5,
+}
+
+
+def patched_config_init(self):
+    pass
+
+
+def patched_config_get(self, param: str, default=None) -> str:
+    return CONFIG[param] if param in CONFIG else default
+
+
+def patched_publisher_init(self, config, named_account, base_path):
+    pass
+
+
+def patched_git_monitor_init(self, config, storage=None):
+    pass
+
+
+def patched_buffered_storage_init(self, filename):
+    pass
+
+
+@patch.object(Config, "__init__", new=patched_config_init)
+@patch.object(Publisher, "__init__", new=patched_publisher_init)
+def get_instance() -> GitChanges:
+    mocked_logger = Mock()
+    mocked_logger.__class__ = PythonLogger
+    return GitChanges(config=Config(), logger=mocked_logger)
+
+
+def test_init():
+    runner = get_instance()
+
+    assert isinstance(runner, GitChanges)
+    assert isinstance(runner._config, Config)
+    assert isinstance(runner._service_publisher, Publisher)
+
+
+def get_config_get(overrides: dict):
+
+    def config_get(self, param: str, default=None):
+        if param in overrides:
+            return overrides[param]
+        return patched_config_get(self, param, default)
+
+    return config_get
+
+
+@patch.object(Config, "get", new=patched_config_get)
+def test_analyse_repositories_runs_concurrently_and_keeps_order():
+    runner = get_instance()
+    # All repositories need to be in flight at the same time to pass the barrier
+    barrier = threading.Barrier(len(REPOSITORIES), timeout=2)
+    finished = {repo["name"]: threading.Event() for repo in REPOSITORIES}
+
+    def analyse(repo, timeout):
+        barrier.wait()
+        # Finish in reverse order: every one waits for the next one
+        index = REPOSITORIES.index(repo.to_dict())
+        if index < len(REPOSITORIES) - 1:
+            finished[REPOSITORIES[index + 1]["name"]].wait(timeout=2)
+        finished[repo.get("name")].set()
+        return repo.get("name")
+
+    repositories = [Dictionary(repo) for repo in REPOSITORIES]
+    with patch.object(runner, "_analyse_repository", new=analyse):
+        result = runner._analyse_repositories(repositories=repositories)
+
+    assert result == ["first", "second", "third"]
+
+
+@patch.object(Config, "get", new=patched_config_get)
+def test_analyse_repositories_isolates_failures():
+    runner = get_instance()
+
+    def analyse(repo, timeout):
+        if repo.get("name") == "second":
+            raise RuntimeError("Oops")
+        return repo.get("name")
+
+    repositories = [Dictionary(repo) for repo in REPOSITORIES]
+    with patch.object(runner, "_analyse_repository", new=analyse):
+        result = runner._analyse_repositories(repositories=repositories)
+
+    assert result == ["first", None, "third"]
+
+
+def test_analyse_repositories_skips_the_ones_timing_out():
+    runner = get_instance()
+    now = [0]
+    runner._clock = lambda: now[0]
+    release = threading.Event()
+
+    def analyse(repo, timeout):
+        if repo.get("name") == "second":
+            # Takes longer than the timeout
+            now[0] = 100
+            release.wait(timeout=5)
+        return repo.get("name")
+
+    repositories = [Dictionary(repo) for repo in REPOSITORIES]
+    with patch.object(Config, "get", new=get_config_get({"git_monitor.timeout": 5})):
+        with patch.object(runner, "_analyse_repository", new=analyse):
+            result = runner._analyse_repositories(repositories=repositories)
+    release.set()
+
+    assert result == ["first", None, "third"]
+
+
+def test_analyse_repositories_times_every_repository_from_its_start():
+    runner = get_instance()
+    now = [0]
+    runner._clock = lambda: now[0]
+
+    def analyse(repo, timeout):
+        # Every one takes 3 of the 5 seconds, 9 in total with a single worker
+        now[0] += 3
+        return repo.get("name")
+
+    repositories = [Dictionary(repo) for repo in REPOSITORIES]
+    config_get = get_config_get({"git_monitor.timeout": 5, "git_monitor.max_workers": 1})
+    with patch.object(Config, "get", new=config_get):
+        with patch.object(runner, "_analyse_repository", new=analyse):
+            result = runner._analyse_repositories(repositories=repositories)
+
+    assert result == ["first", "second", "third"]
+
+
+def test_analyse_repositories_skips_the_queued_ones_when_all_workers_are_stuck():
+    runner = get_instance()
+    now = [0]
+    runner._clock = lambda: now[0]
+    release = threading.Event()
+    analysed = []
+
+    def analyse(repo, timeout):
+        analysed.append(repo.get("name"))
+        if repo.get("name") == "first":
+            # Like a clone, that git can't kill
+            now[0] = 100
+            release.wait(timeout=5)
+        return repo.get("name")
+
+    repositories = [Dictionary(repo) for repo in REPOSITORIES]
+    config_get = get_config_get({"git_monitor.timeout": 5, "git_monitor.max_workers": 1})
+    with patch.object(Config, "get", new=config_get):
+        with patch.object(runner, "_analyse_repository", new=analyse):
+            result = runner._analyse_repositories(repositories=repositories)
+    release.set()
+
+    assert result == [None, None, None]
+    assert analysed == ["first"]
+
+
+@patch.object(Config, "get", new=patched_config_get)
+@patch.object(Publisher, "__init__", new=patched_publisher_init)
+@patch.object(BufferedStorage, "__init__", new=patched_buffered_storage_init)
+def test_run_publishes_sequentially_in_config_order():
+    runner = get_instance()
+
+    monitors = []
+    for repo in REPOSITORIES:
+        monitor = Mock()
+        monitor.__class__ = GitMonitor
+        monitor.remote_unchanged = False
+        monitor.get_current_last_known.return_value = "v1.0"
+        monitor.get_new_last_known.return_value = "v1.1"
+        monitor.get_update_message.return_value = f"message {repo['name']}"
+        monitor.get_changes_note.return_value = "v1.1"
+        monitors.append(monitor)
+    # The second one failed
+    monitors[1] = None
+
+    mocked_analyse_repositories = Mock()
+    mocked_analyse_repositories.return_value = monitors
+    mocked_publisher_info = Mock()
+    mocked_service_info = Mock()
+    mocked_service_error = Mock()
+    mocked_flush = Mock()
+    with patch.object(runner, "_analyse_repositories", new=mocked_analyse_repositories):
+        with patch.object(Publisher, "info", new=mocked_publisher_info):
+            with patch.object(runner._service_publisher, "info", new=mocked_service_info):
+                with patch.object(runner._service_publisher, "error", new=mocked_service_error):
+                    with patch.object(BufferedStorage, "flush", new=mocked_flush):
+                        runner.run()
+
+    mocked_flush.assert_called_once()
+
+    assert [call.kwargs["content"] for call in mocked_publisher_info.call_args_list
+            ] == ["message first", "message third"]
+    monitors[0].write_new_last_known.assert_called_once_with("v1.1")
+    monitors[2].write_new_last_known.assert_called_once_with("v1.1")
+    monitors[0].write_last_remote_head.assert_called_once()
+    monitors[2].write_last_remote_head.assert_called_once()
+    mocked_service_info.assert_called_once_with(
+        "Published an update for:\n\n- first: v1.1\n- third: v1.1"
+    )
+    mocked_service_error.assert_called_once_with("Error while getting updates for:\n\n- second")
+
+
+@patch.object(Config, "get", new=patched_config_get)
+@patch.object(Publisher, "__init__", new=patched_publisher_init)
+@patch.object(BufferedStorage, "__init__", new=patched_buffered_storage_init)
+@patch.object(BufferedStorage, "flush", new=Mock())
+def test_run_skips_unchanged_remotes():
+    runner = get_instance()
+
+    monitor = Mock()
+    monitor.__class__ = GitMonitor
+    monitor.remote_unchanged = True
+
+    mocked_analyse_repositories = Mock()
+    mocked_analyse_repositories.return_value = [monitor, monitor, monitor]
+    mocked_service_info = Mock()
+    with patch.object(runner, "_analyse_repositories", new=mocked_analyse_repositories):
+        with patch.object(runner._service_publisher, "info", new=mocked_service_info):
+            runner.run()
+
+    monitor.get_new_last_known.assert_not_called()
+    monitor.write_new_last_known.assert_not_called()
+    monitor.write_last_remote_head.assert_not_called()
+    mocked_service_info.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    argnames=('remote_unchanged', 'expected_clone'),
+    argvalues=[
+        (True, False),
+        (False, True),
+    ],
+)
+@patch.object(Config, "get", new=patched_config_get)
+@patch.object(GitMonitor, "__init__", new=patched_git_monitor_init)
+def test_analyse_repository_prechecks_the_remote(remote_unchanged, expected_clone):
+    runner = get_instance()
+    runner._clock = lambda: 100.0
+    repo = Dictionary(REPOSITORIES[0])
+
+    mocked_check_remote_head = Mock()
+    mocked_check_remote_head.return_value = remote_unchanged
+    mocked_initiate_or_clone = Mock()
+    mocked_get_updates = Mock()
+    mocked_initialise_changes_instance = Mock()
+    with patch.object(GitMonitor, "check_remote_head", new=mocked_check_remote_head):
+        with patch.object(GitMonitor,
+                          "initiate_or_clone_repository",
+                          new=mocked_initiate_or_clone):
+            with patch.object(GitMonitor, "get_updates", new=mocked_get_updates):
+                with patch.object(GitMonitor,
+                                  "initialise_changes_instance",
+                                  new=mocked_initialise_changes_instance):
+                    result = runner._analyse_repository(repo=repo, timeout=5)
+
+    assert isinstance(result, GitMonitor)
+    mocked_check_remote_head.assert_called_once_with(repository_info=repo, timeout=5)
+    if expected_clone:
+        mocked_initiate_or_clone.assert_called_once_with(repository_info=repo)
+        mocked_get_updates.assert_called_once_with(timeout=5)
+        mocked_initialise_changes_instance.assert_called_once()
+    else:
+        mocked_initiate_or_clone.assert_not_called()
+        mocked_get_updates.assert_not_called()
+        mocked_initialise_changes_instance.assert_not_called()
+
+
+@patch.object(Config, "get", new=patched_config_get)
+@patch.object(Publisher, "__init__", new=patched_publisher_init)
+@patch.object(BufferedStorage, "__init__", new=patched_buffered_storage_init)
+def test_run_flushes_the_state_on_errors():
+    runner = get_instance()
+
+    mocked_analyse_repositories = Mock()
+    mocked_analyse_repositories.side_effect = RuntimeError("Oops")
+    mocked_service_error = Mock()
+    mocked_flush = Mock()
+    with patch.object(runner, "_analyse_repositories", new=mocked_analyse_repositories):
+        with patch.object(runner._service_publisher, "error", new=mocked_service_error):
+            with patch.object(BufferedStorage, "flush", new=mocked_flush):
+                runner.run()
+
+    mocked_service_error.assert_called_once()
+    mocked_flush.assert_called_once()
@@ -0,0 +1,180 @@
+from pyxavi.config import Config
+from janitor.lib.system_info import SystemInfo
+from janitor.runners.metrics_agent import MetricsAgent
+from janitor.runners.run_local import RunLocal
+from janitor.runners.run_remote import RunRemote
+from unittest.mock import patch, Mock
+import pytest
+from logging import Logger as PythonLogger
+
+CONFIG = {
+    "system_info.agent.interval_seconds": 10,
+    "system_info.agent.evaluate_seconds": 60,
+    "system_info.agent.repeat_alert_seconds": 900,
+    "system_info.thresholds": {
+        "cpu_percent": {
+            "value": 80.0,
+            "message_type": "warning",
+            "window": {
+                "aggregation": "p95", "minutes": 10
+            }
+        },
+        "memory_percent": {
+            "value": 80.0, "message_type": "warning"
+        },
+    },
+}
+
+
+def patched_generic_init(self):
+    pass
+
+
+def patched_generic_init_with_config(self, config):
+    pass
+
+
+def get_config_get(overrides: dict = None):
+    config = {**CONFIG, **(overrides if overrides is not None else {})}
+
+    def config_get(self, param: str, default=None):
+        return config[param] if param in config else default
+
+    return config_get
+
+
+@patch.object(Config, "__init__", new=patched_generic_init)
+@patch.object(SystemInfo, "__init__", new=patched_generic_init_with_config)
+def get_instance(overrides: dict = None) -> MetricsAgent:
+    mocked_official_logger = Mock()
+    mocked_official_logger.__class__ = PythonLogger
+    with patch.object(Config, "get", new=get_config_get(overrides)):
+        return MetricsAgent(config=Config(), logger=mocked_official_logger)
+
+
+def test_init():
+    runner = get_instance()
+
+    assert isinstance(runner._sys_info, SystemInfo)
+    assert runner._mode == "local"
+    assert runner._windows == {
+        "cpu_percent": {
+            "aggregation": "p95", "seconds": 600
+        },
+        "memory_percent": {
+            "aggregation": "avg", "seconds": 300
+        },
+    }
+    # The longest window, 600 seconds, sampled every 10 seconds
+    assert runner._metric_windows._capacity == 61
+
+
+def test_init_unknown_mode():
+    with pytest.raises(RuntimeError):
+        get_instance({"system_info.agent.mode": "cloud"})
+
+
+def test_init_unknown_aggregation():
+    with pytest.raises(RuntimeError):
+        get_instance(
+            {
+                "system_info.thresholds": {
+                    "cpu_percent": {
+                        "value": 80.0, "window": {
+                            "aggregation": "median"
+                        }
+                    }
+                }
+            }
+        )
+
+
+def record_samples(runner: MetricsAgent, cpu_values: list):
+    for index, cpu_percent in enumerate(cpu_values):
+        runner._metric_windows.record(
+            {
+                "hostname": "endor", "cpu_percent": cpu_percent, "memory_percent": 50.0
+            },
+            float(index * 10)
+        )
+
+
+def test_evaluate_local_uses_the_aggregated_values():
+    runner = get_instance()
+    # A single spike among 20 samples is not the p95
+    record_samples(runner, [10.0] * 19 + [99.0])
+    mocked_process_data = Mock()
+    mocked_process_data.return_value = False
+
+    with patch.object(RunLocal, "__init__", new=lambda self, config, logger: None):
+        with patch.object(RunLocal, "process_data", new=mocked_process_data):
+            result = runner._evaluate(190.0)
+
+    assert result is False
+    mocked_process_data.assert_called_once_with(
+        {
+            "hostname": "endor", "cpu_percent": 10.0, "memory_percent": 50.0
+        }
+    )
+
+
+def test_evaluate_local_does_not_repeat_alerts_too_soon():
+    runner = get_instance()
+    record_samples(runner, [95.0] * 20)
+    mocked_process_data = Mock()
+    mocked_process_data.return_value = True
+
+    with patch.object(RunLocal, "__init__", new=lambda self, config, logger: None):
+        with patch.object(RunLocal, "process_data", new=mocked_process_data):
+            assert runner._evaluate(190.0) is True
+            assert runner._evaluate(250.0) is False
+            assert runner._evaluate(1090.0) is True
+
+    assert mocked_process_data.call_count == 2
+
+
+def test_evaluate_local_with_alert_state_checks_every_time():
+    runner = get_instance({"system_info.alert_state.active": True})
+    record_samples(runner, [95.0] * 20)
+    mocked_process_data = Mock()
+    mocked_process_data.side_effect = [True, True, False]
+
+    with patch.object(RunLocal, "__init__", new=lambda self, config, logger: None):
+        with patch.object(RunLocal, "process_data", new=mocked_process_data):
+            assert runner._evaluate(190.0) is True
+            # Escalations and resolutions must not wait for repeat_alert_seconds
+            assert runner._evaluate(250.0) is True
+            assert runner._evaluate(310.0) is False
+
+    assert mocked_process_data.call_count == 3
+
+
+def test_evaluate_remote_sends_the_aggregated_values():
+    runner = get_instance({"system_info.agent.mode": "remote"})
+    record_samples(runner, [10.0, 20.0])
+    mocked_send_data = Mock()
+
+    with patch.object(RunRemote, "__init__", new=lambda self, config, logger: None):
+        with patch.object(RunRemote, "send_data", new=mocked_send_data):
+            runner._evaluate(10.0)
+
+    mocked_send_data.assert_called_once_with(
+        {
+            "hostname": "endor", "cpu_percent": 20.0, "memory_percent": 50.0
+        }
+    )
+
+
+def test_run_samples_until_stopped():
+    runner = get_instance({"system_info.agent.interval_seconds": 0.01})
+    samples = []
+
+    def sample(now: float):
+        samples.append(now)
+        if len(samples) == 3:
+            runner.stop()
+
+    with patch.object(runner, "_sample", new=sample):
+        runner.run()
+
+    assert len(samples) == 3
@@ -4,11 +4,20 @@ from janitor.lib.system_info import SystemInfo
 from janitor.lib.system_info_templater import SystemInfoTemplater
 from janitor.lib.publisher import Publisher
 from janitor.objects.message import Message, MessageType
-from janitor.runners.listen import ListenMessage, ListenSysInfo
+from janitor.lib.publisher_pool import PublisherPool
+from janitor.lib.queue_depth import QueueDepth
+from janitor.runners.listen import ListenMessage, ListenSysInfo, ListenHealth, Listen,\
+    ListenSysInfoBatch, ListenMetrics, ListenSysInfoHistory,\
+    app as listen_app
 from unittest.mock import patch, Mock, call
 import pytest
 from logging import Logger as PythonLogger
 from flask_restful import reqparse
+from janitor.lib.wire_format import WireFormat, CONTENT_TYPE_BINARY
+from janitor.lib.report_coalescer import ReportCoalescer
+from janitor.lib.metrics import REGISTRY
+from janitor.lib.host_liveness import HostLiveness
+import sys
 
 COLLECTED_DATA = {
     "hostname": "endor",
@@ -103,6 +112,10 @@ def patched_parser_add_argument(self, *args, **kwargs):
     pass
 
 
+def patched_publisher_pool_init(self, config, base_path):
+    pass
+
+
 @patch.object(reqparse.RequestParser, "__init__", new=patched_generic_init)
 @patch.object(Config, "__init__", new=patched_generic_init)
 @patch.object(Logger, "__init__", new=patched_generic_init_with_config)
@@ -202,6 +215,144 @@ def test_post_data_comes_in_post_crossed_thresholds(collected_data):
     assert code == 200
 
 
+@pytest.mark.parametrize(
+    argnames=('wire_format', 'compression'),
+    argvalues=[
+        ("binary", None),
+        ("binary", "gzip"),
+        ("json", "gzip"),
+    ],
+)
+@patch.object(reqparse.RequestParser, "add_argument", new=patched_parser_add_argument)
+def test_post_encoded_data(collected_data, wire_format, compression):
+    listener = get_instance_sys_info()
+    body, headers = WireFormat.encode(
+        collected_data, wire_format=wire_format, compression=compression
+    )
+
+    mocked_parse_args = Mock()
+    mocked_crossed_thresholds = Mock()
+    mocked_crossed_thresholds.return_value = False
+    with patch.object(listener._parser, "parse_args", new=mocked_parse_args):
+        with patch.object(SystemInfo, "crossed_thresholds", new=mocked_crossed_thresholds):
+            with listener._current_flask_app.test_request_context(method="POST",
+                                                                  data=body,
+                                                                  headers=headers):
+                code = listener.post()
+
+    mocked_parse_args.assert_not_called()
+    mocked_crossed_thresholds.assert_called_once_with(collected_data, ["hostname"])
+    assert code == 200
+
+
+@pytest.mark.parametrize(
+    argnames=('data', 'headers', 'expected_code'),
+    argvalues=[
+        (b"JS\x01\x05", {
+            "Content-Type": CONTENT_TYPE_BINARY
+        }, 400),
+        (b"not gzip", {
+            "Content-Type": CONTENT_TYPE_BINARY, "Content-Encoding": "gzip"
+        }, 400),
+        (b"JS\x01\x00", {
+            "Content-Type": CONTENT_TYPE_BINARY, "Content-Encoding": "br"
+        }, 415),
+        (b"<xml/>", {
+            "Content-Type": "text/xml", "Content-Encoding": "identity"
+        }, 415),
+    ],
+)
+@patch.object(reqparse.RequestParser, "add_argument", new=patched_parser_add_argument)
+def test_post_encoded_data_errors(data, headers, expected_code):
+    listener = get_instance_sys_info()
+
+    with listener._current_flask_app.test_request_context(method="POST",
+                                                          data=data,
+                                                          headers=headers):
+        result, code = listener.post()
+
+    assert code == expected_code
+    assert "error" in result
+
+
+@pytest.mark.parametrize(
+    argnames=('messages', 'published', 'expected_code', 'expected_marked'),
+    argvalues=[
+        ([], None, 200, 0),
+        ([Message(text="report"), Message(text="resolved")], None, 200, 2),
+        ([Message(text="report")], False, 502, 0),
+    ],
+)
+@patch.object(reqparse.RequestParser, "add_argument", new=patched_parser_add_argument)
+def test_post_with_alert_state_publishes_only_the_changes(
+    collected_data, messages, published, expected_code, expected_marked
+):
+    listener = get_instance_sys_info()
+    marked = []
+
+    def publish_changes(sys_data, publish):
+        return [
+            publish(
+                message,
+                lambda published,
+                message=message: marked.append(message) if published else None
+            ) for message in messages
+        ]
+
+    listener._alert_state = Mock()
+    listener._alert_state.publish_changes.side_effect = publish_changes
+    listener._publisher_pool = Mock()
+    publish_message = listener._publisher_pool.get.return_value.publish_message
+    publish_message.return_value = published
+
+    mocked_parse_args = Mock()
+    mocked_parse_args.return_value = {"sys_data": collected_data}
+    mocked_crossed_thresholds = Mock()
+    with patch.object(listener._parser, "parse_args", new=mocked_parse_args):
+        with patch.object(SystemInfo, "crossed_thresholds", new=mocked_crossed_thresholds):
+            with listener._current_flask_app.test_request_context():
+                result = listener.post()
+
+    code = result[1] if isinstance(result, tuple) else result
+    assert code == expected_code
+    mocked_crossed_thresholds.assert_not_called()
+    assert listener._alert_state.publish_changes.call_args[0][0] == collected_data
+    assert publish_message.call_count == len(messages)
+    # Only the published ones are marked as notified
+    assert len(marked) == expected_marked
+
+
+@pytest.mark.parametrize(
+    argnames=('crossed', 'added', 'expected_code'),
+    argvalues=[
+        (False, True, 200),
+        (True, True, 202),
+        (True, False, 503),
+    ],
+)
+@patch.object(reqparse.RequestParser, "add_argument", new=patched_parser_add_argument)
+def test_post_with_coalescer(collected_data, crossed, added, expected_code):
+    listener = get_instance_sys_info()
+    listener._coalescer = Mock()
+    listener._coalescer.add.return_value = added
+
+    mocked_parse_args = Mock()
+    mocked_parse_args.return_value = {"sys_data": collected_data}
+    mocked_crossed_thresholds = Mock()
+    mocked_crossed_thresholds.return_value = crossed
+    with patch.object(listener._parser, "parse_args", new=mocked_parse_args):
+        with patch.object(SystemInfo, "crossed_thresholds", new=mocked_crossed_thresholds):
+            with listener._current_flask_app.test_request_context():
+                result = listener.post()
+
+    code = result[1] if isinstance(result, tuple) else result
+    assert code == expected_code
+    if crossed:
+        listener._coalescer.add.assert_called_once_with(collected_data)
+    else:
+        listener._coalescer.add.assert_not_called()
+
+
 @patch.object(reqparse.RequestParser, "__init__", new=patched_generic_init)
 @patch.object(Config, "__init__", new=patched_generic_init)
 @patch.object(Logger, "__init__", new=patched_generic_init_with_config)
@@ -353,3 +504,604 @@ def test_post_optional_params_not_present(
         code = result
 
     assert code == expected_code
+
+
+@patch.object(reqparse.RequestParser, "add_argument", new=patched_parser_add_argument)
+@patch.object(SystemInfoTemplater, "__init__", new=patched_generic_init_with_config)
+def test_post_crossed_thresholds_uses_the_given_publisher_pool(collected_data):
+    message = Message(text="content of the report")
+
+    listener = get_instance_sys_info()
+    mocked_publisher = Mock()
+    mocked_pool = Mock()
+    mocked_pool.get.return_value = mocked_publisher
+    listener._publisher_pool = mocked_pool
+
+    mocked_parse_args = Mock()
+    mocked_parse_args.return_value = {"sys_data": collected_data}
+    mocked_crossed_thresholds = Mock()
+    mocked_crossed_thresholds.return_value = True
+    mocked_templater_process_report = Mock()
+    mocked_templater_process_report.return_value = message
+    with patch.object(listener._parser, "parse_args", new=mocked_parse_args):
+        with patch.object(SystemInfo, "crossed_thresholds", new=mocked_crossed_thresholds):
+            with patch.object(SystemInfoTemplater,
+                              "process_report",
+                              new=mocked_templater_process_report):
+                with listener._current_flask_app.test_request_context():
+                    code = listener.post()
+
+    mocked_pool.get.assert_called_once_with("default")
+    mocked_publisher.publish_message.assert_called_once_with(message=message)
+    assert code == 200
+
+
+@pytest.mark.parametrize(
+    argnames=("accepted", "expected_result"),
+    argvalues=[
+        (True, 202),
+        (False, ({
+            "error": "The listener is busy, try again later."
+        }, 503)),
+    ],
+)
+@patch.object(reqparse.RequestParser, "add_argument", new=patched_parser_add_argument)
+@patch.object(SystemInfoTemplater, "__init__", new=patched_generic_init_with_config)
+def test_post_crossed_thresholds_goes_to_the_ingest_queue(
+    accepted, expected_result, collected_data
+):
+    message = Message(text="content of the report")
+
+    listener = get_instance_sys_info()
+    mocked_pool = Mock()
+    mocked_ingest_queue = Mock()
+    mocked_ingest_queue.put.return_value = accepted
+    listener._publisher_pool = mocked_pool
+    listener._ingest_queue = mocked_ingest_queue
+
+    mocked_parse_args = Mock()
+    mocked_parse_args.return_value = {"sys_data": collected_data}
+    mocked_crossed_thresholds = Mock()
+    mocked_crossed_thresholds.return_value = True
+    mocked_templater_process_report = Mock()
+    mocked_templater_process_report.return_value = message
+    with patch.object(listener._parser, "parse_args", new=mocked_parse_args):
+        with patch.object(SystemInfo, "crossed_thresholds", new=mocked_crossed_thresholds):
+            with patch.object(SystemInfoTemplater,
+                              "process_report",
+                              new=mocked_templater_process_report):
+                with listener._current_flask_app.test_request_context():
+                    result = listener.post()
+
+    mocked_ingest_queue.put.assert_called_once_with(
+        message=message, named_account="default", on_done=None
+    )
+    mocked_pool.get.assert_not_called()
+    assert result == expected_result
+
+
+def test_health_without_ingest_queue():
+    listener = ListenHealth(config=Mock(), logger=Mock())
+
+    with listener._current_flask_app.test_request_context():
+        result = listener.get()
+
+    assert result == ({"status": "ok"}, 200)
+
+
+def test_health_with_ingest_queue():
+    mocked_ingest_queue = Mock()
+    mocked_ingest_queue.get_stats.return_value = {"depth": 3}
+    listener = ListenHealth(config=Mock(), logger=Mock(), ingest_queue=mocked_ingest_queue)
+
+    with listener._current_flask_app.test_request_context():
+        result = listener.get()
+
+    assert result == ({"status": "ok", "ingest": {"depth": 3}}, 200)
+
+
+def test_health_with_coalescer():
+    mocked_coalescer = Mock()
+    mocked_coalescer.get_stats.return_value = {"hosts": 2}
+    listener = ListenHealth(config=Mock(), logger=Mock(), coalescer=mocked_coalescer)
+
+    with listener._current_flask_app.test_request_context():
+        result = listener.get()
+
+    assert result == ({"status": "ok", "coalesce": {"hosts": 2}}, 200)
+
+
+def test_health_with_liveness():
+    mocked_liveness = Mock()
+    mocked_liveness.get_stats.return_value = {"hosts": 2, "missing": ["endor"]}
+    listener = ListenHealth(config=Mock(), logger=Mock(), liveness=mocked_liveness)
+
+    with listener._current_flask_app.test_request_context():
+        result = listener.get()
+
+    assert result == ({"status": "ok", "liveness": {"hosts": 2, "missing": ["endor"]}}, 200)
+
+
+def get_listen_instance(listen_config: dict) -> Listen:
+    config = {
+        "app.service.listen.host": "0.0.0.0",
+        "app.service.listen.port": 5000,
+        "app.service.listen.debug": False,
+        **listen_config
+    }
+
+    def patched_get(self, param, default=None):
+        return config[param] if param in config else default
+
+    with patch.object(Config, "__init__", new=patched_generic_init):
+        with patch.object(Config, "get", new=patched_get):
+            listen = Listen(config=Config(), logger=Mock())
+    listen._config = Mock()
+    listen._config.get.side_effect = lambda param, default=None: config[param]\
+        if param in config else default
+    return listen
+
+
+@patch.object(PublisherPool, "__init__", new=patched_publisher_pool_init)
+def test_serve_development_mode():
+    listen = get_listen_instance({})
+
+    calls = Mock()
+    with patch("janitor.runners.listen.make_server", new=calls.make_server):
+        with patch.object(listen, "_write_ready_file", new=calls.write_ready_file):
+            listen._serve()
+
+    # Ready only once the socket is bound, right before serving
+    assert calls.mock_calls == [
+        call.make_server("0.0.0.0", 5000, listen_app, threaded=True),
+        call.write_ready_file(host="0.0.0.0", port=5000),
+        call.make_server().serve_forever(),
+    ]
+    assert listen_app.debug is False
+
+
+@patch.object(PublisherPool, "__init__", new=patched_publisher_pool_init)
+def test_serve_production_mode():
+    listen = get_listen_instance(
+        {
+            "app.service.listen.server": "production",
+            "app.service.listen.threads": 16,
+        }
+    )
+
+    mocked_waitress = Mock()
+    mocked_write_ready_file = Mock()
+    with patch.dict(sys.modules, {"waitress": mocked_waitress}):
+        with patch.object(listen, "_write_ready_file", new=mocked_write_ready_file):
+            listen._serve()
+
+    mocked_waitress.create_server.assert_called_once_with(
+        listen_app,
+        host="0.0.0.0",
+        port=5000,
+        threads=16,
+        connection_limit=100,
+        channel_timeout=120,
+        backlog=1024
+    )
+    mocked_write_ready_file.assert_called_once_with(host="0.0.0.0", port=5000)
+    mocked_waitress.create_server.return_value.run.assert_called_once()
+
+
+@pytest.mark.parametrize(
+    argnames=('host', 'expected_url'),
+    argvalues=[
+        ("0.0.0.0", "http://127.0.0.1:5000"),
+        ("::", "http://127.0.0.1:5000"),
+        (None, "http://127.0.0.1:5000"),
+        ("192.168.1.10", "http://192.168.1.10:5000"),
+        ("fd00::10", "http://[fd00::10]:5000"),
+    ],
+)
+@patch.object(PublisherPool, "__init__", new=patched_publisher_pool_init)
+def test_write_ready_file_points_to_the_bound_host(tmp_path, host, expected_url):
+    ready_file = str(tmp_path / "listener.ready")
+    listen = get_listen_instance({})
+
+    with patch.object(listen, "_get_ready_file", new=Mock(return_value=ready_file)):
+        listen._write_ready_file(host=host, port=5000)
+
+    with open(ready_file) as file:
+        assert file.read() == expected_url + "\n"
+
+
+@patch.object(PublisherPool, "__init__", new=patched_publisher_pool_init)
+def test_serve_unknown_mode():
+    listen = get_listen_instance({"app.service.listen.server": "whatever"})
+
+    with pytest.raises(RuntimeError):
+        listen._serve()
+
+
+@patch.object(reqparse.RequestParser, "__init__", new=patched_generic_init)
+@patch.object(Config, "__init__", new=patched_generic_init)
+@patch.object(SystemInfo, "__init__", new=patched_generic_init_with_config)
+def get_instance_sys_info_batch() -> ListenSysInfoBatch:
+    mocked_official_logger = Mock()
+    mocked_official_logger.__class__ = PythonLogger
+    with patch.object(reqparse.RequestParser, "add_argument", new=patched_parser_add_argument):
+        listener = ListenSysInfoBatch(config=Config(), logger=mocked_official_logger)
+    listener._config = Mock()
+    listener._config.get.side_effect = lambda param, default=None: default
+    return listener
+
+
+def test_batch_reports_not_a_list():
+    listener = get_instance_sys_info_batch()
+
+    mocked_parse_args = Mock()
+    mocked_parse_args.return_value = {"reports": None}
+    with patch.object(listener._parser, "parse_args", new=mocked_parse_args):
+        with listener._current_flask_app.test_request_context():
+            result, code = listener.post()
+
+    assert code == 400
+
+
+def test_batch_too_many_reports():
+    listener = get_instance_sys_info_batch()
+    listener._config.get.side_effect = lambda param, default=None: 1
+
+    mocked_parse_args = Mock()
+    mocked_parse_args.return_value = {"reports": [{"hostname": "a"}, {"hostname": "b"}]}
+    with patch.object(listener._parser, "parse_args", new=mocked_parse_args):
+        with listener._current_flask_app.test_request_context():
+            result, code = listener.post()
+
+    assert code == 413
+
+
+def test_batch_no_crossed_thresholds():
+    listener = get_instance_sys_info_batch()
+    listener._publisher_pool = Mock()
+
+    mocked_parse_args = Mock()
+    mocked_parse_args.return_value = {"reports": [{"hostname": "a"}, {"hostname": "b"}]}
+    mocked_crossed_thresholds = Mock()
+    mocked_crossed_thresholds.return_value = False
+    with patch.object(listener._parser, "parse_args", new=mocked_parse_args):
+        with patch.object(SystemInfo, "crossed_thresholds", new=mocked_crossed_thresholds):
+            with listener._current_flask_app.test_request_context():
+                result, code = listener.post()
+
+    assert mocked_crossed_thresholds.call_count == 2
+    listener._publisher_pool.get.assert_not_called()
+    assert result == {
+        "received": 2,
+        "crossed": 0,
+        "messages": 0,
+        "results": [{
+            "hostname": "a", "status": 200
+        }, {
+            "hostname": "b", "status": 200
+        }]
+    }
+    assert code == 200
+
+
+@patch.object(SystemInfoTemplater, "__init__", new=patched_generic_init_with_config)
+def test_batch_crossed_thresholds_publishes_aggregated_message():
+    reports = [{"hostname": "a"}, {"hostname": "b"}, {"hostname": "c"}]
+    message = Message(text="aggregated")
+    listener = get_instance_sys_info_batch()
+    mocked_publisher = Mock()
+    listener._publisher_pool = Mock()
+    listener._publisher_pool.get.return_value = mocked_publisher
+
+    mocked_parse_args = Mock()
+    mocked_parse_args.return_value = {"reports": reports}
+    mocked_crossed_thresholds = Mock()
+    mocked_crossed_thresholds.side_effect = [True, False, True]
+    mocked_process_reports = Mock()
+    mocked_process_reports.return_value = [message]
+    with patch.object(listener._parser, "parse_args", new=mocked_parse_args):
+        with patch.object(SystemInfo, "crossed_thresholds", new=mocked_crossed_thresholds):
+            with patch.object(SystemInfoTemplater,
+                              "process_reports",
+                              new=mocked_process_reports):
+                with listener._current_flask_app.test_request_context():
+                    result, code = listener.post()
+
+    mocked_process_reports.assert_called_once_with(
+        [reports[0], reports[2]], group_by_severity=False
+    )
+    mocked_publisher.publish_message.assert_called_once_with(message=message)
+    assert result["crossed"] == 2
+    assert result["messages"] == 1
+    assert [item["status"] for item in result["results"]] == [200, 200, 200]
+    assert code == 200
+
+
+@patch.object(SystemInfoTemplater, "__init__", new=patched_generic_init_with_config)
+def test_batch_partially_failed_answers_the_status_per_report():
+    reports = [{"hostname": "a"}, {"hostname": "b"}, {"hostname": "c"}]
+    alarm_message = Message(text="alarm")
+    warning_message = Message(text="warning")
+    listener = get_instance_sys_info_batch()
+    listener._config.get.side_effect = lambda param, default=None: True\
+        if param == "app.service.listen.batch.group_by_severity" else default
+    mocked_publisher = Mock()
+    # The alarm goes out, the warning can't be published
+    mocked_publisher.publish_message.side_effect = [{"id": 1}, False]
+    listener._publisher_pool = Mock()
+    listener._publisher_pool.get.return_value = mocked_publisher
+
+    mocked_parse_args = Mock()
+    mocked_parse_args.return_value = {"reports": reports}
+    mocked_crossed_thresholds = Mock()
+    mocked_crossed_thresholds.return_value = True
+    mocked_get_crossed_metrics = Mock()
+    mocked_get_crossed_metrics.side_effect = [
+        {
+            "cpu_percent": "warning"
+        }, {
+            "cpu_percent": "warning", "disk_usage_percent": "alarm"
+        }, {
+            "cpu_percent": "warning"
+        }
+    ]
+    mocked_process_reports = Mock()
+    mocked_process_reports.side_effect = [[alarm_message], [warning_message]]
+    with patch.object(listener._parser, "parse_args", new=mocked_parse_args):
+        with patch.object(SystemInfo, "crossed_thresholds", new=mocked_crossed_thresholds):
+            with patch.object(SystemInfo, "get_crossed_metrics",
+                              new=mocked_get_crossed_metrics):
+                with patch.object(SystemInfoTemplater,
+                                  "process_reports",
+                                  new=mocked_process_reports):
+                    with listener._current_flask_app.test_request_context():
+                        result, code = listener.post()
+
+    # The highest severity first
+    assert mocked_process_reports.call_args_list == [
+        call([reports[1]], group_by_severity=False),
+        call([reports[0], reports[2]], group_by_severity=False),
+    ]
+    assert code == 207
+    assert result["messages"] == 1
+    # So the client retries only the ones that failed
+    assert result["results"] == [
+        {
+            "hostname": "a", "error": "The message could not be published.", "status": 502
+        },
+        {
+            "hostname": "b", "status": 200
+        },
+        {
+            "hostname": "c", "error": "The message could not be published.", "status": 502
+        },
+    ]
+
+
+def test_batch_goes_through_the_coalescer():
+    reports = [{"hostname": "a"}, {"hostname": "b"}]
+    listener = get_instance_sys_info_batch()
+    listener._publisher_pool = Mock()
+    listener._coalescer = Mock()
+    # The second one does not fit
+    listener._coalescer.add.side_effect = [True, False]
+
+    mocked_parse_args = Mock()
+    mocked_parse_args.return_value = {"reports": reports}
+    mocked_crossed_thresholds = Mock()
+    mocked_crossed_thresholds.return_value = True
+    with patch.object(listener._parser, "parse_args", new=mocked_parse_args):
+        with patch.object(SystemInfo, "crossed_thresholds", new=mocked_crossed_thresholds):
+            with listener._current_flask_app.test_request_context():
+                result, code = listener.post()
+
+    assert listener._coalescer.add.call_args_list == [call(reports[0]), call(reports[1])]
+    listener._publisher_pool.get.assert_not_called()
+    assert code == 207
+    assert [item["status"] for item in result["results"]] == [202, 503]
+
+
+def test_batch_goes_through_the_alert_state_per_host():
+    reports = [{"hostname": "a"}, {"hostname": "b"}]
+    listener = get_instance_sys_info_batch()
+    listener._ingest_queue = Mock()
+    listener._ingest_queue.put.return_value = True
+    marked = []
+
+    def publish_changes(sys_data, publish):
+        if sys_data["hostname"] == "a":
+            return []
+        message = Message(text=sys_data["hostname"])
+        return [publish(message, lambda: marked.append(message))]
+
+    listener._alert_state = Mock()
+    listener._alert_state.publish_changes.side_effect = publish_changes
+
+    mocked_parse_args = Mock()
+    mocked_parse_args.return_value = {"reports": reports}
+    with patch.object(listener._parser, "parse_args", new=mocked_parse_args):
+        with listener._current_flask_app.test_request_context():
+            result, code = listener.post()
+
+    assert listener._alert_state.publish_changes.call_count == 2
+    put_message = listener._ingest_queue.put.call_args[1]["message"]
+    assert put_message.text == "b"
+    # Marked by the ingest worker, once published
+    assert marked == []
+    assert code == 202
+    assert [item["status"] for item in result["results"]] == [200, 202]
+
+
+@patch.object(PublisherPool, "__init__", new=patched_publisher_pool_init)
+def test_listen_coalesced_report_goes_to_the_ingest_queue(collected_data):
+    listen = get_listen_instance({"app.service.listen.coalesce.active": True})
+    listen._ingest_queue = Mock()
+    message = Message(text="report")
+    mocked_crossed_thresholds = Mock(return_value=True)
+    mocked_process_report = Mock(return_value=message)
+    with patch.object(SystemInfo, "crossed_thresholds", new=mocked_crossed_thresholds):
+        with patch.object(SystemInfoTemplater, "process_report", new=mocked_process_report):
+            listen._process_coalesced_report(collected_data)
+
+    assert isinstance(listen._coalescer, ReportCoalescer)
+    listen._ingest_queue.put.assert_called_once_with(message=message, on_done=None)
+
+
+def test_metrics_exposes_the_registry():
+    listener = ListenMetrics(config=Mock(), logger=Mock())
+
+    with listener._current_flask_app.test_request_context():
+        response = listener.get()
+
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain; version=0.0.4")
+    assert "# TYPE janitor_listener_requests_total counter" in response.get_data(as_text=True)
+
+
+def test_requests_are_counted_per_route():
+    counter = REGISTRY.get("janitor_listener_requests_total")
+    before = counter.get_value("unmatched", "404")
+
+    response = listen_app.test_client().get("/not-a-route")
+
+    assert response.status_code == 404
+    assert counter.get_value("unmatched", "404") == before + 1
+
+
+@patch.object(PublisherPool, "__init__", new=patched_publisher_pool_init)
+def test_listen_registers_the_queue_depth_gauge():
+    mocked_queue_depth_get = Mock(return_value=4)
+    with patch.object(QueueDepth, "get", new=mocked_queue_depth_get):
+        listen = get_listen_instance({"app.service.listen.metrics.active": True})
+        listen._publisher_pool.get = Mock()
+
+        assert REGISTRY.get("janitor_queue_depth").collect() == {(): 4}
+    # No Publisher is built just to read the depth
+    listen._publisher_pool.get.assert_not_called()
+
+
+@patch.object(reqparse.RequestParser, "add_argument", new=patched_parser_add_argument)
+def test_post_marks_the_host_as_seen(collected_data):
+    listener = get_instance_sys_info()
+    listener._liveness = Mock()
+
+    mocked_parse_args = Mock()
+    mocked_parse_args.return_value = {"sys_data": collected_data}
+    mocked_crossed_thresholds = Mock()
+    mocked_crossed_thresholds.return_value = False
+    with patch.object(listener._parser, "parse_args", new=mocked_parse_args):
+        with patch.object(SystemInfo, "crossed_thresholds", new=mocked_crossed_thresholds):
+            with listener._current_flask_app.test_request_context():
+                result = listener.post()
+
+    assert result == 200
+    listener._liveness.seen.assert_called_once_with(collected_data["hostname"])
+
+
+@patch.object(PublisherPool, "__init__", new=patched_publisher_pool_init)
+def test_listen_publishes_an_alarm_for_a_missing_host():
+    listen = get_listen_instance({"app.service.listen.liveness.active": True})
+    mocked_publisher = Mock()
+    listen._publisher_pool.get = Mock(return_value=mocked_publisher)
+
+    listen._liveness.seen("endor", now=0)
+    listen._liveness.sweep(now=listen._liveness.get_timeout("endor"))
+
+    assert isinstance(listen._liveness, HostLiveness)
+    message = mocked_publisher.publish_message.call_args.kwargs["message"]
+    assert message.message_type == MessageType.ALARM
+    assert message.summary == "🚨 endor is not reporting"
+
+
+@patch.object(PublisherPool, "__init__", new=patched_publisher_pool_init)
+def test_listen_publishes_when_a_missing_host_is_back():
+    listen = get_listen_instance({"app.service.listen.liveness.active": True})
+    listen._ingest_queue = Mock()
+    listen._liveness.seen("endor", now=0)
+    listen._liveness.sweep(now=listen._liveness.get_timeout("endor"))
+
+    listen._liveness.seen("endor")
+
+    message = listen._ingest_queue.put.call_args_list[-1].kwargs["message"]
+    assert message.message_type == MessageType.INFO
+    assert message.summary == "✅ endor is reporting again"
+
+
+@patch.object(reqparse.RequestParser, "add_argument", new=patched_parser_add_argument)
+def test_post_appends_the_report_to_the_history(collected_data):
+    listener = get_instance_sys_info()
+    listener._history = Mock()
+
+    mocked_parse_args = Mock()
+    mocked_parse_args.return_value = {"sys_data": collected_data}
+    mocked_crossed_thresholds = Mock()
+    mocked_crossed_thresholds.return_value = False
+    with patch.object(listener._parser, "parse_args", new=mocked_parse_args):
+        with patch.object(SystemInfo, "crossed_thresholds", new=mocked_crossed_thresholds):
+            with listener._current_flask_app.test_request_context():
+                result = listener.post()
+
+    assert result == 200
+    listener._history.append.assert_called_once_with(collected_data)
+
+
+def get_instance_history(args: dict) -> ListenSysInfoHistory:
+    listener = ListenSysInfoHistory(config=Mock(), logger=Mock(), history=Mock())
+    listener._parser.parse_args = Mock(
+        return_value={
+            **{
+                "hostname": None, "metric": None, "start": None, "end": None, "step": None
+            },
+            **args
+        }
+    )
+    return listener
+
+
+def test_history_lists_the_hosts():
+    listener = get_instance_history({})
+    listener._history.get_hosts.return_value = ["endor", "hoth"]
+
+    assert listener.get() == ({"hosts": ["endor", "hoth"]}, 200)
+
+
+def test_history_lists_the_metrics_of_a_host():
+    listener = get_instance_history({"hostname": "endor"})
+    listener._history.get_metrics.return_value = ["cpu_percent"]
+
+    assert listener.get() == ({"hostname": "endor", "metrics": ["cpu_percent"]}, 200)
+    listener._history.get_metrics.assert_called_once_with("endor")
+
+
+def test_history_queries_a_metric():
+    listener = get_instance_history(
+        {
+            "hostname": "endor", "metric": "cpu_percent", "end": 7200.0, "step": 60.0
+        }
+    )
+    listener._history.query.return_value = {"timestamp": []}
+
+    assert listener.get() == ({"timestamp": []}, 200)
+    listener._history.query.assert_called_once_with(
+        hostname="endor", metric="cpu_percent", start=3600.0, end=7200.0, step=60.0
+    )
+
+
+@pytest.mark.parametrize(
+    argnames=('args'),
+    argvalues=[
+        {
+            "start": 200.0, "end": 100.0
+        },
+        {
+            "step": 0.0
+        },
+    ],
+)
+def test_history_wrong_arguments(args):
+    listener = get_instance_history({"hostname": "endor", "metric": "cpu_percent", **args})
+
+    result = listener.get()
+
+    assert result[1] == 400
+    listener._history.query.assert_not_called()
@@ -3,9 +3,11 @@ from pyxavi.logger import Logger
 from janitor.lib.system_info import SystemInfo
 from janitor.lib.system_info_templater import SystemInfoTemplater
 from janitor.lib.publisher import Publisher
+from janitor.lib.alert_state import AlertState
 from janitor.objects.message import Message
 from janitor.runners.run_local import RunLocal
 from unittest.mock import patch, Mock
+import threading
 import pytest
 from logging import Logger as PythonLogger
 
@@ -77,9 +79,10 @@ def patched_generic_init(self):
     pass
 
 
-def patched_config_get(self, param):
+def patched_config_get(self, param, default=None):
     if param == "mastodon.named_accounts.default":
         return CONFIG_MASTODON_CONN_PARAMS
+    return default
 
 
 def patched_generic_init_with_config(self, config):
@@ -115,6 +118,7 @@ def test_init():
 @patch.object(SystemInfo, "get_cpu_data", new=patched_get_cpu_data)
 @patch.object(SystemInfo, "get_mem_data", new=patched_get_mem_data)
 @patch.object(SystemInfo, "get_disk_data", new=patched_get_disk_data)
+@patch.object(Config, "get", new=patched_config_get)
 def test_run_no_crossed_thresholds():
     runner = get_instance()
 
@@ -156,3 +160,74 @@ def test_run_crossed_thresholds(collected_data):
     # For any reason I can't ensure that publish_message()
     #   is called with the mocked queue item!
     mocked_publisher_publish_message.assert_called_once()
+
+
+def patched_alert_state_init(self, config):
+    self._sys_info = Mock()
+    self._sys_info.get_crossed_metrics.return_value = {"cpu_percent": "warning"}
+    self._pending = {}
+    self._pending_lock = threading.Lock()
+
+
+@patch.object(SystemInfo, "get_hostname", new=patched_get_hostname)
+@patch.object(SystemInfo, "get_cpu_data", new=patched_get_cpu_data)
+@patch.object(SystemInfo, "get_mem_data", new=patched_get_mem_data)
+@patch.object(SystemInfo, "get_disk_data", new=patched_get_disk_data)
+@patch.object(Publisher, "__init__", new=patched_publisher_init)
+@patch.object(AlertState, "__init__", new=patched_alert_state_init)
+@pytest.mark.parametrize(
+    argnames=('notifications', 'published', 'expected_result', 'expected_marks'),
+    argvalues=[
+        ([], None, False, 0),
+        (
+            [
+                (Message(text="report"), {
+                    "firing": ["cpu_percent"]
+                }),
+                (Message(text="resolved"), {
+                    "resolved": ["disk_usage_percent"]
+                }),
+            ],
+            None,
+            True,
+            2
+        ),
+        ([(Message(text="report"), {
+            "firing": ["cpu_percent"]
+        })], False, True, 0),
+    ],
+)
+def test_run_with_alert_state(
+    collected_data, notifications, published, expected_result, expected_marks
+):
+    runner = get_instance()
+
+    def config_get(self, param, default=None):
+        if param == "system_info.alert_state.active":
+            return True
+        return patched_config_get(self, param, default)
+
+    transitions = {"firing": [], "escalated": [], "renotify": [], "resolved": []}
+    mocked_track = Mock()
+    mocked_track.return_value = transitions
+    mocked_get_notifications = Mock()
+    mocked_get_notifications.return_value = notifications
+    mocked_mark_notified = Mock()
+    mocked_publisher_publish_message = Mock()
+    mocked_publisher_publish_message.return_value = published
+    with patch.object(Config, "get", new=config_get):
+        with patch.object(AlertState, "track", new=mocked_track):
+            with patch.object(AlertState, "get_notifications", new=mocked_get_notifications):
+                with patch.object(AlertState, "mark_notified", new=mocked_mark_notified):
+                    with patch.object(Publisher,
+                                      "publish_message",
+                                      new=mocked_publisher_publish_message):
+                        result = runner.run()
+
+    assert result is expected_result
+    mocked_track.assert_called_once()
+    assert mocked_track.call_args.args == (collected_data, None)
+    mocked_get_notifications.assert_called_once_with(collected_data, transitions)
+    assert mocked_publisher_publish_message.call_count == len(notifications)
+    # A failed publish is not marked as notified, so the next run tries again
+    assert mocked_mark_notified.call_count == expected_marks
@@ -2,6 +2,7 @@ from pyxavi.config import Config
 from pyxavi.logger import Logger
 from janitor.lib.system_info import SystemInfo
 from janitor.runners.run_remote import RunRemote
+from janitor.lib.wire_format import WireFormat, CONTENT_TYPE_BINARY
 from unittest.mock import patch, Mock, call
 import requests
 import pytest
@@ -65,6 +66,19 @@ def collected_data():
     }
 
 
+def get_config_get_side_effect(remote_url: str, overrides: dict = None):
+    config = {
+        "app.run_control.dry_run": False,
+        "app.service.remote_url": remote_url,
+        **(overrides if overrides is not None else {})
+    }
+
+    def config_get(param: str, default=None):
+        return config[param] if param in config else default
+
+    return config_get
+
+
 @patch.object(Config, "__init__", new=patched_generic_init)
 @patch.object(Logger, "__init__", new=patched_generic_init_with_config)
 @patch.object(SystemInfo, "__init__", new=patched_generic_init_with_config)
@@ -118,7 +132,7 @@ def test_run_success(collected_data):
     runner = get_instance()
 
     mocked_config_get = Mock()
-    mocked_config_get.side_effect = [False, remote_url]
+    mocked_config_get.side_effect = get_config_get_side_effect(remote_url)
     mocked_requests_post = Mock()
     mocked_requests_post.return_value = ObjectFaker({"status_code": 200})
     with patch.object(Config, "get", new=mocked_config_get):
@@ -150,7 +164,7 @@ def test_run_fail(collected_data):
     runner = get_instance()
 
     mocked_config_get = Mock()
-    mocked_config_get.side_effect = [False, remote_url]
+    mocked_config_get.side_effect = get_config_get_side_effect(remote_url)
     mocked_requests_post = Mock()
     mocked_requests_post.return_value = ObjectFaker({"status_code": 400})
     with patch.object(Config, "get", new=mocked_config_get):
@@ -163,3 +177,56 @@ def test_run_fail(collected_data):
     mocked_requests_post.assert_called_once_with(
         f"{remote_url}/sysinfo", json={'sys_data': collected_data}
     )
+
+
+@patch.object(SystemInfo, "get_hostname", new=patched_get_hostname)
+@patch.object(SystemInfo, "get_cpu_data", new=patched_get_cpu_data)
+@patch.object(SystemInfo, "get_mem_data", new=patched_get_mem_data)
+@patch.object(SystemInfo, "get_disk_data", new=patched_get_disk_data)
+def test_run_binary_format(collected_data):
+    remote_url = "http://remote.url"
+    runner = get_instance()
+
+    mocked_config_get = Mock()
+    mocked_config_get.side_effect = get_config_get_side_effect(
+        remote_url, {
+            "app.service.remote_format": "binary", "app.service.remote_compression": "gzip"
+        }
+    )
+    mocked_requests_post = Mock()
+    mocked_requests_post.return_value = Mock(status_code=200)
+    with patch.object(Config, "get", new=mocked_config_get):
+        with patch.object(requests, "post", new=mocked_requests_post):
+            runner.run()
+
+    mocked_requests_post.assert_called_once()
+    kwargs = mocked_requests_post.call_args.kwargs
+    assert kwargs["headers"] == {
+        "Content-Type": CONTENT_TYPE_BINARY, "Content-Encoding": "gzip"
+    }
+    assert WireFormat.decode(kwargs["data"], CONTENT_TYPE_BINARY, "gzip") == collected_data
+
+
+@patch.object(SystemInfo, "get_hostname", new=patched_get_hostname)
+@patch.object(SystemInfo, "get_cpu_data", new=patched_get_cpu_data)
+@patch.object(SystemInfo, "get_mem_data", new=patched_get_mem_data)
+@patch.object(SystemInfo, "get_disk_data", new=patched_get_disk_data)
+def test_run_binary_format_falls_back_to_json(collected_data):
+    remote_url = "http://remote.url"
+    runner = get_instance()
+
+    mocked_config_get = Mock()
+    mocked_config_get.side_effect = get_config_get_side_effect(
+        remote_url, {"app.service.remote_format": "binary"}
+    )
+    mocked_requests_post = Mock()
+    mocked_requests_post.side_effect = [Mock(status_code=415), Mock(status_code=200)]
+    with patch.object(Config, "get", new=mocked_config_get):
+        with patch.object(requests, "post", new=mocked_requests_post):
+            runner.run()
+
+    assert mocked_requests_post.call_count == 2
+    mocked_requests_post.assert_called_with(
+        f"{remote_url}/sysinfo", json={'sys_data': collected_data}
+    )
+    runner._logger.warning.assert_called_once()
@@ -2,15 +2,17 @@ from argparse import ArgumentParser
 from runner import print_command_list, _get_runner_by_command, setup_parser, run,\
                     load_config_files,\
                     PROGRAM_NAME, PROGRAM_DESC, PROGRAM_EPILOG, PROGRAM_VERSION,\
-                    SUBCOMMAND_TOKEN, CLI_NAME, IMPLEMENTED_IN_BASH_TOKEN
+                    SUBCOMMAND_TOKEN, CLI_NAME, IMPLEMENTED_IN_BASH_TOKEN, HELP_TOKEN,\
+                    COMMAND_MAP, SUBCOMMAND_MAP
 from unittest.mock import patch, Mock, call
 import pytest
 from unittest import TestCase
-from definitions import CONFIG_DIR
+from definitions import CONFIG_DIR, ROOT_DIR, CONFIG_SNAPSHOT_FILE
+from janitor.lib.config_snapshot import ConfigSnapshot
+from janitor.runners.runner_loader import load_runner
 from pyxavi.logger import Logger
-from pyxavi.storage import Storage
-import os
-import glob
+import subprocess
+import sys
 from janitor.runners.runner_protocol import RunnerProtocol
 
 test_command_map = {
@@ -52,46 +54,19 @@ def test_setup_parser():
 
 
 def test_load_config_files():
-    files = {
-        "main.yaml": {
-            "param1": "value1", "param2": "value2"
-        },
-        "second.yaml": {
-            "param2": "value2b"
-        },
-        "third.yaml": {
-            "param3": "value3"
-        },
-    }
-
-    mocked_glob = Mock()
-    mocked_glob.return_value = list(files.keys())
-    mocked_path_exists = Mock()
-    mocked_path_exists.return_value = True
-    mocked_load_file_contents = Mock()
-    mocked_load_file_contents.side_effect = [
-        list(files.values())[0],
-        list(files.values())[0],
-        list(files.values())[1],
-        list(files.values())[2],
-    ]
-    with patch.object(glob, "glob", new=mocked_glob):
-        with patch.object(os.path, "exists", new=mocked_path_exists):
-            with patch.object(Storage, "_load_file_contents", new=mocked_load_file_contents):
-                config = load_config_files()
-
-    mocked_load_file_contents.assert_has_calls(
-        [
-            call(os.path.join(CONFIG_DIR, "main.yaml")),
-            call(os.path.join(CONFIG_DIR, "main.yaml")),
-            call(os.path.join(CONFIG_DIR, "second.yaml")),
-            call(os.path.join(CONFIG_DIR, "third.yaml")),
-        ]
+    mocked_snapshot_init = Mock()
+    mocked_snapshot_init.return_value = None
+    mocked_snapshot_load = Mock()
+    mocked_snapshot_load.return_value = "config"
+    with patch.object(ConfigSnapshot, "__init__", new=mocked_snapshot_init):
+        with patch.object(ConfigSnapshot, "load", new=mocked_snapshot_load):
+            config = load_config_files()
+
+    mocked_snapshot_init.assert_called_once_with(
+        config_dir=CONFIG_DIR, snapshot_file=CONFIG_SNAPSHOT_FILE
     )
-
-    assert config.get("param1") == "value1"
-    assert config.get("param2") == "value2b"
-    assert config.get("param3") == "value3"
+    mocked_snapshot_load.assert_called_once()
+    assert config == "config"
 
 
 @pytest.mark.parametrize(
@@ -109,10 +84,10 @@ def test_load_config_files():
     ],
 )
 def test_get_runner_by_command(command, subcommand, expected_runner, capsys):
-    # For test purposes, runners here ("runner_(0-9)+") are strings,
-    #   while in the program are meant to be the class of the runner,
-    #   so that once it is returned by the function, the result
-    #   can be directly instantiated.
+    # For test purposes, runners here ("runner_(0-9)+") are returned as they are,
+    #   while in the program they are the "module:Class" path of the runner,
+    #   that gets imported so that once it is returned by the function,
+    #   the result can be directly instantiated.
     #
     #   class Example:
     #       def __init__(self, param: str):
@@ -147,12 +122,13 @@ def test_get_runner_by_command(command, subcommand, expected_runner, capsys):
 
     with patch("runner.COMMAND_MAP", new=test_command_map):
         with patch("runner.SUBCOMMAND_MAP", new=test_subcommand_map):
-            if expected_runner is False:
-                with TestCase.assertRaises("runner", RuntimeError):
+            with patch("runner.load_runner", new=lambda path: path):
+                if expected_runner is False:
+                    with TestCase.assertRaises("runner", RuntimeError):
+                        runner_to_call = _get_runner_by_command(args=args)
+                else:
                     runner_to_call = _get_runner_by_command(args=args)
-            else:
-                runner_to_call = _get_runner_by_command(args=args)
-                assert runner_to_call == expected_runner
+                    assert runner_to_call == expected_runner
 
 
 def test_print_command_list(capsys):
@@ -230,3 +206,37 @@ def test_run_command():
     mocked_get_runner.assert_called_once_with(args=parsed_args)
     mocked_returned_runner.assert_called_once()
     mocked_runner_run.assert_called_once()
+
+
+def test_all_runners_in_the_maps_can_be_loaded():
+    tokens = [SUBCOMMAND_TOKEN, HELP_TOKEN, IMPLEMENTED_IN_BASH_TOKEN]
+    paths = [runner for runner, _ in COMMAND_MAP.values() if runner not in tokens]
+    for subcommands in SUBCOMMAND_MAP.values():
+        paths += [runner for runner, _ in subcommands.values() if runner not in tokens]
+
+    for path in paths:
+        assert callable(getattr(load_runner(path), "run", None)), path
+
+
+def test_importing_the_runner_does_not_import_the_runners():
+    # Guards the CLI start up time: a fresh interpreter must not import the heavy stack
+    heavy_modules = [
+        "flask",
+        "flask_restful",
+        "git",
+        "psutil",
+        "requests",
+        "mastodon",
+        "pkg_resources",
+        "janitor.runners.listen",
+        "janitor.runners.git_changes",
+        "janitor.runners.scheduler"
+    ]
+    code = "import sys, runner; " +\
+        f"print(','.join(m for m in {heavy_modules} if m in sys.modules))"
+
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT_DIR, capture_output=True, text=True, check=True
+    )
+
+    assert result.stdout.strip() == ""
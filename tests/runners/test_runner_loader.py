@@ -0,0 +1,21 @@
+from janitor.runners.runner_loader import load_runner
+from janitor.runners.whatismyip import WhatIsMyIp
+import pytest
+
+
+def test_load_runner():
+    assert load_runner("janitor.runners.whatismyip:WhatIsMyIp") is WhatIsMyIp
+
+
+@pytest.mark.parametrize(
+    argnames=('path', 'expected_exception'),
+    argvalues=[
+        ("janitor.runners.whatismyip", RuntimeError),
+        (":WhatIsMyIp", RuntimeError),
+        ("janitor.runners.unexisting:Unexisting", ModuleNotFoundError),
+        ("janitor.runners.whatismyip:Unexisting", AttributeError),
+    ],
+)
+def test_load_runner_wrong_paths(path, expected_exception):
+    with pytest.raises(expected_exception):
+        load_runner(path)
@@ -1,10 +1,11 @@
 from pyxavi.config import Config
 from pyxavi.logger import Logger
-from janitor.runners.scheduler import Scheduler
-from unittest.mock import patch, Mock
+from janitor.runners.scheduler import Scheduler, SchedulerDaemon
+from unittest.mock import patch, Mock, call
 from croniter import croniter
 from freezegun import freeze_time
-from datetime import datetime
+from datetime import datetime, timedelta
+import pytest
 from logging import Logger as PythonLogger
 
 SCHEDULES = [{"name": "Heartbeat", "when": "* * * * *", "action": "sysinfo_local"}]
@@ -18,6 +19,10 @@ def patched_generic_init_with_config(self, config):
     pass
 
 
+def patched_config_get_default(self, param: str, default=None):
+    return default
+
+
 @patch.object(Config, "__init__", new=patched_generic_init)
 @patch.object(Logger, "__init__", new=patched_generic_init_with_config)
 def get_instance() -> Scheduler:
@@ -26,7 +31,8 @@ def get_instance() -> Scheduler:
     mocked_logger_get_logger = Mock()
     mocked_logger_get_logger.return_value = mocked_official_logger
     with patch.object(Logger, "get_logger", new=mocked_logger_get_logger):
-        return Scheduler(config=Config(), logger=mocked_official_logger)
+        with patch.object(Config, "get", new=patched_config_get_default):
+            return Scheduler(config=Config(), logger=mocked_official_logger)
 
 
 def test_init():
@@ -75,3 +81,229 @@ def test_run_time_does_match():
     mocked_config_get.assert_called_once_with("schedules")
     mocked_croniter_match.assert_called_once_with(SCHEDULES[0]["when"], now)
     mocked_action_execution.assert_called_once_with(SCHEDULES[0]["action"])
+
+
+@freeze_time("2023-03-26 13:00")
+def test_run_dispatches_to_the_workers_and_waits():
+    runner = get_instance()
+    runner._workers_active = True
+
+    mocked_config_get = Mock()
+    mocked_config_get.return_value = SCHEDULES
+    mocked_pool = Mock()
+    mocked_action_execution = Mock()
+    with patch.object(Config, "get", new=mocked_config_get):
+        with patch.object(runner, "_get_pool", return_value=mocked_pool) as mocked_get_pool:
+            with patch.object(runner, "_execute_action", new=mocked_action_execution):
+                runner._pool = mocked_pool
+                runner.run()
+
+    mocked_get_pool.assert_called_once()
+    mocked_pool.dispatch.assert_called_once_with(SCHEDULES[0])
+    mocked_pool.wait.assert_called_once()
+    mocked_action_execution.assert_not_called()
+
+
+def test_execute_action_loads_the_runner():
+    runner = get_instance()
+
+    mocked_runner_class = Mock()
+    mocked_load_runner = Mock()
+    mocked_load_runner.return_value = mocked_runner_class
+    with patch("janitor.runners.scheduler.load_runner", new=mocked_load_runner):
+        runner._execute_action("git_changes")
+
+    mocked_load_runner.assert_called_once_with("janitor.runners.git_changes:GitChanges")
+    mocked_runner_class.assert_called_once_with(config=runner._config, logger=runner._logger)
+    mocked_runner_class.return_value.run.assert_called_once()
+
+
+def test_execute_action_unknown():
+    runner = get_instance()
+
+    mocked_load_runner = Mock()
+    with patch("janitor.runners.scheduler.load_runner", new=mocked_load_runner):
+        runner._execute_action("unknown")
+
+    mocked_load_runner.assert_not_called()
+    runner._logger.error.assert_called_once()
+
+
+DAEMON_CONFIG = {
+    "scheduler.daemon.grace_seconds": 60,
+    "scheduler.daemon.max_catch_up": 3,
+    "scheduler.daemon.max_sleep_seconds": 60,
+}
+
+
+def patched_daemon_config_get(self, param: str, default=None):
+    return DAEMON_CONFIG[param] if param in DAEMON_CONFIG else default
+
+
+@patch.object(Config, "__init__", new=patched_generic_init)
+def get_daemon_instance() -> SchedulerDaemon:
+    mocked_official_logger = Mock()
+    mocked_official_logger.__class__ = PythonLogger
+    with patch.object(Config, "get", new=patched_daemon_config_get):
+        return SchedulerDaemon(config=Config(), logger=mocked_official_logger)
+
+
+def test_daemon_init():
+    runner = get_daemon_instance()
+
+    assert isinstance(runner, SchedulerDaemon)
+    assert runner._grace == timedelta(seconds=60)
+    assert runner._max_catch_up == 3
+    assert runner._max_sleep == 60
+    assert runner._heap == []
+
+
+def test_daemon_build_heap_orders_by_next_run_and_drops_invalid():
+    now = datetime(2023, 3, 26, 13, 7, 30)
+    schedules = [
+        {
+            "name": "Hourly", "when": "0 * * * *", "action": "git_changes"
+        },
+        {
+            "name": "Broken", "when": "not a cron", "action": "update_ddns"
+        },
+        {
+            "name": "Every 10", "when": "*/10 * * * *", "action": "sysinfo_local"
+        },
+    ]
+    runner = get_daemon_instance()
+
+    runner._build_heap(schedules, now)
+
+    assert len(runner._heap) == 2
+    assert runner._heap[0] == (datetime(2023, 3, 26, 13, 10), 2, schedules[2])
+    assert sorted(runner._heap)[1] == (datetime(2023, 3, 26, 14, 0), 0, schedules[0])
+
+
+def test_daemon_build_heap_unknown_catch_up():
+    schedules = [{"name": "Hourly", "when": "0 * * * *", "action": "x", "catch_up": "maybe"}]
+    runner = get_daemon_instance()
+
+    with pytest.raises(RuntimeError):
+        runner._build_heap(schedules, datetime(2023, 3, 26, 13, 7))
+
+
+def test_daemon_run_due_runs_and_reschedules():
+    schedules = [
+        {
+            "name": "Every 10", "when": "*/10 * * * *", "action": "sysinfo_local"
+        },
+        {
+            "name": "Hourly", "when": "0 * * * *", "action": "git_changes"
+        },
+    ]
+    runner = get_daemon_instance()
+    runner._build_heap(schedules, datetime(2023, 3, 26, 12, 55))
+
+    mocked_action_execution = Mock()
+    with patch.object(runner, "_execute_action", new=mocked_action_execution):
+        next_run = runner._run_due(datetime(2023, 3, 26, 13, 0, 5))
+
+    assert mocked_action_execution.call_args_list == [
+        call("sysinfo_local"), call("git_changes")
+    ]
+    assert next_run == datetime(2023, 3, 26, 13, 10)
+
+
+def test_daemon_run_due_nothing_due():
+    schedules = [{"name": "Hourly", "when": "0 * * * *", "action": "git_changes"}]
+    runner = get_daemon_instance()
+    runner._build_heap(schedules, datetime(2023, 3, 26, 12, 55))
+
+    mocked_action_execution = Mock()
+    with patch.object(runner, "_execute_action", new=mocked_action_execution):
+        next_run = runner._run_due(datetime(2023, 3, 26, 12, 59))
+
+    mocked_action_execution.assert_not_called()
+    assert next_run == datetime(2023, 3, 26, 13, 0)
+
+
+def test_daemon_run_due_survives_a_failing_action():
+    schedules = [
+        {
+            "name": "Failing", "when": "0 * * * *", "action": "update_ddns"
+        },
+        {
+            "name": "Working", "when": "0 * * * *", "action": "git_changes"
+        },
+    ]
+    runner = get_daemon_instance()
+    runner._build_heap(schedules, datetime(2023, 3, 26, 12, 55))
+
+    mocked_action_execution = Mock()
+    mocked_action_execution.side_effect = [RuntimeError("Oops"), None]
+    with patch.object(runner, "_execute_action", new=mocked_action_execution):
+        runner._run_due(datetime(2023, 3, 26, 13, 0))
+
+    assert mocked_action_execution.call_count == 2
+    runner._logger.exception.assert_called_once()
+
+
+@pytest.mark.parametrize(
+    argnames=('catch_up', 'now', 'expected_runs'),
+    argvalues=[
+        # On time, whatever the policy
+        ("skip", datetime(2023, 3, 26, 13, 0, 30), 1),
+        ("all", datetime(2023, 3, 26, 13, 0, 30), 1),
+        # Late by less than a tick
+        ("once", datetime(2023, 3, 26, 13, 5), 1),
+        ("skip", datetime(2023, 3, 26, 13, 5), 0),
+        ("all", datetime(2023, 3, 26, 13, 5), 1),
+        # Late by several ticks, landing close to the last one
+        ("once", datetime(2023, 3, 26, 13, 20, 30), 1),
+        ("skip", datetime(2023, 3, 26, 13, 20, 30), 1),
+        ("all", datetime(2023, 3, 26, 13, 20, 30), 3),
+        # Way too late, "all" is capped
+        ("all", datetime(2023, 3, 26, 18, 0), 3),
+        ("skip", datetime(2023, 3, 26, 18, 5), 0),
+    ],
+)
+def test_daemon_get_runs_amount(catch_up, now, expected_runs):
+    schedule = {"name": "Every 10", "when": "*/10 * * * *", "catch_up": catch_up}
+    runner = get_daemon_instance()
+
+    result = runner._get_runs_amount(schedule, datetime(2023, 3, 26, 13, 0), now)
+
+    assert result == expected_runs
+
+
+def test_daemon_run_sleeps_until_the_next_one_and_stops():
+    runner = get_daemon_instance()
+    runner._build_heap(
+        [{
+            "name": "Hourly", "when": "0 * * * *", "action": "git_changes"
+        }], datetime.now()
+    )
+
+    def stop_on_wait(timeout):
+        assert 0 < timeout <= 60
+        runner.stop()
+
+    mocked_build_heap = Mock()
+    mocked_config_get = Mock()
+    mocked_config_get.return_value = []
+    with patch.object(Config, "get", new=mocked_config_get):
+        with patch.object(runner, "_build_heap", new=mocked_build_heap):
+            with patch.object(runner._stop_event, "wait", new=stop_on_wait):
+                with patch("janitor.runners.scheduler.signal.signal"):
+                    runner.run()
+
+    mocked_build_heap.assert_called_once()
+    assert runner._stop_event.is_set()
+
+
+def test_daemon_run_without_schedules():
+    runner = get_daemon_instance()
+
+    mocked_config_get = Mock()
+    mocked_config_get.return_value = []
+    with patch.object(Config, "get", new=mocked_config_get):
+        with patch("janitor.runners.scheduler.signal.signal"):
+            runner.run()
+
+    runner._logger.warning.assert_called_once()
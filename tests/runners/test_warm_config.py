@@ -0,0 +1,31 @@
+from pyxavi.config import Config
+from janitor.runners.warm_config import WarmConfig
+from janitor.lib.config_snapshot import ConfigSnapshot
+from definitions import CONFIG_DIR, CONFIG_SNAPSHOT_FILE
+from unittest.mock import patch, Mock
+
+
+def patched_config_init(self):
+    pass
+
+
+def get_instance() -> WarmConfig:
+    with patch.object(Config, "__init__", new=patched_config_init):
+        return WarmConfig(config=Config(), logger=Mock())
+
+
+def test_run_builds_the_snapshot():
+    runner = get_instance()
+
+    mocked_snapshot_init = Mock()
+    mocked_snapshot_init.return_value = None
+    mocked_snapshot_build = Mock()
+    with patch.object(ConfigSnapshot, "__init__", new=mocked_snapshot_init):
+        with patch.object(ConfigSnapshot, "build", new=mocked_snapshot_build):
+            runner.run()
+
+    mocked_snapshot_init.assert_called_once_with(
+        config_dir=CONFIG_DIR, snapshot_file=CONFIG_SNAPSHOT_FILE
+    )
+    mocked_snapshot_build.assert_called_once()
+    runner._logger.info.assert_called_once()